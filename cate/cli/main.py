@@ -332,6 +332,16 @@ def _list_items(category_singular_name: str, category_plural_name: str, names: L
         print('%4d: %s' % (no, item))
 
 
+def _format_size(num_bytes: int) -> str:
+    for unit in ('bytes', 'KiB', 'MiB', 'GiB'):
+        if num_bytes < 1024:
+            break
+        num_bytes /= 1024
+    else:
+        unit = 'TiB'
+    return '%d %s' % (num_bytes, unit) if unit == 'bytes' else '%.1f %s' % (num_bytes, unit)
+
+
 def _get_op_data_type_str(data_type: str):
     return data_type.__name__ if isinstance(data_type, type) else repr(data_type)
 
@@ -1191,6 +1201,12 @@ class DataSourceCommand(SubCommandCommand):
                                  help='Names of variables to be included. Use format "pattern1,pattern2,..."')
         copy_parser.set_defaults(sub_command_function=cls._execute_copy)
 
+        usage_parser = subparsers.add_parser('usage', help='Display the disk usage of local copies of data sources.')
+        usage_parser.add_argument('--evict', '-e', action='store_true',
+                                  help='Remove least recently used local copies exceeding the quota '
+                                       'given by configuration parameter "local_data_store_quota".')
+        usage_parser.set_defaults(sub_command_function=cls._execute_usage)
+
     # noinspection PyShadowingNames
     @classmethod
     def _execute_list(cls, command_args):
@@ -1297,6 +1313,31 @@ class DataSourceCommand(SubCommandCommand):
         else:
             print("Local data source not created. It would have been empty. Please check constraint.")
 
+    @classmethod
+    def _execute_usage(cls, command_args):
+        from cate.core.ds import DATA_STORE_REGISTRY
+
+        local_store = DATA_STORE_REGISTRY.get_data_store('local')
+        if local_store is None:
+            raise RuntimeError('internal error: no local data store found')
+
+        if command_args.evict:
+            removed_ids = local_store.evict(monitor=cls.new_monitor())
+            for ds_id in removed_ids:
+                print("Local data source with name '%s' has been removed." % ds_id)
+
+        local_copies = local_store.get_local_copies()
+        total_size = sum(data_source.size for data_source in local_copies)
+        quota = local_store.get_quota()
+        print('Local copies use %s%s' % (_format_size(total_size),
+                                         ' of %s' % _format_size(quota) if quota is not None else ''))
+        # Most recently used first
+        names = ['%s (%s, last access %s)' % (data_source.id,
+                                              _format_size(data_source.size),
+                                              data_source.last_access or 'unknown')
+                 for data_source in reversed(local_copies)]
+        _list_items('local copy', 'local copies', names, None)
+
 
 class UpdateCommand(Command):
     """
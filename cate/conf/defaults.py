@@ -45,6 +45,27 @@ DEFAULT_RES_PATTERN = 'res_{index}'
 
 NETCDF_COMPRESSION_LEVEL = 9
 
+#: The maximum number of concurrent connections used to download remote data files
+HTTP_DOWNLOAD_MAX_CONNECTIONS = 4
+
+#: The maximum number of remote files concurrently read via OPeNDAP
+OPENDAP_MAX_CONNECTIONS = 4
+
+#: The maximum number of concurrent connections used to synchronize file sets with FTP servers
+FTP_MAX_CONNECTIONS = 4
+
+#: The maximum size in GiB of all local copies in the local data store, None means unlimited
+LOCAL_DATA_STORE_QUOTA = None
+
+#: The format of new local copies in the local data store, either 'netcdf' or 'zarr'
+LOCAL_DATA_STORE_FORMAT = 'netcdf'
+
+#: The chunk layouts of Zarr-backed local copies, either 'map', 'time_series', or 'both'
+LOCAL_DATA_STORE_ZARR_CHUNKING = 'map'
+
+#: The compression of the t-digests used to estimate quantiles of large datasets, higher is more accurate
+QUANTILE_COMPRESSION = 200
+
 _ONE_MIB = 1024 * 1024
 _ONE_GIB = 1024 * _ONE_MIB
 
@@ -37,6 +37,38 @@
 #   'https://host:port'
 # http_proxy =
 
+# The maximum number of concurrent connections used when remote data files are downloaded,
+# e.g. when making a local copy of an ESA CCI Open Data Portal data source.
+# http_download_max_connections = 4
+
+# The maximum number of remote files read concurrently via OPeNDAP when making a local copy of a subset of
+# an ESA CCI Open Data Portal data source.
+# opendap_max_connections = 4
+
+# The maximum number of concurrent connections used when file sets are synchronized with an FTP server.
+# ftp_max_connections = 4
+
+# The maximum size in GiB of all local copies of data sources in the local data store. If a new local copy
+# exceeds this quota, least recently used local copies are removed, except for local copies referenced by
+# open workspaces. Type "cate ds usage" to display the current usage. By default, the size is not limited.
+# local_data_store_quota = 50
+
+# The format of new local copies of data sources. By default, or if 'local_data_store_format' is 'netcdf', a local
+# copy comprises a compressed netCDF file for each remote file. If 'zarr', the data of all files is appended to a
+# single Zarr store, which is faster to open and to read. This requires the Python packages "zarr" and "numcodecs".
+# local_data_store_format = 'zarr'
+
+# The chunking of the Zarr stores of local copies, if 'local_data_store_format' is 'zarr'. Chunks of the
+# 'map' chunking comprise single time steps and are best for displaying maps. Chunks of the 'time_series'
+# chunking comprise many time steps for small spatial tiles and are best for extracting time series at points
+# or for small regions. 'both' keeps a second copy in the 'time_series' chunking, which is used when local copies
+# are opened for a region. The default is 'map'.
+# local_data_store_zarr_chunking = 'both'
+
+# The compression of the t-digest sketches used to estimate quantiles, e.g. by the 'detect_outliers' operation.
+# Higher values are more accurate but slower, datasets with fewer values than this are processed exactly.
+# quantile_compression = 200
+
 # Include/exclude data sources (currently effective in Cate Desktop GUI only, not used by API, CLI).
 #
 # If 'included_data_sources' is a list, its entries are expected to be wildcard patterns for the identifiers of data
@@ -83,13 +83,15 @@ import re
 import itertools
 from abc import ABCMeta, abstractmethod
 from enum import Enum
-from typing import Sequence, Optional, Union, Any, Dict, Set
+from typing import Sequence, Optional, Union, Any, Dict, Set, Callable
 
 import xarray as xr
 
 from .cdm import Schema, get_lon_dim_name, get_lat_dim_name
+from .dsindex import DataSourceIndex
 from .opimpl import normalize_missing_time, normalize_coord_vars
 from .types import PolygonLike, TimeRange, TimeRangeLike, VarNamesLike, ValidationError
+from .vds import open_virtual_dataset, VirtualDatasetError
 from ..util.monitor import Monitor
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
@@ -314,6 +316,7 @@ class DataStore(metaclass=ABCMeta):
         self._id = ds_id
         self._title = title or ds_id
         self._is_local = is_local
+        self._search_index = None
 
     @property
     def id(self) -> str:
@@ -372,6 +375,41 @@ class DataStore(metaclass=ABCMeta):
         :return: Sequence of data sources.
         """
 
+    def search(self,
+               query_expr: str = None,
+               var_names: VarNamesLike.TYPE = None,
+               region: PolygonLike.TYPE = None,
+               time_range: TimeRangeLike.TYPE = None,
+               monitor: Monitor = Monitor.NONE) -> Sequence[DataSource]:
+        """
+        Search data sources in this data store by keywords, variable names, and spatial and temporal coverage.
+
+        Other than ``query()``, which tests every data source, this method uses an inverted index over the
+        data source metadata. The index is built on first use and rebuilt whenever the data sources returned
+        by ``query()`` change.
+
+        :param query_expr: Keywords which must all be found in the identifier, title, variable names or
+            meta-information of a data source. Keywords may be incomplete.
+        :param var_names: Names of variables a data source must provide.
+        :param region: Region a data source must intersect.
+        :param time_range: Time range a data source must intersect.
+        :param monitor: A progress monitor.
+        :return: Sequence of data sources, sorted by descending rank.
+        """
+        data_sources = self.query(monitor=monitor)
+        search_index = self._search_index
+        if search_index is None or len(search_index.data_sources) != len(data_sources) \
+                or any(a is not b for a, b in zip(search_index.data_sources, data_sources)):
+            search_index = DataSourceIndex(data_sources, use_temporal_coverage=self.is_local)
+            self._search_index = search_index
+        return search_index.search(query_expr=query_expr, var_names=var_names, region=region, time_range=time_range)
+
+    def _invalidate_search_index(self):
+        """
+        Force rebuilding the search index, e.g. after the meta-information of a data source has changed.
+        """
+        self._search_index = None
+
     # TODO (forman): issue #399 - remove @abstractmethod, provide reasonable default impl. to make it a convenient ABC
     @abstractmethod
     def _repr_html_(self):
@@ -545,6 +583,8 @@ def open_dataset(data_source: Union[DataSource, str],
 # noinspection PyUnresolvedReferences,PyProtectedMember
 def open_xarray_dataset(paths,
                         monitor: Monitor = Monitor.NONE,
+                        preprocess: Callable[[xr.Dataset], xr.Dataset] = None,
+                        index_path: str = None,
                         **kwargs) -> xr.Dataset:
     """
     Open multiple files as a single dataset. This uses dask. If each individual file
@@ -555,6 +595,11 @@ def open_xarray_dataset(paths,
     :param paths: Either a string glob in the form "path/to/my/files/\*.nc" or an explicit
         list of files to open.
     :param monitor: A progress monitor.
+    :param preprocess: Optional function called for each opened file before the file is normalized,
+        e.g. to select variables and index ranges.
+    :param index_path: Optional path to a virtual dataset index file. If given, the dataset is assembled
+        from the index and the first file, so that other files are opened only when their data is read.
+        The index is created or updated as required. See :py:mod:`cate.core.vds`.
     :param kwargs: Keyword arguments directly passed to ``xarray.open_mfdataset()``
     """
     # paths could be a string or a list
@@ -577,6 +622,19 @@ def open_xarray_dataset(paths,
     else:
         concat_dim = 'time'
 
+    if index_path and len(files) > 1 and not any(re.match(URL_REGEX, file) for file in files):
+        try:
+            return open_virtual_dataset(files,
+                                        index_path,
+                                        concat_dim=concat_dim,
+                                        chunks=kwargs.get('chunks', get_spatial_ext_chunk_sizes),
+                                        preprocess=preprocess,
+                                        monitor=monitor,
+                                        **{k: v for k, v in kwargs.items() if k != 'chunks'})
+        except VirtualDatasetError:
+            # Files differ in structure or cannot be indexed, so let xarray figure it out
+            pass
+
     if 'chunks' in kwargs:
         chunks = kwargs.pop('chunks')
     elif len(files) > 1:
@@ -596,7 +654,9 @@ def open_xarray_dataset(paths,
     else:
         chunks = None
 
-    def preprocess(raw_ds: xr.Dataset):
+    def normalize(raw_ds: xr.Dataset):
+        if preprocess is not None:
+            raw_ds = preprocess(raw_ds)
         # Add a time dimension if attributes "time_coverage_start" and "time_coverage_end" are found.
         norm_ds = normalize_missing_time(normalize_coord_vars(raw_ds))
         monitor.progress(work=1)
@@ -611,7 +671,7 @@ def open_xarray_dataset(paths,
                                  coords='minimal',
                                  data_vars='minimal',
                                  chunks=chunks,
-                                 preprocess=preprocess,
+                                 preprocess=normalize,
                                  **kwargs)
 
 
@@ -0,0 +1,229 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module provides an inverted index over the metadata of data sources which is used to search
+the data sources of a data store by keywords, variable names, and spatial and temporal coverage.
+
+The index maps every *term* found in the identifier, the title, the variable names and the textual
+meta-information of a data source to the data sources containing it. Keyword search matches terms by
+prefix, so that partially typed keywords already find data sources. Results are ranked by the fields
+in which the keywords have been found.
+
+Components
+==========
+"""
+
+import bisect
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+from .types import PolygonLike, TimeRangeLike, ValidationError, VarNamesLike
+
+if TYPE_CHECKING:
+    # cate.core.ds imports this module
+    from .ds import DataSource
+
+_TERM_SEPARATOR = re.compile(r'[^0-9a-zA-Z]+')
+
+# Weights of matches in the different fields of a data source
+_ID_WEIGHT = 4
+_TITLE_WEIGHT = 4
+_VARIABLE_WEIGHT = 2
+_META_INFO_WEIGHT = 1
+
+#: Names of meta-information fields which are not searched by keywords
+_EXCLUDED_FIELD_NAMES = {'title', 'variables', 'protocols', 'uuid', 'data_sources', 'size',
+                         'number_of_aggregations', 'number_of_files',
+                         'bbox_minx', 'bbox_miny', 'bbox_maxx', 'bbox_maxy',
+                         'temporal_coverage_start', 'temporal_coverage_end',
+                         'creation_date', 'publication_date'}
+
+_BBox = Tuple[float, float, float, float]
+_TimeRange = Tuple[datetime, datetime]
+
+
+def split_terms(text: str) -> List[str]:
+    """
+    Split *text* into lower case search terms.
+
+    :param text: Some text, e.g. a data source identifier.
+    :return: List of terms.
+    """
+    return [term for term in _TERM_SEPARATOR.split(text.lower()) if term]
+
+
+class DataSourceIndex:
+    """
+    An inverted index over the metadata of data sources.
+
+    :param data_sources: The data sources to be indexed.
+    :param use_temporal_coverage: Whether the ``temporal_coverage()`` method of data sources may be called to
+        determine their temporal coverage if it is not given by their meta-information. This should only be used
+        for data sources of local data stores, as the method may require remote access.
+    """
+
+    def __init__(self, data_sources: Sequence['DataSource'], use_temporal_coverage: bool = False):
+        self._data_sources = list(data_sources)
+        self._postings = defaultdict(dict)
+        self._variables = []
+        self._bboxes = []
+        self._time_ranges = []
+        for index, data_source in enumerate(self._data_sources):
+            self._add(index, data_source, use_temporal_coverage)
+        self._postings = dict(self._postings)
+        self._terms = sorted(self._postings.keys())
+
+    @property
+    def data_sources(self) -> List['DataSource']:
+        return self._data_sources
+
+    def search(self,
+               query_expr: str = None,
+               var_names: VarNamesLike.TYPE = None,
+               region: PolygonLike.TYPE = None,
+               time_range: TimeRangeLike.TYPE = None) -> List['DataSource']:
+        """
+        Search the indexed data sources.
+
+        :param query_expr: Keywords separated by whitespace or punctuation. Data sources must contain all keywords
+            in their identifier, title, variable names or meta-information. Keywords match any term starting
+            with the keyword.
+        :param var_names: Names of variables data sources must provide.
+        :param region: Region data sources must intersect. Data sources of unknown spatial coverage are retained.
+        :param time_range: Time range data sources must intersect. Data sources of unknown temporal coverage
+            are retained.
+        :return: Data sources sorted by descending rank, then by title.
+        """
+        scores = None
+        if query_expr:
+            for term in split_terms(query_expr):
+                term_scores = self._match_prefix(term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {index: score + term_scores[index] for index, score in scores.items()
+                              if index in term_scores}
+                if not scores:
+                    return []
+        if scores is None:
+            scores = dict.fromkeys(range(len(self._data_sources)), 0)
+
+        var_names = VarNamesLike.convert(var_names)
+        if var_names:
+            var_names = {var_name.lower() for var_name in var_names}
+            scores = {index: score for index, score in scores.items() if var_names <= self._variables[index]}
+
+        region = PolygonLike.convert(region)
+        if region is not None:
+            x1, y1, x2, y2 = region.bounds
+            scores = {index: score for index, score in scores.items()
+                      if self._bboxes[index] is None or _intersects_bbox(self._bboxes[index], x1, y1, x2, y2)}
+
+        time_range = TimeRangeLike.convert(time_range)
+        if time_range is not None:
+            t1, t2 = time_range
+            scores = {index: score for index, score in scores.items()
+                      if self._time_ranges[index] is None or
+                      (self._time_ranges[index][0] <= t2 and t1 <= self._time_ranges[index][1])}
+
+        def sort_key(index):
+            data_source = self._data_sources[index]
+            return -scores[index], data_source.title or data_source.id
+
+        return [self._data_sources[index] for index in sorted(scores.keys(), key=sort_key)]
+
+    def _match_prefix(self, prefix: str) -> Dict[int, int]:
+        scores = {}
+        i = bisect.bisect_left(self._terms, prefix)
+        while i < len(self._terms) and self._terms[i].startswith(prefix):
+            for index, weight in self._postings[self._terms[i]].items():
+                scores[index] = max(scores.get(index, 0), weight)
+            i += 1
+        return scores
+
+    def _add(self, index: int, data_source: 'DataSource', use_temporal_coverage: bool):
+        meta_info = data_source.meta_info or {}
+
+        self._add_text(index, data_source.id, _ID_WEIGHT)
+        self._add_text(index, data_source.title, _TITLE_WEIGHT)
+
+        variables = set()
+        for variable in meta_info.get('variables') or []:
+            var_name = variable.get('name') if isinstance(variable, dict) else variable
+            if isinstance(var_name, str):
+                variables.add(var_name.lower())
+                self._add_text(index, var_name, _VARIABLE_WEIGHT)
+        self._variables.append(variables)
+
+        for name, value in meta_info.items():
+            if name not in _EXCLUDED_FIELD_NAMES:
+                for text in value if isinstance(value, (list, tuple)) else [value]:
+                    self._add_text(index, text, _META_INFO_WEIGHT)
+
+        self._bboxes.append(_get_bbox(meta_info))
+
+        time_range = _get_time_range(meta_info)
+        if time_range is None and use_temporal_coverage:
+            time_range = data_source.temporal_coverage()
+        self._time_ranges.append(time_range)
+
+    def _add_text(self, index: int, text, weight: int):
+        if not isinstance(text, str):
+            return
+        for term in split_terms(text):
+            postings = self._postings[term]
+            if postings.get(index, 0) < weight:
+                postings[index] = weight
+
+
+def _get_bbox(meta_info: dict) -> Optional[_BBox]:
+    try:
+        bbox = tuple(float(meta_info[name]) for name in ('bbox_minx', 'bbox_miny', 'bbox_maxx', 'bbox_maxy'))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return bbox
+
+
+def _get_time_range(meta_info: dict) -> Optional[_TimeRange]:
+    start = meta_info.get('temporal_coverage_start')
+    end = meta_info.get('temporal_coverage_end')
+    if not start or not end:
+        return None
+    try:
+        return TimeRangeLike.convert('{},{}'.format(start, end))
+    except ValidationError:
+        return None
+
+
+def _intersects_bbox(bbox: _BBox, x1: float, y1: float, x2: float, y2: float) -> bool:
+    minx, miny, maxx, maxy = bbox
+    if miny > y2 or maxy < y1:
+        return False
+    if minx > maxx:
+        # Crosses the anti-meridian
+        return x2 >= minx or x1 <= maxx
+    return minx <= x2 and x1 <= maxx
@@ -21,22 +21,33 @@
 
 import warnings
 from datetime import datetime
-from typing import Optional, Sequence, Union, Tuple
+from typing import Optional, Sequence, Union, Tuple, List, Dict
 
+import dask
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
 from jdcal import jd2gcal
-from matplotlib import path
 from shapely.geometry import box, LineString, Polygon
 
 from .types import PolygonLike, ValidationError
-from ..util.misc import to_list
+from ..util.cache import Cache, MemoryCacheStore
+from ..util.misc import to_list, to_fingerprint
 from ..util.monitor import Monitor
 
 __author__ = "Janis Gailis (S[&]T Norway)" \
              "Norman Fomferra (Brockmann Consult GmbH)"
 
+#: Pixel masks of spatial subsets per (grid, polygon), capacity is given in bytes
+_PIXEL_MASK_CACHE = Cache(MemoryCacheStore(), capacity=128 * 1024 * 1024, threshold=0.75)
+
+#: Statistics computed by reduce_impl(). In addition, percentiles can be given as 'p<percent>', e.g. 'p90'.
+REDUCE_STATISTICS = ['mean', 'std', 'var', 'min', 'max', 'sum', 'count', 'median']
+
+# Order of the partial statistics along the last axis of the blocks reduced by reduce_impl()
+_COUNT, _WEIGHT_SUM, _MEAN, _M2, _MIN, _MAX, _SUM = range(7)
+
 
 def normalize_impl(ds: xr.Dataset) -> xr.Dataset:
     """
@@ -727,12 +738,6 @@ def subset_spatial_impl(ds: xr.Dataset,
     else:
         lat_index = slice(lat_min, lat_max)
 
-    if crosses_antimeridian and not simple_polygon and mask:
-        # Unlikely but plausible
-        raise NotImplementedError('Spatial subsets crossing the anti-meridian'
-                                  ' are currently implemented for simple,'
-                                  ' rectangular polygons only, or complex polygons'
-                                  ' without masking.')
     monitor.progress(1)
     if crosses_antimeridian:
         # Shapely messes up longitudes if the polygon crosses the antimeridian
@@ -749,6 +754,20 @@ def subset_spatial_impl(ds: xr.Dataset,
         indexers = {'lon': lon_index, 'lat': lat_index}
         retset = ds.sel(**indexers)
 
+        if mask and not simple_polygon and not explicit_coords:
+            # Mask in a 0;360 longitude space, where the polygon does not cross the antimeridian
+            rings = [np.column_stack([np.where(ring[:, 0] < 0., ring[:, 0] + 360., ring[:, 0]), ring[:, 1]])
+                     for ring in get_polygon_rings(polygon)]
+            lon_values = retset.lon.values
+            lon_values = np.where(lon_values < 0., lon_values + 360., lon_values)
+            mask = _get_pixel_mask(ds, lon_values, retset.lat.values, rings,
+                                   key=(polygon.wkb, 'lon360'))
+            monitor.progress(1)
+            mask = xr.DataArray(mask,
+                                coords={'lon': retset.lon.values, 'lat': retset.lat.values},
+                                dims=['lat', 'lon'])
+            retset = retset.where(mask)
+
         # Preserve the original longitude dimension, masking elements that
         # do not belong to the polygon with NaN.
         with monitor.observing('subset'):
@@ -769,18 +788,13 @@ def subset_spatial_impl(ds: xr.Dataset,
 
     # Create the mask array. The result of this is a lon/lat DataArray where
     # all pixels falling in the region or on its boundary are denoted with True
-    # and all the rest with False. Works on polygon exterior
-
-    polypath = path.Path(np.column_stack([polygon.exterior.coords.xy[0],
-                                          polygon.exterior.coords.xy[1]]))
+    # and all the rest with False.
+    rings = get_polygon_rings(polygon)
 
     # Handle also a single pixel and 1D edge cases
     if len(retset.lat) == 1 or len(retset.lon) == 1:
         # Create a mask directly on pixel centers
-        lonm, latm = np.meshgrid(retset.lon.values, retset.lat.values)
-        grid_points = [(lon, lat) for lon, lat in zip(lonm.ravel(), latm.ravel())]
-        mask = polypath.contains_points(grid_points)
-        mask = mask.reshape(lonm.shape)
+        mask = rasterize_rings_impl(retset.lon.values, retset.lat.values, rings)
         mask = xr.DataArray(mask,
                             coords={'lon': retset.lon.values, 'lat': retset.lat.values},
                             dims=['lat', 'lon'])
@@ -791,34 +805,10 @@ def subset_spatial_impl(ds: xr.Dataset,
         return retset
 
     # The normal case
-    # Create a grid of pixel vertices
-    lon_pixel = abs(ds.lon.values[1] - ds.lon.values[0])
-    lat_pixel = abs(ds.lat.values[1] - ds.lat.values[0])
-
-    lon_min = retset.lon.values[0] - lon_pixel / 2
-    lon_max = retset.lon.values[-1] + lon_pixel / 2
-    lat_min = retset.lat.values[0] - lat_pixel / 2
-    lat_max = retset.lat.values[-1] + lat_pixel / 2
-
-    lat_grid = np.linspace(lat_min, lat_max, len(retset.lat.values) + 1)
-    lon_grid = np.linspace(lon_min, lon_max, len(retset.lon.values) + 1)
-
-    lonm, latm = np.meshgrid(lon_grid, lat_grid)
-
-    # Mark all grid points falling within the polygon as True
-
     monitor.progress(1)
-    grid_points = [(lon, lat) for lon, lat in zip(lonm.ravel(), latm.ravel())]
-
-    monitor.progress(1)
-    mask = polypath.contains_points(grid_points)
-
+    mask = _get_pixel_mask(ds, retset.lon.values, retset.lat.values, rings, key=polygon.wkb)
     monitor.progress(1)
 
-    mask = mask.reshape(lonm.shape)
-    # Vectorized 'rolling window' numpy magic to go from pixel vertices to pixel centers
-    mask = mask[1:, 1:] + mask[1:, :-1] + mask[:-1, 1:] + mask[:-1, :-1]
-
     mask = xr.DataArray(mask,
                         coords={'lon': retset.lon.values, 'lat': retset.lat.values},
                         dims=['lat', 'lon'])
@@ -831,6 +821,122 @@ def subset_spatial_impl(ds: xr.Dataset,
     return retset
 
 
+def _get_pixel_mask(ds: xr.Dataset, lon: np.ndarray, lat: np.ndarray, rings: List[np.ndarray], key) -> np.ndarray:
+    """
+    Get a (lat, lon) mask of all pixels with at least one pixel vertex inside the polygon
+    given by *rings*. Masks are memoized by the grid and the given polygon *key*, so that
+    subsetting many datasets on the same grid with the same polygon doesn't rasterize again.
+    """
+    lon_pixel = abs(ds.lon.values[1] - ds.lon.values[0])
+    lat_pixel = abs(ds.lat.values[1] - ds.lat.values[0])
+    cache_key = (to_fingerprint(lon, lat, lon_pixel, lat_pixel), key)
+    mask = _PIXEL_MASK_CACHE.get_value(cache_key)
+    if mask is None:
+        # Rasterize the pixel vertices: left/right and lower/upper vertex coordinates,
+        # a pixel is selected if any of its four vertices is inside
+        num_lon, num_lat = lon.size, lat.size
+        vertex_mask = rasterize_rings_impl(np.concatenate([lon - lon_pixel / 2, lon + lon_pixel / 2]),
+                                           np.concatenate([lat - lat_pixel / 2, lat + lat_pixel / 2]),
+                                           rings)
+        mask = (vertex_mask[:num_lat, :num_lon] | vertex_mask[:num_lat, num_lon:] |
+                vertex_mask[num_lat:, :num_lon] | vertex_mask[num_lat:, num_lon:])
+        _PIXEL_MASK_CACHE.put_value(cache_key, mask)
+    return mask
+
+
+def get_polygon_rings(geometry) -> List[np.ndarray]:
+    """
+    Get the exterior and interior rings of a polygonal shapely geometry
+    as a list of (num_coords, 2) arrays of (x, y) coordinates.
+
+    Non-polygonal geometries (points, lines) have no rings.
+
+    :param geometry: A shapely geometry
+    :return: List of ring coordinate arrays
+    """
+    if geometry is None or geometry.is_empty:
+        return []
+    if isinstance(geometry, Polygon):
+        rings = [geometry.exterior]
+        rings.extend(geometry.interiors)
+        return [np.asarray(ring.coords, dtype=np.float64)[:, :2] for ring in rings]
+    if hasattr(geometry, 'geoms'):
+        rings = []
+        for part in geometry.geoms:
+            rings.extend(get_polygon_rings(part))
+        return rings
+    return []
+
+
+def rasterize_rings_impl(x: np.ndarray, y: np.ndarray, rings: Sequence[np.ndarray]) -> np.ndarray:
+    """
+    Rasterize polygon rings onto the rectilinear grid given by the 1D coordinates
+    *x* and *y* using a vectorized scanline algorithm and the even-odd rule.
+
+    A grid point is inside, if it is inside the ring(s) or on a left or bottom edge.
+    The coordinates need not be sorted.
+
+    :param x: 1D x-coordinates of the grid points, e.g. longitudes
+    :param y: 1D y-coordinates of the grid points, e.g. latitudes
+    :param rings: Ring coordinate arrays, each of shape (num_coords, 2), see :py:func:`get_polygon_rings`
+    :return: Boolean mask of shape (len(y), len(x))
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.zeros((y.size, x.size), dtype=np.bool_)
+    if x.size == 0 or y.size == 0 or not rings:
+        return mask
+
+    # Collect the edges of all rings, each ring implicitly closed
+    edges = []
+    for ring in rings:
+        ring = np.asarray(ring, dtype=np.float64)[:, :2]
+        if len(ring) < 3:
+            continue
+        edges.append(np.column_stack([ring, np.roll(ring, -1, axis=0)]))
+    if not edges:
+        return mask
+    edges = np.concatenate(edges)
+    x0, y0, x1, y1 = edges[:, 0], edges[:, 1], edges[:, 2], edges[:, 3]
+    non_horizontal = y0 != y1
+    x0, y0, x1, y1 = x0[non_horizontal], y0[non_horizontal], x1[non_horizontal], y1[non_horizontal]
+
+    y_order = np.argsort(y, kind='mergesort')
+    x_order = np.argsort(x, kind='mergesort')
+    ys = y[y_order]
+    xs = x[x_order]
+
+    # Each edge crosses the scanlines ys[row_start:row_stop] (half-open in y)
+    row_start = np.searchsorted(ys, np.minimum(y0, y1), side='left')
+    row_stop = np.searchsorted(ys, np.maximum(y0, y1), side='left')
+    num_rows = row_stop - row_start
+    num_crossings = int(num_rows.sum())
+    if num_crossings == 0:
+        return mask
+
+    edge_index = np.repeat(np.arange(num_rows.size), num_rows)
+    row = np.arange(num_crossings) - np.repeat(np.cumsum(num_rows) - num_rows, num_rows) + row_start[edge_index]
+    x0, y0, x1, y1 = x0[edge_index], y0[edge_index], x1[edge_index], y1[edge_index]
+    x_crossing = x0 + (ys[row] - y0) * (x1 - x0) / (y1 - y0)
+
+    # Closed rings cross every scanline an even number of times,
+    # so sorted crossings of a row can be paired into inside intervals
+    order = np.lexsort((x_crossing, row))
+    row = row[order]
+    x_crossing = x_crossing[order]
+    col_start = np.searchsorted(xs, x_crossing[0::2], side='left')
+    col_stop = np.searchsorted(xs, x_crossing[1::2], side='left')
+    interval_row = row[0::2]
+
+    counts = np.zeros((y.size, x.size + 1), dtype=np.int32)
+    np.add.at(counts, (interval_row, col_start), 1)
+    np.add.at(counts, (interval_row, col_stop), -1)
+    inside = np.cumsum(counts[:, :-1], axis=1) > 0
+
+    mask[np.ix_(y_order, x_order)] = inside
+    return mask
+
+
 def _crosses_antimeridian(region: Polygon) -> bool:
     """
     Determine if the given region crosses the Antimeridian line, by converting
@@ -925,3 +1031,160 @@ def subset_temporal_index_impl(ds: xr.Dataset,
     time_slice = slice(time_ind_min, time_ind_max + 1)
     indexers = {'time': time_slice}
     return ds.isel(**indexers)
+
+
+def reduce_impl(ds: xr.Dataset,
+                var_names: Sequence[str],
+                dims: Sequence[str],
+                statistics: Sequence[str],
+                area_weighted: bool = False,
+                monitor: Monitor = Monitor.NONE) -> Dict[str, Dict[str, xr.DataArray]]:
+    """
+    Compute statistics of the given variables along the given dimensions, ignoring missing values.
+
+    All statistics of all variables are computed together in a single pass over the data.
+    Partial statistics are computed for each chunk and merged in a tree reduction, only percentiles
+    require the data of each output chunk at once.
+
+    :param ds: The dataset
+    :param var_names: Names of the variables to reduce
+    :param dims: Dimensions to reduce, dimensions a variable does not have are ignored
+    :param statistics: Statistics to compute, see REDUCE_STATISTICS, and percentiles given as 'p<percent>'
+    :param area_weighted: Whether to weight the mean, variance and standard deviation by the cosine of latitude
+           if the 'lat' dimension is reduced. Other statistics are never weighted.
+    :param monitor: A progress monitor
+    :return: The statistics as a dictionary that maps variable names to dictionaries that map statistics to
+             data arrays
+    """
+    percentiles = {}
+    for statistic in statistics:
+        if statistic == 'median':
+            percentiles[statistic] = 50.
+        elif statistic not in REDUCE_STATISTICS:
+            try:
+                percentiles[statistic] = float(statistic[1:]) if statistic.startswith('p') else None
+            except ValueError:
+                percentiles[statistic] = None
+            if percentiles[statistic] is None or not 0. <= percentiles[statistic] <= 100.:
+                raise ValidationError('Unknown statistic "{}", must be one of {} or a percentile'
+                                      ' such as "p90"'.format(statistic, ', '.join(REDUCE_STATISTICS)))
+
+    templates = {}
+    lazy_results = {}
+    for var_name in var_names:
+        var = ds[var_name]
+        var_dims = [dim for dim in var.dims if dim in dims]
+        axes = tuple(var.get_axis_num(var_dims))
+        data = var.data
+        if not isinstance(data, da.Array):
+            data = da.from_array(data, chunks='auto')
+
+        weights = []
+        if area_weighted and 'lat' in var_dims:
+            lat_axis = var.get_axis_num('lat')
+            lat_weights = np.cos(np.deg2rad(var['lat'].values)).reshape([-1 if dim == 'lat' else 1 for dim in var.dims])
+            lat_weights = da.from_array(lat_weights, chunks=tuple(chunks if axis == lat_axis else 1
+                                                                  for axis, chunks in enumerate(data.chunks)))
+            weights = [da.broadcast_to(lat_weights, data.shape, chunks=data.chunks)]
+
+        block_stats = da.map_blocks(_reduce_chunk, data, *weights,
+                                    axes=axes,
+                                    dtype=np.float64,
+                                    new_axis=[data.ndim],
+                                    chunks=tuple((1,) * len(chunks) if axis in axes else chunks
+                                                 for axis, chunks in enumerate(data.chunks)) + ((7,),))
+        stats = da.reduction(block_stats, _identity_chunk, _merge_chunk_stats,
+                             combine=_merge_chunk_stats,
+                             axis=axes,
+                             keepdims=False,
+                             dtype=np.float64,
+                             concatenate=True)
+
+        results = {}
+        for statistic in statistics:
+            if statistic in percentiles:
+                rechunked_data = data.rechunk({axis: -1 for axis in axes})
+                results[statistic] = rechunked_data.map_blocks(_percentile_chunk,
+                                                               percentiles[statistic],
+                                                               axes,
+                                                               drop_axis=axes,
+                                                               dtype=np.float64)
+            else:
+                results[statistic] = _finalize_stats(stats, statistic)
+        lazy_results[var_name] = results
+        templates[var_name] = var.isel({dim: 0 for dim in var_dims}, drop=True)
+
+    with monitor.observing('Reduce'):
+        computed_results, = dask.compute(lazy_results)
+
+    result = {}
+    for var_name, results in computed_results.items():
+        template = templates[var_name]
+        result[var_name] = {}
+        for statistic, values in results.items():
+            if statistic != 'count' and np.issubdtype(template.dtype, np.floating):
+                values = values.astype(template.dtype)
+            elif statistic in ('min', 'max', 'sum') and np.issubdtype(template.dtype, np.integer) \
+                    and not np.isnan(values).any():
+                # Like NumPy, keep integer minima and maxima, and sum integers into the default integer type
+                values = values.astype(template.dtype if statistic != 'sum' else np.sum(template.values[:0]).dtype)
+            result[var_name][statistic] = xr.DataArray(values, dims=template.dims, coords=template.coords)
+    return result
+
+
+def _reduce_chunk(x: np.ndarray, weights: np.ndarray = None, axes: Tuple[int, ...] = None) -> np.ndarray:
+    valid = ~np.isnan(x)
+    values = np.where(valid, x, 0.0).astype(np.float64)
+    weights = np.where(valid, 1.0 if weights is None else weights, 0.0)
+    kwargs = dict(axis=axes, keepdims=True)
+    count = np.count_nonzero(valid, **kwargs).astype(np.float64)
+    weight_sum = weights.sum(**kwargs)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(weight_sum > 0, (weights * values).sum(**kwargs) / weight_sum, 0.0)
+    m2 = (weights * np.square(values - mean)).sum(**kwargs)
+    minimum = np.where(count > 0, np.where(valid, x, np.inf).min(**kwargs), np.nan)
+    maximum = np.where(count > 0, np.where(valid, x, -np.inf).max(**kwargs), np.nan)
+    return np.stack([count, weight_sum, mean, m2, minimum, maximum, values.sum(**kwargs)], axis=-1)
+
+
+def _identity_chunk(x: np.ndarray, axis=None, keepdims=None) -> np.ndarray:
+    return x
+
+
+def _merge_chunk_stats(x: np.ndarray, axis=None, keepdims=None) -> np.ndarray:
+    kwargs = dict(axis=axis, keepdims=True)
+    count, weight_sum, mean, m2, minimum, maximum, total = np.moveaxis(x, -1, 0)
+    merged_weight_sum = weight_sum.sum(**kwargs)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        merged_mean = np.where(merged_weight_sum > 0, (weight_sum * mean).sum(**kwargs) / merged_weight_sum, 0.0)
+    merged = np.stack([count.sum(**kwargs),
+                       merged_weight_sum,
+                       merged_mean,
+                       (m2 + weight_sum * np.square(mean - merged_mean)).sum(**kwargs),
+                       np.fmin.reduce(minimum, **kwargs),
+                       np.fmax.reduce(maximum, **kwargs),
+                       total.sum(**kwargs)], axis=-1)
+    return merged if keepdims else merged.squeeze(axis=axis)
+
+
+def _finalize_stats(stats: da.Array, statistic: str) -> da.Array:
+    weight_sum = stats[..., _WEIGHT_SUM]
+    if statistic == 'count':
+        return stats[..., _COUNT].astype(np.int64)
+    if statistic == 'sum':
+        return stats[..., _SUM]
+    if statistic == 'min':
+        return stats[..., _MIN]
+    if statistic == 'max':
+        return stats[..., _MAX]
+    if statistic == 'mean':
+        return da.where(weight_sum > 0, stats[..., _MEAN], np.nan)
+    variance = da.where(weight_sum > 0, stats[..., _M2] / da.where(weight_sum > 0, weight_sum, 1.0), np.nan)
+    return da.sqrt(variance) if statistic == 'std' else variance
+
+
+def _percentile_chunk(x: np.ndarray, q: float, axes: Tuple[int, ...]) -> np.ndarray:
+    with warnings.catch_warnings():
+        # All-NaN slices result in NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(x.astype(np.float64), q, axis=axes)
@@ -37,11 +37,13 @@ def some_op(file: PathLike.TYPE) -> bool:
 
 import ast
 import io
+from collections import OrderedDict
 from abc import ABCMeta, abstractmethod
 from datetime import datetime, date
 from typing import Generic, TypeVar, Union, Optional, Any, Tuple, List
 
 import geopandas
+import numpy
 import pandas
 import shapely
 import shapely.geometry
@@ -742,17 +744,263 @@ class DataFrameLike(Like[pandas.DataFrame]):
         raise ValidationError('Values of type DataFrameLike cannot be converted to text.')
 
 
+class FeatureColumns:
+    """
+    Columnar in-memory representation of a feature collection.
+
+    Feature properties are stored as one NumPy array per property. Geometries are stored as flat
+    coordinate buffers plus offset arrays, following a geometry -> parts -> rings -> coordinates
+    nesting which can represent all GeoJSON geometry types:
+
+    * ``geometry_offsets[i]:geometry_offsets[i + 1]`` are the parts of geometry *i*;
+    * ``part_offsets[j]:part_offsets[j + 1]`` are the rings of part *j*;
+    * ``ring_offsets[k]:ring_offsets[k + 1]`` are the rows of ``coords`` forming ring *k*.
+
+    Shapely geometries are only created on demand, see :py:meth:`get_geometry`.
+    """
+
+    GEOMETRY_TYPES = ('Point', 'LineString', 'Polygon', 'MultiPoint', 'MultiLineString', 'MultiPolygon')
+
+    def __init__(self,
+                 ids: numpy.ndarray,
+                 properties: 'OrderedDict[str, numpy.ndarray]',
+                 geometry_types: numpy.ndarray,
+                 geometry_offsets: numpy.ndarray,
+                 part_offsets: numpy.ndarray,
+                 ring_offsets: numpy.ndarray,
+                 coords: numpy.ndarray):
+        self.ids = ids
+        self.properties = properties
+        self.geometry_types = geometry_types
+        self.geometry_offsets = geometry_offsets
+        self.part_offsets = part_offsets
+        self.ring_offsets = ring_offsets
+        self.coords = coords
+
+    @classmethod
+    def from_features(cls, features, property_names: List[str] = None) -> 'FeatureColumns':
+        """
+        Create columns from an iterable of GeoJSON-like features, e.g. an open ``fiona.Collection``.
+        The features are iterated exactly once.
+
+        :param features: iterable of features or a feature collection
+        :param property_names: optional names of the feature properties. If not given, the names
+               are taken from the collection's schema, if any, or are collected from the features.
+        :return: a new ``FeatureColumns`` instance
+        """
+        if property_names is None:
+            schema = getattr(features, 'schema', None)
+            if schema and schema.get('properties') is not None:
+                property_names = list(schema['properties'].keys())
+
+        type_index = {type_name: i for i, type_name in enumerate(cls.GEOMETRY_TYPES)}
+
+        ids = []
+        property_values = OrderedDict()
+        if property_names is not None:
+            for name in property_names:
+                property_values[name] = []
+        geometry_types = []
+        geometry_offsets = [0]
+        part_offsets = [0]
+        ring_offsets = [0]
+        coords = []
+
+        num_features = 0
+        for feature in features:
+            ids.append(feature.get('id'))
+
+            properties = feature.get('properties') or {}
+            if property_names is None:
+                for name in properties.keys():
+                    if name not in property_values:
+                        # Property first seen in this feature, fill previous rows with None
+                        property_values[name] = [None] * num_features
+            for name, values in property_values.items():
+                values.append(properties.get(name))
+
+            geometry = feature.get('geometry')
+            if geometry:
+                geometry_type = geometry['type']
+                if geometry_type not in type_index:
+                    raise ValueError('unsupported geometry type "%s"' % geometry_type)
+                geometry_types.append(type_index[geometry_type])
+                for part in _geometry_to_parts(geometry_type, geometry['coordinates']):
+                    for ring in part:
+                        coords.extend(ring)
+                        ring_offsets.append(len(coords))
+                    part_offsets.append(len(ring_offsets) - 1)
+            else:
+                geometry_types.append(-1)
+            geometry_offsets.append(len(part_offsets) - 1)
+            num_features += 1
+
+        coord_dim = max((len(coord) for coord in coords), default=2)
+        coords_array = numpy.full((len(coords), coord_dim), numpy.nan, dtype=numpy.float64)
+        for i, coord in enumerate(coords):
+            coords_array[i, :len(coord)] = coord
+
+        return FeatureColumns(_to_column_array(ids),
+                              OrderedDict((name, _to_column_array(values))
+                                          for name, values in property_values.items()),
+                              numpy.array(geometry_types, dtype=numpy.int8),
+                              numpy.array(geometry_offsets, dtype=numpy.int64),
+                              numpy.array(part_offsets, dtype=numpy.int64),
+                              numpy.array(ring_offsets, dtype=numpy.int64),
+                              coords_array)
+
+    def __len__(self):
+        return len(self.geometry_types)
+
+    @property
+    def property_names(self) -> List[str]:
+        return list(self.properties.keys())
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes occupied by the column arrays."""
+        arrays = [self.ids, self.geometry_types, self.geometry_offsets, self.part_offsets, self.ring_offsets,
+                  self.coords]
+        arrays.extend(self.properties.values())
+        return sum(array.nbytes for array in arrays)
+
+    def get_geometry_coords(self, index: int) -> Optional[numpy.ndarray]:
+        """
+        Get the flat coordinate buffer of the geometry at *index* as an array of shape (num_coords, coord_dim).
+        The returned array is a view into the column's coordinate buffer.
+        """
+        if self.geometry_types[index] < 0:
+            return None
+        part_start, part_stop = self.geometry_offsets[index], self.geometry_offsets[index + 1]
+        ring_start, ring_stop = self.part_offsets[part_start], self.part_offsets[part_stop]
+        return self.coords[self.ring_offsets[ring_start]:self.ring_offsets[ring_stop]]
+
+    def get_geometry_interface(self, index: int) -> Optional[dict]:
+        """
+        Get the geometry at *index* as a GeoJSON-like geometry dictionary.
+        """
+        type_code = self.geometry_types[index]
+        if type_code < 0:
+            return None
+        geometry_type = self.GEOMETRY_TYPES[type_code]
+        coord_dim = self.coords.shape[1]
+        parts = []
+        for part in range(self.geometry_offsets[index], self.geometry_offsets[index + 1]):
+            rings = []
+            for ring in range(self.part_offsets[part], self.part_offsets[part + 1]):
+                ring_coords = self.coords[self.ring_offsets[ring]:self.ring_offsets[ring + 1]]
+                if coord_dim > 2 and numpy.isnan(ring_coords[:, 2:]).all():
+                    ring_coords = ring_coords[:, :2]
+                rings.append([tuple(coord) for coord in ring_coords.tolist()])
+            parts.append(rings)
+        return dict(type=geometry_type, coordinates=_parts_to_geometry(geometry_type, parts))
+
+    def get_geometry(self, index: int) -> Optional[shapely.geometry.base.BaseGeometry]:
+        """
+        Get the geometry at *index* as a shapely geometry object.
+        """
+        geometry = self.get_geometry_interface(index)
+        return shapely.geometry.shape(geometry) if geometry is not None else None
+
+    def get_feature(self, index: int) -> dict:
+        """
+        Get the feature at *index* as a GeoJSON-like feature dictionary.
+        """
+        return dict(type='Feature',
+                    id=_to_python_scalar(self.ids[index]),
+                    properties=OrderedDict((name, _to_python_scalar(values[index]))
+                                           for name, values in self.properties.items()),
+                    geometry=self.get_geometry_interface(index))
+
+    def iter_features(self):
+        """
+        Iterate over all features as GeoJSON-like feature dictionaries.
+        Property values are converted to JSON-serializable Python scalars once per column.
+        """
+        ids = self.ids.tolist()
+        names = self.property_names
+        columns = [values.tolist() for values in self.properties.values()]
+        for index in range(len(self)):
+            yield dict(type='Feature',
+                       id=ids[index],
+                       properties=OrderedDict(zip(names, (column[index] for column in columns))),
+                       geometry=self.get_geometry_interface(index))
+
+    def to_data_frame(self) -> pandas.DataFrame:
+        """
+        Get the feature properties as a ``pandas.DataFrame``, without materialising any geometries.
+        """
+        return pandas.DataFrame(self.properties, columns=self.property_names)
+
+    def to_geo_data_frame(self, crs=None) -> geopandas.GeoDataFrame:
+        """
+        Get the features as a ``geopandas.GeoDataFrame``, materialising all geometries.
+        """
+        geometries = geopandas.GeoSeries([self.get_geometry(index) for index in range(len(self))])
+        return geopandas.GeoDataFrame(self.properties, columns=self.property_names, geometry=geometries, crs=crs)
+
+
+def _to_column_array(values: list) -> numpy.ndarray:
+    array = numpy.array(values)
+    if array.ndim != 1:
+        # e.g. list-valued properties, keep one Python object per feature
+        array = numpy.empty(len(values), dtype=object)
+        array[:] = values
+    return array
+
+
+def _to_python_scalar(value):
+    return value.item() if isinstance(value, numpy.generic) else value
+
+
+def _geometry_to_parts(geometry_type: str, coordinates) -> list:
+    if geometry_type == 'Point':
+        return [[[coordinates]]]
+    if geometry_type == 'LineString':
+        return [[coordinates]]
+    if geometry_type == 'Polygon':
+        return [coordinates]
+    if geometry_type == 'MultiPoint':
+        return [[[point]] for point in coordinates]
+    if geometry_type == 'MultiLineString':
+        return [[line_string] for line_string in coordinates]
+    return coordinates
+
+
+def _parts_to_geometry(geometry_type: str, parts: list):
+    if geometry_type == 'Point':
+        return parts[0][0][0]
+    if geometry_type == 'LineString':
+        return parts[0][0]
+    if geometry_type == 'Polygon':
+        return parts[0]
+    if geometry_type == 'MultiPoint':
+        return [part[0][0] for part in parts]
+    if geometry_type == 'MultiLineString':
+        return [part[0] for part in parts]
+    return parts
+
+
 class GeoDataFrame:
     """
     Proxy for a ``geopandas.GeoDataFrame`` that holds an iterable of features or a feature collection
     for fastest possible streaming of GeoJSON features to be consumed by Cate Desktop's 3D globes.
+
+    On first access, the features are read into a columnar representation (see :py:class:`FeatureColumns`).
+    Attribute-only access such as ``gdf['name']`` and GeoJSON streaming is served from these columns, while
+    the full ``geopandas.GeoDataFrame`` including shapely geometries is only created if actually required.
     """
 
     _OWN_PROPERTY_SET = {
         "_features",
         "features",
+        "_lazy_columns",
+        "lazy_columns",
         "_lazy_data_frame",
         "lazy_data_frame",
+        "crs",
+        "iterfeatures",
+        "get_feature",
         "close",
     }
 
@@ -770,6 +1018,7 @@ class GeoDataFrame:
         if features is None:
             raise ValueError('features must not be None')
         self._features = features
+        self._lazy_columns = None
         self._lazy_data_frame = None
 
     @property
@@ -777,12 +1026,48 @@ class GeoDataFrame:
         return self._features
 
     @property
-    def lazy_data_frame(self):
+    def crs(self):
+        if self._lazy_data_frame is not None:
+            return self._lazy_data_frame.crs
+        return getattr(self._features, 'crs', None)
+
+    @crs.setter
+    def crs(self, value):
+        # The features are left untouched, the data frame is the authoritative source from now on
+        self.lazy_data_frame.crs = value
+
+    @property
+    def lazy_columns(self) -> Optional[FeatureColumns]:
         features = self._features
-        if features is not None and self._lazy_data_frame is None:
-            self._lazy_data_frame = geopandas.GeoDataFrame.from_features(features, crs=features.crs)
+        if features is not None and self._lazy_columns is None:
+            self._lazy_columns = FeatureColumns.from_features(features)
+        return self._lazy_columns
+
+    @property
+    def lazy_data_frame(self):
+        columns = self.lazy_columns
+        if columns is not None and self._lazy_data_frame is None:
+            self._lazy_data_frame = columns.to_geo_data_frame(crs=getattr(self._features, 'crs', None))
         return self._lazy_data_frame
 
+    def iterfeatures(self):
+        """
+        Iterate over all features as GeoJSON-like feature dictionaries.
+        Unlike ``geopandas.GeoDataFrame.iterfeatures()``, no shapely geometries are created.
+        """
+        if self._lazy_data_frame is not None:
+            # The data frame may have been modified, so it is the authoritative source
+            return self._lazy_data_frame.iterfeatures()
+        return self.lazy_columns.iter_features()
+
+    def get_feature(self, index: int) -> dict:
+        """
+        Get the feature at *index* as a GeoJSON-like feature dictionary, consistent with :py:meth:`iterfeatures`.
+        """
+        if self._lazy_data_frame is not None:
+            return next(self._lazy_data_frame.iloc[[index]].iterfeatures())
+        return self.lazy_columns.get_feature(index)
+
     def close(self):
         """
         In Cate, closable resources are closed when removed from the resources cache.
@@ -793,6 +1078,7 @@ class GeoDataFrame:
         except AttributeError:
             pass
         self._features = None
+        self._lazy_columns = None
         self._lazy_data_frame = None
 
     def __setattr__(self, key, value):
@@ -806,6 +1092,9 @@ class GeoDataFrame:
         # print('__getattribute__({})'.format(repr(item)))
         if item in GeoDataFrame._OWN_PROPERTY_SET:
             return object.__getattribute__(self, item)
+        elif item == '__class__':
+            # perf: answer isinstance() checks without instantiation of GeoDataFrame._lazy_data_frame
+            return geopandas.GeoDataFrame
         else:
             return getattr(self.lazy_data_frame, item)
 
@@ -818,6 +1107,11 @@ class GeoDataFrame:
         # raise RuntimeError("%s is not an owned property" % item)
 
     def __getitem__(self, item):
+        if self._lazy_data_frame is None and isinstance(item, str):
+            columns = self.lazy_columns
+            if columns is not None and item in columns.properties:
+                # perf: attribute-only access without instantiation of GeoDataFrame._lazy_data_frame
+                return pandas.Series(columns.properties[item], name=item)
         return self.lazy_data_frame.__getitem__(item)
 
     def __setitem__(self, key, value):
@@ -831,6 +1125,10 @@ class GeoDataFrame:
 
     def __len__(self):
         # perf: using self._features here to avoid instantiation of GeoDataFrame._lazy_data_frame
+        if self._lazy_data_frame is not None:
+            return len(self._lazy_data_frame)
+        if self._lazy_columns is not None:
+            return len(self._lazy_columns)
         return len(self._features)
 
     # Add other __x__() methods here to make GeoDataFrame compatible with geopandas.GeoDataFrame
@@ -0,0 +1,345 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module provides *virtual datasets* which represent multiple files concatenated along a common dimension,
+usually "time", without opening each of the files.
+
+A virtual dataset index is a JSON file which records for every file its size, its modification time and the
+normalized values of all coordinate variables along the concatenation dimension. Given an up-to-date index,
+:py:func:`open_virtual_dataset` assembles a lazy dataset from the first file and the index only.
+Any other file is opened only when data of one of its chunks is actually read, and is then kept open
+for subsequent reads of its chunks.
+
+Files are expected to share the same variables, dimensions and data types. Otherwise a
+:py:class:`VirtualDatasetError` is raised and clients should fall back to ``xarray.open_mfdataset()``.
+
+Components
+==========
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Sequence, Union
+
+import dask.array as da
+import numpy as np
+import xarray as xr
+from dask.base import tokenize
+
+from .opimpl import normalize_missing_time, normalize_coord_vars
+from ..util.monitor import Monitor
+
+_INDEX_VERSION = 1
+
+#: Keyword arguments of ``xarray.open_dataset()`` supported by virtual datasets
+_SUPPORTED_OPEN_KWARGS = {'drop_variables', 'decode_cf', 'decode_times', 'mask_and_scale', 'engine'}
+
+#: Maximum number of files kept open for reading chunks
+_MAX_OPEN_FILES = 32
+
+
+class VirtualDatasetError(ValueError):
+    """
+    Raised if files cannot be represented by a virtual dataset.
+    """
+    pass
+
+
+def open_virtual_dataset(files: Sequence[str],
+                         index_path: str,
+                         concat_dim: str = 'time',
+                         chunks: Union[Dict[str, int], Callable[[xr.Dataset], Dict[str, int]]] = None,
+                         preprocess: Callable[[xr.Dataset], xr.Dataset] = None,
+                         monitor: Monitor = Monitor.NONE,
+                         **kwargs) -> xr.Dataset:
+    """
+    Open multiple files as a single lazy dataset concatenated along *concat_dim* using the
+    virtual dataset index stored in *index_path*. The index is created or updated as required.
+
+    Every file is normalized in the same way as by :py:func:`cate.core.ds.open_xarray_dataset`.
+
+    :param files: The files to be opened.
+    :param index_path: Path to the virtual dataset index file.
+    :param concat_dim: Name of the dimension along which files are concatenated.
+    :param chunks: Mapping of dimension names to chunk sizes, or a function computing such mapping from the
+        first file. Files are always chunked separately along *concat_dim*.
+    :param preprocess: Optional function called for each opened file before the file is normalized.
+    :param monitor: A progress monitor.
+    :param kwargs: Keyword arguments passed to ``xarray.open_dataset()``.
+    :return: A lazy dataset.
+    :raise VirtualDatasetError: if the files cannot be represented by a virtual dataset
+    """
+    if not files:
+        raise VirtualDatasetError('no files given')
+    unsupported_kwargs = set(kwargs.keys()) - _SUPPORTED_OPEN_KWARGS
+    if unsupported_kwargs:
+        raise VirtualDatasetError('unsupported keyword arguments: {}'.format(', '.join(sorted(unsupported_kwargs))))
+
+    with monitor.starting('Opening dataset', len(files)):
+        template_ds = _open_file(files[0], preprocess, kwargs)
+        try:
+            signature = _get_signature(template_ds, concat_dim)
+            if callable(chunks):
+                chunks = chunks(template_ds)
+
+            index = _load_index(index_path)
+            if index.get('signature') != signature:
+                index = dict(signature=signature, files=dict())
+            index_entries = index['files']
+
+            index_modified = False
+            entries = []
+            for file in files:
+                file_stat = os.stat(file)
+                entry = index_entries.get(file)
+                if entry is None or entry['size'] != file_stat.st_size or entry['mtime'] != file_stat.st_mtime:
+                    entry = _new_index_entry(file, file_stat, signature, concat_dim, preprocess, kwargs)
+                    index_entries[file] = entry
+                    index_modified = True
+                entries.append(entry)
+                monitor.progress(work=1)
+
+            if index_modified:
+                try:
+                    _save_index(index_path, index)
+                except OSError:
+                    # E.g. a read-only data store, the index is recreated next time
+                    pass
+
+            return _assemble_dataset(template_ds, files, entries, concat_dim, chunks or {}, preprocess, kwargs)
+        except BaseException:
+            template_ds.close()
+            raise
+
+
+def _open_file(file: str, preprocess, open_kwargs: dict) -> xr.Dataset:
+    ds = xr.open_dataset(file, **open_kwargs)
+    if preprocess is not None:
+        ds = preprocess(ds)
+    return normalize_missing_time(normalize_coord_vars(ds))
+
+
+def _get_signature(ds: xr.Dataset, concat_dim: str) -> list:
+    """
+    Get a JSON-serializable description of the structure of *ds* which must be equal for all files.
+    """
+    if concat_dim not in ds.coords or ds.coords[concat_dim].dims != (concat_dim,):
+        raise VirtualDatasetError('missing coordinate variable "{}"'.format(concat_dim))
+    signature = []
+    for var_name, var in ds.variables.items():
+        shape = [-1 if dim == concat_dim else size for dim, size in zip(var.dims, var.shape)]
+        signature.append([var_name, var_name in ds.coords, list(var.dims), shape, str(var.dtype)])
+    return sorted(signature)
+
+
+def _new_index_entry(file: str, file_stat, signature: list, concat_dim: str, preprocess, open_kwargs: dict) -> dict:
+    ds = _open_file(file, preprocess, open_kwargs)
+    try:
+        if _get_signature(ds, concat_dim) != signature:
+            raise VirtualDatasetError('structure of file {} differs from first file'.format(file))
+        coords = dict()
+        for var_name, var in ds.coords.items():
+            if concat_dim in var.dims:
+                coords[var_name] = _encode_values(var.values)
+        return dict(size=file_stat.st_size, mtime=file_stat.st_mtime, coords=coords)
+    finally:
+        ds.close()
+
+
+def _encode_values(values: np.ndarray) -> dict:
+    if np.issubdtype(values.dtype, np.datetime64) or np.issubdtype(values.dtype, np.timedelta64):
+        data = values.view('int64').tolist()
+    elif np.issubdtype(values.dtype, np.number) or np.issubdtype(values.dtype, np.bool_):
+        data = values.tolist()
+    else:
+        # E.g. cftime objects of non-standard calendars
+        raise VirtualDatasetError('unsupported coordinate data type {}'.format(values.dtype))
+    return dict(dtype=str(values.dtype), data=data)
+
+
+def _decode_values(encoded_values: dict) -> np.ndarray:
+    dtype = np.dtype(encoded_values['dtype'])
+    if np.issubdtype(dtype, np.datetime64) or np.issubdtype(dtype, np.timedelta64):
+        return np.array(encoded_values['data'], dtype='int64').view(dtype)
+    return np.array(encoded_values['data'], dtype=dtype)
+
+
+def _load_index(index_path: str) -> dict:
+    if os.path.isfile(index_path):
+        try:
+            with open(index_path) as fp:
+                index = json.load(fp)
+            if index.get('version') == _INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+    return dict()
+
+
+def _save_index(index_path: str, index: dict):
+    index = dict(index)
+    index['version'] = _INDEX_VERSION
+    # Forget about files that have been removed
+    index['files'] = {file: entry for file, entry in index['files'].items() if os.path.isfile(file)}
+    dir_path = os.path.dirname(index_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w') as fp:
+        json.dump(index, fp)
+    os.replace(temp_path, index_path)
+
+
+class _OpenFile:
+    """
+    A file opened and normalized once for reading chunks of any of its variables.
+    The lock serializes reads of the same file, reads of different files may run concurrently.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.dataset = None
+        self.closed = False
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.dataset is not None:
+                self.dataset.close()
+                self.dataset = None
+
+
+class _OpenFileCache:
+    """
+    A least recently used cache of open files.
+    """
+
+    def __init__(self, max_size: int):
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._open_files = OrderedDict()
+
+    def read(self, file: str, file_stamp: tuple, preprocess, open_kwargs: dict, var_name: str, key) -> np.ndarray:
+        cache_key = (file, file_stamp, preprocess, tokenize(open_kwargs))
+        with self._lock:
+            open_file = self._open_files.get(cache_key)
+            if open_file is None:
+                open_file = _OpenFile()
+                self._open_files[cache_key] = open_file
+            else:
+                self._open_files.move_to_end(cache_key)
+            evicted_files = []
+            while len(self._open_files) > self._max_size:
+                evicted_files.append(self._open_files.popitem(last=False)[1])
+        # Close evicted files outside of the cache lock, they may still be read by other threads
+        for evicted_file in evicted_files:
+            evicted_file.close()
+
+        with open_file.lock:
+            if open_file.closed:
+                # Evicted meanwhile, read without caching
+                ds = _open_file(file, preprocess, open_kwargs)
+                try:
+                    return np.asarray(ds[var_name][key].values)
+                finally:
+                    ds.close()
+            if open_file.dataset is None:
+                open_file.dataset = _open_file(file, preprocess, open_kwargs)
+            return np.asarray(open_file.dataset[var_name][key].values)
+
+    def clear(self):
+        with self._lock:
+            open_files = list(self._open_files.values())
+            self._open_files.clear()
+        for open_file in open_files:
+            open_file.close()
+
+
+_OPEN_FILE_CACHE = _OpenFileCache(_MAX_OPEN_FILES)
+
+
+class _FileVariableArray:
+    """
+    An array-like representing a variable of a file that is opened only when it is indexed.
+    """
+
+    def __init__(self, file: str, file_stamp: tuple, var_name: str, shape: tuple, dtype: np.dtype,
+                 preprocess, open_kwargs: dict):
+        self.file = file
+        self.file_stamp = file_stamp
+        self.var_name = var_name
+        self.shape = shape
+        self.dtype = dtype
+        self.ndim = len(shape)
+        self.preprocess = preprocess
+        self.open_kwargs = open_kwargs
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and all(isinstance(k, slice) for k in key):
+            shape = tuple(len(range(*k.indices(size))) for k, size in zip(key, self.shape)) + self.shape[len(key):]
+            if 0 in shape:
+                # Dask probes empty selections to determine the array type, no need to open the file
+                return np.empty(shape, dtype=self.dtype)
+        return _OPEN_FILE_CACHE.read(self.file, self.file_stamp, self.preprocess, self.open_kwargs, self.var_name, key)
+
+
+def _assemble_dataset(template_ds: xr.Dataset,
+                      files: Sequence[str],
+                      entries: Sequence[dict],
+                      concat_dim: str,
+                      chunks: Dict[str, int],
+                      preprocess,
+                      open_kwargs: dict) -> xr.Dataset:
+    file_sizes = [len(entry['coords'][concat_dim]['data']) for entry in entries]
+
+    variables = OrderedDict()
+    for var_name, var in template_ds.variables.items():
+        is_coord = var_name in template_ds.coords
+        if concat_dim not in var.dims:
+            variables[var_name] = var if is_coord else var.chunk({dim: chunks[dim]
+                                                                  for dim in var.dims if dim in chunks})
+            continue
+
+        axis = var.dims.index(concat_dim)
+        if is_coord:
+            data = np.concatenate([_decode_values(entry['coords'][var_name]) for entry in entries], axis=axis)
+        else:
+            arrays = []
+            for file, entry, file_size in zip(files, entries, file_sizes):
+                shape = tuple(file_size if dim == concat_dim else size for dim, size in zip(var.dims, var.shape))
+                file_chunks = tuple(size if dim == concat_dim else min(chunks.get(dim, size), size)
+                                    for dim, size in zip(var.dims, shape))
+                array = _FileVariableArray(file, (entry['size'], entry['mtime']), var_name, shape, var.dtype,
+                                           preprocess, open_kwargs)
+                name = 'vds-' + tokenize(file, entry['size'], entry['mtime'], var_name, file_chunks, open_kwargs)
+                arrays.append(da.from_array(array, chunks=file_chunks, name=name))
+            data = da.concatenate(arrays, axis=axis)
+        variables[var_name] = xr.Variable(var.dims, data, attrs=var.attrs, encoding=var.encoding)
+
+    coords = OrderedDict((var_name, variables[var_name]) for var_name in template_ds.coords)
+    data_vars = OrderedDict((var_name, variables[var_name]) for var_name in template_ds.data_vars)
+    return xr.Dataset(data_vars=data_vars, coords=coords, attrs=template_ds.attrs)
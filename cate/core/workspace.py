@@ -23,19 +23,22 @@
 This module defines the ``Workspace`` class.
 """
 
+import json
 import logging
 import os
 import shutil
+import weakref
 from collections import OrderedDict
 from threading import RLock
-from typing import List, Any, Dict, Optional
+from typing import List, Any, Dict, Optional, Set
 
 import fiona
 import pandas as pd
+import psutil
 import xarray as xr
 
 from .workflow import Workflow, OpStep, NodePort, ValueCache
-from ..conf import conf
+from ..conf import conf, get_data_stores_path
 from ..conf.defaults import WORKSPACE_DATA_DIR_NAME, WORKSPACE_WORKFLOW_FILE_NAME, SCRATCH_WORKSPACES_PATH
 from ..core.cdm import get_tiling_scheme
 from ..core.op import OP_REGISTRY
@@ -52,6 +55,14 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
 _LOG = logging.getLogger('cate')
 
+#: Workspaces which have not been closed yet
+_OPEN_WORKSPACES = weakref.WeakSet()
+
+#: Name of the directory in the data stores path which holds a references file for every open workspace of
+#: every process, so that data sources referenced by workspaces of other processes are known.
+#: The environment variable CATE_WORKSPACE_REFS_PATH may point to another directory.
+_WORKSPACE_REFS_DIR_NAME = 'workspace-refs'
+
 #: An JSON-serializable operation argument is a one-element dictionary taking two possible forms:
 #: 1. dict(value=Any):  a value which may be any constant Python object which must JSON-serializable
 #: 2. dict(source=str): a reference to a step port name
@@ -87,6 +98,68 @@ def mk_op_kwargs(**kwargs) -> OpKwArgs:
     return OrderedDict([(kw, mk_op_arg(arg)) for kw, arg in kwargs.items()])
 
 
+def get_referenced_data_source_ids() -> Set[str]:
+    """
+    Get the identifiers of data sources which may be referenced by the workflows of open workspaces.
+    These are all string values of step inputs, e.g. the *ds_id* input of the ``open_dataset`` operation.
+
+    :return: A set of potential data source identifiers.
+    """
+    ds_ids = set()
+    for workspace in list(_OPEN_WORKSPACES):
+        ds_ids.update(_get_workflow_data_source_ids(workspace.workflow))
+
+    # Workspaces opened by other processes, e.g. the GUI's WebAPI service
+    refs_dir = _get_workspace_refs_dir()
+    if os.path.isdir(refs_dir):
+        for filename in os.listdir(refs_dir):
+            if not filename.endswith('.json'):
+                continue
+            refs_file = os.path.join(refs_dir, filename)
+            try:
+                with open(refs_file) as fp:
+                    refs = json.load(fp)
+            except (OSError, ValueError):
+                continue
+            if _is_process_alive(refs.get('pid'), refs.get('create_time')):
+                ds_ids.update(refs.get('ds_ids', []))
+            else:
+                # Left behind by a process that terminated without closing its workspaces
+                try:
+                    os.remove(refs_file)
+                except OSError:
+                    pass
+    return ds_ids
+
+
+def _get_workflow_data_source_ids(workflow: Workflow) -> Set[str]:
+    ds_ids = set()
+    for step in workflow.steps:
+        for port in step.inputs[:]:
+            if port.is_value and isinstance(port.value, str):
+                ds_ids.add(port.value)
+    return ds_ids
+
+
+def _get_workspace_refs_dir() -> str:
+    return os.environ.get('CATE_WORKSPACE_REFS_PATH',
+                          os.path.join(get_data_stores_path(), _WORKSPACE_REFS_DIR_NAME))
+
+
+def _get_process_create_time(pid: int) -> int:
+    return int(psutil.Process(pid).create_time() * 1000000)
+
+
+def _is_process_alive(pid: Optional[int], create_time: Optional[int]) -> bool:
+    if not pid or not psutil.pid_exists(pid):
+        return False
+    try:
+        # Process identifiers are reused, so the process must also have the same creation time
+        return _get_process_create_time(pid) == create_time
+    except psutil.Error:
+        return False
+
+
 class Workspace:
     """
     A Workspace uses a :py:class:`Workflow` to record user operations.
@@ -104,6 +177,9 @@ class Workspace:
         self._resource_cache = ValueCache()
         self._user_data = dict()
         self._lock = RLock()
+        self._refs_file = os.path.join(_get_workspace_refs_dir(), '{}-{}.json'.format(os.getpid(), id(self)))
+        _OPEN_WORKSPACES.add(self)
+        self._update_refs_file()
 
     def __del__(self):
         self.close()
@@ -187,6 +263,12 @@ class Workspace:
     def close(self):
         if self._is_closed:
             return
+        _OPEN_WORKSPACES.discard(self)
+        try:
+            if os.path.isfile(self._refs_file):
+                os.remove(self._refs_file)
+        except OSError:
+            _LOG.exception('closing workspace failed')
         with self._lock:
             self._resource_cache.close()
             # Remove all resource files that are no longer required
@@ -202,6 +284,23 @@ class Workspace:
                             except OSError:
                                 _LOG.exception('closing workspace failed')
 
+    def _update_refs_file(self):
+        """
+        Record the data sources referenced by this workspace, so that other processes don't evict their local copies.
+        """
+        refs = dict(pid=os.getpid(),
+                    create_time=_get_process_create_time(os.getpid()),
+                    base_dir=self._base_dir,
+                    ds_ids=sorted(_get_workflow_data_source_ids(self._workflow)))
+        temp_file = self._refs_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self._refs_file), exist_ok=True)
+            with open(temp_file, 'w') as fp:
+                json.dump(refs, fp)
+            os.replace(temp_file, self._refs_file)
+        except OSError:
+            _LOG.warning('writing workspace references to "%s" failed' % self._refs_file)
+
     def save(self, monitor: Monitor = Monitor.NONE):
         self._assert_open()
         with self._lock:
@@ -432,6 +531,7 @@ class Workspace:
             self.workflow.remove_step(res_step)
             if res_name in self._resource_cache:
                 del self._resource_cache[res_name]
+            self._update_refs_file()
 
     def rename_resource(self, res_name: str, new_res_name: str) -> None:
         Workspace._validate_res_name(new_res_name)
@@ -551,6 +651,7 @@ class Workspace:
             # noinspection PyUnusedLocal
             workflow.add_step(new_step, can_exist=True)
             self._is_modified = True
+            self._update_refs_file()
 
             # Remove any cached resource values, whose steps became invalidated
             for key in ids_of_invalidated_steps:
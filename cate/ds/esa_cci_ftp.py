@@ -39,18 +39,27 @@ Components
 ==========
 """
 
+import fnmatch
 import ftplib
 import json
 import os
 import os.path
 import pkgutil
+import re
+import threading
+import time
+import urllib.parse
 from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from enum import Enum
 from io import StringIO, IOBase
-from typing import Sequence, Union, List, Tuple, Mapping, Any
+from typing import Sequence, Union, List, Tuple, Mapping, Any, Dict, Iterator, Optional
 
+from cate.conf import get_config_value
 from cate.conf.conf import get_data_stores_path
+from cate.conf.defaults import FTP_MAX_CONNECTIONS
 from cate.core.cdm import Schema
 from cate.core.ds import DataStore, DataSource, open_xarray_dataset, DATA_STORE_REGISTRY
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
@@ -64,6 +73,11 @@ __author__ = "Norman Fomferra (Brockmann Consult GmbH), " \
 Time = Union[str, datetime]
 TimeRange = Tuple[Time, Time]
 
+# Errors after which an FTP connection can't be used anymore, as opposed to ftplib.error_perm
+_FTP_CONNECTION_ERRORS = (ftplib.error_temp, ftplib.error_reply, ftplib.error_proto, OSError, EOFError)
+
+_PLACEHOLDER_REGEX = re.compile(r'\$?{\w+}')
+
 
 def set_default_data_store():
     """
@@ -208,7 +222,25 @@ class FileSetDataSource(DataSource):
         if date1 > date2:
             raise ValueError("start time '%s' is after end time '%s'" % (date1, date2))
 
-        return [self._resolve_base_path(date1 + timedelta(days=i)) for i in range((date2 - date1).days + 1)]
+        # Resolve the pattern once per file of the file set, e.g. once per month for monthly files
+        paths = OrderedDict()
+        for date in _iter_dates(date1, date2, self.frequency):
+            paths[self._resolve_base_path(date)] = None
+        return list(paths.keys())
+
+    @property
+    def frequency(self) -> Optional[str]:
+        """
+        The frequency of the files of this file set, derived from the finest date placeholder in its file pattern.
+        One of "day", "month", "year", or ``None``, if the file pattern doesn't contain date placeholders.
+        """
+        if '{DD}' in self._file_pattern:
+            return 'day'
+        if '{MM}' in self._file_pattern:
+            return 'month'
+        if '{YYYY}' in self._file_pattern:
+            return 'year'
+        return None
 
     def _resolve_base_path(self, the_date: datetime):
         resolved_path = self._file_pattern
@@ -217,64 +249,100 @@ class FileSetDataSource(DataSource):
         resolved_path = resolved_path.replace('{DD}', '%02d' % the_date.day)
         return self._base_dir + '/' + resolved_path
 
-    def _sync_files(self, ftp, ftp_base_dir, expected_remote_files, num_of_expected_remote_files,
-                    monitor: Monitor) -> int:
-        sync_files_number = 0
-        checked_files_number = 0
+    def sync(self,
+             time_range: TimeRangeLike.TYPE = None,
+             max_connections: int = None,
+             monitor: Monitor = Monitor.NONE) -> Tuple[int, int]:
+        """
+        Download the files of this file set within *time_range* from the data store's remote FTP server into the
+        data store's root directory. Files are transferred concurrently using a pool of FTP connections. Local files
+        which are up-to-date are skipped, partially transferred files are resumed.
+
+        :param time_range: The time range, defaults to the time range of the file set.
+        :param max_connections: The maximum number of concurrent FTP connections,
+               defaults to the value of configuration parameter ``ftp_max_connections``.
+        :param monitor: A progress monitor.
+        :return: A pair (*number of transferred files*, *number of expected files*).
+        """
+        time_range = TimeRangeLike.convert(time_range) if time_range else (None, None)
+        expected_remote_files = self._get_expected_remote_files(time_range)
+        num_of_expected_remote_files = sum(len(filename_dict) for filename_dict in expected_remote_files.values())
+        if max_connections is None:
+            max_connections = get_config_value('ftp_max_connections', FTP_MAX_CONNECTIONS)
+        connection_pool = self._file_set_data_store.new_connection_pool(max_connections)
+        try:
+            with monitor.starting('Sync ' + self._id, total_work=10):
+                sync_files_number = self._sync_files(connection_pool, connection_pool.base_dir,
+                                                     expected_remote_files, num_of_expected_remote_files, monitor)
+        finally:
+            connection_pool.close()
+        return sync_files_number, num_of_expected_remote_files
+
+    def _sync_files(self, connection_pool: 'FtpConnectionPool', ftp_base_dir, expected_remote_files,
+                    num_of_expected_remote_files, monitor: Monitor) -> int:
+        listing_cache = self._file_set_data_store.listing_cache
+
+        def list_dir(expected_dir_path: str):
+            return listing_cache.list_dir(connection_pool, ftp_base_dir + '/' + expected_dir_path)
+
+        # Directory listings are fetched concurrently and cached, so repeated syncs don't list directories again
+        with monitor.child(work=1).starting('Listing directories', len(expected_remote_files)) as list_monitor:
+            remote_dir_contents = _run_concurrently(list_dir, list(expected_remote_files.keys()),
+                                                    connection_pool.max_connections, list_monitor,
+                                                    on_done=lambda dir_path, content: list_monitor.progress(work=1))
 
         files_to_download = OrderedDict()
         file_set_size = 0
         for expected_dir_path, expected_filename_dict in expected_remote_files.items():
-            if monitor.is_cancelled():
-                raise Cancellation()
-            ftp_dir = ftp_base_dir + '/' + expected_dir_path
-            try:
-                ftp.cwd(ftp_dir)
-            except ftplib.Error:
-                # Note: If we can't CWD to ftp_dir, this usually means,
+            remote_dir_content = remote_dir_contents[expected_dir_path]
+            if remote_dir_content is None:
+                # Note: If the directory doesn't exist, this usually means,
                 # expected_dir_path may refer to a time range that is not covered remotely.
-                monitor.progress(work=1)
                 continue
-
-            try:
-                remote_dir_content = ftp.mlsd(facts=['type', 'size', 'modify'])
-            except ftplib.Error:
-                # Note: If we can't MLSD the CWD ftp_dir, we have a problem.
-                monitor.progress(work=1)
-                continue
-
-            for existing_filename, facts in remote_dir_content:
-                if monitor.is_cancelled():
-                    raise Cancellation()
-                if facts.get('type', None) == 'file' and existing_filename in expected_filename_dict:
-                    # update expected_filename_dict with facts of existing_filename
-                    expected_filename_dict[existing_filename] = facts
+            # Unresolved placeholders, e.g. times of day, are matched against the directory listing
+            filename_patterns = [_PLACEHOLDER_REGEX.sub('*', filename) for filename in expected_filename_dict.keys()
+                                 if _PLACEHOLDER_REGEX.search(filename)]
+            for existing_filename, facts in remote_dir_content.items():
+                if existing_filename in expected_filename_dict \
+                        or any(fnmatch.fnmatchcase(existing_filename, pattern) for pattern in filename_patterns):
                     file_size = int(facts.get('size', '-1'))
                     if file_size > 0:
                         file_set_size += file_size
                     # TODO (forman, 20160619): put also 'modify' in file_info, to update outdated local files
-                    existing_file_info = dict(size=file_size, path=expected_dir_path)
-                    files_to_download[existing_filename] = existing_file_info
-
-        last_cwd = None
-        if files_to_download:
-            dl_stat = _DownloadStatistics(file_set_size)
-            for existing_filename, existing_file_info in files_to_download.items():
-                checked_files_number += 1
-                child_monitor = monitor.child(work=1.)
-                if monitor.is_cancelled():
-                    raise Cancellation()
-                if last_cwd is not existing_file_info['path']:
-                    ftp.cwd(ftp_base_dir + '/' + existing_file_info['path'])
-                    last_cwd = existing_file_info['path']
-                downloader = FtpDownloader(ftp,
-                                           existing_filename, existing_file_info, self._file_set_data_store.root_dir,
-                                           (checked_files_number, num_of_expected_remote_files), child_monitor,
-                                           dl_stat)
-                result = downloader.start()
-                if DownloadStatus.SUCCESS is result:
-                    sync_files_number += 1
-        return sync_files_number
+                    files_to_download[(expected_dir_path, existing_filename)] = dict(size=file_size,
+                                                                                     path=expected_dir_path)
+
+        dl_stat = _DownloadStatistics(file_set_size)
+        local_dir = self._file_set_data_store.root_dir
+        file_numbers = {file_key: i + 1 for i, file_key in enumerate(files_to_download.keys())}
+
+        def download(file_key: Tuple[str, str], progress: Monitor) -> DownloadStatus:
+            existing_file_info = files_to_download[file_key]
+            local_file = os.path.join(local_dir, existing_file_info['path'], file_key[1])
+            if 0 < existing_file_info['size'] == (os.path.getsize(local_file) if os.path.isfile(local_file) else 0):
+                # Don't borrow a connection for files which are up-to-date
+                progress.progress(work=existing_file_info['size'], msg='local file is up-to-date')
+                return DownloadStatus.SKIPPED
+            file_index = (file_numbers[file_key], num_of_expected_remote_files)
+            num_retries = 0
+            while True:
+                try:
+                    with connection_pool.connection() as ftp:
+                        ftp.cwd(ftp_base_dir + '/' + existing_file_info['path'])
+                        # On retries, the bytes of the incomplete file have already been reported
+                        downloader = FtpDownloader(ftp, file_key[1], existing_file_info, local_dir, file_index,
+                                                   progress, dl_stat, report_resumed_size=num_retries == 0)
+                        return downloader.start()
+                except _FTP_CONNECTION_ERRORS:
+                    # Broken transfers are restarted on another connection where they have been interrupted
+                    num_retries += 1
+                    if num_retries > connection_pool.max_retries:
+                        raise
+
+        with monitor.child(work=9).starting('Downloading files', max(1, file_set_size)) as download_monitor:
+            results = _run_concurrently(download, list(files_to_download.keys()), connection_pool.max_connections,
+                                        download_monitor, collect_progress=True)
+        return len([result for result in results.values() if result is DownloadStatus.SUCCESS])
 
     def _get_expected_remote_files(self, time_range: TimeRange = (None, None)) -> Mapping[str, Mapping[str, Any]]:
         expected_remote_files = OrderedDict()
@@ -325,9 +393,11 @@ class _DownloadStatistics:
         self.bytes_total = bytes_total
         self.bytes_done = 0
         self.startTime = datetime.now()
+        self._lock = threading.Lock()
 
     def handle_chunk(self, bytes):
-        self.bytes_done += bytes
+        with self._lock:
+            self.bytes_done += bytes
 
     def as_mb(self, bytes):
         return bytes / (1000 * 1000)
@@ -351,7 +421,8 @@ class FtpDownloader:
                  file_index: Tuple[int, int],
                  monitor: Monitor,
                  dl_stat: _DownloadStatistics = None,
-                 block_size: int = 10 * 1024):
+                 block_size: int = 10 * 1024,
+                 report_resumed_size: bool = True):
         self._ftp = ftp
         self._filename = filename
         self._file_index = file_index
@@ -364,6 +435,7 @@ class FtpDownloader:
         self._fp = None
         self._message = None
         self._dl_stat = dl_stat
+        self._report_resumed_size = report_resumed_size
 
     def start(self) -> DownloadStatus:
         with self._monitor.starting(
@@ -388,19 +460,29 @@ class FtpDownloader:
         filename_incomplete = self._filename + '.incomplete'
         local_file_incomplete = os.path.join(local_dir, filename_incomplete)
         if os.path.exists(local_file_incomplete):
-            # TODO (forman, 20160619): reuse what has already been downloaded, then set variable 'rest' accordingly.
-            # Brute force approach here: delete what has already been downloaded
-            os.remove(local_file_incomplete)
+            incomplete_size = os.path.getsize(local_file_incomplete)
+            if 0 < incomplete_size < self._file_size:
+                # Restart the transfer where it has been interrupted
+                rest = incomplete_size
+                self._bytes_written = incomplete_size
+                if self._report_resumed_size:
+                    self._report_progress(incomplete_size)
+            else:
+                os.remove(local_file_incomplete)
         error_msg = None
-        with open(local_file_incomplete, 'wb') as fp:
+        with open(local_file_incomplete, 'ab' if rest else 'wb') as fp:
             self._fp = fp
             try:
                 self._ftp.retrbinary('RETR ' + self._filename, self.on_new_block, blocksize=self._block_size, rest=rest)
             except KeyboardInterrupt:
                 error_msg = 'download cancelled'
-            except ftplib.Error as ftp_err:
+            except ftplib.error_perm as ftp_err:
                 error_msg = 'download error: ' + str(ftp_err)
+            # Other errors, e.g. broken connections, are raised and keep the incomplete file, so that
+            # the transfer can be restarted
         # sys.stdout.write('\n')
+        if error_msg is None and 0 < self._file_size != os.path.getsize(local_file_incomplete):
+            raise EOFError('incomplete transfer of {}'.format(self._filename))
         if error_msg is None:
             os.rename(local_file_incomplete, local_file)
         else:
@@ -409,9 +491,14 @@ class FtpDownloader:
         return DownloadStatus.SUCCESS if error_msg is None else DownloadStatus.FAILURE
 
     def on_new_block(self, bytes_block):
+        if self._monitor.is_cancelled():
+            raise Cancellation()
         self._fp.write(bytes_block)
         block_size = len(bytes_block)
         self._bytes_written += block_size
+        self._report_progress(block_size)
+
+    def _report_progress(self, block_size: int):
         if self._dl_stat:
             self._dl_stat.handle_chunk(block_size)
             self._monitor.progress(work=block_size, msg=str(self._dl_stat))
@@ -419,6 +506,263 @@ class FtpDownloader:
             self._monitor.progress(work=block_size, msg=self._filename)
 
 
+class FtpConnectionPool:
+    """
+    A bounded pool of authenticated connections to an FTP server. Connections are reused, broken connections
+    are replaced by new ones.
+
+    :param host: The server's host name.
+    :param port: The server's port.
+    :param user: The user name, defaults to anonymous login.
+    :param passwd: The password.
+    :param base_dir: The base directory of files on the server.
+    :param max_connections: The maximum number of concurrently open connections.
+    :param timeout: The timeout in seconds for blocking operations.
+    :param max_retries: How often an interrupted transfer is restarted before giving up.
+    """
+
+    def __init__(self,
+                 host: str,
+                 port: int = 21,
+                 user: str = 'anonymous',
+                 passwd: str = '',
+                 base_dir: str = '',
+                 max_connections: int = 4,
+                 timeout: float = 60.,
+                 max_retries: int = 3):
+        self._host = host
+        self._port = port
+        self._user = user
+        self._passwd = passwd
+        self._base_dir = base_dir.rstrip('/')
+        self._max_connections = max(1, int(max_connections))
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._idle_connections = []
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(self._max_connections)
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'FtpConnectionPool':
+        """
+        Create a connection pool for an FTP URL of the form ``ftp://[user[:passwd]@]host[:port][/base_dir]``.
+        """
+        parts = urllib.parse.urlparse(url)
+        if parts.scheme != 'ftp' or not parts.hostname:
+            raise ValueError('invalid FTP URL: "%s"' % url)
+        return FtpConnectionPool(parts.hostname,
+                                 port=parts.port or 21,
+                                 user=urllib.parse.unquote(parts.username) if parts.username else 'anonymous',
+                                 passwd=urllib.parse.unquote(parts.password) if parts.password else '',
+                                 base_dir=parts.path,
+                                 **kwargs)
+
+    @property
+    def host(self) -> str:
+        return self._host
+
+    @property
+    def port(self) -> int:
+        return self._port
+
+    @property
+    def base_dir(self) -> str:
+        return self._base_dir
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    @property
+    def max_retries(self) -> int:
+        return self._max_retries
+
+    @contextmanager
+    def connection(self) -> Iterator[ftplib.FTP]:
+        """
+        Borrow a connection from the pool. Blocks while *max_connections* connections are in use.
+        """
+        with self._semaphore:
+            with self._lock:
+                ftp = self._idle_connections.pop() if self._idle_connections else None
+            if ftp is None:
+                ftp = ftplib.FTP(timeout=self._timeout)
+                ftp.connect(self._host, self._port)
+                ftp.login(self._user, self._passwd)
+            try:
+                yield ftp
+            except BaseException as e:
+                if not isinstance(e, ftplib.error_perm):
+                    # The connection may be in an undefined state, e.g. in the middle of a transfer
+                    ftp.close()
+                    raise
+                self._release(ftp)
+                raise
+            self._release(ftp)
+
+    def _release(self, ftp: ftplib.FTP):
+        with self._lock:
+            self._idle_connections.append(ftp)
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle_connections = self._idle_connections
+            self._idle_connections = []
+        for ftp in idle_connections:
+            try:
+                ftp.quit()
+            except _FTP_CONNECTION_ERRORS + (ftplib.error_perm,):
+                ftp.close()
+
+
+class FtpListingCache:
+    """
+    A thread-safe cache for the contents of directories on FTP servers.
+
+    :param ttl: The time in seconds a directory listing is kept.
+    """
+
+    def __init__(self, ttl: float = 3600.):
+        self._ttl = ttl
+        self._entries = dict()
+        self._lock = threading.Lock()
+
+    def list_dir(self, connection_pool: FtpConnectionPool, dir_path: str) -> Optional[Dict[str, dict]]:
+        """
+        Get the files in the remote directory *dir_path*.
+
+        :param connection_pool: The pool providing the connection used to list the directory if it is not cached.
+        :param dir_path: The absolute path of the remote directory.
+        :return: Mapping of file names to their facts "size" and "modify" or ``None``,
+                 if the directory doesn't exist.
+        """
+        key = (connection_pool.host, connection_pool.port, dir_path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self._ttl:
+            return entry[1]
+        try:
+            with connection_pool.connection() as ftp:
+                dir_content = OrderedDict((name, facts)
+                                          for name, facts in ftp.mlsd(dir_path, facts=['type', 'size', 'modify'])
+                                          if facts.get('type', None) == 'file')
+        except ftplib.error_perm:
+            dir_content = None
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dir_content)
+        return dir_content
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class _ProgressCollector(Monitor):
+    """
+    A thread-safe monitor which collects the progress reported by worker threads,
+    so that it can be forwarded to another monitor from the calling thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._work = 0
+        self._msg = None
+        self._cancelled = threading.Event()
+
+    def start(self, label: str, total_work: float = None):
+        pass
+
+    def progress(self, work: float = None, msg: str = None):
+        with self._lock:
+            if work:
+                self._work += work
+            if msg:
+                self._msg = msg
+
+    def done(self):
+        pass
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def collect(self) -> Tuple[float, Optional[str]]:
+        with self._lock:
+            work, msg = self._work, self._msg
+            self._work = 0
+            self._msg = None
+        return work, msg
+
+
+def _run_concurrently(function, keys: Sequence, max_workers: int, monitor: Monitor,
+                      on_done=None, collect_progress: bool = False) -> Dict[Any, Any]:
+    """
+    Call ``function(key)``, or ``function(key, progress)`` if *collect_progress* is true, for all *keys* using
+    at most *max_workers* threads. Progress reported to *progress* and ``on_done(key, result)`` calls are
+    forwarded from the calling thread. If *monitor* is cancelled or a call fails, pending calls are abandoned.
+
+    :return: Mapping of keys to results
+    """
+    results = dict()
+    if not keys:
+        return results
+    progress = _ProgressCollector()
+
+    def forward_progress():
+        work, msg = progress.collect()
+        if work or msg:
+            monitor.progress(work=work or None, msg=msg)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as executor:
+        futures = {executor.submit(function, *((key, progress) if collect_progress else (key,))): key
+                   for key in keys}
+        pending = set(futures.keys())
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                forward_progress()
+                for future in done:
+                    key = futures[future]
+                    results[key] = future.result()
+                    if on_done is not None:
+                        on_done(key, results[key])
+                if monitor.is_cancelled():
+                    raise Cancellation()
+        except BaseException:
+            progress.cancel()
+            for future in pending:
+                future.cancel()
+            raise
+    return results
+
+
+def _iter_dates(date1: datetime, date2: datetime, frequency: Optional[str]) -> Iterator[datetime]:
+    """
+    Generate the first dates of all days, months, or years given by *frequency* between *date1* and *date2*.
+    If *frequency* is ``None``, only *date1* is generated.
+    """
+    if frequency is None:
+        yield date1
+        return
+    if frequency == 'day':
+        date = datetime(date1.year, date1.month, date1.day)
+    elif frequency == 'month':
+        date = datetime(date1.year, date1.month, 1)
+    else:
+        date = datetime(date1.year, 1, 1)
+    while date <= date2:
+        yield date
+        if frequency == 'day':
+            date += timedelta(days=1)
+        elif frequency == 'month':
+            date = datetime(date.year + date.month // 12, date.month % 12 + 1, 1)
+        else:
+            date = datetime(date.year + 1, 1, 1)
+
+
 class FileSetInfo:
     def __init__(self,
                  info_update_time: Union[str, datetime],
@@ -500,6 +844,7 @@ class FileSetDataStore(DataStore):
         self._root_dir = root_dir
         self._remote_url = remote_url
         self._data_sources = []
+        self._listing_cache = FtpListingCache()
 
     @property
     def root_dir(self) -> str:
@@ -515,6 +860,21 @@ class FileSetDataStore(DataStore):
         """Optional URL of the data store's remote service."""
         return self._remote_url
 
+    @property
+    def listing_cache(self) -> FtpListingCache:
+        """The cache for directory listings of the data store's remote FTP server."""
+        return self._listing_cache
+
+    def new_connection_pool(self, max_connections: int = FTP_MAX_CONNECTIONS) -> FtpConnectionPool:
+        """
+        Create a pool of connections to the data store's remote FTP server given by :py:attr:`remote_url`.
+
+        :param max_connections: The maximum number of concurrent connections.
+        """
+        if not self._remote_url:
+            raise ValueError('data store "%s" has no remote URL' % self.id)
+        return FtpConnectionPool.from_url(self._remote_url, max_connections=max_connections)
+
     def query(self, ds_id: str = None, query_expr: str = None, monitor: Monitor = Monitor.NONE) -> Sequence[DataSource]:
         if ds_id or query_expr:
             return [ds for ds in self._data_sources if ds.matches(ds_id=ds_id, query_expr=query_expr)]
@@ -38,28 +38,34 @@ Components
 ==========
 """
 import json
+import multiprocessing
 import os
 import re
 import socket
 import urllib.error
 import urllib.parse
 import urllib.request
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from math import ceil
-from typing import Sequence, Tuple, Optional, Any
+from typing import Sequence, Tuple, Optional, Any, Callable, Dict
 
+import numpy as np
+import shapely.geometry
 import xarray as xr
 from owslib.csw import CatalogueServiceWeb
 from owslib.namespaces import Namespaces
 
 from cate.conf import get_config_value, get_data_stores_path
-from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
+from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL, HTTP_DOWNLOAD_MAX_CONNECTIONS, OPENDAP_MAX_CONNECTIONS
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataStore, DataSource, Schema, open_xarray_dataset
-from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
-from cate.core.types import PolygonLike, TimeLike, TimeRange, TimeRangeLike, VarNamesLike, ValidationError
+from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl, is_coord_var, \
+    get_lat_dim_name_impl, get_lon_dim_name_impl, get_extents, _crosses_antimeridian
+from cate.core.types import PolygonLike, TimeLike, TimeRange, TimeRangeLike, VarNames, VarNamesLike, ValidationError
 from cate.ds.local import add_to_data_store_registry, LocalDataSource, LocalDataStore
+from cate.util.download import Downloader, DownloadTask
 from cate.util.monitor import Cancellation, Monitor
+from cate.util.recordfile import read_record_file, write_record_file
 
 ESA_CCI_ODP_DATA_STORE_ID = 'esa_cci_odp'
 
@@ -73,6 +79,9 @@ _CSW_CEDA_URL = "https://csw.ceda.ac.uk/geonetwork/srv/eng/csw-CEDA-CCI"
 
 _TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+_SOLR_MAX_CONNECTIONS = 4
+_SOLR_TIMESTAMP_TOLERANCE = timedelta(hours=1)
+
 _REFERENCE_DATA_SOURCE_TYPE = "OPEN_DATA_PORTAL"
 
 _RE_TO_DATETIME_FORMATS = patterns = [(re.compile(14 * '\\d'), '%Y%m%d%H%M%S'),
@@ -92,6 +101,10 @@ _TIME_FREQUENCY_TO_TIME_DELTA = dict([
 
 _YEAR_REALIZATION = re.compile(4 * '\\d')
 
+# Matches the dimensions of an array declaration in a DAP Dataset Descriptor Structure (DDS), e.g. "[time = 12]"
+_DDS_DIMENSION = re.compile(r'\[\s*([^\]=\s]+)\s*=\s*(\d+)\s*\]')
+_DDS_TIMEOUT = 10
+
 _ODP_PROTOCOL_HTTP = 'HTTPServer'
 _ODP_PROTOCOL_OPENDAP = 'OPENDAP'
 
@@ -99,6 +112,7 @@ _ODP_AVAILABLE_PROTOCOLS_LIST = [_ODP_PROTOCOL_HTTP, _ODP_PROTOCOL_OPENDAP]
 
 _CSW_TIMEOUT = 10
 _CSW_MAX_RESULTS = 1000
+_CSW_MAX_CONNECTIONS = 4
 _CSW_METADATA_CACHE_FILE = 'catalogue_metadata.xml'
 _CSW_CACHE_FILE = 'catalogue.xml'
 
@@ -154,45 +168,90 @@ def get_exclude_variables_fix_known_issues(ds_id: str) -> [str]:
         return []
 
 
-def _fetch_solr_json(base_url, query_args, offset=0, limit=3500, timeout=10, monitor: Monitor = Monitor.NONE):
+def _fetch_solr_json(base_url, query_args, offset=0, limit=3500, timeout=10, monitor: Monitor = Monitor.NONE,
+                     max_connections: int = _SOLR_MAX_CONNECTIONS):
     """
     Return JSON value read from paginated Solr web-service.
+
+    The first page tells the number of documents found, all remaining pages are then fetched concurrently
+    using at most *max_connections* connections.
     """
-    combined_json_dict = None
-    num_found = -1
-    # we don't know ahead of time how much request are necessary
-    with monitor.starting("Loading", 10):
-        while True:
-            monitor.progress(work=1)
-            paging_query_args = dict(query_args or {})
-            # noinspection PyArgumentList
-            paging_query_args.update(offset=offset, limit=limit, format='application/solr+json')
-            url = base_url + '?' + urllib.parse.urlencode(paging_query_args)
+    combined_json_dict = _fetch_solr_page(base_url, query_args, offset, limit, timeout)
+    num_found = combined_json_dict.get('response', {}).get('numFound', 0)
+    page_offsets = list(range(offset + limit, num_found, limit))
+    with monitor.starting("Loading", len(page_offsets) + 1):
+        monitor.progress(work=1)
+        if not page_offsets:
+            return combined_json_dict
+        combined_docs = combined_json_dict.setdefault('response', {}).setdefault('docs', [])
+        with ThreadPoolExecutor(max_workers=min(max_connections, len(page_offsets))) as executor:
+            futures = [executor.submit(_fetch_solr_page, base_url, query_args, page_offset, limit, timeout)
+                       for page_offset in page_offsets]
             try:
-                with urllib.request.urlopen(url, timeout=timeout) as response:
-                    json_text = response.read()
-                    json_dict = json.loads(json_text.decode('utf-8'))
-                    if num_found is -1:
-                        num_found = json_dict.get('response', {}).get('numFound', 0)
-                    if not combined_json_dict:
-                        combined_json_dict = json_dict
-                        if num_found < limit:
-                            break
-                    else:
-                        docs = json_dict.get('response', {}).get('docs', [])
-                        combined_json_dict.get('response', {}).get('docs', []).extend(docs)
-                        if num_found < offset + limit:
-                            break
-            except (urllib.error.HTTPError, urllib.error.URLError) as e:
-                raise DataAccessError("Downloading CCI Open Data Portal index failed: {}\n{}"
-                                      .format(e, base_url)) from e
-            except socket.timeout:
-                raise DataAccessError("Downloading CCI Open Data Portal index failed: connection timeout\n{}"
-                                      .format(base_url))
-            offset += limit
+                # Collect pages in order, so that documents are in the same order as if fetched sequentially
+                for future in futures:
+                    json_dict = future.result()
+                    combined_docs.extend(json_dict.get('response', {}).get('docs', []))
+                    monitor.progress(work=1)
+                    monitor.check_for_cancellation()
+            finally:
+                for future in futures:
+                    future.cancel()
     return combined_json_dict
 
 
+def _fetch_solr_page(base_url, query_args, offset, limit, timeout) -> dict:
+    paging_query_args = dict(query_args or {})
+    # noinspection PyArgumentList
+    paging_query_args.update(offset=offset, limit=limit, format='application/solr+json')
+    url = base_url + '?' + urllib.parse.urlencode(paging_query_args)
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            json_text = response.read()
+            return json.loads(json_text.decode('utf-8'))
+    except (urllib.error.HTTPError, urllib.error.URLError) as e:
+        raise DataAccessError("Downloading CCI Open Data Portal index failed: {}\n{}"
+                              .format(e, base_url)) from e
+    except socket.timeout:
+        raise DataAccessError("Downloading CCI Open Data Portal index failed: connection timeout\n{}"
+                              .format(base_url))
+
+
+def _update_solr_json(json_dict: dict, timestamp: datetime, base_url, query_args,
+                      limit=3500, timeout=10, monitor: Monitor = Monitor.NONE,
+                      max_connections: int = _SOLR_MAX_CONNECTIONS):
+    """
+    Update the JSON value *json_dict* previously returned by :py:func:`_fetch_solr_json` by fetching only those
+    documents that have been indexed since the UTC *timestamp*. Documents are identified by their "master_id",
+    so that new versions of a dataset replace older ones.
+
+    If the number of documents differs from the number of documents found in the index afterwards,
+    e.g. because datasets have been retracted, all documents are fetched again.
+    """
+    # Allow for a clock skew between client and server
+    since = timestamp - _SOLR_TIMESTAMP_TOLERANCE
+    update_query_args = dict(query_args or {})
+    update_query_args['from'] = since.strftime('%Y-%m-%dT%H:%M:%SZ')
+    update_json_dict = _fetch_solr_json(base_url, update_query_args, limit=limit, timeout=timeout,
+                                        monitor=monitor, max_connections=max_connections)
+    num_found = _fetch_solr_page(base_url, query_args, 0, 0, timeout).get('response', {}).get('numFound', 0)
+
+    docs = OrderedDict((_get_solr_doc_key(doc), doc) for doc in json_dict.get('response', {}).get('docs', []))
+    for doc in update_json_dict.get('response', {}).get('docs', []):
+        docs[_get_solr_doc_key(doc)] = doc
+    if len(docs) != num_found:
+        return _fetch_solr_json(base_url, query_args, limit=limit, timeout=timeout,
+                                monitor=monitor, max_connections=max_connections)
+
+    json_dict = dict(json_dict)
+    json_dict['response'] = dict(json_dict.get('response', {}), numFound=num_found, docs=list(docs.values()))
+    return json_dict
+
+
+def _get_solr_doc_key(doc) -> str:
+    return doc.get('master_id') or doc.get('id')
+
+
 def _load_or_fetch_json(fetch_json_function,
                         fetch_json_args: list = None,
                         fetch_json_kwargs: dict = None,
@@ -200,12 +259,24 @@ def _load_or_fetch_json(fetch_json_function,
                         cache_dir: str = None,
                         cache_json_filename: str = None,
                         cache_timestamp_filename: str = None,
-                        cache_expiration_days: float = 1.0) -> Sequence:
+                        cache_expiration_days: float = 1.0,
+                        cache_records_path: Sequence[str] = (),
+                        cache_key_names: Sequence[str] = (),
+                        update_json_function=None) -> Sequence:
     """
     Return (JSON) value of fetch_json_function or return value of a cached JSON file.
+
+    The cached value is stored as a record file, see :py:mod:`cate.util.recordfile`, whose records are
+    identified by *cache_records_path* and decoded lazily.
+
+    If the cached value has expired and *update_json_function* is given, it is called as
+    ``update_json_function(cached_value, timestamp, *fetch_json_args, **fetch_json_kwargs)`` with
+    the UTC *timestamp* of the cached value to fetch only what has changed since then.
     """
     json_obj = None
+    cached_json_obj = None
     cache_json_file = None
+    timestamp = None
 
     if cache_used:
         if cache_dir is None:
@@ -219,39 +290,42 @@ def _load_or_fetch_json(fetch_json_function,
 
         cache_json_file = os.path.join(cache_dir, cache_json_filename)
         cache_timestamp_file = os.path.join(cache_dir, cache_timestamp_filename)
+        _remove_stale_json_cache(cache_json_file)
 
-        timestamp = datetime(year=2000, month=1, day=1)
         if os.path.exists(cache_timestamp_file):
             with open(cache_timestamp_file) as fp:
                 timestamp_text = fp.read()
                 timestamp = datetime.strptime(timestamp_text, _TIMESTAMP_FORMAT)
 
-        time_diff = datetime.now() - timestamp
-        time_diff_days = time_diff.days + time_diff.seconds / 3600. / 24.
-        if time_diff_days < cache_expiration_days:
-            if os.path.exists(cache_json_file):
-                with open(cache_json_file) as fp:
-                    json_text = fp.read()
-                    json_obj = json.loads(json_text)
+        cached_json_obj = _read_json_cache(cache_json_file)
+        if cached_json_obj is not None and timestamp is not None:
+            time_diff = datetime.utcnow() - timestamp
+            time_diff_days = time_diff.days + time_diff.seconds / 3600. / 24.
+            if time_diff_days < cache_expiration_days:
+                json_obj = cached_json_obj
 
     if json_obj is None:
         # noinspection PyArgumentList
         try:
-            # noinspection PyArgumentList
-            json_obj = fetch_json_function(*(fetch_json_args or []), **(fetch_json_kwargs or {}))
+            fetch_timestamp = datetime.utcnow()
+            if update_json_function is not None and cached_json_obj is not None and timestamp is not None:
+                # noinspection PyArgumentList
+                json_obj = update_json_function(cached_json_obj, timestamp,
+                                                *(fetch_json_args or []), **(fetch_json_kwargs or {}))
+            else:
+                # noinspection PyArgumentList
+                json_obj = fetch_json_function(*(fetch_json_args or []), **(fetch_json_kwargs or {}))
             if cache_used:
                 os.makedirs(cache_dir, exist_ok=True)
                 # noinspection PyUnboundLocalVariable
-                with open(cache_json_file, 'w') as fp:
-                    fp.write(json.dumps(json_obj, indent='  '))
+                write_record_file(cache_json_file, json_obj,
+                                  records_path=cache_records_path, key_names=cache_key_names)
                 # noinspection PyUnboundLocalVariable
                 with open(cache_timestamp_file, 'w') as fp:
-                    fp.write(datetime.utcnow().strftime(_TIMESTAMP_FORMAT))
+                    fp.write(fetch_timestamp.strftime(_TIMESTAMP_FORMAT))
         except Exception as e:
-            if cache_json_file and os.path.exists(cache_json_file):
-                with open(cache_json_file) as fp:
-                    json_text = fp.read()
-                    json_obj = json.loads(json_text)
+            if cached_json_obj is not None:
+                json_obj = cached_json_obj
             else:
                 if isinstance(e, DataAccessError):
                     raise DataAccessError("Cannot fetch information from CCI Open Data Portal server.") from e
@@ -261,10 +335,30 @@ def _load_or_fetch_json(fetch_json_function,
     return json_obj
 
 
+def _remove_stale_json_cache(cache_json_file: str):
+    # Older Cate versions cached the value as JSON file of the same name, e.g. "file-list.json"
+    stale_json_file = os.path.splitext(cache_json_file)[0] + '.json'
+    if stale_json_file != cache_json_file and os.path.isfile(stale_json_file):
+        try:
+            os.remove(stale_json_file)
+        except OSError:
+            pass
+
+
+def _read_json_cache(cache_json_file: str):
+    if not os.path.exists(cache_json_file):
+        return None
+    try:
+        return read_record_file(cache_json_file)
+    except (OSError, ValueError):
+        # E.g. a file written by an older Cate version, it will be overwritten
+        return None
+
+
 def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monitor = Monitor.NONE):
     file_index_json_dict = _fetch_solr_json(_ESGF_CEDA_URL,
                                             dict(type='File',
-                                                 fields='url,title,size',
+                                                 fields='url,title,size,checksum,checksum_type',
                                                  dataset_id=dataset_query_id,
                                                  replica='false',
                                                  latest='True',
@@ -286,6 +380,8 @@ def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monit
 
         filename = doc.get('title', None)
         file_size = doc.get('size', -1)
+        checksum = _get_solr_doc_value(doc, 'checksum')
+        checksum_type = _get_solr_doc_value(doc, 'checksum_type')
         if not filename:
             filename = os.path.basename(urllib.parse.urlparse(urls[_ODP_PROTOCOL_HTTP])[2])
         if filename in file_list:
@@ -303,7 +399,7 @@ def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monit
                 start_time = datetime.strptime(filename[p1:p2], time_format)
                 # Convert back to text, so we can JSON-encode it
                 start_time = datetime.strftime(start_time, _TIMESTAMP_FORMAT)
-        file_list.append([filename, start_time, end_time, file_size, urls])
+        file_list.append([filename, start_time, end_time, file_size, urls, checksum, checksum_type])
 
     def pick_start_time(file_info_rec):
         return file_info_rec[1] if file_info_rec[1] else datetime.max
@@ -311,6 +407,228 @@ def _fetch_file_list_json(dataset_id: str, dataset_query_id: str, monitor: Monit
     return sorted(file_list, key=pick_start_time)
 
 
+def _get_solr_doc_value(doc: dict, name: str):
+    value = doc.get(name, None)
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value
+
+
+def _get_file_checksum(file_rec: list) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return the pair (checksum, checksum_type) of a file record.
+    File records cached by older Cate versions do not provide a checksum.
+    """
+    if len(file_rec) < 7:
+        return None, None
+    return file_rec[5], file_rec[6]
+
+
+def _make_local_subset_file(dataset_uri: str,
+                            local_filepath: str,
+                            drop_variables: Sequence[str],
+                            var_names: Optional[Sequence[str]],
+                            region_wkt: Optional[str],
+                            encoding_update: dict) -> dict:
+    """
+    Write the subset of the remote OPeNDAP dataset *dataset_uri* given by *var_names* and *region_wkt*
+    to *local_filepath*. Called in worker processes, therefore all arguments are plain values.
+
+    :return: information about the subset required to update the local data source's meta-information
+    """
+    opened_dataset = xr.open_dataset(dataset_uri, drop_variables=drop_variables)
+    try:
+        remote_dataset = opened_dataset
+        if var_names:
+            remote_dataset = remote_dataset.drop([var_name for var_name in remote_dataset.data_vars.keys()
+                                                  if var_name not in var_names])
+        if region_wkt:
+            remote_dataset = normalize_impl(remote_dataset)
+            remote_dataset = adjust_spatial_attrs_impl(subset_spatial_impl(remote_dataset, region_wkt),
+                                                       allow_point=False)
+        if encoding_update:
+            for sel_var_name in remote_dataset.variables.keys():
+                remote_dataset.variables.get(sel_var_name).encoding.update(encoding_update)
+
+        remote_dataset.to_netcdf(local_filepath)
+
+        return dict(variables=list(remote_dataset.variables.keys()),
+                    dims=list(remote_dataset.dims.keys()),
+                    attrs={name: value for name, value in remote_dataset.attrs.items()
+                           if name.startswith('geospatial_')})
+    finally:
+        opened_dataset.close()
+
+
+def _run_ordered(function: Callable,
+                 args_list: Sequence[tuple],
+                 commit: Callable[[int, Any], None],
+                 max_workers: int = 4,
+                 monitor: Monitor = Monitor.NONE):
+    """
+    Call ``function(*args)`` for every *args* in *args_list* using a pool of at most *max_workers* worker processes
+    and call ``commit(index, result)`` from the calling thread in the order of *args_list*.
+
+    If a call fails, results of all preceding calls are committed before the error is raised.
+    Worker processes are spawned rather than forked, as the netCDF/HDF5 libraries are neither thread-safe
+    nor fork-safe.
+    """
+    num_workers = min(max_workers, len(args_list))
+    if num_workers <= 1:
+        for index, args in enumerate(args_list):
+            monitor.check_for_cancellation()
+            commit(index, function(*args))
+        return
+
+    pool = multiprocessing.get_context('spawn').Pool(processes=num_workers)
+    try:
+        # Queue more calls than there are workers, so that workers keep busy while results are committed
+        max_pending = 2 * num_workers
+        pending = deque()
+        next_index = 0
+        while next_index < len(args_list) or pending:
+            while next_index < len(args_list) and len(pending) < max_pending:
+                pending.append((next_index, pool.apply_async(function, args_list[next_index])))
+                next_index += 1
+            index, async_result = pending.popleft()
+            while not async_result.ready():
+                monitor.check_for_cancellation()
+                # Wake up regularly to check for cancellation
+                async_result.wait(timeout=0.25)
+            commit(index, async_result.get())
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+class _DatasetConstraint:
+    """
+    The variables and index ranges to be read from each file of a data source.
+
+    A constraint is resolved from the first file of a data source, assuming that all files share a common grid.
+    For OPeNDAP URLs it is pushed down to the server as DAP constraint expression, so that only the requested
+    hyperslabs of the requested variables are transferred. As the sizes of unconstrained dimensions such as time
+    may differ between files, they must be given for each file. For other files it is applied by lazy index slicing.
+
+    :param var_dims: Mapping of the names of all variables to be read to their dimension names.
+    :param index_slices: Mapping of dimension names to the index ranges to be read.
+    """
+
+    def __init__(self,
+                 var_dims: Dict[str, Tuple[str, ...]],
+                 index_slices: Dict[str, slice]):
+        self.var_dims = var_dims
+        self.index_slices = index_slices
+
+    @classmethod
+    def resolve(cls,
+                dataset: xr.Dataset,
+                region: PolygonLike.TYPE = None,
+                var_names: VarNamesLike.TYPE = None) -> '_DatasetConstraint':
+        polygon = PolygonLike.convert(region) if region else None
+        var_names = VarNamesLike.convert(var_names) if var_names else None
+
+        var_dims = OrderedDict()
+        for var_name, var in dataset.data_vars.items():
+            if not var_names or var_name in var_names or is_coord_var(dataset, var):
+                var_dims[var_name] = var.dims
+        for var_name, var in dataset.coords.items():
+            var_dims[var_name] = var.dims
+
+        index_slices = dict()
+        lat_name = get_lat_dim_name_impl(dataset)
+        lon_name = get_lon_dim_name_impl(dataset)
+        if polygon is not None and lat_name and lon_name and lat_name in dataset and lon_name in dataset:
+            # Same as subset_spatial_impl(), boxes given as "lon_min,lat_min,lon_max,lat_max" may cross the
+            # antimeridian with lon_min > lon_max
+            (lon_min, lat_min, lon_max, lat_max), explicit_coords = get_extents(region)
+            crosses_antimeridian = (lon_min > lon_max) if explicit_coords else _crosses_antimeridian(polygon)
+            lat_slice = _get_index_slice(dataset[lat_name].values, min(lat_min, lat_max), max(lat_min, lat_max))
+            if lat_slice is not None:
+                index_slices[lat_name] = lat_slice
+            lon = dataset[lon_name].values
+            # Longitudes of 0..360 grids are normalized after opening, so we can't select them here.
+            # A region crossing the antimeridian covers both ends of the longitudes, so all of them are read.
+            if not crosses_antimeridian and lon.size and -180. <= lon.min() and lon.max() <= 180.:
+                lon_slice = _get_index_slice(lon, lon_min, lon_max)
+                if lon_slice is not None:
+                    index_slices[lon_name] = lon_slice
+
+        return _DatasetConstraint(var_dims, index_slices)
+
+    def to_dap_url(self, url: str, dim_sizes: Dict[str, int] = None) -> str:
+        """
+        :param url: The OPeNDAP URL of a file.
+        :param dim_sizes: The sizes of the dimensions of the file, see :py:func:`_fetch_dap_dim_sizes`.
+               Required, if this constraint has index ranges.
+        :return: The OPeNDAP *url* with this constraint appended as DAP constraint expression.
+        """
+        projections = []
+        for var_name, dims in self.var_dims.items():
+            projection = urllib.parse.quote(var_name, safe='')
+            if any(dim in self.index_slices for dim in dims):
+                # DAP requires a hyperslab for each dimension of a variable, unconstrained dimensions are read
+                # entirely using the sizes of the given file
+                for dim in dims:
+                    index_slice = self.index_slices[dim] if dim in self.index_slices else slice(0, dim_sizes[dim])
+                    projection += '[%d:1:%d]' % (index_slice.start, index_slice.stop - 1)
+            projections.append(projection)
+        return url + '?' + ','.join(projections)
+
+    def apply(self, dataset: xr.Dataset) -> xr.Dataset:
+        """
+        :return: The lazily evaluated subset of *dataset* given by this constraint.
+        """
+        drop_var_names = [var_name for var_name in dataset.data_vars if var_name not in self.var_dims]
+        if drop_var_names:
+            dataset = dataset.drop(drop_var_names)
+        index_slices = {dim: index_slice for dim, index_slice in self.index_slices.items() if dim in dataset.dims}
+        if index_slices:
+            dataset = dataset.isel(**index_slices)
+        return dataset
+
+
+def _fetch_dap_dim_sizes(url: str, timeout: float = _DDS_TIMEOUT) -> Dict[str, int]:
+    """
+    Get the dimension sizes of the OPeNDAP dataset at *url* from its Dataset Descriptor Structure (DDS).
+    """
+    try:
+        with urllib.request.urlopen(url + '.dds', timeout=timeout) as response:
+            dds = response.read().decode('utf-8')
+    except (urllib.error.HTTPError, urllib.error.URLError) as e:
+        raise DataAccessError("Reading dataset structure failed: {}\n{}".format(e, url)) from e
+    except socket.timeout:
+        raise DataAccessError("Reading dataset structure failed: connection timeout\n{}".format(url))
+    return {urllib.parse.unquote(dim): int(size) for dim, size in _DDS_DIMENSION.findall(dds)}
+
+
+def _get_index_slice(values: np.ndarray, value_min: float, value_max: float) -> Optional[slice]:
+    """
+    Get the index range of the monotonic coordinate *values* covering *value_min* to *value_max*, including one
+    extra coordinate at each end, so that pixels intersecting the given range are always included.
+    """
+    if values.ndim != 1 or values.size < 2:
+        return None
+    size = values.size
+    descending = values[-1] < values[0]
+    if descending:
+        values = values[::-1]
+    if np.any(np.diff(values) <= 0):
+        return None
+    start = max(int(np.searchsorted(values, value_min, side='left')) - 1, 0)
+    stop = min(int(np.searchsorted(values, value_max, side='right')) + 1, size)
+    if stop <= start:
+        return None
+    if descending:
+        start, stop = size - stop, size - start
+    return slice(start, stop)
+
+
+def _is_dap_url(url: str) -> bool:
+    return urllib.parse.urlparse(url).scheme.lower() in ('http', 'https')
+
+
 class EsaCciOdpDataStore(DataStore):
     def __init__(self,
                  id: str = 'esa_cci_odp',
@@ -368,16 +686,17 @@ class EsaCciOdpDataStore(DataStore):
         docs = self._esgf_data.get('response', {}).get('docs', [])
         data_sources = []
         if self._csw_data:
+            docs_by_instance_id = OrderedDict()
+            for doc in docs:
+                docs_by_instance_id.setdefault(doc.get('instance_id', None), deque()).append(doc)
             for catalogue_data in self._csw_data.values():
                 catalogue_item = catalogue_data.copy()
                 catalogue_item.pop('data_sources')
                 for ds_name in catalogue_data.get('data_sources'):
-                    for idx, doc in enumerate(docs):
-                        instance_id = doc.get('instance_id', None)
-                        if ds_name == instance_id:
-                            data_sources.append(EsaCciOdpDataSource(self, doc, catalogue_item))
-                            del docs[idx]
-                            break
+                    # Every document is used only once
+                    instance_docs = docs_by_instance_id.get(ds_name)
+                    if instance_docs:
+                        data_sources.append(EsaCciOdpDataSource(self, instance_docs.popleft(), catalogue_item))
         else:
             for doc in docs:
                 data_sources.append(EsaCciOdpDataSource(self, doc))
@@ -394,16 +713,19 @@ class EsaCciOdpDataStore(DataStore):
                                                           project='esacci')],
                                                  cache_used=self._index_cache_used,
                                                  cache_dir=get_metadata_store_path(),
-                                                 cache_json_filename='dataset-list.json',
+                                                 cache_json_filename='dataset-list.records',
                                                  cache_timestamp_filename='dataset-list-timestamp.json',
-                                                 cache_expiration_days=self._index_cache_expiration_days)
+                                                 cache_expiration_days=self._index_cache_expiration_days,
+                                                 cache_records_path=('response', 'docs'),
+                                                 cache_key_names=('id', 'master_id', 'instance_id', 'xlink'),
+                                                 update_json_function=_update_solr_json)
 
             cci_catalogue_service = EsaCciCatalogueService(_CSW_CEDA_URL)
             csw_json_dict = _load_or_fetch_json(cci_catalogue_service.getrecords,
                                                 fetch_json_args=[],
                                                 cache_used=self._index_cache_used,
                                                 cache_dir=get_metadata_store_path(),
-                                                cache_json_filename='catalogue.json',
+                                                cache_json_filename='catalogue.records',
                                                 cache_timestamp_filename='catalogue-timestamp.json',
                                                 cache_expiration_days=self._index_cache_expiration_days)
         except DataAccessError as e:
@@ -555,8 +877,8 @@ class EsaCciOdpDataSource(DataSource):
         selected_file_list = self._find_files(None)
         if selected_file_list:
             dataset_dir = self.local_dataset_dir()
-            for filename, date_from, date_to, none, none \
-                    in selected_file_list:
+            for file_rec in selected_file_list:
+                filename, date_from, date_to = file_rec[:3]
                 if os.path.exists(os.path.join(dataset_dir, filename)):
                     if date_from in coverage.values():
                         for temp_date_from, temp_date_to in coverage.items():
@@ -648,7 +970,24 @@ class EsaCciOdpDataSource(DataSource):
 
         files = self._get_urls_list(selected_file_list, _ODP_PROTOCOL_OPENDAP)
         try:
-            ds = open_xarray_dataset(files, monitor=monitor)
+            preprocess = None
+            if region or var_names:
+                # Resolve variables and index ranges before the files are opened
+                with xr.open_dataset(files[0]) as first_ds:
+                    constraint = _DatasetConstraint.resolve(first_ds, region=region, var_names=var_names)
+                if all(_is_dap_url(file) for file in files):
+                    if constraint.index_slices:
+                        max_workers = get_config_value('opendap_max_connections', OPENDAP_MAX_CONNECTIONS)
+                        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as executor:
+                            files_dim_sizes = list(executor.map(_fetch_dap_dim_sizes, files))
+                    else:
+                        files_dim_sizes = [None] * len(files)
+                    files = [constraint.to_dap_url(file, dim_sizes)
+                             for file, dim_sizes in zip(files, files_dim_sizes)]
+                else:
+                    preprocess = constraint.apply
+
+            ds = open_xarray_dataset(files, monitor=monitor, preprocess=preprocess)
             if region:
                 ds = normalize_impl(ds)
                 ds = subset_spatial_impl(ds, region)
@@ -697,7 +1036,8 @@ class EsaCciOdpDataSource(DataSource):
         excluded_variables = get_exclude_variables_fix_known_issues(self.id)
 
         compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
-        compression_enabled = True if compression_level > 0 else False
+        # Files of Zarr-backed local copies are only kept until they have been moved into the Zarr stores
+        compression_enabled = True if compression_level > 0 and local_ds.storage_format != 'zarr' else False
 
         do_update_of_verified_time_coverage_start_once = True
         verified_time_coverage_start = None
@@ -722,58 +1062,52 @@ class EsaCciOdpDataSource(DataSource):
             if time_range is not None:
                 msg += ' in given time range {}'.format(TimeRangeLike.format(time_range))
             raise DataAccessError(msg)
+        # Files already contained in the local data source, e.g. when extending a local copy, are not copied again
+        missing_files = set(local_ds.get_missing_files([os.path.join(local_id, file_rec[0])
+                                                        for file_rec in selected_file_list]))
+        selected_file_list = [file_rec for file_rec in selected_file_list
+                              if os.path.join(local_id, file_rec[0]) in missing_files]
         try:
-            if protocol == _ODP_PROTOCOL_OPENDAP:
+            if not selected_file_list:
+                pass
+            elif protocol == _ODP_PROTOCOL_OPENDAP:
 
                 do_update_of_variables_meta_info_once = True
                 do_update_of_region_meta_info_once = True
 
                 files = self._get_urls_list(selected_file_list, protocol)
-                monitor.start('Sync ' + self.id, total_work=len(files))
-                for idx, dataset_uri in enumerate(files):
-                    child_monitor = monitor.child(work=1)
+                drop_variables = [variable.get('name') for variable in excluded_variables]
+                region_wkt = PolygonLike.format(PolygonLike.convert(region)) if region else None
 
-                    file_name = os.path.basename(dataset_uri)
-                    local_filepath = os.path.join(local_path, file_name)
+                args_list = []
+                for dataset_uri in files:
+                    local_filepath = os.path.join(local_path, os.path.basename(dataset_uri))
+                    args_list.append((dataset_uri, local_filepath, drop_variables, var_names, region_wkt,
+                                      encoding_update))
 
+                def commit_file(idx: int, subset_info: dict):
+                    nonlocal do_update_of_variables_meta_info_once, do_update_of_region_meta_info_once
+                    nonlocal do_update_of_verified_time_coverage_start_once
+                    nonlocal verified_time_coverage_start, verified_time_coverage_end
+
+                    file_name = os.path.basename(files[idx])
                     time_coverage_start = selected_file_list[idx][1]
                     time_coverage_end = selected_file_list[idx][2]
 
-                    child_monitor.start(label=file_name, total_work=1)
-
-                    remote_dataset = xr.open_dataset(dataset_uri, drop_variables=[variable.get('name') for variable in
-                                                                                  excluded_variables])
-                    if var_names:
-                        remote_dataset = remote_dataset.drop([var_name for var_name in remote_dataset.data_vars.keys()
-                                                              if var_name not in var_names])
-
-                    if region:
-                        remote_dataset = normalize_impl(remote_dataset)
-                        remote_dataset = adjust_spatial_attrs_impl(subset_spatial_impl(remote_dataset, region),
-                                                                   allow_point=False)
-
-                        if do_update_of_region_meta_info_once:
-                            local_ds.meta_info['bbox_minx'] = remote_dataset.attrs['geospatial_lon_min']
-                            local_ds.meta_info['bbox_maxx'] = remote_dataset.attrs['geospatial_lon_max']
-                            local_ds.meta_info['bbox_maxy'] = remote_dataset.attrs['geospatial_lat_max']
-                            local_ds.meta_info['bbox_miny'] = remote_dataset.attrs['geospatial_lat_min']
-                            do_update_of_region_meta_info_once = False
-
-                    if compression_enabled:
-                        for sel_var_name in remote_dataset.variables.keys():
-                            remote_dataset.variables.get(sel_var_name).encoding.update(encoding_update)
-
-                    remote_dataset.to_netcdf(local_filepath)
-
-                    child_monitor.progress(work=1, msg=str(time_coverage_start))
+                    if region and do_update_of_region_meta_info_once:
+                        local_ds.meta_info['bbox_minx'] = subset_info['attrs']['geospatial_lon_min']
+                        local_ds.meta_info['bbox_maxx'] = subset_info['attrs']['geospatial_lon_max']
+                        local_ds.meta_info['bbox_maxy'] = subset_info['attrs']['geospatial_lat_max']
+                        local_ds.meta_info['bbox_miny'] = subset_info['attrs']['geospatial_lat_min']
+                        do_update_of_region_meta_info_once = False
 
                     if do_update_of_variables_meta_info_once:
                         variables_info = local_ds.meta_info.get('variables', [])
                         local_ds.meta_info['variables'] = [var_info for var_info in variables_info
                                                            if var_info.get('name')
-                                                           in remote_dataset.variables.keys() and
+                                                           in subset_info['variables'] and
                                                            var_info.get('name')
-                                                           not in remote_dataset.dims.keys()]
+                                                           not in subset_info['dims']]
                         do_update_of_variables_meta_info_once = False
 
                     local_ds.add_dataset(os.path.join(local_id, file_name),
@@ -783,54 +1117,95 @@ class EsaCciOdpDataSource(DataSource):
                         verified_time_coverage_start = time_coverage_start
                         do_update_of_verified_time_coverage_start_once = False
                     verified_time_coverage_end = time_coverage_end
-                    child_monitor.done()
+
+                    monitor.progress(work=1, msg=str(time_coverage_start))
+
+                max_workers = get_config_value('opendap_max_connections', OPENDAP_MAX_CONNECTIONS)
+                with monitor.starting('Sync ' + self.id, total_work=len(files)):
+                    _run_ordered(_make_local_subset_file, args_list, commit_file,
+                                 max_workers=max_workers, monitor=monitor)
             else:
                 outdated_file_list = []
                 for file_rec in selected_file_list:
-                    filename, _, _, file_size, url = file_rec
+                    filename, _, _, file_size, url = file_rec[:5]
                     dataset_file = os.path.join(local_path, filename)
-                    # todo (forman, 20160915): must perform better checks on dataset_file if it is...
-                    # ... outdated or incomplete or corrupted.
-                    # JSON also includes "checksum" and "checksum_type" fields.
+                    # Files of the expected size are considered up-to-date. Partially downloaded files are
+                    # resumed, and downloaded files are verified against the file's "checksum" and
+                    # "checksum_type", if given.
                     if not os.path.isfile(dataset_file) or (file_size and os.path.getsize(dataset_file) != file_size):
                         outdated_file_list.append(file_rec)
 
                 if outdated_file_list:
-                    with monitor.starting('Sync ' + self.id, len(outdated_file_list)):
-                        bytes_to_download = sum([file_rec[3] for file_rec in outdated_file_list])
-                        dl_stat = _DownloadStatistics(bytes_to_download)
-
-                        file_number = 1
-
-                        for filename, coverage_from, coverage_to, file_size, url in outdated_file_list:
-                            dataset_file = os.path.join(local_path, filename)
-                            sub_monitor = monitor.child(work=1.0)
-
-                            # noinspection PyUnusedLocal
-                            def reporthook(block_number, read_size, total_file_size):
-                                dl_stat.handle_chunk(read_size)
-                                sub_monitor.progress(work=read_size, msg=str(dl_stat))
-
-                            sub_monitor_msg = "file %d of %d" % (file_number, len(outdated_file_list))
-                            with sub_monitor.starting(sub_monitor_msg, file_size):
-                                urllib.request.urlretrieve(url[protocol], filename=dataset_file, reporthook=reporthook)
-                            file_number += 1
-                            local_ds.add_dataset(os.path.join(local_id, filename), (coverage_from, coverage_to))
-
-                            if do_update_of_verified_time_coverage_start_once:
-                                verified_time_coverage_start = coverage_from
-                                do_update_of_verified_time_coverage_start_once = False
-                            verified_time_coverage_end = coverage_to
+                    bytes_to_download = sum([max(file_rec[3] or 0, 0) for file_rec in outdated_file_list])
+                    dl_stat = _DownloadStatistics(bytes_to_download)
+
+                    download_tasks = []
+                    for file_rec in outdated_file_list:
+                        filename, _, _, file_size, url = file_rec[:5]
+                        checksum, checksum_type = _get_file_checksum(file_rec)
+                        download_tasks.append(DownloadTask(url[protocol],
+                                                           os.path.join(local_path, filename),
+                                                           size=file_size,
+                                                           checksum=checksum,
+                                                           checksum_type=checksum_type))
+                    file_recs = dict(zip(download_tasks, outdated_file_list))
+
+                    # noinspection PyUnusedLocal
+                    def on_chunk(task: DownloadTask, num_bytes: int):
+                        dl_stat.handle_chunk(num_bytes)
+                        monitor.progress(work=num_bytes, msg=str(dl_stat))
+
+                    def on_done(task: DownloadTask):
+                        nonlocal do_update_of_verified_time_coverage_start_once
+                        nonlocal verified_time_coverage_start, verified_time_coverage_end
+                        filename, coverage_from, coverage_to = file_recs[task][:3]
+                        local_ds.add_dataset(os.path.join(local_id, filename), (coverage_from, coverage_to))
+
+                        if do_update_of_verified_time_coverage_start_once:
+                            verified_time_coverage_start = coverage_from
+                            do_update_of_verified_time_coverage_start_once = False
+                        verified_time_coverage_end = coverage_to
+
+                    max_connections = get_config_value('http_download_max_connections',
+                                                       HTTP_DOWNLOAD_MAX_CONNECTIONS)
+                    with monitor.starting('Sync ' + self.id, bytes_to_download):
+                        Downloader(max_connections=max_connections).download(download_tasks,
+                                                                             monitor=monitor,
+                                                                             on_chunk=on_chunk,
+                                                                             on_done=on_done)
         except OSError as e:
             raise DataAccessError("Copying remote data source failed: {}".format(e), source=self) from e
         except ValueError as e:
             raise ValidationError("Copying remote data source failed: {}".format(e), source=self) from e
 
-        local_ds.meta_info['temporal_coverage_start'] = TimeLike.format(verified_time_coverage_start)
-        local_ds.meta_info['temporal_coverage_end'] = TimeLike.format(verified_time_coverage_end)
+        if verified_time_coverage_start is not None:
+            # Include files copied previously, if an existing local copy has been extended
+            verified_time_coverage_start, verified_time_coverage_end = local_ds.files_temporal_coverage()
+            local_ds.meta_info['temporal_coverage_start'] = TimeLike.format(verified_time_coverage_start)
+            local_ds.meta_info['temporal_coverage_end'] = TimeLike.format(verified_time_coverage_end)
         local_ds.meta_info['exclude_variables'] = excluded_variables
         local_ds.save(True)
 
+    def _update_local(self,
+                      local_ds: LocalDataSource,
+                      time_range: Optional[TimeRange],
+                      region: Optional[shapely.geometry.Polygon],
+                      var_names: Optional[VarNames],
+                      monitor: Monitor = Monitor.NONE) -> LocalDataSource:
+        """
+        Extend the existing local copy *local_ds* of this data source, which has been made for the same
+        *region* and *var_names*, to *time_range*. Only files not yet contained in *local_ds* are copied.
+        """
+        self._make_local(local_ds, time_range, region, var_names, monitor=monitor)
+        local_ds.update_temporal_coverage(time_range)
+        # The merged temporal coverage may have gaps, so only the time range just copied is known to be complete
+        local_ds.meta_info['uuid'] = LocalDataStore.generate_uuid(ref_id=self.id, time_range=time_range,
+                                                                  region=region, var_names=var_names)
+        local_ds.save()
+        local_ds.consolidate(monitor=monitor)
+        local_ds.data_store.update_usage(local_ds)
+        return local_ds
+
     def make_local(self,
                    local_name: str,
                    local_id: str = None,
@@ -854,23 +1229,31 @@ class EsaCciOdpDataSource(DataSource):
             raise ValueError('Cannot initialize `local` DataStore')
 
         uuid = LocalDataStore.generate_uuid(ref_id=self.id, time_range=time_range, region=region, var_names=var_names)
+        subset_uuid = LocalDataStore.generate_uuid(ref_id=self.id, region=region, var_names=var_names)
 
         if not ds_id or len(ds_id) == 0:
             ds_id = "local.{}.{}".format(self.id, uuid)
             existing_ds_list = local_store.query(ds_id=ds_id)
             if len(existing_ds_list) == 1:
                 return existing_ds_list[0]
+            existing_ds = local_store.find_local_copy(self.id, subset_uuid)
+            if existing_ds:
+                return self._update_local(existing_ds, time_range, region, var_names, monitor=monitor)
         else:
             existing_ds_list = local_store.query(ds_id='local.%s' % ds_id)
             if len(existing_ds_list) == 1:
                 if existing_ds_list[0].meta_info.get('uuid', None) == uuid:
                     return existing_ds_list[0]
+                elif existing_ds_list[0].meta_info.get('subset_uuid', None) == subset_uuid:
+                    return self._update_local(existing_ds_list[0], time_range, region, var_names, monitor=monitor)
                 else:
                     raise ValueError('Datastore {} already contains dataset {}'.format(local_store.id, ds_id))
 
         local_meta_info = self.meta_info.copy()
         local_meta_info['ref_uuid'] = local_meta_info.get('uuid', None)
         local_meta_info['uuid'] = uuid
+        local_meta_info['subset_uuid'] = subset_uuid
+        local_meta_info.update(local_store.new_storage_meta_info())
 
         local_ds = local_store.create_data_source(ds_id, title=title,
                                                   time_range=time_range, region=region, var_names=var_names,
@@ -905,7 +1288,7 @@ class EsaCciOdpDataSource(DataSource):
                                         fetch_json_kwargs=dict(monitor=monitor),
                                         cache_used=self._data_store.index_cache_used,
                                         cache_dir=self.local_metadata_dataset_dir(),
-                                        cache_json_filename='file-list.json',
+                                        cache_json_filename='file-list.records',
                                         cache_timestamp_filename='file-list-timestamp.txt',
                                         cache_expiration_days=self._data_store.index_cache_expiration_days)
 
@@ -959,6 +1342,9 @@ class _DownloadStatistics:
             mb_per_sec = self._to_megas(self.bytes_done) / seconds
         else:
             mb_per_sec = 0.
+        if self.bytes_total <= 0:
+            # File sizes are unknown
+            return "%d MB @ %.3f MB/s" % (self._to_megas(self.bytes_done), mb_per_sec)
         percent = 100. * self.bytes_done / self.bytes_total
         return "%d of %d MB @ %.3f MB/s, %.1f%% complete" % \
                (self._to_megas(self.bytes_done), self._to_megas(self.bytes_total), mb_per_sec, percent)
@@ -995,31 +1381,28 @@ class EsaCciCatalogueService:
 
         self._catalogue = {}
 
-        catalogue_metadata = {}
-
-        start_position = 0
         max_records = _CSW_MAX_RESULTS
 
-        matches = -1
-        while True:
-            # fetch record metadata
-            self._catalogue_service.getrecords2(esn='full', outputschema=self._namespaces.get_namespace('gmd'),
-                                                startposition=start_position, maxrecords=max_records)
-            if matches == -1:
-                # set counters, start progress monitor
-                matches = self._catalogue_service.results.get('matches')
-                if matches == 0:
-                    break
-                monitor.start(label="Fetching catalogue data... (%d records)" % matches,
-                              total_work=ceil(matches / max_records))
-
-            catalogue_metadata.update(self._catalogue_service.records)
+        # The first page tells the number of matching records, all remaining pages are fetched concurrently
+        catalogue_metadata = OrderedDict(self._fetch_records(self._catalogue_service, 0, max_records))
+        matches = self._catalogue_service.results.get('matches')
+        if matches:
+            start_positions = list(range(max_records, matches + 1, max_records))
+            monitor.start(label="Fetching catalogue data... (%d records)" % matches,
+                          total_work=len(start_positions) + 1)
             monitor.progress(work=1)
-
-            # bump counters
-            start_position += max_records
-            if start_position > matches:
-                break
+            if start_positions:
+                with ThreadPoolExecutor(max_workers=min(_CSW_MAX_CONNECTIONS, len(start_positions))) as executor:
+                    # CatalogueServiceWeb instances keep the results of their last request, so use one per request
+                    futures = [executor.submit(self._fetch_records, None, start_position, max_records)
+                               for start_position in start_positions]
+                    try:
+                        for future in futures:
+                            catalogue_metadata.update(future.result())
+                            monitor.progress(work=1)
+                    finally:
+                        for future in futures:
+                            future.cancel()
 
         self._catalogue = {
             record.identification.uricode[0]: {
@@ -1043,6 +1426,13 @@ class EsaCciCatalogueService:
         }
         monitor.done()
 
+    def _fetch_records(self, catalogue_service: Optional[CatalogueServiceWeb], start_position: int, max_records: int):
+        if catalogue_service is None:
+            catalogue_service = CatalogueServiceWeb(url=self._catalogue_url, timeout=_CSW_TIMEOUT, skip_caps=True)
+        catalogue_service.getrecords2(esn='full', outputschema=self._namespaces.get_namespace('gmd'),
+                                      startposition=start_position, maxrecords=max_records)
+        return catalogue_service.records
+
     def _init_service(self):
         if self._catalogue:
             return
@@ -37,6 +37,8 @@ Components
 ==========
 """
 
+import bisect
+import copy
 import json
 import os
 import re
@@ -44,23 +46,26 @@ import shutil
 import uuid
 import warnings
 from collections import OrderedDict
-from datetime import datetime
+from datetime import datetime, timedelta
 from glob import glob
-from typing import Optional, Sequence, Union, Any, Tuple
+from typing import Optional, Sequence, Union, Any, Tuple, List
 
+import numpy as np
 import psutil
 import shapely.geometry
 import xarray as xr
 from dateutil import parser
 
 from cate.conf import get_config_value, get_data_stores_path
-from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL
+from cate.conf.defaults import NETCDF_COMPRESSION_LEVEL, LOCAL_DATA_STORE_QUOTA, LOCAL_DATA_STORE_FORMAT, \
+    LOCAL_DATA_STORE_ZARR_CHUNKING
 from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, DataAccessWarning, DataSourceStatus, DataStore, \
     DataSource, \
     open_xarray_dataset
 from cate.core.opimpl import subset_spatial_impl, normalize_impl, adjust_spatial_attrs_impl
 from cate.core.types import PolygonLike, TimeRange, TimeRangeLike, VarNames, VarNamesLike, ValidationError, \
     GeometryLike
+from cate.ds.local_zarr import check_zarr_available, get_zarr_layouts, get_zarr_store_path, open_zarr, write_zarr
 from cate.util.monitor import Monitor
 
 
@@ -72,6 +77,15 @@ _REFERENCE_DATA_SOURCE_TYPE = "FILE_PATTERN"
 
 _NAMESPACE = uuid.UUID(bytes=b"1234567890123456", version=3)
 
+_CATALOGUE_FILE_NAME = '.catalogue'
+_CATALOGUE_VERSION = 1
+
+# Accesses of a local copy are recorded with this resolution, so that opening it doesn't always rewrite its config
+_LAST_ACCESS_RESOLUTION = timedelta(minutes=1)
+_LAST_ACCESS_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+_ONE_GIB = 1024 * 1024 * 1024
+
 
 def get_data_store_path():
     return os.environ.get('CATE_LOCAL_DATA_STORE_PATH',
@@ -83,6 +97,42 @@ def add_to_data_store_registry():
     DATA_STORE_REGISTRY.add_data_store(data_store)
 
 
+class _FileTimeIndex:
+    """
+    A sorted index of the time coverages of a data source's files.
+
+    Files covering a time range ``(start, end)`` are selected if they are fully contained in a requested
+    time range, files stamped with a single time if it lies within the requested time range.
+    Selection uses binary search and takes O(log n + k) for k candidate files.
+
+    :param files: Mapping of file paths to time coverages.
+    """
+
+    def __init__(self, files: OrderedDict):
+        intervals = sorted(((coverage[0], coverage[1], file) for file, coverage in files.items()
+                            if isinstance(coverage, Tuple)), key=lambda item: item[0])
+        self._starts = [item[0] for item in intervals]
+        self._ends = [item[1] for item in intervals]
+        self._interval_files = [item[2] for item in intervals]
+        instants = sorted(((coverage, file) for file, coverage in files.items()
+                           if isinstance(coverage, datetime)), key=lambda item: item[0])
+        self._times = [item[0] for item in instants]
+        self._instant_files = [item[1] for item in instants]
+
+    def select(self, time_range: TimeRange) -> List[str]:
+        """
+        Get the files within *time_range* ordered by time.
+        """
+        t1, t2 = time_range
+        files = []
+        # Intervals starting after t2 cannot end before t2
+        for i in range(bisect.bisect_left(self._starts, t1), bisect.bisect_right(self._starts, t2)):
+            if self._ends[i] <= t2:
+                files.append(self._interval_files[i])
+        files.extend(self._instant_files[bisect.bisect_left(self._times, t1):bisect.bisect_left(self._times, t2)])
+        return files
+
+
 # TODO (kbernat): document this class
 class LocalDataSource(DataSource):
     """
@@ -106,10 +156,13 @@ class LocalDataSource(DataSource):
                  meta_info: dict = None,
                  status: DataSourceStatus = None):
         self._id = ds_id
+        self._files_json_path = None
         if isinstance(files, Sequence):
             self._files = OrderedDict.fromkeys(files)
         else:
             self._files = files
+        self._file_index = None
+        self._resolved_paths = dict()
         self._data_store = data_store
 
         initial_temporal_coverage = TimeRangeLike.convert(temporal_coverage) if temporal_coverage else None
@@ -140,9 +193,43 @@ class LocalDataSource(DataSource):
                  } for var_name in self._variables]
 
         self._status = status if status else DataSourceStatus.READY
+        self._size = None
+        self._last_access = None
+
+    @property
+    def _files(self) -> OrderedDict:
+        if self._files_json_path is not None:
+            # Data source has been created from the data store's catalogue, load files on first access
+            json_dict = self._data_store._load_json_file(self._files_json_path)
+            files = self._parse_files(json_dict.get('name'), json_dict.get('files', None))
+            self._file_dict = OrderedDict.fromkeys(files) if isinstance(files, Sequence) else files
+            self._files_json_path = None
+        return self._file_dict
+
+    @_files.setter
+    def _files(self, files: OrderedDict):
+        self._file_dict = files
+        self._files_json_path = None
 
     def _resolve_file_path(self, path) -> Sequence:
-        return glob(os.path.join(self._data_store.data_store_path, path))
+        resolved_paths = self._resolved_paths.get(path)
+        if resolved_paths is None:
+            resolved_paths = glob(os.path.join(self._data_store.data_store_path, path))
+            if resolved_paths:
+                # Don't cache missing files, they may yet be written
+                self._resolved_paths[path] = resolved_paths
+        return resolved_paths
+
+    def _select_files(self, time_range: Optional[TimeRange]) -> Sequence[str]:
+        if not time_range:
+            return list(self._files.keys())
+        if self._file_index is None:
+            self._file_index = _FileTimeIndex(self._files)
+        return self._file_index.select(time_range)
+
+    def _invalidate_files(self):
+        self._file_index = None
+        self._resolved_paths = dict()
 
     def open_dataset(self,
                      time_range: TimeRangeLike.TYPE = None,
@@ -153,32 +240,32 @@ class LocalDataSource(DataSource):
         time_range = TimeRangeLike.convert(time_range) if time_range else None
         if var_names:
             var_names = VarNamesLike.convert(var_names)
-        paths = []
-        if time_range:
-            time_series = list(self._files.values())
-            file_paths = list(self._files.keys())
-            for i in range(len(time_series)):
-                if time_series[i]:
-                    if isinstance(time_series[i], Tuple) and \
-                            time_series[i][0] >= time_range[0] and \
-                            time_series[i][1] <= time_range[1]:
-                        paths.extend(self._resolve_file_path(file_paths[i]))
-                    elif isinstance(time_series[i], datetime) and time_range[0] <= time_series[i] < time_range[1]:
-                        paths.extend(self._resolve_file_path(file_paths[i]))
+        if self.storage_format == 'zarr':
+            # Files of Zarr-backed local copies are only recorded to keep track of their time coverage
+            paths = [self._get_zarr_store_path(region)] if self._select_files(time_range) else []
         else:
-            for file in self._files.items():
-                paths.extend(self._resolve_file_path(file[0]))
+            paths = []
+            for file in self._select_files(time_range):
+                paths.extend(self._resolve_file_path(file))
         if paths:
             paths = sorted(set(paths))
             try:
-                excluded_variables = self._meta_info.get('exclude_variables', [])
-                ds = open_xarray_dataset(paths, drop_variables=[variable.get('name') for variable in
-                                                                excluded_variables], monitor=monitor)
+                if self.storage_format == 'zarr':
+                    ds = open_zarr(paths[0])
+                    if time_range:
+                        ds = ds.sel(time=slice(time_range[0], time_range[1]))
+                else:
+                    excluded_variables = self._meta_info.get('exclude_variables', [])
+                    index_path = os.path.join(self._data_store.data_store_path, self._id + '.index')
+                    ds = open_xarray_dataset(paths, drop_variables=[variable.get('name') for variable in
+                                                                    excluded_variables],
+                                             index_path=index_path, monitor=monitor)
                 if region:
                     ds = normalize_impl(ds)
                     ds = subset_spatial_impl(ds, region)
                 if var_names:
                     ds = ds.drop([var_name for var_name in ds.data_vars.keys() if var_name not in var_names])
+                self.record_access()
                 return ds
             except OSError as e:
                 raise DataAccessError("Cannot open local dataset:\n"
@@ -202,6 +289,27 @@ class LocalDataSource(DataSource):
             else:
                 raise DataAccessError("No local datasets available", source=self)
 
+    def _get_zarr_store_path(self, region: Optional[PolygonLike.TYPE]) -> str:
+        layouts = self.zarr_layouts
+        # Subsets of regions are mostly used to extract time series
+        layout = 'time_series' if region and 'time_series' in layouts else layouts[0]
+        return get_zarr_store_path(self.local_copy_dir, layout)
+
+    def _open_zarr_file(self, zarr_dataset: xr.Dataset, start_times: List[datetime], file: str) -> xr.Dataset:
+        """
+        Select the time steps of *zarr_dataset*, the opened Zarr store of this local copy, which stem from *file*.
+        The time steps are assigned to the files by their sorted *start_times*, so that every time step stems from
+        exactly one file.
+        """
+        file_start_time = self._files[file][0]
+        next_index = bisect.bisect_right(start_times, file_start_time)
+        time_values = zarr_dataset.time.values
+        start_index = 0 if file_start_time == start_times[0] \
+            else np.searchsorted(time_values, np.datetime64(file_start_time), side='left')
+        end_index = np.searchsorted(time_values, np.datetime64(start_times[next_index]), side='left') \
+            if next_index < len(start_times) else len(time_values)
+        return zarr_dataset.isel(time=slice(start_index, end_index))
+
     @staticmethod
     def _get_harmonized_coordinate_value(attrs: dict, attr_name: str):
         value = attrs.get(attr_name, 'nan')
@@ -222,7 +330,8 @@ class LocalDataSource(DataSource):
         var_names = VarNamesLike.convert(var_names) if var_names else None  # type: Sequence
 
         compression_level = get_config_value('NETCDF_COMPRESSION_LEVEL', NETCDF_COMPRESSION_LEVEL)
-        compression_enabled = True if compression_level > 0 else False
+        # Files of Zarr-backed local copies are only kept until they have been moved into the Zarr stores
+        compression_enabled = True if compression_level > 0 and local_ds.storage_format != 'zarr' else False
 
         encoding_update = dict()
         if compression_enabled:
@@ -230,11 +339,24 @@ class LocalDataSource(DataSource):
 
         local_path = os.path.join(local_ds.data_store.data_store_path, local_id)
         data_store_path = local_ds.data_store.data_store_path
+        is_zarr_backed = self.storage_format == 'zarr'
         if not os.path.exists(local_path):
             os.makedirs(local_path)
 
-        monitor.start("Sync " + self.id, total_work=len(self._files.items()))
-        for remote_relative_filepath, coverage in self._files.items():
+        selected_files = self._select_files(time_range)
+        # Files already contained in the local data source, e.g. when extending a local copy, are not copied again
+        missing_files = set(local_ds.get_missing_files([os.path.join(local_id, os.path.basename(file))
+                                                        for file in selected_files]))
+        selected_files = [file for file in selected_files
+                          if os.path.join(local_id, os.path.basename(file)) in missing_files]
+        if is_zarr_backed and selected_files:
+            # Sorted once, the start times assign the time steps of the Zarr store to the files being copied
+            zarr_start_times = sorted(coverage[0] for coverage in self._files.values()
+                                      if isinstance(coverage, Tuple))
+            zarr_dataset = open_zarr(get_zarr_store_path(self.local_copy_dir, self.zarr_layouts[0]))
+        monitor.start("Sync " + self.id, total_work=len(selected_files))
+        for remote_relative_filepath in selected_files:
+            coverage = self._files[remote_relative_filepath]
             child_monitor = monitor.child(work=1)
 
             file_name = os.path.basename(remote_relative_filepath)
@@ -249,13 +371,21 @@ class LocalDataSource(DataSource):
                 time_coverage_end = coverage[1]
 
                 if not time_range or time_coverage_start >= time_range[0] and time_coverage_end <= time_range[1]:
-                    if region or var_names:
+                    if region or var_names or is_zarr_backed:
 
                         do_update_of_variables_meta_info_once = True
                         do_update_of_region_meta_info_once = True
 
+                        if is_zarr_backed:
+                            remote_dataset = self._open_zarr_file(zarr_dataset, zarr_start_times,
+                                                                  remote_relative_filepath)
+                            if not remote_dataset.dims.get('time'):
+                                child_monitor.done()
+                                continue
+
                         try:
-                            remote_dataset = xr.open_dataset(remote_absolute_filepath)
+                            if not is_zarr_backed:
+                                remote_dataset = xr.open_dataset(remote_absolute_filepath)
 
                             if var_names:
                                 remote_dataset = remote_dataset.drop(
@@ -323,27 +453,37 @@ class LocalDataSource(DataSource):
             raise ValueError('Cannot initialize `local` DataStore')
 
         _uuid = LocalDataStore.generate_uuid(ref_id=self.id, time_range=time_range, region=region, var_names=var_names)
+        subset_uuid = LocalDataStore.generate_uuid(ref_id=self.id, region=region, var_names=var_names)
 
         if not local_name or len(local_name) == 0:
             local_name = "local.{}.{}".format(self.id, _uuid)
             existing_ds_list = local_store.query(ds_id=local_name)
             if len(existing_ds_list) == 1:
                 return existing_ds_list[0]
+            existing_ds = local_store.find_local_copy(self.id, subset_uuid)
+            if existing_ds:
+                return self._update_local(existing_ds, time_range, region, var_names, monitor=monitor)
         else:
             existing_ds_list = local_store.query(ds_id='local.%s' % local_name)
             if len(existing_ds_list) == 1:
                 if existing_ds_list[0].meta_info.get('uuid', None) == _uuid:
                     return existing_ds_list[0]
+                elif existing_ds_list[0].meta_info.get('subset_uuid', None) == subset_uuid:
+                    return self._update_local(existing_ds_list[0], time_range, region, var_names, monitor=monitor)
                 else:
                     raise ValueError('Datastore {} already contains dataset {}'.format(local_store.id, local_name))
 
         local_meta_info = self.meta_info.copy()
         local_meta_info['ref_uuid'] = local_meta_info.get('uuid', None)
         local_meta_info['uuid'] = _uuid
+        local_meta_info['subset_uuid'] = subset_uuid
+        local_meta_info.pop('storage_format', None)
+        local_meta_info.pop('zarr_layouts', None)
+        local_meta_info.update(local_store.new_storage_meta_info())
 
         local_ds = local_store.create_data_source(local_name, region, local_name,
                                                   time_range=time_range, var_names=var_names,
-                                                  meta_info=self.meta_info.copy())
+                                                  meta_info=local_meta_info)
         if local_ds:
             if not local_ds.is_complete:
                 self._make_local(local_ds, time_range, region, var_names, monitor=monitor)
@@ -356,10 +496,31 @@ class LocalDataSource(DataSource):
             return local_ds
         return None
 
+    def _update_local(self,
+                      local_ds: 'LocalDataSource',
+                      time_range: Optional[TimeRange],
+                      region: Optional[shapely.geometry.Polygon],
+                      var_names: Optional[VarNames],
+                      monitor: Monitor = Monitor.NONE) -> 'LocalDataSource':
+        """
+        Extend the existing local copy *local_ds* of this data source, which has been made for the same
+        *region* and *var_names*, to *time_range*. Only files not yet contained in *local_ds* are copied.
+        """
+        self._make_local(local_ds, time_range, region, var_names, monitor=monitor)
+        local_ds.update_temporal_coverage(time_range)
+        # The merged temporal coverage may have gaps, so only the time range just copied is known to be complete
+        local_ds.meta_info['uuid'] = LocalDataStore.generate_uuid(ref_id=self.id, time_range=time_range,
+                                                                  region=region, var_names=var_names)
+        local_ds.save()
+        local_ds.consolidate(monitor=monitor)
+        local_ds.data_store.update_usage(local_ds)
+        return local_ds
+
     def add_dataset(self, file, time_coverage: TimeRangeLike.TYPE = None, update: bool = False,
                     extract_meta_info: bool = False):
         if update or self._files.keys().isdisjoint([file]):
             self._files[file] = time_coverage
+            self._invalidate_files()
             if time_coverage:
                 self._extend_temporal_coverage(time_coverage)
         self._files = OrderedDict(sorted(self._files.items(),
@@ -370,7 +531,8 @@ class LocalDataSource(DataSource):
                 self._meta_info.update(ds.attrs)
             except OSError:
                 pass
-        self.save()
+        # Called for every file of a local copy being made, the store's catalogue is updated once it is complete
+        self.save(update_catalogue=False)
 
     def _extend_temporal_coverage(self, time_range: TimeRangeLike.TYPE):
         """
@@ -381,13 +543,10 @@ class LocalDataSource(DataSource):
         if not time_range:
             return
         if self._temporal_coverage:
-            if time_range[0] >= self._temporal_coverage[1]:
-                self._temporal_coverage = tuple([self._temporal_coverage[0], time_range[1]])
-            elif time_range[1] <= self._temporal_coverage[0]:
-                self._temporal_coverage = tuple([time_range[0], self._temporal_coverage[1]])
+            self._temporal_coverage = (min(self._temporal_coverage[0], time_range[0]),
+                                       max(self._temporal_coverage[1], time_range[1]))
         else:
-            self._temporal_coverage = time_range
-        self.save()
+            self._temporal_coverage = tuple(time_range)
 
     def update_temporal_coverage(self, time_range: TimeRangeLike.TYPE):
         """
@@ -395,7 +554,8 @@ class LocalDataSource(DataSource):
         :param time_range: Time range to be added to data source temporal coverage
         :return:
         """
-        self._extend_temporal_coverage(time_range)
+        self._extend_temporal_coverage(TimeRangeLike.convert(time_range))
+        self.save()
 
     def _reduce_temporal_coverage(self, time_range: TimeRangeLike.TYPE):
         """
@@ -426,13 +586,170 @@ class LocalDataSource(DataSource):
             elif time_coverage[0] <= time_range[1] <= time_coverage[1]:
                 time_range_to_be_removed = time_range[1], time_coverage[1]
         for file in files_to_remove:
-            os.remove(os.path.join(self._data_store.data_store_path, file))
+            file_path = os.path.join(self._data_store.data_store_path, file)
+            # Files of Zarr-backed local copies don't exist
+            if os.path.isfile(file_path):
+                os.remove(file_path)
             del self._files[file]
+        if files_to_remove:
+            self._invalidate_files()
         if time_range_to_be_removed:
             self._reduce_temporal_coverage(time_range_to_be_removed)
 
-    def save(self, unlock: bool = False):
-        self._data_store.save_data_source(self, unlock)
+    def get_missing_files(self, files: Sequence[str]) -> List[str]:
+        """
+        Get those of the given *files* which are not yet contained in this data source.
+
+        :param files: File paths relative to the data store directory
+        :return: The missing files in the given order
+        """
+        return [file for file in files if file not in self._files]
+
+    def files_temporal_coverage(self) -> Optional[TimeRange]:
+        """
+        Get the time range covered by the files of this data source, which may be smaller than the
+        data source's temporal coverage.
+
+        :return: A tuple of (*start*, *end*) ``datetime`` instances or ``None`` if files have no time information.
+        """
+        starts = []
+        ends = []
+        for coverage in self._files.values():
+            if isinstance(coverage, Tuple):
+                starts.append(coverage[0])
+                ends.append(coverage[1])
+            elif isinstance(coverage, datetime):
+                starts.append(coverage)
+                ends.append(coverage)
+        if not starts:
+            return None
+        return min(starts), max(ends)
+
+    @property
+    def is_local_copy(self) -> bool:
+        """
+        Whether the files of this data source are stored in the data store directory, which is the case
+        for local copies of other data sources. Only local copies are subject to the data store's quota.
+        """
+        return os.path.isdir(self.local_copy_dir)
+
+    @property
+    def local_copy_dir(self) -> str:
+        return os.path.join(self._data_store.data_store_path, self._id)
+
+    @property
+    def size(self) -> Optional[int]:
+        """
+        The recorded number of bytes of the files of a local copy, or ``None`` if unknown.
+        """
+        return self._size
+
+    @property
+    def last_access(self) -> Optional[datetime]:
+        """
+        The recorded time of the last access of a local copy, or ``None`` if unknown.
+        """
+        return self._last_access
+
+    def update_size(self) -> int:
+        """
+        Compute and record the number of bytes of the files of a local copy.
+
+        :return: The number of bytes
+        """
+        size = 0
+        for dir_path, _, file_names in os.walk(self.local_copy_dir):
+            for file_name in file_names:
+                try:
+                    size += os.path.getsize(os.path.join(dir_path, file_name))
+                except OSError:
+                    pass
+        self._size = size
+        return size
+
+    def record_access(self, force: bool = False):
+        """
+        Record the current time as the time of the last access of a local copy.
+
+        :param force: Whether to record the access even if the last access has been recorded only recently.
+        """
+        now = datetime.now().replace(microsecond=0)
+        if not force and self._last_access is not None and now - self._last_access < _LAST_ACCESS_RESOLUTION:
+            return
+        if not self.is_local_copy:
+            return
+        self._last_access = now
+        try:
+            self.save()
+        except DataAccessError:
+            # E.g. a read-only data store
+            pass
+
+    @property
+    def storage_format(self) -> str:
+        """
+        The format of the files of a local copy, either "netcdf" or "zarr". If "zarr", the data of the local
+        copy's files is stored in a Zarr store for each of the chunk layouts given by :py:attr:`zarr_layouts`.
+        """
+        return self._meta_info.get('storage_format', 'netcdf')
+
+    @property
+    def zarr_layouts(self) -> List[str]:
+        """
+        The chunk layouts of the Zarr stores of a Zarr-backed local copy, see :py:mod:`cate.ds.local_zarr`.
+        """
+        return self._meta_info.get('zarr_layouts') or ['map']
+
+    def consolidate(self, monitor: Monitor = Monitor.NONE):
+        """
+        Move the data of the netCDF files which have been added to a Zarr-backed local copy into its Zarr stores
+        and remove the files. Does nothing for other data sources.
+
+        :param monitor: A progress monitor.
+        """
+        if self.storage_format != 'zarr':
+            return
+        check_zarr_available()
+
+        data_store_path = self._data_store.data_store_path
+        files = [file for file in self._files.keys() if os.path.isfile(os.path.join(data_store_path, file))]
+        if not files:
+            return
+        files = sorted(files, key=lambda file: self._files[file][0] if isinstance(self._files[file], Tuple)
+                       else (self._files[file] or datetime.min))
+        paths = [os.path.join(data_store_path, file) for file in files]
+
+        layouts = self.zarr_layouts
+        with monitor.starting('Consolidate ' + self._id, len(layouts)):
+            try:
+                dataset = open_xarray_dataset(paths)
+                try:
+                    for layout in layouts:
+                        write_zarr(dataset, get_zarr_store_path(self.local_copy_dir, layout), layout)
+                        monitor.progress(work=1)
+                finally:
+                    dataset.close()
+            except OSError as e:
+                raise DataAccessError("Cannot store local dataset as Zarr:\n{}".format(e), source=self) from e
+        for path in paths:
+            os.remove(path)
+        self._invalidate_files()
+
+    def _usage_to_json_dict(self) -> Optional[dict]:
+        if self._size is None and self._last_access is None:
+            return None
+        return OrderedDict([('size', self._size),
+                            ('last_access', self._last_access.strftime(_LAST_ACCESS_FORMAT)
+                             if self._last_access else None)])
+
+    def _usage_from_json_dict(self, usage: Optional[dict]):
+        if usage:
+            self._size = usage.get('size')
+            last_access = usage.get('last_access')
+            self._last_access = datetime.strptime(last_access, _LAST_ACCESS_FORMAT) if last_access else None
+
+    def save(self, unlock: bool = False, update_catalogue: bool = True):
+        self._data_store.save_data_source(self, unlock, update_catalogue=update_catalogue)
 
     def temporal_coverage(self, monitor: Monitor = Monitor.NONE) -> Optional[TimeRange]:
         return self._temporal_coverage
@@ -516,6 +833,9 @@ class LocalDataSource(DataSource):
             'meta_info': self._meta_info,
             'files': [[item[0], item[1][0], item[1][1]] if item[1] else [item[0]] for item in self._files.items()]
         })
+        usage = self._usage_to_json_dict()
+        if usage:
+            config['usage'] = usage
         return config
 
     @classmethod
@@ -547,6 +867,14 @@ class LocalDataSource(DataSource):
                 if temporal_coverage_start and temporal_coverage_end:
                     temporal_coverage = temporal_coverage_start, temporal_coverage_end
 
+        files_dict = cls._parse_files(name, files)
+        data_source = LocalDataSource(name, files_dict, data_store, temporal_coverage, spatial_coverage, variables,
+                                      meta_info=meta_info)
+        data_source._usage_from_json_dict(json_dict.get('usage'))
+        return data_source
+
+    @staticmethod
+    def _parse_files(name: str, files: Optional[list]) -> OrderedDict:
         files_dict = OrderedDict()
         if name and isinstance(files, list):
             if len(files) > 0:
@@ -563,15 +891,56 @@ class LocalDataSource(DataSource):
                                                  if len(item) > 1 else (item[0], None) for item in files)
                 else:
                     files_dict = files
-        return LocalDataSource(name, files_dict, data_store, temporal_coverage, spatial_coverage, variables,
-                               meta_info=meta_info)
+        return files_dict
+
+    def _to_catalogue_entry(self) -> dict:
+        """
+        Return the fields of this data source needed for listing and querying.
+        """
+        temporal_coverage = self._temporal_coverage
+        return OrderedDict([
+            ('name', self._id),
+            ('meta_info', self._meta_info),
+            ('variables', list(self._variables)),
+            ('temporal_coverage', [temporal_coverage[0], temporal_coverage[1]] if temporal_coverage else None),
+            ('spatial_coverage', PolygonLike.format(self._spatial_coverage) or None),
+            ('usage', self._usage_to_json_dict()),
+        ])
+
+    @classmethod
+    def _from_catalogue_entry(cls, entry: dict, data_store: 'LocalDataStore', json_path: str) -> 'LocalDataSource':
+        """
+        Create a data source from a catalogue entry. Its files are loaded from *json_path* on first access.
+        """
+        data_source = LocalDataSource(entry['name'], OrderedDict(), data_store,
+                                      spatial_coverage=entry.get('spatial_coverage'),
+                                      variables=entry.get('variables'),
+                                      meta_info=copy.deepcopy(entry.get('meta_info')))
+        temporal_coverage = entry.get('temporal_coverage')
+        if temporal_coverage:
+            data_source._temporal_coverage = (parser.parse(temporal_coverage[0]), parser.parse(temporal_coverage[1]))
+        data_source._usage_from_json_dict(entry.get('usage'))
+        data_source._files_json_path = json_path
+        return data_source
 
 
 class LocalDataStore(DataStore):
+    """
+    A data store for data sources whose configurations are stored as JSON files in *store_dir*.
+
+    The fields needed to list and query data sources are kept in a consolidated catalogue file
+    in *store_dir*, so that data source configurations only need to be loaded if they have been
+    modified since the catalogue was written. The files of a data source are loaded on first access.
+
+    :param ds_id: The data store's identifier.
+    :param store_dir: Path to the directory that stores the data source configurations.
+    """
+
     def __init__(self, ds_id: str, store_dir: str):
         super().__init__(ds_id, title='Local Data Sources', is_local=True)
         self._store_dir = store_dir
         self._data_sources = None
+        self._catalogue = None
 
     def add_pattern(self, data_source_id: str, files: Union[str, Sequence[str]] = None) -> 'DataSource':
         data_source = self.create_data_source(data_source_id)
@@ -602,6 +971,13 @@ class LocalDataStore(DataStore):
         lock_file = os.path.join(self._store_dir, data_source.id + '.lock')
         if os.path.isfile(lock_file):
             os.remove(lock_file)
+        index_file = os.path.join(self._store_dir, data_source.id + '.index')
+        if os.path.isfile(index_file):
+            os.remove(index_file)
+        catalogue = self._get_catalogue()
+        if data_source.id in catalogue:
+            del catalogue[data_source.id]
+            self._save_catalogue()
         if remove_files:
             data_source_path = os.path.join(self._store_dir, data_source.id)
             if os.path.isdir(data_source_path):
@@ -609,9 +985,128 @@ class LocalDataStore(DataStore):
         if data_source in self._data_sources:
             self._data_sources.remove(data_source)
 
+    def find_local_copy(self, ref_id: str, subset_uuid: str) -> Optional[LocalDataSource]:
+        """
+        Find a local copy of the data source *ref_id* with a generated identifier, which has been made for the
+        region and variables identified by *subset_uuid* but possibly for another time range.
+
+        :param ref_id: Identifier of the copied data source
+        :param subset_uuid: UUID generated from *ref_id*, region and variables, but without time range
+        :return: The local copy or ``None``
+        """
+        id_prefix = '{}.{}.'.format(self.id, ref_id)
+        for data_source in self.query():
+            if data_source.id.startswith(id_prefix) and data_source.is_complete \
+                    and data_source.meta_info.get('subset_uuid', None) == subset_uuid:
+                return data_source
+        return None
+
     def register_ds(self, data_source: LocalDataSource):
         data_source.set_completed(True)
+        data_source.save()
         self._data_sources.append(data_source)
+        data_source.consolidate()
+        self.update_usage(data_source)
+
+    def new_storage_meta_info(self) -> dict:
+        """
+        Get the meta-information describing how the files of new local copies are stored, see configuration
+        parameters ``local_data_store_format`` and ``local_data_store_zarr_chunking``.
+
+        :return: A dictionary which is empty for local copies stored as netCDF files.
+        """
+        storage_format = get_config_value('local_data_store_format', LOCAL_DATA_STORE_FORMAT)
+        if storage_format == 'netcdf':
+            return {}
+        if storage_format != 'zarr':
+            raise ValidationError('Invalid local data store format "{}", must be "netcdf" or "zarr"'
+                                  .format(storage_format))
+        check_zarr_available()
+        chunking = get_config_value('local_data_store_zarr_chunking', LOCAL_DATA_STORE_ZARR_CHUNKING)
+        return OrderedDict([('storage_format', 'zarr'), ('zarr_layouts', get_zarr_layouts(chunking))])
+
+    def update_usage(self, data_source: LocalDataSource):
+        """
+        Record size and access time of the local copy *data_source*, which has just been created or extended,
+        and evict other local copies if the store's quota is exceeded.
+
+        :param data_source: A local copy.
+        """
+        if not data_source.is_local_copy:
+            return
+        data_source.update_size()
+        data_source.record_access(force=True)
+        self.evict(keep=[data_source.id])
+
+    def get_local_copies(self) -> List[LocalDataSource]:
+        """
+        Get the local copies in this data store, least recently used first.
+        Sizes not recorded yet are computed.
+
+        :return: List of local copies.
+        """
+        local_copies = [data_source for data_source in self.query() if data_source.is_local_copy]
+        for data_source in local_copies:
+            if data_source.size is None:
+                data_source.update_size()
+        return sorted(local_copies, key=lambda data_source: data_source.last_access or datetime.min)
+
+    def get_quota(self) -> Optional[int]:
+        """
+        Get the maximum number of bytes of all local copies in this data store, see configuration
+        parameter ``local_data_store_quota``.
+
+        :return: The number of bytes or ``None`` if unlimited.
+        """
+        quota = get_config_value('local_data_store_quota', LOCAL_DATA_STORE_QUOTA)
+        if quota is None:
+            return None
+        return int(float(quota) * _ONE_GIB)
+
+    def evict(self, quota: int = None, keep: Sequence[str] = None,
+              monitor: Monitor = Monitor.NONE) -> List[str]:
+        """
+        Remove least recently used local copies including their files until the total size of all local
+        copies does not exceed *quota*. Local copies which are referenced by open workspaces, which are
+        being created, or whose identifiers are given by *keep* are not removed.
+
+        :param quota: The maximum number of bytes. Defaults to the configured quota, see :py:meth:`get_quota`.
+        :param keep: Identifiers of data sources which must not be removed.
+        :param monitor: A progress monitor.
+        :return: Identifiers of the removed data sources.
+        """
+        if quota is None:
+            quota = self.get_quota()
+            if quota is None:
+                return []
+        local_copies = self.get_local_copies()
+        total_size = sum(data_source.size for data_source in local_copies)
+        if total_size <= quota:
+            return []
+
+        from cate.core.workspace import get_referenced_data_source_ids
+        referenced_ids = get_referenced_data_source_ids()
+        keep = set(keep or [])
+
+        def is_in_use(data_source: LocalDataSource) -> bool:
+            if data_source.id in keep or not data_source.is_complete \
+                    or os.path.isfile(os.path.join(self._store_dir, data_source.id + '.lock')):
+                return True
+            # Local copies with generated identifiers are named "local.<ref_id>.<uuid>"
+            return any(data_source.id == ds_id or data_source.id.startswith('{}.{}.'.format(self.id, ds_id))
+                       for ds_id in referenced_ids)
+
+        removed_ids = []
+        with monitor.starting('Evicting local copies', len(local_copies)):
+            for data_source in local_copies:
+                if total_size <= quota:
+                    break
+                if not is_in_use(data_source):
+                    self.remove_data_source(data_source, remove_files=True)
+                    total_size -= data_source.size
+                    removed_ids.append(data_source.id)
+                monitor.progress(work=1)
+        return removed_ids
 
     @classmethod
     def generate_uuid(cls, ref_id: str,
@@ -734,6 +1229,16 @@ class LocalDataStore(DataStore):
         """
         if self._data_sources:
             return
+        self._sync_data_sources(skip_broken=skip_broken)
+
+    def _sync_data_sources(self, skip_broken: bool = True):
+        """
+        Synchronize data sources with the data source configurations in the store directory.
+        Only configurations whose modification time or size differ from the catalogue are loaded.
+        Data sources of unchanged configurations are reused.
+
+        :param skip_broken: In case of broken data sources skip loading and log warning instead of rising Error.
+        """
         os.makedirs(self._store_dir, exist_ok=True)
         json_files = [f for f in os.listdir(self._store_dir)
                       if os.path.isfile(os.path.join(self._store_dir, f)) and f.endswith('.json')]
@@ -741,35 +1246,105 @@ class LocalDataStore(DataStore):
                          if os.path.isfile(os.path.join(self._store_dir, f)) and f.endswith('.lock')]
         if skip_broken:
             json_files = [f for f in json_files if f.replace('.json', '.lock') not in unfinished_ds]
-        self._data_sources = []
+
+        old_catalogue = self._get_catalogue()
+        old_data_sources = {data_source.id: data_source for data_source in self._data_sources or []}
+        catalogue = OrderedDict()
+        data_sources = []
         for json_file in json_files:
+            json_path = os.path.join(self._store_dir, json_file)
             try:
-                data_source = self._load_data_source(os.path.join(self._store_dir, json_file))
-                if data_source:
-                    self._data_sources.append(data_source)
-            except (DataAccessError, ValidationError) as e:
-                if skip_broken:
-                    warnings.warn(str(e), DataAccessWarning, stacklevel=0)
-                else:
-                    raise e
+                json_stat = os.stat(json_path)
+            except OSError:
+                continue
+            ds_id = json_file[:-len('.json')]
+            entry = old_catalogue.get(ds_id)
+            if entry is not None and entry['mtime'] == json_stat.st_mtime_ns and entry['size'] == json_stat.st_size:
+                data_source = old_data_sources.get(ds_id)
+                if data_source is None:
+                    data_source = LocalDataSource._from_catalogue_entry(entry, self, json_path)
+            else:
+                try:
+                    data_source = self._load_data_source(json_path)
+                except (DataAccessError, ValidationError) as e:
+                    if skip_broken:
+                        warnings.warn(str(e), DataAccessWarning, stacklevel=0)
+                        continue
+                    else:
+                        raise e
+                if not data_source:
+                    continue
+                entry = self._new_catalogue_entry(data_source, json_stat)
+            catalogue[ds_id] = entry
+            data_sources.append(data_source)
+
+        self._data_sources = data_sources
+        if catalogue != old_catalogue:
+            self._catalogue = catalogue
+            self._save_catalogue()
+
+    def _get_catalogue(self) -> OrderedDict:
+        if self._catalogue is None:
+            self._catalogue = self._load_catalogue()
+        return self._catalogue
+
+    def _load_catalogue(self) -> OrderedDict:
+        catalogue_file = os.path.join(self._store_dir, _CATALOGUE_FILE_NAME)
+        if os.path.isfile(catalogue_file):
+            try:
+                with open(catalogue_file) as fp:
+                    json_dict = json.load(fp, object_pairs_hook=OrderedDict)
+                if json_dict.get('version') == _CATALOGUE_VERSION:
+                    return json_dict.get('data_sources', OrderedDict())
+            except (OSError, ValueError):
+                pass
+        return OrderedDict()
 
-    def save_data_source(self, data_source, unlock: bool = False):
-        self._save_data_source(data_source)
+    def _save_catalogue(self):
+        catalogue_file = os.path.join(self._store_dir, _CATALOGUE_FILE_NAME)
+        json_dict = OrderedDict([('version', _CATALOGUE_VERSION), ('data_sources', self._catalogue)])
+        try:
+            self._write_json_file(catalogue_file, json_dict)
+        except OSError:
+            # The catalogue is rebuilt from the data source configurations if it is missing or outdated
+            pass
+
+    def _new_catalogue_entry(self, data_source: LocalDataSource, json_stat) -> OrderedDict:
+        entry = OrderedDict([('mtime', json_stat.st_mtime_ns), ('size', json_stat.st_size)])
+        entry.update(data_source._to_catalogue_entry())
+        # Store a snapshot, as it would be read from the catalogue file
+        return json.loads(json.dumps(entry, default=self._json_default_serializer), object_pairs_hook=OrderedDict)
+
+    def _write_json_file(self, file_name: str, json_dict: dict, **dump_kwargs):
+        # Write to a temporary file first, so that readers never see partially written files
+        temp_file_name = file_name + '.tmp'
+        with open(temp_file_name, 'w') as fp:
+            json.dump(json_dict, fp, default=self._json_default_serializer, **dump_kwargs)
+        os.replace(temp_file_name, file_name)
+
+    def save_data_source(self, data_source, unlock: bool = False, update_catalogue: bool = True):
+        self._save_data_source(data_source, update_catalogue=update_catalogue)
         if unlock:
             lock_file = os.path.join(self._store_dir, data_source.id + '.lock')
             if os.path.isfile(lock_file):
                 os.remove(lock_file)
 
-    def _save_data_source(self, data_source):
+    def _save_data_source(self, data_source, update_catalogue: bool = True):
         json_dict = data_source.to_json_dict()
-        dump_kwargs = dict(indent='  ', default=self._json_default_serializer)
         file_name = os.path.join(self._store_dir, data_source.id + '.json')
         try:
-            with open(file_name, 'w') as fp:
-                json.dump(json_dict, fp, **dump_kwargs)
+            self._write_json_file(file_name, json_dict, indent='  ')
+            json_stat = os.stat(file_name)
         except EnvironmentError as e:
             raise DataAccessError("Couldn't save data source config file {}\n"
                                   "{}".format(file_name, e), source=self) from e
+        if not update_catalogue:
+            # The catalogue entry is outdated until the data source is saved again with update_catalogue=True
+            return
+        self._get_catalogue()[data_source.id] = self._new_catalogue_entry(data_source, json_stat)
+        self._save_catalogue()
+        # The meta-information or temporal coverage of the data source may have changed
+        self._invalidate_search_index()
 
     def _load_data_source(self, json_path):
         json_dict = self._load_json_file(json_path)
@@ -777,8 +1352,7 @@ class LocalDataStore(DataStore):
             return LocalDataSource.from_json_dict(json_dict, self)
 
     def invalidate(self):
-        self._data_sources = None
-        self._init_data_sources()
+        self._sync_data_sources()
 
     @staticmethod
     def _load_json_file(json_path: str):
@@ -0,0 +1,259 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module stores local copies of data sources as Zarr stores, one store per chunk *layout*, to which
+the files of a local copy are appended along the time dimension.
+
+The chunk shapes of a store are chosen for the dominant access pattern:
+
+* ``"map"``: one chunk per time step, comprising whole rows of the spatial grid. Best for displaying and
+  processing single time steps.
+* ``"time_series"``: many time steps per chunk, comprising small spatial tiles. Best for extracting
+  time series at points or for small regions.
+
+The Python packages ``zarr`` and ``numcodecs`` are optional dependencies of Cate, they are only imported if
+Zarr-backed local copies are used.
+
+Components
+==========
+"""
+
+import importlib.util
+import os
+import shutil
+from typing import Dict, List, Sequence
+
+import numpy as np
+import xarray as xr
+
+from cate.core.types import ValidationError
+
+#: The chunk layouts
+ZARR_LAYOUTS = ('map', 'time_series')
+
+#: The chunk layouts for the values of configuration parameter "local_data_store_zarr_chunking"
+ZARR_CHUNKINGS = {
+    'map': ['map'],
+    'time_series': ['time_series'],
+    'both': ['map', 'time_series'],
+}
+
+# The desired number of uncompressed bytes of a chunk
+_TARGET_CHUNK_BYTES = 4 * 1024 * 1024
+
+# The number of time steps of a chunk in the time series layout
+_TIME_SERIES_CHUNK_LENGTH = 256
+
+_SPATIAL_DIMS = ('lat', 'lon')
+
+
+def get_zarr_layouts(chunking: str) -> List[str]:
+    """
+    Get the chunk layouts of the Zarr stores of a local copy.
+
+    :param chunking: One of "map", "time_series", or "both".
+    :return: List of chunk layouts, the first one is the primary layout.
+    """
+    layouts = ZARR_CHUNKINGS.get(chunking)
+    if layouts is None:
+        raise ValidationError('Invalid Zarr chunking "{}", must be one of {}'
+                              .format(chunking, ', '.join('"%s"' % c for c in ZARR_CHUNKINGS.keys())))
+    return list(layouts)
+
+
+def get_zarr_store_path(local_copy_dir: str, layout: str) -> str:
+    """
+    Get the path of the Zarr store of the local copy in *local_copy_dir* with the given chunk *layout*.
+    """
+    return os.path.join(local_copy_dir, layout + '.zarr')
+
+
+def check_zarr_available():
+    """
+    Raise a ``ValidationError`` if the packages required to write Zarr stores are not installed.
+    """
+    if importlib.util.find_spec('zarr') is None or importlib.util.find_spec('numcodecs') is None:
+        raise ValidationError('Zarr-backed local copies require the Python packages "zarr" and "numcodecs"',
+                              hint='Install them or set configuration parameter '
+                                   '"local_data_store_format" to "netcdf"')
+
+
+def get_zarr_chunk_sizes(dataset: xr.Dataset, layout: str) -> Dict[str, int]:
+    """
+    Compute the chunk sizes of the dimensions of *dataset* for the given chunk *layout*.
+
+    :param dataset: A normalized dataset with a "time" dimension.
+    :param layout: One of "map" or "time_series".
+    :return: Mapping from dimension name to chunk size
+    """
+    item_size = max([var.dtype.itemsize for var in dataset.data_vars.values()] or [8])
+    dim_sizes = dict(dataset.dims)
+    chunk_sizes = dict(dim_sizes)
+    spatial_dims = [dim for dim in _SPATIAL_DIMS if dim in dim_sizes]
+    # Dimensions other than time and space, e.g. depth or bounds, are not split
+    other_size = 1
+    for dim, size in dim_sizes.items():
+        if dim != 'time' and dim not in spatial_dims:
+            other_size *= size
+
+    if layout == 'map':
+        chunk_sizes['time'] = 1
+        if len(spatial_dims) == 2:
+            row_bytes = item_size * other_size * dim_sizes['lon']
+            chunk_sizes['lat'] = min(dim_sizes['lat'], max(1, _TARGET_CHUNK_BYTES // row_bytes))
+    elif layout == 'time_series':
+        # The length of the time dimension grows when appending, so its chunk size doesn't depend on it
+        chunk_sizes['time'] = _TIME_SERIES_CHUNK_LENGTH
+        if spatial_dims:
+            num_cells = max(1, _TARGET_CHUNK_BYTES // (item_size * other_size * _TIME_SERIES_CHUNK_LENGTH))
+            tile_size = max(1, int(num_cells ** (1. / len(spatial_dims))))
+            for dim in spatial_dims:
+                chunk_sizes[dim] = min(dim_sizes[dim], tile_size)
+    else:
+        raise ValidationError('Invalid Zarr chunk layout "{}"'.format(layout))
+    return chunk_sizes
+
+
+def write_zarr(dataset: xr.Dataset, store_path: str, layout: str):
+    """
+    Write *dataset* to the Zarr store *store_path* using the given chunk *layout*.
+
+    If the store exists and *dataset* starts after the last time step of the store, *dataset* is appended.
+    Otherwise the store is rewritten with the time steps of both, sorted by time, so that local copies can
+    also be extended into the past.
+
+    :param dataset: A normalized dataset with a "time" dimension.
+    :param store_path: Path of the Zarr store.
+    :param layout: One of "map" or "time_series".
+    """
+    if 'time' not in dataset.dims:
+        raise ValidationError('Datasets stored as Zarr require a "time" dimension')
+
+    _recover_replaced_store(store_path)
+    if not os.path.exists(store_path):
+        _write_new_zarr(dataset, store_path, layout)
+        return
+
+    existing_dataset = xr.open_zarr(store_path, consolidated=True)
+    try:
+        if dataset.time.values[0] > existing_dataset.time.values[-1]:
+            _append_zarr(dataset, existing_dataset, store_path)
+            return
+        combined_dataset = xr.concat([existing_dataset, dataset], dim='time',
+                                     data_vars='minimal', coords='minimal', compat='override')
+        combined_dataset = combined_dataset.sortby('time')
+        _, unique_indexes = np.unique(combined_dataset.time.values, return_index=True)
+        combined_dataset = combined_dataset.isel(time=unique_indexes)
+        temp_store_path = store_path + '.tmp'
+        if os.path.exists(temp_store_path):
+            shutil.rmtree(temp_store_path)
+        _write_new_zarr(combined_dataset, temp_store_path, layout)
+    finally:
+        existing_dataset.close()
+
+    _replace_store(temp_store_path, store_path)
+
+
+def open_zarr(store_path: str) -> xr.Dataset:
+    """
+    Open the Zarr store *store_path* written by :py:func:`write_zarr`.
+    """
+    return xr.open_zarr(store_path, consolidated=True)
+
+
+def _replace_store(temp_store_path: str, store_path: str):
+    # Move the old store aside first, so that it is only deleted once the new one is in place
+    old_store_path = store_path + '.old'
+    if os.path.exists(old_store_path):
+        shutil.rmtree(old_store_path)
+    os.rename(store_path, old_store_path)
+    try:
+        os.rename(temp_store_path, store_path)
+    except OSError:
+        os.rename(old_store_path, store_path)
+        raise
+    shutil.rmtree(old_store_path, ignore_errors=True)
+
+
+def _recover_replaced_store(store_path: str):
+    # Complete a replacement of the store that has been interrupted, see _replace_store()
+    old_store_path = store_path + '.old'
+    if os.path.exists(old_store_path):
+        if os.path.exists(store_path):
+            shutil.rmtree(old_store_path, ignore_errors=True)
+        else:
+            os.rename(old_store_path, store_path)
+
+
+def _write_new_zarr(dataset: xr.Dataset, store_path: str, layout: str):
+    import numcodecs
+
+    # A fast compressor, as opposed to the zlib compression used for netCDF files
+    compressor = numcodecs.Blosc(cname='lz4', clevel=5, shuffle=numcodecs.Blosc.SHUFFLE)
+
+    chunk_sizes = get_zarr_chunk_sizes(dataset, layout)
+    dataset = _strip_encodings(dataset)
+    dataset = dataset.chunk({dim: chunk_sizes[dim] for dim in dataset.dims})
+    encoding = {var_name: dict(chunks=tuple(chunk_sizes[dim] for dim in var.dims), compressor=compressor)
+                for var_name, var in dataset.data_vars.items()}
+    dataset.to_zarr(store_path, mode='w', encoding=encoding, consolidated=True)
+
+
+def _append_zarr(dataset: xr.Dataset, existing_dataset: xr.Dataset, store_path: str):
+    dataset = _strip_encodings(dataset)
+    num_times = existing_dataset.dims['time']
+    chunks = {}
+    for var_name, var in existing_dataset.data_vars.items():
+        zarr_chunks = var.encoding.get('chunks')
+        if zarr_chunks and var_name in dataset and 'time' in var.dims:
+            chunks = dict(zip(var.dims, zarr_chunks))
+            break
+    if chunks:
+        # Each dask chunk must write whole Zarr chunks, otherwise concurrent writes of partial chunks interfere.
+        # The first dask chunk fills up the last, partially filled Zarr chunk of the store.
+        chunks['time'] = _get_aligned_chunks(num_times, dataset.dims['time'], chunks['time'])
+        dataset = dataset.chunk({dim: chunk for dim, chunk in chunks.items() if dim in dataset.dims})
+    dataset.to_zarr(store_path, mode='a', append_dim='time', consolidated=True)
+
+
+def _get_aligned_chunks(offset: int, length: int, chunk_size: int) -> Sequence[int]:
+    chunks = []
+    first_chunk_size = chunk_size - offset % chunk_size
+    if first_chunk_size < chunk_size:
+        chunks.append(min(first_chunk_size, length))
+        length -= chunks[0]
+    while length > 0:
+        chunks.append(min(chunk_size, length))
+        length -= chunks[-1]
+    return tuple(chunks)
+
+
+def _strip_encodings(dataset: xr.Dataset) -> xr.Dataset:
+    # Drop encodings specific to the netCDF files the dataset has been read from
+    dataset = dataset.copy()
+    for var in dataset.variables.values():
+        var.encoding = {name: value for name, value in var.encoding.items()
+                        if name in ('_FillValue', 'dtype', 'scale_factor', 'add_offset', 'units', 'calendar')}
+    return dataset
@@ -68,6 +68,7 @@ from .anomaly import anomaly_internal, anomaly_external
 from .index import enso, enso_nino34, oni
 from .outliers import detect_outliers
 from .data_frame import data_frame_min, data_frame_max, data_frame_query
+from .zonal import zonal_statistics
 
 
 __all__ = [
@@ -143,4 +144,6 @@ __all__ = [
     'data_frame_min',
     'data_frame_max',
     'data_frame_query',
+    # .zonal
+    'zonal_statistics',
 ]
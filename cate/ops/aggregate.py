@@ -29,6 +29,8 @@ Components
 ==========
 """
 
+import dask
+import dask.array as da
 import xarray as xr
 import pandas as pd
 import numpy as np
@@ -36,6 +38,7 @@ import numpy as np
 from cate.core.op import op, op_input, op_return
 from cate.ops.select import select_var
 from cate.util.monitor import Monitor
+from cate.core.opimpl import reduce_impl
 from cate.core.types import VarNamesLike, DatasetLike, ValidationError, DimNamesLike
 
 from cate.ops.normalize import adjust_temporal_attrs
@@ -106,50 +109,11 @@ def _lta_monthly(ds: xr.Dataset, monitor: Monitor):
     :return: Aggregated dataset
     """
     time_min = pd.Timestamp(ds.time.values[0])
-    time_max = pd.Timestamp(ds.time.values[-1])
-    total_work = 100
-    retset = ds
-
-    with monitor.starting('LTA', total_work=total_work):
-        monitor.progress(work=0)
-        step = total_work / 12
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_mean, **kwargs)
-
-    # Make the return dataset CF compliant
-    retset = retset.rename({'month': 'time'})
-    retset['time'] = pd.date_range('{}-01-01'.format(time_min.year),
-                                   freq='MS',
-                                   periods=12)
-
-    climatology_bounds = xr.DataArray(data=np.tile([time_min, time_max],
-                                                   (12, 1)),
-                                      dims=['time', 'nv'],
-                                      name='climatology_bounds')
-    retset['climatology_bounds'] = climatology_bounds
-    retset.time.attrs = ds.time.attrs
-    retset.time.attrs['climatology'] = 'climatology_bounds'
-
-    for var in retset.data_vars:
-        try:
-            retset[var].attrs['cell_methods'] = \
-                retset[var].attrs['cell_methods'] + ' time: mean over years'
-        except KeyError:
-            retset[var].attrs['cell_methods'] = 'time: mean over years'
-
-    return retset
-
-
-def _groupby_day(ds: xr.Dataset, monitor: Monitor, step: float):
-    """
-    Groupby the given dataset by day of month and apply mean to it
-
-    :param ds: Dataset to aggregate
-    :param monitor: Progress monitor
-    :param step: Progress step
-    """
-    kwargs = {'monitor': monitor, 'step': step}
-    return ds.groupby('time.day', squeeze=False).apply(_mean, **kwargs)
+    group_indexes = pd.DatetimeIndex(ds.time.values).month.values - 1
+    time_coord = pd.date_range('{}-01-01'.format(time_min.year),
+                               freq='MS',
+                               periods=12)
+    return _lta(ds, group_indexes, time_coord, monitor)
 
 
 def _lta_daily(ds: xr.Dataset, monitor: Monitor):
@@ -161,50 +125,17 @@ def _lta_daily(ds: xr.Dataset, monitor: Monitor):
     :return: Aggregated dataset
     """
     time_min = pd.Timestamp(ds.time.values[0])
-    time_max = pd.Timestamp(ds.time.values[-1])
-    total_work = 100
-    retset = ds
-
-    with monitor.starting('LTA', total_work=total_work):
-        monitor.progress(work=0)
-        step = total_work / 366
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_groupby_day, **kwargs)
-
-    # Make the return dataset CF compliant
-    retset = retset.stack(time=('month', 'day'))
-
-    # Get rid of redundant dates
-    drop = [(2, 29), (2, 30), (2, 31), (4, 31), (6, 31),
-            (9, 31), (11, 31)]
-    retset = retset.drop(drop, dim='time')
-
-    # Turn month, day coordinates to time
-    retset = retset.reset_index('time')
-    retset = retset.drop(['month', 'day'])
+    time_index = pd.DatetimeIndex(ds.time.values)
+    # Day of a year without February 29th, which is left out
+    day_offsets = np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+    group_indexes = day_offsets[time_index.month.values - 1] + time_index.day.values - 1
+    group_indexes[(time_index.month.values == 2) & (time_index.day.values == 29)] = -1
     time_coord = pd.date_range(start='{}-01-01'.format(time_min.year),
                                end='{}-12-31'.format(time_min.year),
                                freq='D')
     if len(time_coord) == 366:
         time_coord = time_coord.drop(np.datetime64('{}-02-29'.format(time_min.year)))
-    retset['time'] = time_coord
-
-    climatology_bounds = xr.DataArray(data=np.tile([time_min, time_max],
-                                                   (365, 1)),
-                                      dims=['time', 'nv'],
-                                      name='climatology_bounds')
-    retset['climatology_bounds'] = climatology_bounds
-    retset.time.attrs = ds.time.attrs
-    retset.time.attrs['climatology'] = 'climatology_bounds'
-
-    for var in retset.data_vars:
-        try:
-            retset[var].attrs['cell_methods'] = \
-                retset[var].attrs['cell_methods'] + ' time: mean over years'
-        except KeyError:
-            retset[var].attrs['cell_methods'] = 'time: mean over years'
-
-    return retset
+    return _lta(ds, group_indexes, time_coord, monitor)
 
 
 def _lta_general(ds: xr.Dataset, monitor: Monitor):
@@ -216,51 +147,84 @@ def _lta_general(ds: xr.Dataset, monitor: Monitor):
     :param monitor: Progress monitor
     :return: Aggregated dataset
     """
-    time_min = pd.Timestamp(ds.time.values[0])
-    time_max = pd.Timestamp(ds.time.values[-1])
-    total_work = 100
-    retset = ds
+    time_index = pd.DatetimeIndex(ds.time.values)
+    month_days = list(zip(time_index.month, time_index.day))
+
+    # Get 'representative year', the first year or the second one, if it
+    # has more time steps, e.g. because the first year is not full
+    years = time_index.year.values
+    unique_years = np.unique(years)
+    rep_year_mask = years == unique_years[0]
+    if len(unique_years) > 1 and np.count_nonzero(years == unique_years[1]) > np.count_nonzero(rep_year_mask):
+        rep_year_mask = years == unique_years[1]
+    rep_year = time_index[rep_year_mask]
 
     # The dataset should feature time periods consistent over years
     # and denoted with the same dates each year
-    if not _is_seasonal(ds.time):
+    rep_month_days = {month_day: i for i, month_day in enumerate(zip(rep_year.month, rep_year.day))}
+    if not all(month_day in rep_month_days for month_day in month_days):
         raise ValidationError("A long term average dataset can not be created for"
                               " a dataset with inconsistent seasons.")
 
-    # Get 'representative year'
-    c = 0
-    for group in ds.time.groupby('time.year'):
-        c = c + 1
-        if c == 1:
-            rep_year = group[1].time
+    group_indexes = np.array([rep_month_days[month_day] for month_day in month_days])
+    return _lta(ds, group_indexes, rep_year, monitor)
+
+
+def _lta(ds: xr.Dataset, group_indexes: np.ndarray, time_coord: pd.DatetimeIndex, monitor: Monitor):
+    """
+    Average the variables of *ds* over all time steps that belong to the same group, e.g. the same
+    month or day of year.
+
+    The sums and counts of valid values per group are accumulated chunk by chunk in a single pass
+    over the dataset, so that datasets larger than memory can be averaged.
+
+    :param ds: Dataset to aggregate
+    :param group_indexes: For each time step, the index of its group in *time_coord*, or -1 if the time step
+           is not used
+    :param time_coord: The time coordinate of the climatology, one time for each group
+    :param monitor: Progress monitor
+    :return: Aggregated dataset
+    """
+    time_min = pd.Timestamp(ds.time.values[0])
+    time_max = pd.Timestamp(ds.time.values[-1])
+    num_groups = len(time_coord)
+
+    var_names = []
+    sums_and_counts = []
+    for var_name, var in ds.data_vars.items():
+        if 'time' not in var.dims:
             continue
-        if c == 2 and len(group[1].time) > len(rep_year):
-            rep_year = group[1].time
-            break
+        if not (np.issubdtype(var.dtype, np.number) or var.dtype == np.bool_):
+            continue
+        var_names.append(var_name)
+        sums_and_counts.append(_group_sums_and_counts(var, group_indexes, num_groups))
 
-    with monitor.starting('LTA', total_work=total_work):
+    with monitor.starting('LTA', total_work=100):
         monitor.progress(work=0)
-        step = total_work / len(rep_year.time)
-        kwargs = {'monitor': monitor, 'step': step}
-        retset = retset.groupby('time.month', squeeze=False).apply(_groupby_day, **kwargs)
+        with monitor.child(100).observing('Aggregate'):
+            sums_and_counts = dask.compute(*sums_and_counts)
 
+    retset = ds.drop([var_name for var_name, var in ds.variables.items() if 'time' in var.dims])
     # Make the return dataset CF compliant
-    retset = retset.stack(time=('month', 'day'))
-
-    # Turn month, day coordinates to time
-    retset = retset.reset_index('time')
-    retset = retset.drop(['month', 'day'])
-    retset['time'] = rep_year.time
+    retset['time'] = time_coord
+    for var_name, (sums, counts) in zip(var_names, sums_and_counts):
+        var = ds[var_name]
+        dtype = var.dtype if np.issubdtype(var.dtype, np.floating) else np.float64
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan).astype(dtype)
+        # Restore the original order of dimensions
+        dims = ('time',) + tuple(dim for dim in var.dims if dim != 'time')
+        retset[var_name] = xr.DataArray(means, dims=dims, attrs=var.attrs).transpose(*var.dims)
 
     climatology_bounds = xr.DataArray(data=np.tile([time_min, time_max],
-                                                   (len(rep_year), 1)),
+                                                   (num_groups, 1)),
                                       dims=['time', 'nv'],
                                       name='climatology_bounds')
     retset['climatology_bounds'] = climatology_bounds
     retset.time.attrs = ds.time.attrs
     retset.time.attrs['climatology'] = 'climatology_bounds'
 
-    for var in retset.data_vars:
+    for var in var_names:
         try:
             retset[var].attrs['cell_methods'] = \
                 retset[var].attrs['cell_methods'] + ' time: mean over years'
@@ -270,57 +234,79 @@ def _lta_general(ds: xr.Dataset, monitor: Monitor):
     return retset
 
 
-def _is_seasonal(time: xr.DataArray):
-    """
-    Check if the given timestamp dataarray features consistent
-    seasons. E.g. Each year has the same date-month values in it.
+def _group_sums_and_counts(var: xr.DataArray, group_indexes: np.ndarray, num_groups: int):
     """
-    c = 0
-    for group in time.groupby('time.year'):
-        # Test (month, day) dates of all years against
-        # (month, day) dates of the first year, or second
-        # year in case the first year is not full
-        c = c + 1
-        np_time = group[1].time.values
-        months = pd.DatetimeIndex(np_time).month
-        days = pd.DatetimeIndex(np_time).day
-        if c == 1:
-            first_months = months
-            first_days = days
-            continue
-        elif c == 2:
-            second_months = months
-            second_days = days
-            if len(second_months) > len(first_months):
-                test = zip(second_months, second_days)
-                for date in zip(first_months, first_days):
-                    if date not in test:
-                        return False
-            else:
-                test = zip(first_months, first_days)
-                for date in zip(second_months, second_days):
-                    if date not in test:
-                        return False
-            continue
+    Get a dask array of shape (2, num_groups, ...) of the sums and the counts of the valid values
+    of *var* in each group.
 
-        for date in zip(months, days):
-            if date not in test:
-                return False
-
-    return True
-
-
-def _mean(ds: xr.Dataset, monitor: Monitor, step: float):
+    Each chunk is reduced only into the groups of its own time steps, so that the partial results are
+    never larger than the chunk itself. The sums and counts of a group are then accumulated from the
+    partial results of those chunks that contain time steps of the group.
     """
-    Calculate mean of the given dataset and update the given monitor.
-
-    :param ds: Dataset to take the mean of
-    :param monitor: Monitor to update
-    :param step: Work step
+    var = var.transpose('time', *[dim for dim in var.dims if dim != 'time'])
+    data = var.data
+    if not isinstance(data, da.Array):
+        data = da.from_array(data, chunks=data.shape)
+
+    time_bounds = np.cumsum((0,) + data.chunks[0])
+    blocks = data.to_delayed()
+    # For each group, the indexes of the time chunks that contain time steps of the group
+    group_blocks = [[] for _ in range(num_groups)]
+    for block_index in range(data.numblocks[0]):
+        chunk_group_indexes = group_indexes[time_bounds[block_index]:time_bounds[block_index + 1]]
+        for group_index in np.unique(chunk_group_indexes[chunk_group_indexes >= 0]):
+            group_blocks[group_index].append(block_index)
+
+    spatial_blocks = []
+    for spatial_index in np.ndindex(*data.numblocks[1:]):
+        shape = tuple(chunks[i] for chunks, i in zip(data.chunks[1:], spatial_index))
+        partials = []
+        for block_index in range(data.numblocks[0]):
+            chunk_group_indexes = group_indexes[time_bounds[block_index]:time_bounds[block_index + 1]]
+            partials.append(dask.delayed(_chunk_group_sums_and_counts)(blocks[(block_index,) + spatial_index],
+                                                                       chunk_group_indexes))
+        group_results = []
+        for group_index in range(num_groups):
+            group_partials = [partials[block_index] for block_index in group_blocks[group_index]]
+            group_result = dask.delayed(_merge_group_sums_and_counts)(group_index, shape, *group_partials)
+            group_results.append(da.from_delayed(group_result, shape=(2, 1) + shape, dtype=np.float64))
+        spatial_blocks.append(da.concatenate(group_results, axis=1))
+
+    if len(spatial_blocks) == 1:
+        return spatial_blocks[0]
+    nested = np.empty(data.numblocks[1:], dtype=object)
+    for spatial_index, block in zip(np.ndindex(*data.numblocks[1:]), spatial_blocks):
+        nested[spatial_index] = block
+    return da.block(nested.tolist())
+
+
+def _chunk_group_sums_and_counts(chunk: np.ndarray, chunk_group_indexes: np.ndarray):
     """
-    retset = ds.mean(dim='time', keep_attrs=True)
-    monitor.progress(work=step)
-    return retset
+    Get the indexes of the groups of the time steps in *chunk*, and the sums and counts of the valid values
+    of each of these groups.
+    """
+    group_indexes = np.unique(chunk_group_indexes[chunk_group_indexes >= 0])
+    sums = np.empty((len(group_indexes),) + chunk.shape[1:], dtype=np.float64)
+    counts = np.empty((len(group_indexes),) + chunk.shape[1:], dtype=np.float64)
+    for i, group_index in enumerate(group_indexes):
+        values = chunk[chunk_group_indexes == group_index].astype(np.float64)
+        valid = np.isfinite(values)
+        sums[i] = np.where(valid, values, 0.0).sum(axis=0)
+        counts[i] = valid.sum(axis=0)
+    return group_indexes, sums, counts
+
+
+def _merge_group_sums_and_counts(group_index: int, shape: tuple, *partials):
+    """
+    Accumulate the sums and counts of group *group_index* from the *partials*
+    returned by :py:func:`_chunk_group_sums_and_counts`.
+    """
+    result = np.zeros((2, 1) + shape, dtype=np.float64)
+    for group_indexes, sums, counts in partials:
+        i = np.searchsorted(group_indexes, group_index)
+        result[0, 0] += sums[i]
+        result[1, 0] += counts[i]
+    return result
 
 
 @op(tags=['aggregate', 'temporal'], version='1.5')
@@ -444,12 +430,13 @@ def _validate_freq(in_res: str, out_res: str) -> None:
 @op_input('ds', data_type=DatasetLike)
 @op_input('var', data_type=VarNamesLike, value_set_source='ds')
 @op_input('dim', data_type=DimNamesLike, value_set_source='ds')
-@op_input('method', value_set=['mean', 'min', 'max', 'sum', 'median'])
+@op_input('method', value_set=['mean', 'min', 'max', 'sum', 'median', 'std', 'var', 'count'])
 @op_return(add_history=True)
 def reduce(ds: DatasetLike.TYPE,
            var: VarNamesLike.TYPE = None,
            dim: DimNamesLike.TYPE = None,
            method: str = 'mean',
+           area_weighted: bool = False,
            monitor: Monitor = Monitor.NONE):
     """
     Reduce the given variables of the given dataset along the given dimensions.
@@ -462,11 +449,10 @@ def reduce(ds: DatasetLike.TYPE,
     :param var: Variables in the dataset to reduce
     :param dim: Dataset dimensions along which to reduce
     :param method: reduction method
+    :param area_weighted: Whether to weight the values by the cosine of latitude when reducing
+           the 'lat' dimension. Only used by the 'mean', 'std' and 'var' methods.
     :param monitor: A progress monitor
     """
-    ufuncs = {'min': np.nanmin, 'max': np.nanmax, 'mean': np.nanmean,
-              'median': np.nanmedian, 'sum': np.nansum}
-
     if not var:
         var = list(ds.data_vars.keys())
     var_names = VarNamesLike.convert(var)
@@ -478,13 +464,14 @@ def reduce(ds: DatasetLike.TYPE,
 
     retset = ds.copy()
 
+    with monitor.starting("Reduce dataset", total_work=100):
+        monitor.progress(5)
+        results = reduce_impl(retset, var_names, dim, [method],
+                              area_weighted=area_weighted,
+                              monitor=monitor.child(95))
+
     for var_name in var_names:
-        intersection = [value for value in dim if value in retset[var_name].dims]
-        with monitor.starting("Reduce dataset", total_work=100):
-            monitor.progress(5)
-            with monitor.child(95).observing("Reduce"):
-                retset[var_name] = retset[var_name].reduce(ufuncs[method],
-                                                           dim=intersection,
-                                                           keep_attrs=True)
+        retset[var_name] = results[var_name][method]
+        retset[var_name].attrs = dict(ds[var_name].attrs)
 
     return retset
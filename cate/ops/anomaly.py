@@ -28,12 +28,15 @@ Anomaly calculation operations
 Functions
 =========
 """
+import os
+from functools import lru_cache
+
 import xarray as xr
 
 from cate.core.op import op, op_return, op_input
 from cate.util.monitor import Monitor
 from cate.ops.subset import subset_spatial, subset_temporal
-from cate.ops.arithmetics import diff, ds_arithmetics
+from cate.ops.arithmetics import ds_arithmetics
 from cate.core.types import TimeRangeLike, PolygonLike, ValidationError
 
 
@@ -79,46 +82,57 @@ def anomaly_external(ds: xr.Dataset,
         raise ValidationError('The dataset provided for anomaly calculation'
                               ' is required to have a time coordinate.')
 
-    clim = xr.open_dataset(file)
     ret = ds.copy()
     if transform:
         ret = ds_arithmetics(ds, transform)
-    # Group by months, subtract the appropriate slice from the reference
-    # Note that this requires that 'time' coordinate labels are of type
-    # datetime64[ns]
-    total_work = 100
-    step = 100 / 12
 
-    with monitor.starting('Anomaly', total_work=total_work):
+    with monitor.starting('Anomaly', total_work=100):
         monitor.progress(work=0)
-        kwargs = {'ref': clim, 'monitor': monitor, 'step': step}
-        ret = ret.groupby(ds['time.month']).apply(_group_anomaly,
-                                                  **kwargs)
+        clim = _get_climatology(file, ret)
+        # Look up the climatology of each time step's month and subtract it in one go.
+        # Note that this requires that 'time' coordinate labels are of type
+        # datetime64[ns]
+        month_indexes = xr.DataArray(ds['time.month'].values - 1, dims='time')
+        if ret.chunks:
+            clim = clim.chunk()
+        ret = ret - clim.isel(month=month_indexes)
+        monitor.progress(work=100)
 
-    # Running groupby results in a redundant 'month' variable being added to
-    # the dataset
-    ret = ret.drop('month')
     return ret
 
 
-def _group_anomaly(group: xr.Dataset,
-                   ref: xr.Dataset,
-                   monitor: Monitor = Monitor.NONE,
-                   step: float = None):
+def _get_climatology(file: str, ds: xr.Dataset) -> xr.Dataset:
     """
-    Calculate anomaly for the given group.
+    Get the monthly climatology stored in *file*, restricted to the grid of *ds*.
+    The time dimension of the climatology is renamed to 'month'.
 
-    :param group: Result of a groupby('time.month') operation
-    :param ref: Reference dataset
-    :param monitor: Monitor of the parent method
-    :param step: Step to add to monitor progress
-    :return: Group dataset with anomaly calculation applied
+    Climatologies are cached by file, modification time, size and grid, so that computing
+    anomalies of the same dataset or of the same subset of it again, e.g. for several
+    indexes, neither rereads the file nor realigns the climatology.
     """
-    # Retrieve the month of the current group
-    month = group['time.month'][0].values
-    ret = diff(group, ref.isel(time=month - 1))
-    monitor.progress(work=step)
-    return ret
+    path = os.path.abspath(file)
+    stat = os.stat(path)
+    grid = tuple((dim, tuple(index.tolist())) for dim, index in ds.indexes.items() if dim != 'time')
+    return _get_aligned_climatology((path, stat.st_mtime_ns, stat.st_size), grid)
+
+
+@lru_cache(maxsize=32)
+def _get_aligned_climatology(file_key: tuple, grid: tuple) -> xr.Dataset:
+    clim = _open_climatology(file_key)
+    clim, _ = xr.align(clim, xr.Dataset(coords={dim: list(labels) for dim, labels in grid}), join='inner')
+    return clim
+
+
+@lru_cache(maxsize=8)
+def _open_climatology(file_key: tuple) -> xr.Dataset:
+    with xr.open_dataset(file_key[0]) as clim:
+        if clim.dims.get('time') != 12:
+            raise ValidationError('The reference dataset is expected to consist of 12 time slices,'
+                                  ' one for each month.')
+        clim = clim.load()
+    if 'time' in clim.coords:
+        clim = clim.drop('time')
+    return clim.rename_dims(time='month')
 
 
 @op(tags=['anomaly'], version='1.0')
@@ -29,6 +29,11 @@ Functions
 =========
 """
 
+import ast
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import numba
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -37,7 +42,16 @@ from xarray import ufuncs as xu
 from cate.core.op import op, op_input, op_return
 from cate.core.types import DatasetLike, ValidationError
 from cate.util.monitor import Monitor
-from cate.util.safe import safe_exec
+from cate.util.safe import compile_source, safe_exec
+
+#: Element-wise functions of the ``np`` and ``xu`` packages that can be fused into a kernel
+_KERNEL_FUNCTIONS = frozenset(['log', 'log10', 'log2', 'log1p', 'exp', 'expm1', 'sqrt', 'square',
+                               'sin', 'cos', 'tan', 'arcsin', 'arccos', 'arctan', 'sinh', 'cosh', 'tanh',
+                               'fabs', 'absolute', 'floor', 'ceil'])
+
+_KERNEL_OPERATORS = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**'}
+
+_KERNEL_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
 
 
 @op(tags=['arithmetic'], version='1.0')
@@ -71,32 +85,25 @@ def ds_arithmetics(ds: DatasetLike.TYPE,
     :return: The dataset with given arithmetic operations applied
     """
     ds = DatasetLike.convert(ds)
-    retset = ds
-    with monitor.starting('Calculate result', total_work=len(op.split(','))):
-        for item in op.split(','):
+    items = [item.strip() for item in op.split(',')]
+    expression = 'a0'
+    keep_attrs = True
+    for item in items:
+        if item[0] in '+-*/':
+            expression = '({} {} {!r})'.format(expression, item[0], float(item[1:]))
+            keep_attrs = False
+        elif item in ('log', 'log10', 'log2', 'log1p', 'exp'):
+            expression = 'np.{}({})'.format(item, expression)
+        else:
+            raise ValidationError('Arithmetic operation {} not'
+                                  ' implemented.'.format(item[0]))
+
+    kernel = _get_kernel(expression, 1)
+    retset = ds.copy()
+    with monitor.starting('Calculate result', total_work=len(ds.data_vars)):
+        for name, var in ds.data_vars.items():
             with monitor.child(1).observing("Calculate"):
-                item = item.strip()
-                if item[0] == '+':
-                    retset = retset + float(item[1:])
-                elif item[0] == '-':
-                    retset = retset - float(item[1:])
-                elif item[0] == '*':
-                    retset = retset * float(item[1:])
-                elif item[0] == '/':
-                    retset = retset / float(item[1:])
-                elif item[:] == 'log':
-                    retset = xu.log(retset)
-                elif item[:] == 'log10':
-                    retset = xu.log10(retset)
-                elif item[:] == 'log2':
-                    retset = xu.log2(retset)
-                elif item[:] == 'log1p':
-                    retset = xu.log1p(retset)
-                elif item[:] == 'exp':
-                    retset = xu.exp(retset)
-                else:
-                    raise ValidationError('Arithmetic operation {} not'
-                                          ' implemented.'.format(item[0]))
+                retset[name] = _apply_kernel(kernel, [var], keep_attrs=keep_attrs)
 
     return retset
 
@@ -217,7 +224,9 @@ def compute(ds: DatasetLike.TYPE,
     local_namespace = dict(orig_namespace)
 
     with monitor.observing("Executing script"):
-        safe_exec(script, local_namespace=local_namespace)
+        for code, fused in _get_script_plan(script):
+            if fused is None or not _exec_fused(fused, local_namespace):
+                safe_exec(code, local_namespace=local_namespace)
 
     data_vars = {}
     for name, array in local_namespace.items():
@@ -237,3 +246,152 @@ def compute(ds: DatasetLike.TYPE,
         new_ds = xr.Dataset(data_vars=data_vars)
 
     return new_ds
+
+
+class _FusedAssign:
+    """
+    A statement ``<target> = <expr>`` whose element-wise expression *expr* is evaluated by a single fused kernel.
+    """
+
+    def __init__(self, target: str, expression: str, arg_names: Tuple[str, ...], attrs_name: Optional[str]):
+        self.target = target
+        self.expression = expression
+        self.arg_names = arg_names
+        self.attrs_name = attrs_name
+
+
+@lru_cache(maxsize=128)
+def _get_script_plan(script: str) -> List[Tuple[Any, Optional[_FusedAssign]]]:
+    """
+    Split *script* into a list of (code, fused) pairs, where *code* is the compiled code of one or more statements
+    and *fused* is a :py:class:`_FusedAssign`, if the statement can be evaluated by a fused kernel, otherwise None.
+    """
+    plan = []
+    pending = []
+
+    def flush():
+        if pending:
+            module = ast.Module(body=list(pending), type_ignores=[])
+            plan.append((compile(module, '<string>', 'exec'), None))
+            pending.clear()
+
+    for statement in ast.parse(script).body:
+        fused = _to_fused_assign(statement)
+        if fused is None:
+            pending.append(statement)
+        else:
+            flush()
+            module = ast.Module(body=[statement], type_ignores=[])
+            plan.append((compile(module, '<string>', 'exec'), fused))
+    flush()
+
+    if not plan:
+        plan.append((compile_source(script, 'exec'), None))
+    return plan
+
+
+def _to_fused_assign(statement: ast.stmt) -> Optional[_FusedAssign]:
+    if not isinstance(statement, ast.Assign) \
+            or len(statement.targets) != 1 \
+            or not isinstance(statement.targets[0], ast.Name):
+        return None
+    arg_names = []
+    try:
+        expression = _to_kernel_expression(statement.value, arg_names)
+    except ValueError:
+        return None
+    num_ops = sum(1 for node in ast.walk(statement.value) if isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call)))
+    if not arg_names or num_ops < 2:
+        # Nothing to gain from fusing a single operation
+        return None
+    return _FusedAssign(statement.targets[0].id, expression, tuple(arg_names), _get_attrs_name(statement.value))
+
+
+def _to_kernel_expression(node: ast.expr, arg_names: List[str]) -> str:
+    """
+    Convert an element-wise expression *node* into the source code of a kernel expression whose
+    arguments are named ``a0``, ``a1``, ... in the order of *arg_names*.
+    Raise ValueError, if *node* is not an element-wise expression.
+    """
+    if isinstance(node, ast.Name):
+        if node.id not in arg_names:
+            arg_names.append(node.id)
+        return 'a{}'.format(arg_names.index(node.id))
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return repr(node.value)
+    if isinstance(node, ast.BinOp) and type(node.op) in _KERNEL_OPERATORS:
+        return '({} {} {})'.format(_to_kernel_expression(node.left, arg_names),
+                                   _KERNEL_OPERATORS[type(node.op)],
+                                   _to_kernel_expression(node.right, arg_names))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        return '({}{})'.format('-' if isinstance(node.op, ast.USub) else '+',
+                               _to_kernel_expression(node.operand, arg_names))
+    if isinstance(node, ast.Call) \
+            and isinstance(node.func, ast.Attribute) \
+            and isinstance(node.func.value, ast.Name) \
+            and node.func.value.id in ('np', 'xu') \
+            and node.func.attr in _KERNEL_FUNCTIONS \
+            and len(node.args) == 1 \
+            and not node.keywords:
+        return 'np.{}({})'.format(node.func.attr, _to_kernel_expression(node.args[0], arg_names))
+    raise ValueError('not an element-wise expression')
+
+
+def _get_attrs_name(node: ast.expr) -> Optional[str]:
+    """
+    Get the name of the variable whose attributes are preserved by the expression *node*, if any.
+    Like xarray, arithmetic operators drop attributes while ufuncs keep those of their argument.
+    """
+    while isinstance(node, ast.Call):
+        node = node.args[0]
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _exec_fused(fused: _FusedAssign, local_namespace: Dict[str, Any]) -> bool:
+    """
+    Evaluate *fused* in *local_namespace*. Return False, if the arguments do not allow for
+    kernel evaluation, e.g. because they are not floating point data arrays.
+    """
+    if local_namespace.get('np') is not np or local_namespace.get('xu') is not xu:
+        return False
+    args = [local_namespace.get(name) for name in fused.arg_names]
+    if not all(isinstance(arg, xr.DataArray) and arg.dtype in _KERNEL_DTYPES for arg in args):
+        return False
+    result = _apply_kernel(_get_kernel(fused.expression, len(args)), args, keep_attrs=False)
+    if fused.attrs_name is not None:
+        result.attrs = dict(local_namespace[fused.attrs_name].attrs)
+    local_namespace[fused.target] = result
+    return True
+
+
+@lru_cache(maxsize=128)
+def _get_kernel(expression: str, num_args: int):
+    """
+    Get a compiled element-wise kernel that evaluates *expression* for the arguments ``a0``, ``a1``, ...
+    Kernels are cached by expression text, so repeated calls do not trigger recompilation.
+    """
+    arg_names = ', '.join('a{}'.format(i) for i in range(num_args))
+    source = 'def kernel({}):\n    return {}\n'.format(arg_names, expression)
+    namespace = dict(np=np, inf=np.inf, nan=np.nan)
+    exec(compile_source(source, 'exec'), namespace)
+    signatures = ['{0}({1})'.format(dtype, ', '.join([dtype] * num_args)) for dtype in ('float32', 'float64')]
+    return numba.vectorize(signatures, nopython=True)(namespace['kernel'])
+
+
+def _apply_kernel(kernel, args: List[xr.DataArray], keep_attrs: bool) -> xr.DataArray:
+    """
+    Apply *kernel* chunk-wise to *args*. Single precision is preserved if all arguments
+    are single precision, otherwise the result is double precision.
+    Like xarray's arithmetic operators, arguments are aligned by an inner join of their indexes.
+    """
+    if all(arg.dtype == np.float32 for arg in args):
+        dtype = np.float32
+    else:
+        dtype = np.float64
+    return xr.apply_ufunc(kernel, *args,
+                          kwargs=dict(dtype=dtype),
+                          join='inner',
+                          dataset_join='inner',
+                          dask='parallelized',
+                          output_dtypes=[dtype],
+                          keep_attrs=keep_attrs)
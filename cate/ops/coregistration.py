@@ -192,33 +192,15 @@ def _within_bounds(array: np.ndarray, low_bound) -> bool:
     return (array[0] >= low_bound and array[-1] <= abs(low_bound))
 
 
-def _resample_slice(arr_slice: xr.DataArray, w: int, h: int, ds_method: int, us_method: int, parent_monitor: Monitor) -> xr.DataArray:
-    """
-    Resample a single time slice of a larger xr.DataArray
-
-    :param arr_slice: xr.DataArray single slice
-    :param w: The desired new width (amount of longitudes)
-    :param h: The desired new height (amount of latitudes)
-    :param ds_method: Downsampling method, see resampling.py
-    :param us_method: Upsampling method, see resampling.py
-    :param parent_monitor: the parent progress monitor.
-    :return: resampled slice
-    """
-    monitor = parent_monitor.child(1)
-    with monitor.observing("resample slice"):
-        result = resampling.resample_2d(np.ma.masked_invalid(arr_slice.values),
-                                        w,
-                                        h,
-                                        ds_method,
-                                        us_method)
-        return xr.DataArray(result)
-
-
 def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, method_us: int,
                     method_ds: int, parent_monitor: Monitor) -> xr.DataArray:
     """
     Resample the given xr.DataArray to a new grid defined by lat and lon
 
+    The resampling kernel is mapped lazily over the dask blocks of the whole (..., lat, lon)
+    stack, so that the result is only computed when needed and blocks are processed in parallel.
+    Each block comprises the full spatial extent and the chunks of the other dimensions of *array*.
+
     :param array: xr.DataArray with lat,lon and time coordinates
     :param lat: 'lat' xr.DataArray attribute for the new grid
     :param lon: 'lon' xr.DataArray attribute for the new grid
@@ -233,41 +215,38 @@ def _resample_array(array: xr.DataArray, lon: xr.DataArray, lat: xr.DataArray, m
 
     monitor = parent_monitor.child(1)
 
-    kwargs = {'w': width, 'h': height, 'ds_method': method_ds, 'us_method': method_us, 'parent_monitor': monitor}
-
-    groupby_list = list(array.dims)
-    for dim in ['lon', 'lat']:
-        groupby_list.remove(dim)
-
-    if 0 == len(groupby_list):
-        # a 2d dataset, can't do groupby => do a simple slice resample
-        with monitor.starting("coregister dataarray", total_work=1):
-            temp_array = _resample_slice(array, **kwargs)
-            coords = {'lat': lat, 'lon': lon}
-            return xr.DataArray(temp_array.values,
-                                name=array.name,
-                                dims=array.dims,
-                                coords=coords,
-                                attrs=array.attrs).chunk()
-
-    num_steps = 1
-    for dim in groupby_list:
-        num_steps = num_steps * len(array[dim])
-
-    with monitor.starting("coregister dataarray", total_work=num_steps):
-        temp_array = _nested_groupby_apply(array, groupby_list, _resample_slice, kwargs)
-        chunks = {'lat': height, 'lon': width}
-        coords = {'lat': lat, 'lon': lon}
-        for dim in groupby_list:
-            coords[dim] = array[dim]
+    with monitor.starting("coregister dataarray", total_work=1):
+        other_dims = [dim for dim in array.dims if dim not in ('lat', 'lon')]
+        src_array = array.transpose(*other_dims, 'lat', 'lon')
+        if src_array.chunks is None:
             # One spatial slice is one dask chunk, e.g. chunking is
             # (1,1,1..1,len(lat),len(lon))
-            chunks[dim] = 1
-        return xr.DataArray(temp_array.values,
-                            name=array.name,
-                            dims=array.dims,
-                            coords=coords,
-                            attrs=array.attrs).chunk(chunks=chunks)
+            chunks = {dim: 1 for dim in other_dims}
+        else:
+            chunks = {}
+        # The kernel requires the full spatial extent in each block
+        chunks.update(lat=-1, lon=-1)
+        src_data = src_array.chunk(chunks).data
+
+        dst_dtype = src_data.dtype if np.issubdtype(src_data.dtype, np.floating) else np.float64
+        dst_data = src_data.map_blocks(resampling.resample_stack,
+                                       width,
+                                       height,
+                                       method_ds,
+                                       method_us,
+                                       chunks=src_data.chunks[:-2] + ((height,), (width,)),
+                                       dtype=dst_dtype)
+
+        coords = {'lat': lat, 'lon': lon}
+        for dim in other_dims:
+            coords[dim] = array[dim]
+        dst_array = xr.DataArray(dst_data,
+                                 name=array.name,
+                                 dims=src_array.dims,
+                                 coords=coords,
+                                 attrs=array.attrs)
+        monitor.progress(work=1)
+        return dst_array.transpose(*array.dims)
 
 
 def _resample_dataset(ds_master: xr.Dataset, ds_slave: xr.Dataset, method_us: int, method_ds: int, monitor: Monitor) -> xr.Dataset:
@@ -369,25 +348,3 @@ def _find_intersection(first: np.ndarray,
                               ' coregistration on')
 
     return (minimum, maximum)
-
-
-def _nested_groupby_apply(array: xr.DataArray,
-                          groupby: list,
-                          apply_fn: object,
-                          kwargs: dict):
-    """
-    Perform a nested groupby over given dimensions and apply a function on the
-    last 'slice'
-
-    :param array: xr.DataArray to perform groupby on
-    :param groupby: a list of coordinate labels over which to perform groupby
-    :param apply_fn: The function to apply
-    :return: groupby-split-appy result
-    """
-    if len(groupby) == 1:
-        return array.groupby(groupby[0]).apply(apply_fn, **kwargs)
-    else:
-        return array.groupby(groupby[0]).apply(_nested_groupby_apply,
-                                               groupby=groupby[1:],
-                                               apply_fn=apply_fn,
-                                               kwargs=kwargs)
@@ -30,6 +30,7 @@ Functions
 """
 
 
+import dask.array as da
 import numpy as np
 import pandas as pd
 import xarray as xr
@@ -172,7 +173,7 @@ def pearson_correlation(ds_x: DatasetLike.TYPE,
                                   ' of a 3D lon/lat/time dataset and a 1D timeseries'
                                   ' is provided.')
 
-        if array_x.values.shape != array_y.values.shape:
+        if array_x.shape != array_y.shape:
             raise ValidationError('The provided variables {} and {} do not have the'
                                   ' same shape, Pearson correlation can not be'
                                   ' performed. Please review operation'
@@ -231,6 +232,11 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     as the one computed from these datasets. The p-values are not entirely
     reliable but are probably reasonable for datasets larger than 500 or so.
 
+    The co-moments of x and y are computed block by block in a single pass over the
+    time dimension and then merged pairwise (Chan et al.), so that only the final
+    lon/lat maps are loaded into memory. Only time steps where both x and y are
+    valid are taken into account.
+
     :param x: lon/lat/time xr.DataArray
     :param y: xr.DataArray of the same spatiotemporal extents and resolution as x.
     :param monitor: Monitor to use for monitoring the calculation
@@ -241,52 +247,108 @@ def _pearsonr(x: xr.DataArray, y: xr.DataArray, monitor: Monitor) -> xr.Dataset:
     ----------
     http://www.statsoft.com/textbook/glosp.html#Pearson%20Correlation
     """
-    with monitor.starting("Calculate Pearson correlation", total_work=6):
-        n = len(x['time'])
-
-        xm, ym = x - x.mean(dim='time'), y - y.mean(dim='time')
-        xm_ym = xm * ym
-        r_num = xm_ym.sum(dim='time')
-        xm_squared = xr.ufuncs.square(xm)
-        ym_squared = xr.ufuncs.square(ym)
-        r_den = xr.ufuncs.sqrt(xm_squared.sum(dim='time') *
-                               ym_squared.sum(dim='time'))
-        r_den = r_den.where(r_den != 0)
-        r = r_num / r_den
-
+    # The time coordinates may differ, hence broadcast x and y against each other without aligning them
+    array_x, array_y = xr.broadcast(x.drop('time') if 'time' in x.coords else x,
+                                    y.drop('time') if 'time' in y.coords else y)
+    dims = ('time',) + tuple(dim for dim in (x if x.ndim >= y.ndim else y).dims if dim != 'time')
+    array_x = array_x.transpose(*dims)
+    array_y = array_y.transpose(*dims)
+    data_x = _as_dask_array(array_x.data)
+    data_y = _as_dask_array(array_y.data).rechunk(data_x.chunks)
+
+    block_co_moments = da.map_blocks(_co_moments, data_x, data_y,
+                                     dtype=np.float64,
+                                     new_axis=[1],
+                                     chunks=((1,) * data_x.numblocks[0], (6,)) + data_x.chunks[1:])
+    co_moments = [block_co_moments[i:i + 1] for i in range(block_co_moments.numblocks[0])]
+    while len(co_moments) > 1:
+        co_moments = [da.map_blocks(_merge_co_moments, *co_moments[i:i + 2], dtype=np.float64)
+                      if i + 1 < len(co_moments) else co_moments[i]
+                      for i in range(0, len(co_moments), 2)]
+    r_and_prob = da.map_blocks(_pearsonr_from_co_moments, co_moments[0],
+                               dtype=np.float64,
+                               drop_axis=[0],
+                               chunks=((2,),) + co_moments[0].chunks[2:])
+
+    with monitor.starting("Calculate Pearson correlation", total_work=1):
+        with monitor.child(1).observing("Calculate co-moments"):
+            r_and_prob = r_and_prob.compute()
+
+    template = array_x.isel(time=0, drop=True)
+    r = xr.DataArray(r_and_prob[0], dims=template.dims, coords=template.coords)
+    r.attrs = {'description': 'Correlation coefficients between'
+               ' {} and {}.'.format(x.name, y.name)}
+    prob = xr.DataArray(r_and_prob[1], dims=template.dims, coords=template.coords)
+    prob.attrs = {'description': 'Rough indicator of probability of an'
+                  ' uncorrelated system producing datasets that have a Pearson'
+                  ' correlation at least as extreme as the one computed from'
+                  ' these datsets. Not entirely reliable, but reasonable for'
+                  ' datasets larger than 500 or so.'}
+
+    return xr.Dataset({'corr_coef': r,
+                       'p_value': prob})
+
+
+def _as_dask_array(data) -> da.Array:
+    if isinstance(data, da.Array):
+        return data
+    return da.from_array(data, chunks=('auto',) + data.shape[1:])
+
+
+def _co_moments(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """
+    Get the count, the means, the sums of squared deviations and the sum of the
+    products of deviations of x and y along the first (time) axis, stacked along
+    a new second axis of size 6.
+    """
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    n = np.count_nonzero(valid, axis=0).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(n > 0, np.where(valid, x, 0.0).sum(axis=0) / n, 0.0)
+        mean_y = np.where(n > 0, np.where(valid, y, 0.0).sum(axis=0) / n, 0.0)
+    dx = np.where(valid, x - mean_x, 0.0)
+    dy = np.where(valid, y - mean_y, 0.0)
+    co_moments = np.stack([n, mean_x, mean_y, (dx * dx).sum(axis=0), (dy * dy).sum(axis=0), (dx * dy).sum(axis=0)])
+    return co_moments[np.newaxis, ...]
+
+
+def _merge_co_moments(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Merge two sets of co-moments as returned by :py:func:`_co_moments`.
+    """
+    n_a, mean_x_a, mean_y_a, m2_x_a, m2_y_a, c_a = a[0]
+    n_b, mean_x_b, mean_y_b, m2_x_b, m2_y_b, c_b = b[0]
+    n = n_a + n_b
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f_b = np.where(n > 0, n_b / n, 0.0)
+    delta_x = mean_x_b - mean_x_a
+    delta_y = mean_y_b - mean_y_a
+    f_ab = n_a * f_b
+    return np.stack([n,
+                     mean_x_a + delta_x * f_b,
+                     mean_y_a + delta_y * f_b,
+                     m2_x_a + m2_x_b + delta_x * delta_x * f_ab,
+                     m2_y_a + m2_y_b + delta_y * delta_y * f_ab,
+                     c_a + c_b + delta_x * delta_y * f_ab])[np.newaxis, ...]
+
+
+def _pearsonr_from_co_moments(co_moments: np.ndarray) -> np.ndarray:
+    """
+    Get the correlation coefficients and p-values from the co-moments as returned by
+    :py:func:`_co_moments`, stacked along the first axis.
+    """
+    n, _, _, m2_x, m2_y, c = co_moments[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_den = np.sqrt(m2_x * m2_y)
+        r = c / np.where(r_den != 0, r_den, np.nan)
         # Presumably, if abs(r) > 1, then it is only some small artifact of floating
         # point arithmetic.
-        # At this point r should be a lon/lat dataArray, so it should be safe to
-        # load it in memory explicitly. This may take time as it will kick-start
-        # deferred processing.
-        # Comparing with NaN produces warnings that can be safely ignored
-        default_warning_settings = np.seterr(invalid='ignore')
-        with monitor.child(1).observing("task 1"):
-            negativ_r = r.values < -1.0
-        with monitor.child(1).observing("task 2"):
-            r.values[negativ_r] = -1.0
-        with monitor.child(1).observing("task 3"):
-            positiv_r = r.values > 1.0
-        with monitor.child(1).observing("task 4"):
-            r.values[positiv_r] = 1.0
-        np.seterr(**default_warning_settings)
-        r.attrs = {'description': 'Correlation coefficients between'
-                   ' {} and {}.'.format(x.name, y.name)}
-
-        df = n - 2
-        t_squared = xr.ufuncs.square(r) * (df / ((1.0 - r.where(r != 1)) *
-                                                 (1.0 + r.where(r != -1))))
-        prob = df / (df + t_squared)
-        with monitor.child(1).observing("task 5"):
-            prob_values_in = prob.values
-        with monitor.child(1).observing("task 6"):
-            prob.values = betainc(0.5 * df, 0.5, prob_values_in)
-        prob.attrs = {'description': 'Rough indicator of probability of an'
-                      ' uncorrelated system producing datasets that have a Pearson'
-                      ' correlation at least as extreme as the one computed from'
-                      ' these datsets. Not entirely reliable, but reasonable for'
-                      ' datasets larger than 500 or so.'}
-
-        retset = xr.Dataset({'corr_coef': r,
-                             'p_value': prob})
-    return retset
+        r = np.clip(r, -1.0, 1.0)
+
+        df = np.where(n > 2, n - 2, np.nan)
+        t_squared = np.square(r) * (df / ((1.0 - np.where(r != 1, r, np.nan)) *
+                                          (1.0 + np.where(r != -1, r, np.nan))))
+        prob = betainc(0.5 * df, 0.5, df / (df + t_squared))
+    return np.stack([r, prob])
@@ -19,13 +19,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import itertools
 import json
 import os.path
 from abc import ABCMeta
+from typing import Tuple
 
 import fiona
 import geopandas as gpd
+import numpy as np
 import pandas as pd
 import xarray as xr
 from cate.core.ds import get_spatial_ext_chunk_sizes
@@ -39,6 +40,9 @@ from cate.util.monitor import Monitor
 
 _ALL_FILE_FILTER = dict(name='All Files', extensions=['*'])
 
+#: Maximum number of rows formatted at once when writing a dataset to CSV
+_CSV_BLOCK_SIZE = 65536
+
 
 @op(tags=['input'], res_pattern='ds_{index}')
 @op_input('ds_id', nullable=False)
@@ -363,41 +367,38 @@ def write_csv(obj: DataFrameLike.TYPE,
                 if coord_var is None:
                     raise ValueError(f'No coordinate variable found for dimension "{dim_name}"')
             coord_vars.append(coord_var)
-        coord_indexes = [range(len(coord_var)) for coord_var in coord_vars]
-        num_coords = len(coord_vars)
-
-        num_rows = 1
-        for coord_var in coord_vars:
-            num_rows *= len(coord_var)
+        shape = tuple(len(coord_var) for coord_var in coord_vars)
+        num_rows = int(np.prod(shape))
+        coord_values = [coord_var.values.astype(str) for coord_var in coord_vars]
 
         stream = open(file, 'w') if isinstance(file, str) else file
         try:
             # Write header row
-            stream.write('index')
-            for i in range(num_coords):
-                stream.write(delimiter)
-                stream.write(coord_vars[i].name)
-            for data_var in data_vars:
-                stream.write(delimiter)
-                stream.write(data_var.name)
+            stream.write(delimiter.join(['index'] +
+                                        [str(coord_var.name) for coord_var in coord_vars] +
+                                        [str(data_var.name) for data_var in data_vars]))
             stream.write('\n')
 
             with monitor.starting('Writing CSV', num_rows):
                 row = 0
-                for index in itertools.product(*coord_indexes):
-                    # Write data row
-                    stream.write(str(row))
-                    for i in range(num_coords):
-                        coord_value = coord_vars[i].values[index[i]]
-                        stream.write(delimiter)
-                        stream.write(str(coord_value))
+                for key, block_shape in _get_csv_blocks(shape, _CSV_BLOCK_SIZE):
+                    # Format a block of consecutive rows column by column
+                    block_size = int(np.prod(block_shape))
+                    columns = [np.arange(row, row + block_size).astype(str).tolist()]
+                    block_indexes = np.unravel_index(np.arange(block_size), block_shape)
+                    block_dim = len(shape) - len(block_shape)
+                    for i in range(len(shape)):
+                        if i < block_dim:
+                            columns.append([coord_values[i][key[i]]] * block_size)
+                        else:
+                            offset = key[i].start if i < len(key) else 0
+                            columns.append(coord_values[i][block_indexes[i - block_dim] + offset].tolist())
                     for data_var in data_vars:
-                        var_value = data_var.values[index]
-                        stream.write(delimiter)
-                        stream.write(str(var_value))
+                        columns.append(data_var[key].values.ravel().astype(str).tolist())
+                    stream.write('\n'.join(map(delimiter.join, zip(*columns))))
                     stream.write('\n')
-                    monitor.progress(1)
-                    row += 1
+                    monitor.progress(block_size)
+                    row += block_size
         finally:
             if isinstance(file, str):
                 stream.close()
@@ -408,6 +409,28 @@ def write_csv(obj: DataFrameLike.TYPE,
         raise ValidationError('obj must be a pandas.DataFrame or a xarray.Dataset')
 
 
+def _get_csv_blocks(shape: Tuple[int, ...], max_size: int):
+    """
+    Split an array of the given *shape* into blocks of consecutive elements in C order, so that
+    a block comprises no more than *max_size* elements. Generate pairs (key, block_shape), where *key*
+    is the index into the array. Leading dimensions indexed by integers are not part of *block_shape*.
+    """
+    if not shape:
+        yield (), ()
+        return
+    if 0 in shape:
+        return
+    split_dim = len(shape) - 1
+    while split_dim > 0 and int(np.prod(shape[split_dim:])) <= max_size:
+        split_dim -= 1
+    inner_size = int(np.prod(shape[split_dim + 1:]))
+    step = max(1, max_size // inner_size)
+    for outer_index in np.ndindex(*shape[:split_dim]):
+        for start in range(0, shape[split_dim], step):
+            stop = min(start + step, shape[split_dim])
+            yield tuple(outer_index) + (slice(start, stop),), (stop - start,) + shape[split_dim + 1:]
+
+
 @op(tags=['input'], res_pattern='gdf_{index}')
 @op_input('file', file_open_mode='r', file_filters=[dict(name='ESRI Shapefiles', extensions=['shp']),
                                                     dict(name='GeoJSON', extensions=['json', 'geojson']),
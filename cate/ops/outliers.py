@@ -29,12 +29,17 @@ Functions
 =========
 """
 import fnmatch
+import dask
+import dask.array as da
 import xarray as xr
 import numpy as np
 
+from cate.conf import get_config_value
+from cate.conf.defaults import QUANTILE_COMPRESSION
 from cate.core.op import op, op_input, op_return
 from cate.core.types import VarNamesLike, DatasetLike
 from cate.util.monitor import Monitor
+from cate.util.tdigest import TDigest
 from cate import __version__
 
 
@@ -64,7 +69,8 @@ def detect_outliers(ds: xr.Dataset,
     :param threshold_low: Values less or equal to this will be removed/masked
     :param threshold_high: Values greater or equal to this will be removed/masked
     :param quantiles: If True, threshold values are treated as quantiles,
-    otherwise as absolute values.
+    otherwise as absolute values. Quantiles of large variables are estimated,
+    the accuracy is given by the configuration parameter 'quantile_compression'.
     :param mask: If True, an ancillary variable containing flag values for
     outliers will be added to the dataset. Otherwise, outliers will be replaced
     with nan directly in the data variables.
@@ -84,31 +90,73 @@ def detect_outliers(ds: xr.Dataset,
     # For each array in the dataset for which we should detect outliers, detect
     # outliers
     ret_ds = ds.copy()
-    with monitor.starting("detect_outliers", total_work=len(variables) * 3):
-        for var_name in variables:
-            if quantiles:
-                # Get threshold values
-                with monitor.child(1).observing("quantile low"):
-                    threshold_low = ret_ds[var_name].quantile(threshold_low)
-                with monitor.child(1).observing("quantile high"):
-                    threshold_high = ret_ds[var_name].quantile(threshold_high)
-            else:
-                monitor.progress(2)
+    with monitor.starting("detect_outliers", total_work=len(variables) + 1):
+        if quantiles:
+            # Get threshold values of all variables in a single pass
+            with monitor.child(1).observing("quantiles"):
+                thresholds = _get_quantiles([ret_ds[var_name] for var_name in variables],
+                                            [threshold_low, threshold_high])
+        else:
+            thresholds = [(threshold_low, threshold_high)] * len(variables)
+            monitor.progress(1)
+        for var_name, (var_threshold_low, var_threshold_high) in zip(variables, thresholds):
             # If not mask, put nans in the data arrays for min/max outliers
             if not mask:
                 arr = ret_ds[var_name]
-                attrs = arr.attrs
-                ret_ds[var_name] = arr.where((arr > threshold_low) & (arr < threshold_high))
-                ret_ds[var_name].attrs = attrs
+                # Promote integers like DataArray.where() does
+                dtype = arr.dtype if np.issubdtype(arr.dtype, np.floating) else \
+                    np.dtype(np.float32 if arr.dtype.itemsize <= 2 else np.float64)
+                ret_ds[var_name] = xr.apply_ufunc(_replace_outliers, arr,
+                                                  kwargs=dict(threshold_low=var_threshold_low,
+                                                              threshold_high=var_threshold_high,
+                                                              dtype=dtype),
+                                                  dask='parallelized',
+                                                  output_dtypes=[dtype],
+                                                  keep_attrs=True)
             else:
                 # Create and add a data variable containing the mask for this data
                 # variable
-                _mask_outliers(ret_ds, var_name, threshold_low, threshold_high)
+                _mask_outliers(ret_ds, var_name, var_threshold_low, var_threshold_high)
             monitor.progress(1)
 
     return ret_ds
 
 
+def _get_quantiles(arrays, qs):
+    """
+    Estimate the quantiles *qs* of each of the given data arrays using t-digests, which are computed
+    for each chunk of the data arrays and then merged.
+
+    :return: A list that contains the quantiles of each data array
+    """
+    compression = get_config_value('quantile_compression', QUANTILE_COMPRESSION)
+    digests = []
+    for arr in arrays:
+        if isinstance(arr.data, da.Array):
+            chunk_digests = [dask.delayed(TDigest.from_values)(block, compression)
+                             for block in arr.data.to_delayed().ravel()]
+            # Merge the digests in a tree of up to 8 digests per node
+            while len(chunk_digests) > 1:
+                chunk_digests = [dask.delayed(TDigest.merge)(chunk_digests[i:i + 8])
+                                 for i in range(0, len(chunk_digests), 8)]
+            digests.append(chunk_digests[0])
+        else:
+            digests.append(TDigest.from_values(arr.values, compression))
+    digests = dask.compute(*digests)
+    return [tuple(digest.quantile(q) for q in qs) for digest in digests]
+
+
+def _replace_outliers(values: np.ndarray, threshold_low: float, threshold_high: float, dtype: np.dtype) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        return np.where((values > threshold_low) & (values < threshold_high), values, np.nan).astype(dtype, copy=False)
+
+
+def _outlier_mask(values: np.ndarray, threshold_low: float, threshold_high: float) -> np.ndarray:
+    # 8-bit integer dtype, as to_netcdf will complain about a boolean dtype
+    with np.errstate(invalid='ignore'):
+        return (~((values > threshold_low) & (values < threshold_high))).astype('i1')
+
+
 def _mask_outliers(ds: xr.Dataset, var_name: str, threshold_low: float,
                    threshold_high: float):
     """
@@ -127,11 +175,12 @@ def _mask_outliers(ds: xr.Dataset, var_name: str, threshold_low: float,
     """
     arr = ds[var_name]
 
-    # Create a boolean mask where True denotes an outlier, convert it to 8-bit
-    # integer dtype, as to_netcdf will complain about a boolean dtype
-    mask = arr.where((arr > threshold_low) & (arr < threshold_high))
-    mask = mask.isnull()
-    mask = mask.astype('i1')
+    # Create a mask where 1 denotes an outlier
+    mask = xr.apply_ufunc(_outlier_mask, arr,
+                          kwargs=dict(threshold_low=threshold_low,
+                                      threshold_high=threshold_high),
+                          dask='parallelized',
+                          output_dtypes=['i1'])
 
     # According to CF conventions, the actual variable name in the netCDF can
     # be whatever, but appending things after an underscore is a reasonable
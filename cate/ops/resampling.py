@@ -31,8 +31,12 @@ Components
 # http://stackoverflow.com/questions/7075082/what-is-future-in-python-used-for-and-how-when-to-use-it-and-how-it-works
 from __future__ import division
 
+import threading
+import types
+from functools import lru_cache
+
 import numpy as np
-from numba import jit
+from numba import jit, prange
 
 #: Interpolation method for upsampling: Take nearest source grid cell, even if it is invalid.
 US_NEAREST = 10
@@ -101,6 +105,356 @@ def resample_2d(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, fill_value=No
                         src, fill_value)
 
 
+def resample_stack(src, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, mode_rank=1):
+    """
+    Resample a stack of 2-D grids given by the last two dimensions of *src* to a new resolution.
+
+    In contrast to :py:func:`resample_2d`, masked arrays are not supported. Instead, invalid (non-finite) source
+    grid cells are ignored and output grid cells without valid contributions are set to NaN. The whole stack is
+    resampled using a cached :py:class:`ResamplingPlan`, so that this function can be mapped efficiently over the
+    blocks of a dask array.
+
+    :param src: *ndarray* with at least two dimensions, the last two being height and width of the grids.
+        Integer arrays are converted to ``float64``.
+    :param w: *int*
+        New grid width
+    :param h:  *int*
+        New grid height
+    :param ds_method: one of the *DS_* constants, optional
+        Grid cell aggregation method for a possible downsampling
+    :param us_method: one of the *US_* constants, optional
+        Grid cell interpolation method for a possible upsampling
+    :param mode_rank: *scalar*, optional
+        The rank of the frequency determined by the *ds_method* ``DS_MODE``.
+    :return: A resampled version of the *src* array with shape ``src.shape[:-2] + (h, w)``.
+    """
+    src_h, src_w = src.shape[-2:]
+    return get_resampling_plan(src_w, src_h, w, h, ds_method=ds_method, us_method=us_method,
+                               mode_rank=mode_rank).apply(src)
+
+
+@lru_cache(maxsize=128)
+def get_resampling_plan(src_w, src_h, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, mode_rank=1):
+    """
+    Get the resampling plan for resampling grids of size *src_w* x *src_h* to size *w* x *h*.
+
+    Plans are cached, so that repeated resampling between the same grids, e.g. for all time steps and
+    variables of a dataset, reuses the source indexes and weights computed once.
+
+    :return: A :py:class:`ResamplingPlan`
+    """
+    return ResamplingPlan(src_w, src_h, w, h, ds_method=ds_method, us_method=us_method, mode_rank=mode_rank)
+
+
+class ResamplingPlan:
+    """
+    A precomputed plan for resampling grids of size *src_w* x *src_h* to size *w* x *h*.
+
+    As grid cells are axis-aligned, the contributing source grid cells and their weights are separable into
+    the indexes and weights along x and along y, which are computed once when the plan is created and then
+    passed to compiled kernels, which process the output rows of a stack of grids in parallel. Aggregation
+    methods ``DS_MEAN``, ``DS_VAR``, and ``DS_STD`` are applied in two separable passes. The number of threads
+    used is controlled by Numba, e.g. using the ``NUMBA_NUM_THREADS`` environment variable.
+
+    The results are those of :py:func:`resample_2d` applied to each grid, except that non-finite source values
+    are ignored and output grid cells without valid contributions are set to NaN.
+    """
+
+    def __init__(self, src_w, src_h, w, h, ds_method=DS_MEAN, us_method=US_LINEAR, mode_rank=1):
+        if ds_method == DS_MODE and mode_rank < 1:
+            raise ValueError('mode_rank must be >= 1')
+        self.src_shape = (src_h, src_w)
+        self.shape = (h, w)
+        self.ds_method = ds_method
+        self.us_method = us_method
+        self.mode_rank = mode_rank
+        # The steps mirror the cases of _resample_2d()
+        self._steps = []
+        if w < src_w or h < src_h:
+            temp_shape = (min(h, src_h), min(w, src_w))
+            self._steps.append(_AggregationStep((src_h, src_w), temp_shape, ds_method, mode_rank))
+            if temp_shape != (h, w):
+                self._steps.append(_InterpolationStep(temp_shape, (h, w), us_method))
+        elif w > src_w or h > src_h:
+            self._steps.append(_InterpolationStep((src_h, src_w), (h, w), us_method))
+
+    def apply(self, src, parallel=None):
+        """
+        Resample the stack of 2-D grids given by the last two dimensions of *src*.
+
+        :param src: *ndarray* with at least two dimensions. Integer arrays are converted to ``float64``.
+        :param parallel: Whether to use multiple threads. If ``None``, multiple threads are only used if called
+            from the main thread. Calls from other threads, e.g. when computing the blocks of a dask array,
+            usually run concurrently already.
+        :return: *ndarray* with shape ``src.shape[:-2] + (h, w)``.
+        """
+        if src.shape[-2:] != self.src_shape:
+            raise ValueError("'src' shape is incompatible with the resampling plan")
+        if not np.issubdtype(src.dtype, np.floating):
+            src = src.astype(np.float64)
+        stack_shape = src.shape[:-2]
+        if src.size == 0:
+            return np.empty(stack_shape + self.shape, dtype=src.dtype)
+        if self.src_shape == self.shape:
+            return src.copy()
+        if parallel is None:
+            parallel = threading.current_thread() is threading.main_thread()
+        out = src.reshape((-1,) + self.src_shape)
+        for step in self._steps:
+            out = step.apply(out, 1 if parallel else 0)
+        return out.reshape(stack_shape + self.shape)
+
+
+class _AggregationStep:
+    def __init__(self, src_shape, shape, method, mode_rank):
+        if method not in (DS_FIRST, DS_LAST, DS_MEAN, DS_MODE, DS_VAR, DS_STD):
+            raise ValueError('invalid downsampling method')
+        self.method = method
+        self.mode_rank = mode_rank
+        self.indexes_y = _get_aggregation_indexes(src_shape[0], shape[0])
+        self.indexes_x = _get_aggregation_indexes(src_shape[1], shape[1])
+
+    def apply(self, stack, variant):
+        out = np.empty((stack.shape[0], self.indexes_y[0].size, self.indexes_x[0].size), dtype=stack.dtype)
+        if self.method in (DS_MEAN, DS_VAR, DS_STD):
+            return _AGGREGATE_3D[variant](stack, *self.indexes_y, *self.indexes_x, self.method, out)
+        return _SELECT_3D[variant](stack, *self.indexes_y, *self.indexes_x, self.method, self.mode_rank, out)
+
+
+def _get_aggregation_indexes(src_size, size):
+    # Range of contributing source indexes and the area weights of the first and last one for each target index,
+    # as computed in _downsample_2d(). Source indexes in between have weight one.
+    scale = src_size / size
+    i0s = np.zeros(size, dtype=np.int64)
+    i1s = np.zeros(size, dtype=np.int64)
+    w0s = np.zeros(size, dtype=np.float64)
+    w1s = np.zeros(size, dtype=np.float64)
+    for i in range(size):
+        f0 = scale * i
+        f1 = f0 + scale
+        i0 = int(f0)
+        i1 = int(f1)
+        w1 = f1 - i1
+        if w1 < _EPS:
+            w1 = 1.0
+            if i1 > i0:
+                i1 -= 1
+        i0s[i] = i0
+        i1s[i] = i1
+        w0s[i] = 1.0 - (f0 - i0)
+        w1s[i] = w1
+    return i0s, i1s, w0s, w1s
+
+
+class _InterpolationStep:
+    def __init__(self, src_shape, shape, method):
+        if method == US_NEAREST:
+            self.indexes_y = _get_nearest_indexes(src_shape[0], shape[0])
+            self.indexes_x = _get_nearest_indexes(src_shape[1], shape[1])
+        elif method == US_LINEAR:
+            self.indexes_y = _get_linear_indexes(src_shape[0], shape[0])
+            self.indexes_x = _get_linear_indexes(src_shape[1], shape[1])
+        else:
+            raise ValueError('invalid upsampling method')
+
+    def apply(self, stack, variant):
+        out = np.empty((stack.shape[0], self.indexes_y[0].size, self.indexes_x[0].size), dtype=stack.dtype)
+        return _INTERPOLATE_3D[variant](stack, *self.indexes_y, *self.indexes_x, out)
+
+
+def _get_nearest_indexes(src_size, size):
+    # Nearest neighbours are expressed as linear interpolation with zero weights
+    scale = src_size / size
+    i0 = np.array([int(scale * i) for i in range(size)], dtype=np.int64)
+    return i0, i0, np.zeros(size, dtype=np.float64)
+
+
+def _get_linear_indexes(src_size, size):
+    # Source indexes and weights, as computed in _upsample_2d()
+    scale = (src_size - 1.0) / ((size - 1.0) if size > 1 else 1.0)
+    i0 = np.zeros(size, dtype=np.int64)
+    i1 = np.zeros(size, dtype=np.int64)
+    weights = np.zeros(size, dtype=np.float64)
+    for i in range(size):
+        f = scale * i
+        i0[i] = int(f)
+        weights[i] = f - i0[i]
+        i1[i] = min(i0[i] + 1, src_size - 1)
+    return i0, i1, weights
+
+
+# This function will be JIT-compiled by Numba with nopython=True, see _jit_variants(),
+# therefore all arg types must be either primitive scalars or numpy arrays.
+# Key-value args are not allowed.
+#
+def _aggregate_3d(src, y0s, y1s, wy0s, wy1s, x0s, x1s, wx0s, wx1s, method, out):
+    # Weights are separable, so sums are first computed along x for each source row, then along y.
+    src_h = src.shape[1]
+    out_h = out.shape[1]
+    out_w = out.shape[2]
+    use_squares = method != DS_MEAN
+    w_sums = np.zeros((src_h, out_w), dtype=np.float64)
+    wv_sums = np.zeros((src_h, out_w), dtype=np.float64)
+    wvv_sums = np.zeros((src_h, out_w), dtype=np.float64)
+    for i in range(src.shape[0]):
+        for src_y in prange(src_h):
+            row = src[i, src_y]
+            for out_x in range(out_w):
+                src_x0 = x0s[out_x]
+                src_x1 = x1s[out_x]
+                w_sum = 0.0
+                wv_sum = 0.0
+                wvv_sum = 0.0
+                for src_x in range(src_x0, src_x1 + 1):
+                    v = row[src_x]
+                    if np.isfinite(v):
+                        w = wx0s[out_x] if src_x == src_x0 else wx1s[out_x] if src_x == src_x1 else 1.0
+                        w_sum += w
+                        wv_sum += w * v
+                        if use_squares:
+                            wvv_sum += w * v * v
+                w_sums[src_y, out_x] = w_sum
+                wv_sums[src_y, out_x] = wv_sum
+                wvv_sums[src_y, out_x] = wvv_sum
+        for out_y in prange(out_h):
+            src_y0 = y0s[out_y]
+            src_y1 = y1s[out_y]
+            w_row = np.zeros(out_w, dtype=np.float64)
+            wv_row = np.zeros(out_w, dtype=np.float64)
+            wvv_row = np.zeros(out_w, dtype=np.float64)
+            for src_y in range(src_y0, src_y1 + 1):
+                wy = wy0s[out_y] if src_y == src_y0 else wy1s[out_y] if src_y == src_y1 else 1.0
+                for out_x in range(out_w):
+                    w_row[out_x] += wy * w_sums[src_y, out_x]
+                    wv_row[out_x] += wy * wv_sums[src_y, out_x]
+                    if use_squares:
+                        wvv_row[out_x] += wy * wvv_sums[src_y, out_x]
+            for out_x in range(out_w):
+                w_sum = w_row[out_x]
+                wv_sum = wv_row[out_x]
+                if w_sum < _EPS:
+                    out[i, out_y, out_x] = np.nan
+                elif method == DS_MEAN:
+                    out[i, out_y, out_x] = wv_sum / w_sum
+                else:
+                    # Clip negative variances caused by rounding errors
+                    var = max(0.0, (wvv_row[out_x] * w_sum - wv_sum * wv_sum) / w_sum / w_sum)
+                    out[i, out_y, out_x] = np.sqrt(var) if method == DS_STD else var
+    return out
+
+
+# This function will be JIT-compiled by Numba with nopython=True, see _jit_variants(),
+# therefore all arg types must be either primitive scalars or numpy arrays.
+# Key-value args are not allowed.
+#
+def _select_3d(src, y0s, y1s, wy0s, wy1s, x0s, x1s, wx0s, wx1s, method, mode_rank, out):
+    # Aggregation methods DS_FIRST, DS_LAST, and DS_MODE, which select one of the contributing values
+    num_slices = src.shape[0]
+    out_h = out.shape[1]
+    out_w = out.shape[2]
+    max_value_count = (np.max(y1s - y0s) + 1) * (np.max(x1s - x0s) + 1)
+    for k in prange(num_slices * out_h):
+        i = k // out_h
+        out_y = k % out_h
+        src_y0 = y0s[out_y]
+        src_y1 = y1s[out_y]
+        values = np.zeros(max_value_count, dtype=src.dtype)
+        frequencies = np.zeros(max_value_count, dtype=np.float64)
+        for out_x in range(out_w):
+            src_x0 = x0s[out_x]
+            src_x1 = x1s[out_x]
+            value = np.nan
+            value_count = 0
+            done = False
+            for src_y in range(src_y0, src_y1 + 1):
+                wy = wy0s[out_y] if src_y == src_y0 else wy1s[out_y] if src_y == src_y1 else 1.0
+                for src_x in range(src_x0, src_x1 + 1):
+                    v = src[i, src_y, src_x]
+                    if not np.isfinite(v):
+                        continue
+                    if method == DS_FIRST:
+                        value = v
+                        done = True
+                        break
+                    elif method == DS_LAST:
+                        value = v
+                    else:
+                        w = wy * (wx0s[out_x] if src_x == src_x0 else wx1s[out_x] if src_x == src_x1 else 1.0)
+                        found = False
+                        for j in range(value_count):
+                            if v == values[j]:
+                                frequencies[j] += w
+                                found = True
+                                break
+                        if not found:
+                            values[value_count] = v
+                            frequencies[value_count] = w
+                            value_count += 1
+                if done:
+                    break
+            if method == DS_MODE:
+                # Select the value with the mode_rank-th highest frequency, the first seen one wins ties
+                for rank in range(min(mode_rank, value_count)):
+                    j_max = 0
+                    for j in range(1, value_count):
+                        if frequencies[j] > frequencies[j_max]:
+                            j_max = j
+                    value = values[j_max]
+                    frequencies[j_max] = -1.0
+                if mode_rank > value_count:
+                    value = np.nan
+            out[i, out_y, out_x] = value
+    return out
+
+
+# This function will be JIT-compiled by Numba with nopython=True, see _jit_variants(),
+# therefore all arg types must be either primitive scalars or numpy arrays.
+# Key-value args are not allowed.
+#
+def _interpolate_3d(src, y0s, y1s, wys, x0s, x1s, wxs, out):
+    out_h = out.shape[1]
+    for k in prange(src.shape[0] * out_h):
+        i = k // out_h
+        out_y = k % out_h
+        src_y0 = y0s[out_y]
+        src_y1 = y1s[out_y]
+        wy = wys[out_y]
+        for out_x in range(out.shape[2]):
+            src_x0 = x0s[out_x]
+            src_x1 = x1s[out_x]
+            wx = wxs[out_x]
+            v00 = src[i, src_y0, src_x0]
+            v01 = src[i, src_y0, src_x1]
+            v10 = src[i, src_y1, src_x0]
+            v11 = src[i, src_y1, src_x1]
+            if np.isfinite(v00) and np.isfinite(v01) and np.isfinite(v10) and np.isfinite(v11):
+                v0 = v00 + wx * (v01 - v00)
+                v1 = v10 + wx * (v11 - v10)
+                value = v0 + wy * (v1 - v0)
+            elif wx < 0.5:
+                # NEAREST according to weight
+                value = v00 if wy < 0.5 else v10
+            else:
+                # NEAREST according to weight
+                value = v01 if wy < 0.5 else v11
+            out[i, out_y, out_x] = value if np.isfinite(value) else np.nan
+    return out
+
+
+def _jit_variants(func):
+    # Compile *func* for serial and for parallel execution. The parallel variant needs its own name,
+    # otherwise both variants would share the same on-disk cache entries.
+    parallel_func = types.FunctionType(func.__code__, func.__globals__, func.__name__ + '_parallel',
+                                       func.__defaults__, func.__closure__)
+    parallel_func.__qualname__ = func.__qualname__ + '_parallel'
+    return jit(nopython=True, cache=True)(func), jit(nopython=True, parallel=True, cache=True)(parallel_func)
+
+
+_AGGREGATE_3D = _jit_variants(_aggregate_3d)
+_SELECT_3D = _jit_variants(_select_3d)
+_INTERPOLATE_3D = _jit_variants(_interpolate_3d)
+
+
 def upsample_2d(src, w, h, method=US_LINEAR, fill_value=None, out=None):
     """
     Upsample a 2-D grid to a higher resolution by interpolating original grid cells.
@@ -209,7 +563,7 @@ def _get_fill_value(fill_value, src, out):
 # therefore all arg types must be either primitive scalars or numpy arrays.
 # Key-value args are not allowed.
 #
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def _resample_2d(src, mask, use_mask, ds_method, us_method, fill_value, mode_rank, out):
     src_w = src.shape[-1]
     src_h = src.shape[-2]
@@ -243,7 +597,7 @@ def _resample_2d(src, mask, use_mask, ds_method, us_method, fill_value, mode_ran
 # therefore all arg types must be either primitive scalars or numpy arrays.
 # Key-value args are not allowed.
 #
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def _upsample_2d(src, mask, use_mask, method, fill_value, out):
     src_w = src.shape[-1]
     src_h = src.shape[-2]
@@ -336,7 +690,7 @@ def _upsample_2d(src, mask, use_mask, method, fill_value, out):
 # therefore all arg types must be either primitive scalars or numpy arrays.
 # Key-value args are not allowed.
 #
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def _downsample_2d(src, mask, use_mask, method, fill_value, mode_rank, out):
     src_w = src.shape[-1]
     src_h = src.shape[-2]
@@ -32,6 +32,7 @@ Functions
 import xarray as xr
 
 from cate.core.op import op_input, op, op_return
+from cate.core.opimpl import reduce_impl
 from cate.ops.select import select_var
 from cate.core.types import VarNamesLike, PointLike
 from cate.util.monitor import Monitor
@@ -98,6 +99,7 @@ def tseries_mean(ds: xr.Dataset,
                  var: VarNamesLike.TYPE,
                  std_suffix: str = '_std',
                  calculate_std: bool = True,
+                 area_weighted: bool = False,
                  monitor: Monitor = Monitor.NONE) -> xr.Dataset:
     """
     Extract spatial mean timeseries of the provided variables, return the
@@ -113,6 +115,7 @@ def tseries_mean(ds: xr.Dataset,
     :param var: Variables for which to perform timeseries extraction
     :param calculate_std: Whether to calculate std in addition to mean
     :param std_suffix: Std suffix to use for resulting datasets, if std is calculated.
+    :param area_weighted: Whether to weight the values by the cosine of latitude.
     :param monitor: a progress monitor.
     :return: Dataset with timeseries variables
     """
@@ -120,17 +123,23 @@ def tseries_mean(ds: xr.Dataset,
         var = '*'
 
     retset = select_var(ds, var)
-    names = retset.data_vars.keys()
-
-    with monitor.starting("Calculate mean", total_work=len(names)):
-        for name in names:
-            dims = list(ds[name].dims)
-            dims.remove('time')
-            with monitor.child(1).observing("Calculate mean"):
-                retset[name] = retset[name].mean(dim=dims, keep_attrs=True)
-            retset[name].attrs['Cate_Description'] = 'Mean aggregated over {} at each point in time.'.format(dims)
+    names = list(retset.data_vars.keys())
+    dims = [dim for dim in retset.dims if dim != 'time']
+    statistics = ['mean', 'std'] if calculate_std else ['mean']
+
+    with monitor.starting("Calculate mean", total_work=1):
+        results = reduce_impl(retset, names, dims, statistics,
+                              area_weighted=area_weighted,
+                              monitor=monitor.child(1))
+
+    for name in names:
+        var_dims = [dim for dim in ds[name].dims if dim != 'time']
+        retset[name] = results[name]['mean']
+        retset[name].attrs = dict(ds[name].attrs)
+        retset[name].attrs['Cate_Description'] = 'Mean aggregated over {} at each point in time.'.format(var_dims)
+        if calculate_std:
             std_name = name + std_suffix
-            retset[std_name] = ds[name].std(dim=dims)
+            retset[std_name] = results[name]['std']
             retset[std_name].attrs['Cate_Description'] = 'Accompanying std values for variable \'{}\''.format(name)
 
     return retset
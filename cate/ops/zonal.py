@@ -0,0 +1,252 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+Zonal statistics operations
+
+Functions
+=========
+"""
+from typing import List
+
+import numpy as np
+import xarray as xr
+
+from cate.core.op import op, op_input, op_return
+from cate.core.opimpl import get_polygon_rings, rasterize_rings_impl
+from cate.core.types import VarNamesLike, DatasetLike, DataFrameLike, GeoDataFrame, ValidationError
+from cate.ops.select import select_var
+from cate.util.cache import Cache, MemoryCacheStore
+from cate.util.misc import to_fingerprint
+from cate.util.monitor import Monitor
+
+#: Zone label grids per (grid, feature collection), capacity is given in bytes
+_ZONE_LABELS_CACHE = Cache(MemoryCacheStore(), capacity=256 * 1024 * 1024, threshold=0.75)
+
+#: Approximate size in bytes of the data blocks read per variable
+_BLOCK_SIZE = 64 * 1024 * 1024
+
+_STAT_NAMES = ('mean', 'min', 'max', 'std', 'count')
+
+
+@op(tags=['geometric', 'spatial', 'statistics'], version='1.0')
+@op_input('ds', data_type=DatasetLike)
+@op_input('gdf', data_type=DataFrameLike)
+@op_input('var', value_set_source='ds', data_type=VarNamesLike)
+@op_return(add_history=True)
+def zonal_statistics(ds: DatasetLike.TYPE,
+                     gdf: DataFrameLike.TYPE,
+                     var: VarNamesLike.TYPE = None,
+                     monitor: Monitor = Monitor.NONE) -> xr.Dataset:
+    """
+    Compute statistics of gridded variables for each polygon (zone) of a feature collection,
+    for example country or river basin means over time.
+
+    All polygons are rasterized once into a grid of zone labels aligned with the dataset's
+    lat/lon coordinates. A pixel belongs to a zone if its center is inside the zone's polygon.
+    If polygons overlap, a pixel is assigned to the first of them. The label grid is cached,
+    so that repeated calls for the same grid and feature collection don't rasterize again.
+
+    For every variable with lat/lon dimensions the mean, min, max, std and count of the valid
+    values of each zone are computed and stored in the variables named
+    ``<var>_mean``, ``<var>_min``, ``<var>_max``, ``<var>_std``, and ``<var>_count``.
+    The lat/lon dimensions are replaced by a *zone* dimension, other dimensions such as time
+    are preserved. Feature attributes are added as coordinates of the *zone* dimension.
+
+    :param ds: The gridded dataset.
+    :param gdf: The feature collection providing the zone polygons, e.g. the result of ``read_geo_data_frame``.
+    :param var: Variable(s) for which to compute zonal statistics.
+                If none is given, all variables with lat/lon dimensions will be used.
+    :param monitor: a progress monitor.
+    :return: Dataset with the zonal statistics variables
+    """
+    ds = DatasetLike.convert(ds)
+    gdf = DataFrameLike.convert(gdf)
+    if ds is None:
+        raise ValidationError('ds must not be None')
+    if gdf is None:
+        raise ValidationError('gdf must not be None')
+    if 'lat' not in ds.coords or 'lon' not in ds.coords:
+        raise ValidationError('Dataset must have lat and lon coordinates, consider using "normalize" first.')
+
+    if not var:
+        var = '*'
+    var_names = [name for name, variable in select_var(ds, var).data_vars.items()
+                 if 'lat' in variable.dims and 'lon' in variable.dims]
+    if not var_names:
+        raise ValidationError('None of the selected variables has lat and lon dimensions.')
+
+    zone_rings = _get_zone_rings(gdf)
+    num_zones = len(zone_rings)
+    labels = _get_zone_labels(ds.lon.values, ds.lat.values, zone_rings)
+
+    # Order the labelled pixels by zone, so that every zone is a contiguous segment
+    flat_labels = labels.ravel()
+    pixel_indexes = np.nonzero(flat_labels >= 0)[0]
+    pixel_labels = flat_labels[pixel_indexes]
+    order = np.argsort(pixel_labels, kind='mergesort')
+    pixel_indexes = pixel_indexes[order]
+    pixel_labels = pixel_labels[order]
+    zones, segment_starts = np.unique(pixel_labels, return_index=True)
+    segment_zones = np.repeat(np.arange(zones.size), np.diff(np.append(segment_starts, pixel_labels.size)))
+
+    retset = xr.Dataset(coords={'zone': np.arange(num_zones)})
+    for name, values in _get_zone_attributes(gdf, num_zones).items():
+        if name not in ds.variables and name not in retset.variables:
+            retset.coords[name] = ('zone', values)
+
+    with monitor.starting('Compute zonal statistics', total_work=len(var_names)):
+        for var_name in var_names:
+            variable = ds[var_name]
+            with monitor.child(1).observing('Compute zonal statistics for ' + var_name):
+                stats = _compute_zonal_statistics(variable, pixel_indexes, segment_starts, segment_zones,
+                                                  zones, num_zones)
+            other_dims = [dim for dim in variable.dims if dim not in ('lat', 'lon')]
+            for stat_name, stat_values in zip(_STAT_NAMES, stats):
+                stat_var = xr.DataArray(stat_values,
+                                        dims=other_dims + ['zone'],
+                                        coords={dim: variable.coords[dim] for dim in other_dims
+                                                if dim in variable.coords})
+                if stat_name != 'count':
+                    stat_var.attrs.update(variable.attrs)
+                stat_var.attrs['Cate_Description'] = 'Zonal {} of variable \'{}\''.format(stat_name, var_name)
+                retset[var_name + '_' + stat_name] = stat_var
+
+    retset.attrs.update(ds.attrs)
+    for key in ['geospatial_lon_min', 'geospatial_lat_min', 'geospatial_lon_max', 'geospatial_lat_max',
+                'geospatial_lon_resolution', 'geospatial_lat_resolution',
+                'geospatial_lon_units', 'geospatial_lat_units']:
+        retset.attrs.pop(key, None)
+    return retset
+
+
+def _compute_zonal_statistics(variable: xr.DataArray,
+                              pixel_indexes: np.ndarray,
+                              segment_starts: np.ndarray,
+                              segment_zones: np.ndarray,
+                              zones: np.ndarray,
+                              num_zones: int):
+    other_dims = [dim for dim in variable.dims if dim not in ('lat', 'lon')]
+    variable = variable.transpose(*(other_dims + ['lat', 'lon']))
+    lead_shape = variable.shape[:-2]
+    num_pixels = variable.shape[-2] * variable.shape[-1]
+    num_lead = int(np.prod(lead_shape)) if lead_shape else 1
+
+    results = [np.full((num_lead, num_zones), np.nan) for _ in _STAT_NAMES[:-1]]
+    results.append(np.zeros((num_lead, num_zones), dtype=np.int64))
+
+    if zones.size > 0:
+        # Read the data in blocks along the leading (e.g. time) dimension
+        if other_dims:
+            variable = variable.stack(_lead=other_dims)
+            variable = variable.transpose('_lead', 'lat', 'lon')
+        else:
+            variable = variable.expand_dims('_lead')
+        block_size = max(1, _BLOCK_SIZE // (8 * num_pixels))
+        for block_start in range(0, num_lead, block_size):
+            block_stop = min(block_start + block_size, num_lead)
+            block = np.asarray(variable[block_start:block_stop].values, dtype=np.float64)
+            block = block.reshape((block_stop - block_start, num_pixels))[:, pixel_indexes]
+            block_stats = _compute_block_statistics(block, segment_starts, segment_zones)
+            for result, block_result in zip(results, block_stats):
+                result[block_start:block_stop, zones] = block_result
+
+    return [result.reshape(lead_shape + (num_zones,)) for result in results]
+
+
+def _compute_block_statistics(block: np.ndarray, segment_starts: np.ndarray, segment_zones: np.ndarray):
+    """
+    Compute statistics of all zone segments of a (num_steps, num_pixels) block in one vectorized pass.
+    """
+    valid = np.isfinite(block)
+    count = np.add.reduceat(valid, segment_starts, axis=1, dtype=np.int64)
+    total = np.add.reduceat(np.where(valid, block, 0.), segment_starts, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        deviation = np.where(valid, block - mean[:, segment_zones], 0.)
+        std = np.sqrt(np.add.reduceat(deviation * deviation, segment_starts, axis=1) / count)
+    # fmin/fmax ignore NaNs, all-NaN segments yield NaN
+    minimum = np.fmin.reduceat(block, segment_starts, axis=1)
+    maximum = np.fmax.reduceat(block, segment_starts, axis=1)
+    return mean, minimum, maximum, std, count
+
+
+def _get_zone_labels(lon: np.ndarray, lat: np.ndarray, zone_rings: List[List[np.ndarray]]) -> np.ndarray:
+    """
+    Get the (lat, lon) grid of zone labels, -1 for pixels outside of any zone.
+    """
+    key = (to_fingerprint(lon, lat),
+           to_fingerprint(*[len(rings) for rings in zone_rings], *[ring for rings in zone_rings for ring in rings]))
+    labels = _ZONE_LABELS_CACHE.get_value(key)
+    if labels is None:
+        labels = _rasterize_zones(lon, lat, zone_rings)
+        _ZONE_LABELS_CACHE.put_value(key, labels)
+    return labels
+
+
+def _rasterize_zones(lon: np.ndarray, lat: np.ndarray, zone_rings: List[List[np.ndarray]]) -> np.ndarray:
+    labels = np.full((lat.size, lon.size), -1, dtype=np.int32)
+    for zone, rings in enumerate(zone_rings):
+        if not rings:
+            continue
+        # Rasterize within the zone's bounding box only
+        coords = np.concatenate(rings)
+        lon_indexes = np.nonzero((lon >= coords[:, 0].min()) & (lon <= coords[:, 0].max()))[0]
+        lat_indexes = np.nonzero((lat >= coords[:, 1].min()) & (lat <= coords[:, 1].max()))[0]
+        if lon_indexes.size == 0 or lat_indexes.size == 0:
+            continue
+        inside = rasterize_rings_impl(lon[lon_indexes], lat[lat_indexes], rings)
+        window = np.ix_(lat_indexes, lon_indexes)
+        window_labels = labels[window]
+        window_labels[inside & (window_labels < 0)] = zone
+        labels[window] = window_labels
+    return labels
+
+
+def _get_zone_rings(gdf) -> List[List[np.ndarray]]:
+    if type(gdf) is GeoDataFrame:
+        # perf: take rings directly from the proxy's coordinate buffers, no shapely objects required
+        columns = gdf.lazy_columns
+        zone_rings = []
+        for index in range(len(columns)):
+            rings = []
+            type_code = columns.geometry_types[index]
+            if type_code >= 0 and columns.GEOMETRY_TYPES[type_code] in ('Polygon', 'MultiPolygon'):
+                part_start, part_stop = columns.geometry_offsets[index], columns.geometry_offsets[index + 1]
+                for ring in range(columns.part_offsets[part_start], columns.part_offsets[part_stop]):
+                    rings.append(columns.coords[columns.ring_offsets[ring]:columns.ring_offsets[ring + 1], :2])
+            zone_rings.append(rings)
+        return zone_rings
+    if not hasattr(gdf, 'geometry'):
+        raise ValidationError('gdf must be a feature collection with a geometry column.')
+    return [get_polygon_rings(geometry) for geometry in gdf.geometry]
+
+
+def _get_zone_attributes(gdf, num_zones: int) -> dict:
+    if type(gdf) is GeoDataFrame:
+        attributes = gdf.lazy_columns.properties
+    else:
+        attributes = {name: gdf[name].values for name in gdf.columns if name != 'geometry'}
+    return {name: values for name, values in attributes.items()
+            if len(values) == num_zones and values.dtype != object}
@@ -0,0 +1,343 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module provides the :py:class:`Downloader` class which downloads a number of files concurrently.
+
+* HTTP(S) downloads use a bounded pool of persistent (keep-alive) connections.
+* Partially downloaded files are resumed using HTTP ``Range`` requests.
+* Downloaded files are verified against an optional checksum such as those provided by ESGF indexes.
+
+URLs of other schemes supported by ``urllib.request``, e.g. ``file:``, are copied without resume
+and are only verified against a given checksum.
+
+Components
+==========
+"""
+
+import hashlib
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import Callable, Sequence
+
+import requests
+import requests.adapters
+
+from .monitor import Cancellation, Monitor
+
+_HTTP_SCHEMES = {'http', 'https'}
+
+_HTTP_PARTIAL_CONTENT = 206
+_HTTP_RANGE_NOT_SATISFIABLE = 416
+
+# Delay in seconds before the first retry of a failed connection, doubled for every further retry
+_RETRY_BACKOFF = 0.5
+_MAX_RETRY_BACKOFF = 8.
+
+
+class DownloadError(OSError):
+    """
+    Raised if a file could not be downloaded or if the downloaded file is corrupted.
+    """
+    pass
+
+
+class DownloadTask:
+    """
+    Describes a single file to be downloaded.
+
+    :param url: The source URL.
+    :param file_path: The target file path.
+    :param size: The expected file size in bytes, if known.
+    :param checksum: The expected checksum as hexadecimal string, if known.
+    :param checksum_type: The checksum's hash algorithm, e.g. "SHA256" or "MD5".
+    """
+
+    def __init__(self,
+                 url: str,
+                 file_path: str,
+                 size: int = None,
+                 checksum: str = None,
+                 checksum_type: str = None):
+        self.url = url
+        self.file_path = file_path
+        self.size = size if size and size > 0 else None
+        self.checksum = checksum.lower() if checksum and checksum_type else None
+        self.checksum_type = checksum_type if self.checksum else None
+
+    def new_hash(self):
+        """
+        :return: A new hash object for the task's checksum type or ``None``,
+                 if there is no checksum or its type is not supported.
+        """
+        if not self.checksum:
+            return None
+        try:
+            return hashlib.new(self.checksum_type.lower().replace('-', ''))
+        except ValueError:
+            return None
+
+    def __repr__(self):
+        return 'DownloadTask(%r, %r)' % (self.url, self.file_path)
+
+
+class Downloader:
+    """
+    Downloads files concurrently using at most *max_connections* connections at a time.
+
+    :param max_connections: The maximum number of concurrent connections.
+    :param chunk_size: The number of bytes read from a connection at a time.
+    :param timeout: The connection and read timeout in seconds.
+    :param max_retries: How often an interrupted download is resumed before giving up.
+    """
+
+    def __init__(self,
+                 max_connections: int = 4,
+                 chunk_size: int = 1024 * 1024,
+                 timeout: float = 30.,
+                 max_retries: int = 3):
+        self._max_connections = max(1, int(max_connections))
+        self._chunk_size = chunk_size
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def max_connections(self) -> int:
+        return self._max_connections
+
+    def download(self,
+                 tasks: Sequence[DownloadTask],
+                 monitor: Monitor = Monitor.NONE,
+                 on_chunk: Callable[[DownloadTask, int], None] = None,
+                 on_done: Callable[[DownloadTask], None] = None):
+        """
+        Download all *tasks*.
+
+        *on_chunk* is called with the task and the number of bytes received for every received chunk,
+        including the number of bytes of a partial file when its download is resumed. Calls are serialized,
+        so *on_chunk* may safely update shared state such as progress statistics or the *monitor*.
+
+        *on_done* is called from the calling thread for every successfully downloaded task in the order of *tasks*,
+        so that clients can register downloaded files in a deterministic order.
+
+        If any task fails, remaining tasks are abandoned, *on_done* is called for all leading tasks that
+        completed successfully, and the first error is raised.
+
+        :param tasks: The download tasks.
+        :param monitor: A monitor which is only checked for cancellation.
+        :param on_chunk: Optional progress callback.
+        :param on_done: Optional completion callback.
+        :raise DownloadError: if a download failed
+        :raise Cancellation: if the *monitor* has been cancelled
+        """
+        if not tasks:
+            return
+
+        lock = threading.Lock()
+        abort = threading.Event()
+
+        def report_chunk(task: DownloadTask, num_bytes: int):
+            if abort.is_set():
+                raise Cancellation()
+            if monitor.is_cancelled():
+                abort.set()
+                raise Cancellation()
+            if on_chunk is not None:
+                with lock:
+                    on_chunk(task, num_bytes)
+
+        def run(task: DownloadTask):
+            if abort.is_set():
+                raise Cancellation()
+            try:
+                self._download_file(task, report_chunk)
+            except BaseException:
+                abort.set()
+                raise
+
+        num_workers = min(self._max_connections, len(tasks))
+        try:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                futures = [executor.submit(run, task) for task in tasks]
+                error = None
+                for task, future in zip(tasks, futures):
+                    # Wait in task order, so that on_done is called in a deterministic order
+                    try:
+                        future.result()
+                    except CancelledError:
+                        continue
+                    except BaseException as e:
+                        if error is None or (isinstance(error, Cancellation) and not isinstance(e, Cancellation)):
+                            error = e
+                        abort.set()
+                        for pending_future in futures:
+                            pending_future.cancel()
+                        continue
+                    if error is None and on_done is not None:
+                        on_done(task)
+                if error is not None:
+                    raise error
+        finally:
+            self.close()
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def _get_session(self) -> requests.Session:
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self._max_connections,
+                                                        pool_maxsize=self._max_connections)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _download_file(self, task: DownloadTask, report_chunk: Callable[[DownloadTask, int], None]):
+        dir_path = os.path.dirname(task.file_path)
+        if dir_path:
+            os.makedirs(dir_path, exist_ok=True)
+
+        scheme = urllib.parse.urlparse(task.url).scheme.lower()
+        if scheme in _HTTP_SCHEMES:
+            self._download_http_file(task, report_chunk)
+        else:
+            self._download_other_file(task, report_chunk)
+
+    def _download_http_file(self, task: DownloadTask, report_chunk: Callable[[DownloadTask, int], None]):
+        session = self._get_session()
+        num_bytes_reported = 0
+
+        def report_total(num_bytes_total: int):
+            # Report progress only once for bytes received by a previous attempt
+            nonlocal num_bytes_reported
+            if num_bytes_total > num_bytes_reported:
+                report_chunk(task, num_bytes_total - num_bytes_reported)
+                num_bytes_reported = num_bytes_total
+
+        verified_from_scratch = False
+        num_retries = 0
+        while True:
+            resumed = False
+            offset = os.path.getsize(task.file_path) if os.path.isfile(task.file_path) else 0
+            if task.size is not None and offset > task.size:
+                offset = 0
+            hash_obj = task.new_hash()
+            headers = {'Range': 'bytes=%d-' % offset} if offset > 0 else {}
+            try:
+                with session.get(task.url, headers=headers, stream=True, timeout=self._timeout) as response:
+                    if offset > 0 and response.status_code == _HTTP_RANGE_NOT_SATISFIABLE:
+                        # Nothing left to read, so the local file is either complete or corrupt
+                        response.close()
+                        if self._verify(task, task.new_hash(), hash_file=True):
+                            report_total(offset)
+                            return
+                        os.remove(task.file_path)
+                        continue
+                    response.raise_for_status()
+                    if offset > 0 and response.status_code == _HTTP_PARTIAL_CONTENT:
+                        mode = 'ab'
+                        resumed = True
+                        if hash_obj is not None:
+                            _update_hash_from_file(hash_obj, task.file_path)
+                        report_total(offset)
+                    else:
+                        # Server ignored the Range header
+                        mode = 'wb'
+                        offset = 0
+                    with open(task.file_path, mode) as fp:
+                        for chunk in response.iter_content(chunk_size=self._chunk_size):
+                            if not chunk:
+                                continue
+                            fp.write(chunk)
+                            if hash_obj is not None:
+                                hash_obj.update(chunk)
+                            offset += len(chunk)
+                            report_total(offset)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                num_retries += 1
+                if num_retries > self._max_retries:
+                    raise DownloadError('Downloading {} failed: {}'.format(task.url, e)) from e
+                time.sleep(min(_RETRY_BACKOFF * 2 ** (num_retries - 1), _MAX_RETRY_BACKOFF))
+                continue
+            except requests.RequestException as e:
+                raise DownloadError('Downloading {} failed: {}'.format(task.url, e)) from e
+
+            if self._verify(task, hash_obj):
+                return
+            os.remove(task.file_path)
+            if verified_from_scratch or not resumed:
+                raise DownloadError('Downloading {} failed: file is corrupted'.format(task.url))
+            # A resumed download may be based on a corrupted partial file, so try once more from scratch
+            verified_from_scratch = True
+
+    def _download_other_file(self, task: DownloadTask, report_chunk: Callable[[DownloadTask, int], None]):
+        hash_obj = task.new_hash()
+        try:
+            with urllib.request.urlopen(task.url, timeout=self._timeout) as response, \
+                    open(task.file_path, 'wb') as fp:
+                while True:
+                    chunk = response.read(self._chunk_size)
+                    if not chunk:
+                        break
+                    fp.write(chunk)
+                    if hash_obj is not None:
+                        hash_obj.update(chunk)
+                    report_chunk(task, len(chunk))
+        except urllib.error.URLError as e:
+            raise DownloadError('Downloading {} failed: {}'.format(task.url, e)) from e
+        if hash_obj is not None and hash_obj.hexdigest() != task.checksum:
+            os.remove(task.file_path)
+            raise DownloadError('Downloading {} failed: file is corrupted'.format(task.url))
+
+    @staticmethod
+    def _verify(task: DownloadTask, hash_obj, hash_file: bool = False) -> bool:
+        if task.size is not None and os.path.getsize(task.file_path) != task.size:
+            return False
+        if hash_obj is None:
+            return True
+        if hash_file:
+            _update_hash_from_file(hash_obj, task.file_path)
+        return hash_obj.hexdigest() == task.checksum
+
+
+def _update_hash_from_file(hash_obj, file_path: str, block_size: int = 1024 * 1024):
+    with open(file_path, 'rb') as fp:
+        while True:
+            block = fp.read(block_size)
+            if not block:
+                break
+            hash_obj.update(block)
@@ -20,6 +20,7 @@
 # SOFTWARE.
 
 import fnmatch
+import hashlib
 import os
 import os.path
 import re
@@ -369,6 +370,28 @@ def to_json(v):
     return str(v)
 
 
+def to_fingerprint(*values) -> str:
+    """
+    Compute a fingerprint (a SHA-1 hex digest) of the given values, e.g. for use as cache key.
+    Values may be numpy arrays, bytes, or any other objects with a unique ``str()`` representation.
+
+    :param values: the values
+    :return: the fingerprint string
+    """
+    sha = hashlib.sha1()
+    for value in values:
+        if isinstance(value, np.ndarray):
+            value = np.ascontiguousarray(value)
+            sha.update('{}{}'.format(value.dtype.str, value.shape).encode('utf-8'))
+            sha.update(value.tobytes())
+        elif isinstance(value, bytes):
+            sha.update(value)
+        else:
+            sha.update(str(value).encode('utf-8'))
+        sha.update(b'|')
+    return sha.hexdigest()
+
+
 def filter_fileset(names: Sequence[str],
                    includes: Optional[Sequence[str]] = None,
                    excludes: Optional[Sequence[str]] = None) -> Sequence[str]:
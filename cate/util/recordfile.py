@@ -0,0 +1,218 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+"""
+Description
+===========
+
+This module provides a compact binary file format for JSON values comprising a large number of *records*,
+such as the documents returned by a Solr index or the entries of a metadata catalogue.
+
+A record file stores every record as separately compressed JSON text, preceded by a header that comprises
+the remaining JSON value, the positions of all records, and optionally a few *key* fields of every record.
+Reading a record file only decodes its header. Records are decoded on first access of a field that is not
+a key field. Records that have not been decoded are written back to a record file without decoding them.
+
+Components
+==========
+"""
+
+import json
+import os
+import struct
+import zlib
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Sequence
+
+_MAGIC = b'CATEREC1'
+_HEADER_LENGTH_FORMAT = '<Q'
+_HEADER_LENGTH_SIZE = struct.calcsize(_HEADER_LENGTH_FORMAT)
+
+
+class LazyRecord(MutableMapping):
+    """
+    A JSON object (dictionary) read from a record file, which is decoded on first access of a field
+    other than its key fields.
+    """
+
+    def __init__(self, data: bytes, key_fields: dict):
+        self._data = data
+        self._key_fields = key_fields
+        self._dict = None
+
+    @property
+    def is_decoded(self) -> bool:
+        return self._dict is not None
+
+    def _get_dict(self) -> dict:
+        if self._dict is None:
+            self._dict = json.loads(zlib.decompress(self._data).decode('utf-8'), object_pairs_hook=OrderedDict)
+            self._data = None
+        return self._dict
+
+    def get(self, key, default=None):
+        if self._dict is None and key in self._key_fields:
+            return self._key_fields[key]
+        return self._get_dict().get(key, default)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            # Records may also be JSON arrays, slices are not valid dictionary keys
+            return self._get_dict()[key]
+        if self._dict is None and key in self._key_fields:
+            return self._key_fields[key]
+        return self._get_dict()[key]
+
+    def __contains__(self, key):
+        if self._dict is None and key in self._key_fields:
+            return True
+        return key in self._get_dict()
+
+    def __setitem__(self, key, value):
+        self._get_dict()[key] = value
+
+    def __delitem__(self, key):
+        del self._get_dict()[key]
+
+    def __iter__(self):
+        return iter(self._get_dict())
+
+    def __len__(self):
+        return len(self._get_dict())
+
+    def copy(self) -> dict:
+        return OrderedDict(self._get_dict())
+
+    def __repr__(self):
+        return 'LazyRecord(%r)' % (self._dict if self._dict is not None else self._key_fields)
+
+
+def write_record_file(file_path: str, value: Any, records_path: Sequence[str] = (), key_names: Sequence[str] = ()):
+    """
+    Write a JSON value to a record file. The file is replaced atomically.
+
+    :param file_path: The record file path.
+    :param value: The JSON value.
+    :param records_path: Sequence of keys identifying the list or dictionary of records within *value*.
+    :param key_names: Names of record fields that are available without decoding a record read from the file.
+    """
+    records_path = list(records_path)
+    records = _get_path(value, records_path)
+    if isinstance(records, dict):
+        container = 'dict'
+        record_keys = list(records.keys())
+        record_values = list(records.values())
+    elif isinstance(records, list):
+        container = 'list'
+        record_keys = None
+        record_values = records
+    else:
+        raise ValueError('no records found at {}'.format(records_path))
+
+    blobs = []
+    key_fields = []
+    for record in record_values:
+        if isinstance(record, LazyRecord) and not record.is_decoded:
+            # noinspection PyProtectedMember
+            blobs.append(record._data)
+        else:
+            blobs.append(zlib.compress(_to_json_text(record).encode('utf-8')))
+        key_fields.append({key_name: record.get(key_name) for key_name in key_names
+                           if isinstance(record, MutableMapping) and key_name in record})
+
+    header = dict(value=_set_path(value, records_path, None),
+                  records_path=records_path,
+                  container=container,
+                  record_keys=record_keys,
+                  record_sizes=[len(blob) for blob in blobs],
+                  key_fields=key_fields)
+    header_data = zlib.compress(_to_json_text(header).encode('utf-8'))
+
+    dir_path = os.path.dirname(file_path)
+    if dir_path:
+        os.makedirs(dir_path, exist_ok=True)
+    temp_file_path = file_path + '.tmp'
+    with open(temp_file_path, 'wb') as fp:
+        fp.write(_MAGIC)
+        fp.write(struct.pack(_HEADER_LENGTH_FORMAT, len(header_data)))
+        fp.write(header_data)
+        for blob in blobs:
+            fp.write(blob)
+    os.replace(temp_file_path, file_path)
+
+
+def read_record_file(file_path: str) -> Any:
+    """
+    Read a JSON value from a record file. Records are returned as :py:class:`LazyRecord` instances.
+
+    :param file_path: The record file path.
+    :return: The JSON value.
+    :raise ValueError: if the file is not a valid record file
+    """
+    with open(file_path, 'rb') as fp:
+        data = fp.read()
+    if data[:len(_MAGIC)] != _MAGIC:
+        raise ValueError('{} is not a record file'.format(file_path))
+    offset = len(_MAGIC)
+    header_length, = struct.unpack_from(_HEADER_LENGTH_FORMAT, data, offset)
+    offset += _HEADER_LENGTH_SIZE
+    try:
+        header = json.loads(zlib.decompress(data[offset:offset + header_length]).decode('utf-8'),
+                            object_pairs_hook=OrderedDict)
+    except zlib.error as e:
+        raise ValueError('{} is not a valid record file: {}'.format(file_path, e)) from e
+    offset += header_length
+
+    records = []
+    for size, key_fields in zip(header['record_sizes'], header['key_fields']):
+        if offset + size > len(data):
+            raise ValueError('{} is truncated'.format(file_path))
+        records.append(LazyRecord(data[offset:offset + size], key_fields))
+        offset += size
+    if header['container'] == 'dict':
+        records = OrderedDict(zip(header['record_keys'], records))
+    return _set_path(header['value'], header['records_path'], records)
+
+
+def _to_json_text(value: Any) -> str:
+    return json.dumps(value, separators=(',', ':'), default=_json_default)
+
+
+def _json_default(value):
+    if isinstance(value, MutableMapping):
+        return OrderedDict(value)
+    raise TypeError('{!r} is not JSON serializable'.format(value))
+
+
+def _get_path(value: Any, path: Sequence[str]) -> Any:
+    for key in path:
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def _set_path(value: Any, path: Sequence[str], new_value: Any) -> Any:
+    """Return a shallow copy of *value* where the item at *path* is replaced by *new_value*."""
+    if not path:
+        return new_value
+    value = OrderedDict(value)
+    value[path[0]] = _set_path(value.get(path[0]), path[1:], new_value)
+    return value
@@ -20,7 +20,9 @@
 # SOFTWARE.
 
 import sys
-from typing import Dict, Any, Callable
+from functools import lru_cache
+from types import CodeType
+from typing import Dict, Any, Callable, Union
 
 __author__ = "Norman Fomferra (Brockmann Consult GmbH)"
 
@@ -104,7 +106,22 @@ def _get_safe_globals_accessor() -> Callable[[], dict]:
 get_safe_globals = _get_safe_globals_accessor()
 
 
-def safe_eval(expression: str, local_namespace: Dict[str, Any] = None):
+@lru_cache(maxsize=256)
+def compile_source(source_code: str, mode: str = 'eval') -> CodeType:
+    """
+    Compile the given Python *source_code* into a code object.
+
+    Code objects are cached by source text and *mode*, so that expressions and scripts which are evaluated
+    repeatedly, e.g. by workflow expression steps, are parsed and compiled only once.
+
+    :param source_code: Python source code.
+    :param mode: The compile mode, either ``'eval'`` for expressions or ``'exec'`` for statements.
+    :return: The compiled code object.
+    """
+    return compile(source_code, '<string>', mode)
+
+
+def safe_eval(expression: Union[str, CodeType], local_namespace: Dict[str, Any] = None):
     """
     Evaluate the given Python *expression* in the given *local_namespace*.
 
@@ -115,14 +132,16 @@ def safe_eval(expression: str, local_namespace: Dict[str, Any] = None):
 
     Syntax errors are reported as exceptions.
 
-    :param expression: A Python expression.
+    :param expression: A Python expression or a code object returned by :py:func:`compile_source`.
     :param local_namespace: The local namespace in which **expression** is evaluated.
     :return: The result of the evaluated expression.
     """
+    if isinstance(expression, str):
+        expression = compile_source(expression, 'eval')
     return eval(expression, get_safe_globals(), local_namespace or {})
 
 
-def safe_exec(source_code: str, local_namespace: Dict[str, Any] = None):
+def safe_exec(source_code: Union[str, CodeType], local_namespace: Dict[str, Any] = None):
     """
     Execute the given *source_code* in the in the given *local_namespace*.
 
@@ -133,8 +152,10 @@ def safe_exec(source_code: str, local_namespace: Dict[str, Any] = None):
 
     Syntax errors are reported as exceptions.
 
-    :param source_code: Python source code.
+    :param source_code: Python source code or a code object returned by :py:func:`compile_source`.
     :param local_namespace: The local namespace in which **expression** is evaluated.
     :return: The result of the evaluated expression.
     """
+    if isinstance(source_code, str):
+        source_code = compile_source(source_code, 'exec')
     return exec(source_code, get_safe_globals(), local_namespace or {})
@@ -0,0 +1,155 @@
+# The MIT License (MIT)
+# Copyright (c) 2016, 2017 by the ESA CCI Toolbox development team and contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of
+# this software and associated documentation files (the "Software"), to deal in
+# the Software without restriction, including without limitation the rights to
+# use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies
+# of the Software, and to permit persons to whom the Software is furnished to do
+# so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+"""
+Description
+===========
+
+This module defines the :py:class:`TDigest` class, a mergeable sketch of the distribution of a large number
+of values from which quantiles can be estimated, see Ted Dunning, "Computing Extremely Accurate Quantiles
+Using t-Digests" (https://arxiv.org/abs/1902.04023).
+
+Sketches can be computed independently for parts of the data, e.g. the chunks of a Dask array, and then merged.
+Quantiles of the tails of the distribution are estimated more accurately than quantiles near the median.
+
+Components
+==========
+"""
+
+from typing import Iterable, Union
+
+import numpy as np
+
+#: The default compression of t-digests
+DEFAULT_COMPRESSION = 200
+
+
+class TDigest:
+    """
+    A t-digest summarizes values by a sorted list of centroids, each given by a mean and a weight, i.e. the number of
+    values it represents. Centroids near the tails of the distribution represent few values, centroids near the
+    median many values.
+
+    :param means: The means of the centroids
+    :param weights: The weights of the centroids
+    :param minimum: The minimum value
+    :param maximum: The maximum value
+    :param compression: Controls the number of centroids, which is less than *compression*. Higher values
+           are more accurate but slower. Up to *compression* values are represented exactly.
+    """
+
+    def __init__(self,
+                 means: np.ndarray = None,
+                 weights: np.ndarray = None,
+                 minimum: float = np.nan,
+                 maximum: float = np.nan,
+                 compression: int = DEFAULT_COMPRESSION):
+        self._means, self._weights = _compress(np.empty(0) if means is None else np.asarray(means, dtype=np.float64),
+                                               np.empty(0) if weights is None else np.asarray(weights,
+                                                                                              dtype=np.float64),
+                                               compression)
+        self._minimum = float(minimum)
+        self._maximum = float(maximum)
+        self._compression = compression
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, compression: int = DEFAULT_COMPRESSION) -> 'TDigest':
+        """
+        Create a t-digest from the given values of any shape, NaN values are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return cls(compression=compression)
+        return cls(values, np.ones_like(values), values.min(), values.max(), compression=compression)
+
+    @classmethod
+    def merge(cls, digests: Iterable['TDigest'], compression: int = None) -> 'TDigest':
+        """
+        Merge the given t-digests into a new one.
+
+        :param digests: The t-digests
+        :param compression: The compression of the new t-digest, defaults to the highest compression of *digests*
+        """
+        digests = list(digests)
+        if compression is None:
+            compression = max([digest.compression for digest in digests], default=DEFAULT_COMPRESSION)
+        if not digests:
+            return cls(compression=compression)
+        return cls(np.concatenate([digest._means for digest in digests]),
+                   np.concatenate([digest._weights for digest in digests]),
+                   np.nanmin([digest._minimum for digest in digests] + [np.inf]),
+                   np.nanmax([digest._maximum for digest in digests] + [-np.inf]),
+                   compression=compression)
+
+    @property
+    def compression(self) -> int:
+        return self._compression
+
+    @property
+    def count(self) -> int:
+        """The number of values."""
+        return int(round(self._weights.sum()))
+
+    @property
+    def num_centroids(self) -> int:
+        return self._means.size
+
+    def quantile(self, q: Union[float, np.ndarray]) -> Union[float, np.ndarray]:
+        """
+        Estimate the quantile(s) *q* in the range 0 to 1. Like ``numpy.quantile()``, quantiles are linearly
+        interpolated, hence the result is exact if the t-digest represents all values exactly.
+        Returns NaN if the t-digest is empty.
+        """
+        if self._means.size == 0:
+            return np.full_like(q, np.nan, dtype=np.float64) if np.ndim(q) else np.nan
+        total_weight = self._weights.sum()
+        # Position of each centroid's center, if its values were at indexes of the sorted values
+        centers = np.cumsum(self._weights) - 0.5 * (self._weights + 1.0)
+        positions = np.concatenate([[0.0], centers, [total_weight - 1.0]])
+        values = np.concatenate([[self._minimum], self._means, [self._maximum]])
+        result = np.interp(np.asarray(q, dtype=np.float64) * (total_weight - 1.0), positions, values)
+        return float(result) if np.ndim(result) == 0 else result
+
+    def __repr__(self):
+        return 'TDigest(count={}, num_centroids={}, compression={})'.format(self.count,
+                                                                            self.num_centroids,
+                                                                            self.compression)
+
+
+def _compress(means: np.ndarray, weights: np.ndarray, compression: int):
+    """
+    Sort the centroids and merge adjacent ones whose quantiles fall into the same unit interval of the
+    t-digest scale function k(q) = compression / (2 pi) * asin(2 q - 1).
+    """
+    order = np.argsort(means, kind='mergesort')
+    means = means[order]
+    weights = weights[order]
+    if means.size <= compression:
+        return means, weights
+    cum_weights = np.cumsum(weights)
+    q = (cum_weights - 0.5 * weights) / cum_weights[-1]
+    k = np.floor(compression / (2 * np.pi) * np.arcsin(2 * q - 1) + compression / 4)
+    starts = np.flatnonzero(np.concatenate([[True], k[1:] != k[:-1]]))
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return merged_means, merged_weights
@@ -291,8 +291,9 @@ class ResFeatureCollectionHandler(WorkspaceResourceHandler):
                 crs = features.crs
                 num_features = len(features)
             elif isinstance(resource, GeoDataFrame):
-                features = resource.features
-                crs = features.crs
+                # perf: stream from the proxy's feature columns so the feature source is not read again
+                features = resource.iterfeatures()
+                crs = resource.crs
                 num_features = len(resource)
             elif isinstance(resource, gpd.GeoDataFrame):
                 features = resource.iterfeatures()
@@ -343,8 +344,9 @@ class ResFeatureHandler(WorkspaceResourceHandler):
             elif isinstance(resource, GeoDataFrame):
                 if not self._check_feature_index(feature_index, len(resource)):
                     return
-                feature = resource.features[feature_index]
-                crs = resource.features.crs
+                # Same source as the features streamed by ResFeatureCollectionHandler
+                feature = resource.get_feature(feature_index)
+                crs = resource.crs
             elif isinstance(resource, gpd.GeoDataFrame):
                 if not self._check_feature_index(feature_index, len(resource)):
                     return
@@ -114,18 +114,34 @@ class WebSocketService:
                      title=data_store.title,
                      isLocal=data_store.is_local) for data_store in data_stores]
 
-    def get_data_sources(self, data_store_id: str, monitor: Monitor) -> list:
+    def get_data_sources(self, data_store_id: str, monitor: Monitor,
+                         query_expr: str = None,
+                         var_names: str = None,
+                         region: str = None,
+                         time_range: str = None) -> list:
         """
         Get data sources for a given data store.
 
+        If any of *query_expr*, *var_names*, *region* or *time_range* is given, the data store is searched
+        and the data sources are sorted by descending rank.
+
         :param data_store_id: ID of the data store
         :param monitor: a progress monitor
-        :return: JSON-serializable list of data sources, sorted by name.
+        :param query_expr: optional keywords, which may be incomplete
+        :param var_names: optional names of variables data sources must provide
+        :param region: optional region data sources must intersect
+        :param time_range: optional time range data sources must intersect
+        :return: JSON-serializable list of data sources, sorted by name or rank.
         """
         data_store = DATA_STORE_REGISTRY.get_data_store(data_store_id)
         if data_store is None:
             raise ValueError('Unknown data store: "%s"' % data_store_id)
-        data_sources = data_store.query(monitor=monitor)
+        is_search = bool(query_expr or var_names or region or time_range)
+        if is_search:
+            data_sources = data_store.search(query_expr=query_expr, var_names=var_names, region=region,
+                                             time_range=time_range, monitor=monitor)
+        else:
+            data_sources = data_store.query(monitor=monitor)
         if data_store_id == 'esa_cci_odp':
             # Filter ESA Open Data Portal data sources
             data_source_dict = {ds.id: ds for ds in data_sources}
@@ -133,9 +149,12 @@ class WebSocketService:
             data_source_ids = filter_fileset(data_source_dict.keys(),
                                              includes=conf.get_config_value('included_data_sources', default=None),
                                              excludes=conf.get_config_value('excluded_data_sources', default=None))
-            data_sources = [data_source_dict[ds_id] for ds_id in data_source_ids]
+            # Keep the order of the data sources, which is significant for search results
+            data_source_ids = set(data_source_ids)
+            data_sources = [ds for ds in data_sources if ds.id in data_source_ids]
 
-        data_sources = sorted(data_sources, key=lambda ds: ds.title or ds.id)
+        if not is_search:
+            data_sources = sorted(data_sources, key=lambda ds: ds.title or ds.id)
         return [dict(id=data_source.id,
                      title=data_source.title,
                      meta_info=data_source.meta_info) for data_source in data_sources]
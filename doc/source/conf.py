@@ -33,7 +33,8 @@ MOCK_MODULES = ['geopandas', 'cartopy', 'cartopy.crs', 'fiona', 'numba', 'pandas
                 'shapely', 'shapely.errors', 'shapely.wkt', 'shapely.geometry', 'shapely.geometry.base',
                 'xarray', 'xarray.backends',
                 'dask', 'dask.callbacks',
-                'numpy', 'jdcal', 'dateutil', 'owslib', 'owslib.csw', 'owslib.namespaces', 'psutil']
+                'numpy', 'jdcal', 'dateutil', 'owslib', 'owslib.csw', 'owslib.namespaces', 'psutil',
+                'requests', 'requests.adapters']
 for mod_name in MOCK_MODULES:
     sys.modules[mod_name] = mock.Mock()
 
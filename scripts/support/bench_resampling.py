@@ -0,0 +1,84 @@
+"""
+Benchmark of the resampling kernels used by the coregister operation.
+
+Measures the time to compile or load the cached kernels, the time of resampling a stack of grids slice by
+slice using resample_2d(), and the time of resampling the whole stack using a ResamplingPlan with
+an increasing number of threads.
+
+Usage:
+
+    $ python bench_resampling.py --src-size 1440x720 --size 360x180 --num-slices 50
+"""
+
+import argparse
+import time
+
+import numba
+import numpy as np
+
+import cate.ops.resampling as rs
+
+DS_METHODS = dict(first=rs.DS_FIRST, last=rs.DS_LAST, mean=rs.DS_MEAN, mode=rs.DS_MODE, var=rs.DS_VAR,
+                  std=rs.DS_STD)
+US_METHODS = dict(nearest=rs.US_NEAREST, linear=rs.US_LINEAR)
+
+
+def parse_size(text):
+    w, h = text.lower().split('x')
+    return int(w), int(h)
+
+
+def measure(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the resampling kernels')
+    parser.add_argument('--src-size', type=parse_size, default='1440x720', help='source grid size WxH')
+    parser.add_argument('--size', type=parse_size, default='360x180', help='target grid size WxH')
+    parser.add_argument('--num-slices', type=int, default=50, help='number of grids in the stack')
+    parser.add_argument('--ds-method', choices=sorted(DS_METHODS.keys()), default='mean')
+    parser.add_argument('--us-method', choices=sorted(US_METHODS.keys()), default='linear')
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions, the best time is reported')
+    args = parser.parse_args()
+
+    src_w, src_h = args.src_size
+    w, h = args.size
+    ds_method = DS_METHODS[args.ds_method]
+    us_method = US_METHODS[args.us_method]
+
+    src = np.random.RandomState(0).rand(args.num_slices, src_h, src_w)
+    src[src < 0.1] = np.nan
+
+    t0 = time.perf_counter()
+    plan = rs.get_resampling_plan(src_w, src_h, w, h, ds_method=ds_method, us_method=us_method)
+    plan.apply(src[:1], parallel=False)
+    plan.apply(src[:1], parallel=True)
+    print('compile or load kernels: %.3f s' % (time.perf_counter() - t0))
+
+    rs.resample_2d(src[0], w, h, ds_method=ds_method, us_method=us_method)
+    t_ref = measure(lambda: [rs.resample_2d(src[i], w, h, ds_method=ds_method, us_method=us_method)
+                             for i in range(args.num_slices)], args.repeat)
+    print('resample_2d, per slice: %.3f s' % t_ref)
+
+    t_serial = measure(lambda: plan.apply(src, parallel=False), args.repeat)
+    print('plan, serial:           %.3f s, speedup %.1f' % (t_serial, t_ref / t_serial))
+
+    max_threads = numba.config.NUMBA_NUM_THREADS
+    num_threads = 1
+    while True:
+        numba.set_num_threads(num_threads)
+        t = measure(lambda: plan.apply(src, parallel=True), args.repeat)
+        print('plan, %3d thread(s):    %.3f s, speedup %.1f' % (num_threads, t, t_ref / t))
+        if num_threads == max_threads:
+            break
+        num_threads = min(2 * num_threads, max_threads)
+
+
+if __name__ == '__main__':
+    main()
@@ -42,6 +42,7 @@ requirements = [
     'pillow',
     'psutil',
     'pyproj',
+    'requests',
     'scipy',
     'shapely',
     'tornado',
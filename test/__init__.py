@@ -0,0 +1,10 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Workspaces opened by tests, also those of Web API services started by tests, must not record
+# their data source references in the user's data stores path
+_WORKSPACE_REFS_PATH = tempfile.mkdtemp(prefix='cate-test-workspace-refs-')
+os.environ['CATE_WORKSPACE_REFS_PATH'] = _WORKSPACE_REFS_PATH
+atexit.register(shutil.rmtree, _WORKSPACE_REFS_PATH, ignore_errors=True)
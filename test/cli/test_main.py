@@ -242,7 +242,8 @@ class ResourceCommandTest(CliTestCase):
                              '  ds2 = cate.ops.io.read_object('
                              'file=%s, format=None) [OpStep]' % NETCDF_TEST_FILE,
                              '  ts = cate.ops.timeseries.tseries_mean('
-                             'ds=@ds2, var=temperature, std_suffix=_std, calculate_std=True) [OpStep]'])
+                             'ds=@ds2, var=temperature, std_suffix=_std, calculate_std=True, '
+                             'area_weighted=False) [OpStep]'])
 
         self.assert_main(['res', 'set', 'ts', 'cate.ops.timeseries.tseries_mean', 'ds=@ds2', 'var=temperature'],
                          expected_status=1,
@@ -259,7 +260,8 @@ class ResourceCommandTest(CliTestCase):
                              '  ds2 = cate.ops.io.read_object('
                              'file=%s, format=None) [OpStep]' % NETCDF_TEST_FILE,
                              '  ts = cate.ops.timeseries.tseries_mean('
-                             'ds=@ds2, var=temperature, std_suffix=_std, calculate_std=True) [OpStep]'])
+                             'ds=@ds2, var=temperature, std_suffix=_std, calculate_std=True, '
+                             'area_weighted=False) [OpStep]'])
 
         self.assert_main(['res', 'set', 'ts',
                           'cate.ops.timeseries.tseries_point', 'ds=@ds2', 'point=XYZ',
@@ -0,0 +1,104 @@
+from unittest import TestCase
+
+from cate.core.dsindex import DataSourceIndex, split_terms
+from test.core.test_ds import SimpleDataSource, SimpleDataStore
+
+
+def _new_data_sources():
+    return [
+        SimpleDataSource('esacci.SST.day.L4.SSTdepth.multi-sensor.multi-platform.OSTIA.1-1.r1',
+                         meta_info=dict(title='ESA Sea Surface Temperature Climate Change Initiative',
+                                        cci_project='SST',
+                                        time_frequency='day',
+                                        variables=[dict(name='analysed_sst'), dict(name='sea_ice_fraction')],
+                                        bbox_minx='-180.0', bbox_miny='-90.0', bbox_maxx='180.0', bbox_maxy='90.0',
+                                        temporal_coverage_start='1991-09-01T00:00:00',
+                                        temporal_coverage_end='2010-12-31T23:59:59')),
+        SimpleDataSource('esacci.OC.mon.L3S.CHLOR_A.multi-sensor.multi-platform.MERGED.3-1.geographic',
+                         meta_info=dict(title='ESA Ocean Colour Climate Change Initiative',
+                                        cci_project='OC',
+                                        time_frequency='mon',
+                                        variables=[dict(name='chlor_a'), dict(name='chlor_a_log10_bias')],
+                                        temporal_coverage_start='1997-09-04T00:00:00',
+                                        temporal_coverage_end='2016-12-31T23:59:59')),
+        SimpleDataSource('esacci.SEAICE.day.L4.SICONC.multi-sensor.multi-platform.AMSR_25kmEASE2.2-1.NH',
+                         meta_info=dict(title='ESA Sea Ice Concentration',
+                                        cci_project='SEAICE',
+                                        abstract='Daily sea ice concentration of the northern hemisphere',
+                                        variables=[dict(name='ice_conc')],
+                                        bbox_minx='-180.0', bbox_miny='45.0', bbox_maxx='180.0', bbox_maxy='90.0',
+                                        temporal_coverage_start='2002-06-01T00:00:00',
+                                        temporal_coverage_end='2017-05-31T23:59:59')),
+        SimpleDataSource('local.no_meta_info'),
+    ]
+
+
+def _ids(data_sources):
+    return [data_source.id.split('.')[1] for data_source in data_sources]
+
+
+class DataSourceIndexTest(TestCase):
+    def setUp(self):
+        self.index = DataSourceIndex(_new_data_sources())
+
+    def test_split_terms(self):
+        self.assertEqual(split_terms('esacci.SST.day.L4  Sea-Surface'),
+                         ['esacci', 'sst', 'day', 'l4', 'sea', 'surface'])
+        self.assertEqual(split_terms('...'), [])
+
+    def test_search_all(self):
+        self.assertEqual(_ids(self.index.search()), ['OC', 'SEAICE', 'SST', 'no_meta_info'])
+
+    def test_search_keywords(self):
+        self.assertEqual(_ids(self.index.search(query_expr='sst')), ['SST'])
+        self.assertEqual(_ids(self.index.search(query_expr='SST.day')), ['SST'])
+        self.assertEqual(_ids(self.index.search(query_expr='day')), ['SEAICE', 'SST'])
+        self.assertEqual(_ids(self.index.search(query_expr='ocean')), ['OC'])
+        self.assertEqual(_ids(self.index.search(query_expr='northern')), ['SEAICE'])
+        self.assertEqual(_ids(self.index.search(query_expr='sea ice')), ['SEAICE', 'SST'])
+        self.assertEqual(_ids(self.index.search(query_expr='sea ocean')), [])
+        self.assertEqual(_ids(self.index.search(query_expr='xyz')), [])
+
+    def test_search_prefixes(self):
+        self.assertEqual(_ids(self.index.search(query_expr='chl')), ['OC'])
+        self.assertEqual(_ids(self.index.search(query_expr='clim')), ['OC', 'SST'])
+        self.assertEqual(_ids(self.index.search(query_expr='no_me')), ['no_meta_info'])
+
+    def test_search_is_ranked(self):
+        # "ice" is found in the title of SEAICE, but only in a variable name of SST
+        self.assertEqual(_ids(self.index.search(query_expr='ice')), ['SEAICE', 'SST'])
+        # "sea" is found in the titles of both, then sorted by title
+        self.assertEqual(_ids(self.index.search(query_expr='sea')), ['SEAICE', 'SST'])
+        # "concentration" is found in the title of SEAICE, "conc" in a variable name of SEAICE
+        self.assertEqual(_ids(self.index.search(query_expr='conc')), ['SEAICE'])
+
+    def test_search_var_names(self):
+        self.assertEqual(_ids(self.index.search(var_names='analysed_sst')), ['SST'])
+        self.assertEqual(_ids(self.index.search(var_names='chlor_a, chlor_a_log10_bias')), ['OC'])
+        self.assertEqual(_ids(self.index.search(var_names=['chlor_a', 'ice_conc'])), [])
+        self.assertEqual(_ids(self.index.search(query_expr='esacci', var_names='ice_conc')), ['SEAICE'])
+
+    def test_search_region(self):
+        # Data sources of unknown coverage are retained
+        self.assertEqual(_ids(self.index.search(region='-10,0,10,20')), ['OC', 'SST', 'no_meta_info'])
+        self.assertEqual(_ids(self.index.search(region='-10,50,10,60')), ['OC', 'SEAICE', 'SST', 'no_meta_info'])
+
+    def test_search_time_range(self):
+        self.assertEqual(_ids(self.index.search(time_range='1995-01-01,1996-01-01')), ['SST', 'no_meta_info'])
+        self.assertEqual(_ids(self.index.search(time_range='2012-01-01,2013-01-01')), ['OC', 'SEAICE', 'no_meta_info'])
+        self.assertEqual(_ids(self.index.search(query_expr='sea', time_range='2012-01-01,2013-01-01')), ['SEAICE'])
+
+
+class DataStoreSearchTest(TestCase):
+    def test_search_index_is_reused(self):
+        data_sources = _new_data_sources()
+        data_store = SimpleDataStore('test', data_sources[:2])
+        self.assertEqual(_ids(data_store.search(query_expr='esa')), ['OC', 'SST'])
+        search_index = data_store._search_index
+        self.assertEqual(_ids(data_store.search(query_expr='sst')), ['SST'])
+        self.assertIs(data_store._search_index, search_index)
+
+        # Index is rebuilt when data sources change
+        data_store._data_sources.append(data_sources[2])
+        self.assertEqual(_ids(data_store.search(query_expr='esa')), ['OC', 'SEAICE', 'SST'])
+        self.assertIsNot(data_store._search_index, search_index)
@@ -14,7 +14,7 @@ from shapely.geometry import Point, Polygon
 from cate.core.op import op_input, OpRegistry
 from cate.core.types import Like, VarNamesLike, VarName, PointLike, PolygonLike, TimeRangeLike, GeometryLike, \
     DictLike, TimeLike, Arbitrary, Literal, DatasetLike, DataFrameLike, FileLike, GeoDataFrame, HTMLLike, HTML, \
-    ValidationError, DimName, DimNamesLike
+    ValidationError, DimName, DimNamesLike, FeatureColumns
 from cate.util.misc import object_to_qualified_name, OrderedDict
 
 # 'ExamplePoint' is an example type which may come from Cate API or other required API.
@@ -673,6 +673,104 @@ class TestGeoDataFrame(TestCase):
         self.assertIsInstance(df_max.geometry, gpd.GeoSeries)
         self.assertIsNotNone(df_max.crs)
 
+    def test_set_crs(self):
+        features = read_test_features()
+        gdf = GeoDataFrame.from_features(features)
+        gdf.crs = 'EPSG:3857'
+        self.assertEqual(gdf.crs, 'EPSG:3857')
+        self.assertEqual(gdf.lazy_data_frame.crs, 'EPSG:3857')
+
+    def test_get_feature(self):
+        features = read_test_features()
+        gdf = GeoDataFrame.from_features(features)
+        self.assertEqual(gdf.get_feature(1)['properties'], {'A': 2, 'B': False, 'C': 0.1})
+        self.assertIsNone(object.__getattribute__(gdf, '_lazy_data_frame'))
+
+        # Once created, the data frame is the authoritative source
+        gdf['A'] = [4, 5, 6]
+        feature = gdf.get_feature(1)
+        self.assertEqual(feature['properties']['A'], 5)
+        self.assertEqual(feature['geometry'], list(gdf.iterfeatures())[1]['geometry'])
+
+    def test_attribute_access_uses_columns(self):
+        features = read_test_features()
+        gdf = GeoDataFrame.from_features(features)
+        self.assertEqual(len(gdf), 3)
+        self.assertEqual(list(gdf['A']), [1, 2, 3])
+        self.assertEqual(list(gdf['C']), [0.5, 0.1, 0.3])
+        self.assertIsNotNone(gdf.lazy_columns)
+        self.assertIsNone(object.__getattribute__(gdf, '_lazy_data_frame'))
+
+    def test_iterfeatures(self):
+        features = read_test_features()
+        gdf = GeoDataFrame.from_features(features)
+        feature_list = list(gdf.iterfeatures())
+        self.assertEqual(len(feature_list), 3)
+        self.assertEqual(feature_list[1]['properties'], {'A': 2, 'B': False, 'C': 0.1})
+        self.assertEqual(feature_list[1]['geometry'], {'type': 'Point', 'coordinates': (10.0, 20.0)})
+        self.assertIsNone(object.__getattribute__(gdf, '_lazy_data_frame'))
+
+
+class TestFeatureColumns(TestCase):
+
+    def test_from_features(self):
+        columns = FeatureColumns.from_features(_TEST_FEATURES)
+        self.assertEqual(len(columns), 4)
+        self.assertEqual(columns.property_names, ['name', 'value'])
+        np.testing.assert_equal(columns.properties['value'], np.array([1.5, 2.5, 3.5, 4.5]))
+        np.testing.assert_equal(columns.geometry_types, np.array([0, 2, 5, -1]))
+        np.testing.assert_equal(columns.geometry_offsets, np.array([0, 1, 2, 4, 4]))
+        np.testing.assert_equal(columns.part_offsets, np.array([0, 1, 3, 4, 5]))
+        np.testing.assert_equal(columns.ring_offsets, np.array([0, 1, 6, 10, 14, 18]))
+        self.assertEqual(columns.coords.shape, (18, 2))
+        self.assertEqual(columns.get_geometry_coords(0).tolist(), [[1.0, 2.0]])
+        self.assertEqual(columns.get_geometry_coords(2).shape, (8, 2))
+        self.assertIsNone(columns.get_geometry_coords(3))
+
+    def test_geometry_round_trip(self):
+        columns = FeatureColumns.from_features(_TEST_FEATURES)
+        for index, feature in enumerate(_TEST_FEATURES):
+            expected = feature['geometry']
+            actual = columns.get_geometry_interface(index)
+            if expected is None:
+                self.assertIsNone(actual)
+                self.assertIsNone(columns.get_geometry(index))
+            else:
+                self.assertEqual(shapely.geometry.shape(actual), shapely.geometry.shape(expected))
+                self.assertEqual(columns.get_geometry(index), shapely.geometry.shape(expected))
+
+    def test_to_data_frames(self):
+        columns = FeatureColumns.from_features(_TEST_FEATURES)
+        df = columns.to_data_frame()
+        self.assertIsInstance(df, pd.DataFrame)
+        self.assertEqual(list(df.columns), ['name', 'value'])
+        gdf = columns.to_geo_data_frame()
+        self.assertIsInstance(gdf, gpd.GeoDataFrame)
+        self.assertEqual(list(gdf.columns), ['name', 'value', 'geometry'])
+        self.assertEqual(gdf.geometry[1].area, 3.875)
+
+    def test_get_feature(self):
+        columns = FeatureColumns.from_features(_TEST_FEATURES)
+        feature = columns.get_feature(0)
+        self.assertEqual(feature['id'], '0')
+        self.assertEqual(feature['properties'], {'name': 'a', 'value': 1.5})
+        self.assertIsInstance(feature['properties']['value'], float)
+        self.assertEqual(list(columns.iter_features())[0], feature)
+
+
+_TEST_FEATURES = [
+    dict(type='Feature', id='0', properties=dict(name='a', value=1.5),
+         geometry=dict(type='Point', coordinates=(1.0, 2.0))),
+    dict(type='Feature', id='1', properties=dict(name='b', value=2.5),
+         geometry=dict(type='Polygon', coordinates=[[(0., 0.), (2., 0.), (2., 2.), (0., 2.), (0., 0.)],
+                                                    [(0.5, 0.5), (1., 0.5), (1., 1.), (0.5, 0.5)]])),
+    dict(type='Feature', id='2', properties=dict(name='c', value=3.5),
+         geometry=dict(type='MultiPolygon', coordinates=[[[(0., 0.), (1., 0.), (1., 1.), (0., 0.)]],
+                                                         [[(5., 5.), (6., 5.), (6., 6.), (5., 5.)]]])),
+    dict(type='Feature', id='3', properties=dict(name='d', value=4.5),
+         geometry=None),
+]
+
 
 def read_test_features():
     import fiona
@@ -0,0 +1,141 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+import cate.core.vds
+from cate.core.ds import open_xarray_dataset
+from cate.core.vds import open_virtual_dataset, VirtualDatasetError
+
+
+def _write_file(dir_path, index, num_times=2):
+    time = pd.date_range('2000-01-01', periods=num_times, freq='D') + pd.Timedelta(days=num_times * index)
+    ds = xr.Dataset({
+        'sm': (['time', 'lat', 'lon'], np.random.rand(num_times, 4, 8)),
+        'mask': (['lat', 'lon'], np.ones((4, 8))),
+        'lat': np.linspace(-67.5, 67.5, 4),
+        'lon': np.linspace(-157.5, 157.5, 8),
+        'time': time,
+    }, attrs=dict(title='Test dataset'))
+    ds.sm.attrs['units'] = 'm3 m-3'
+    file = os.path.join(dir_path, 'sm-%02d.nc' % index)
+    ds.to_netcdf(file)
+    return file
+
+
+class OpenVirtualDatasetTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.files = [_write_file(self.tmp_dir, i) for i in range(4)]
+        self.index_path = os.path.join(self.tmp_dir, 'sm.index')
+
+    def tearDown(self):
+        cate.core.vds._OPEN_FILE_CACHE.clear()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _count_opened_files(self, function):
+        opened_files = []
+        open_file = cate.core.vds._open_file
+
+        def counting_open_file(file, *args):
+            opened_files.append(file)
+            return open_file(file, *args)
+
+        with patch('cate.core.vds._open_file', counting_open_file):
+            result = function()
+        return result, opened_files
+
+    def test_equals_open_mfdataset(self):
+        actual = open_virtual_dataset(self.files, self.index_path, chunks=dict(lat=2))
+        expected = xr.open_mfdataset(self.files, concat_dim='time', coords='minimal', data_vars='minimal')
+        self.assertTrue(actual.identical(expected))
+        self.assertEqual(actual.sm.chunks, ((2, 2, 2, 2), (2, 2), (8,)))
+        actual.close()
+        expected.close()
+
+    def test_index_is_reused(self):
+        ds, opened_files = self._count_opened_files(lambda: open_virtual_dataset(self.files, self.index_path))
+        self.assertEqual(opened_files, [self.files[0]] + self.files)
+        ds.close()
+
+        with open(self.index_path) as fp:
+            index = json.load(fp)
+        self.assertEqual(set(index['files'].keys()), set(self.files))
+
+        ds, opened_files = self._count_opened_files(lambda: open_virtual_dataset(self.files, self.index_path))
+        self.assertEqual(opened_files, [self.files[0]])
+
+        # Only the file containing the selected time is opened
+        _, opened_files = self._count_opened_files(lambda: ds.sm.sel(time='2000-01-06').values)
+        self.assertEqual(opened_files, [self.files[2]])
+        ds.close()
+
+    def test_files_are_opened_once_for_all_chunks(self):
+        ds = open_virtual_dataset(self.files, self.index_path, chunks=dict(lat=1, lon=2))
+        self.assertEqual(len(ds.sm.data.__dask_keys__()), 4)
+
+        # 16 chunks per file and variable, read concurrently by dask's threaded scheduler
+        _, opened_files = self._count_opened_files(lambda: ds.sm.values)
+        self.assertEqual(sorted(opened_files), self.files)
+        _, opened_files = self._count_opened_files(lambda: ds.sm.values)
+        self.assertEqual(opened_files, [])
+        ds.close()
+
+    def test_least_recently_used_files_are_closed(self):
+        ds = open_virtual_dataset(self.files, self.index_path)
+        with patch('cate.core.vds._OPEN_FILE_CACHE', cate.core.vds._OpenFileCache(2)):
+            for i in range(4):
+                ds.sm.isel(time=2 * i).values
+            _, opened_files = self._count_opened_files(lambda: ds.sm.isel(time=slice(4, 8)).values)
+            self.assertEqual(opened_files, [])
+            _, opened_files = self._count_opened_files(lambda: ds.sm.isel(time=0).values)
+            self.assertEqual(opened_files, [self.files[0]])
+            cate.core.vds._OPEN_FILE_CACHE.clear()
+        ds.close()
+
+    def test_modified_files_are_reindexed(self):
+        open_virtual_dataset(self.files, self.index_path).close()
+
+        os.remove(self.files[3])
+        _write_file(self.tmp_dir, 3, num_times=3)
+        os.utime(self.files[3], (0, 0))
+
+        ds, opened_files = self._count_opened_files(lambda: open_virtual_dataset(self.files, self.index_path))
+        self.assertEqual(opened_files, [self.files[0], self.files[3]])
+        self.assertEqual(ds.dims['time'], 9)
+        expected = xr.open_mfdataset(self.files, concat_dim='time')
+        np.testing.assert_array_equal(ds.time.values, expected.time.values)
+        np.testing.assert_array_equal(ds.sm.values, expected.sm.values)
+        ds.close()
+        expected.close()
+
+    def test_structure_mismatch(self):
+        xr.Dataset({'sm': (['time', 'lat'], np.ones((2, 5))),
+                    'time': pd.date_range('2001-01-01', periods=2)}).to_netcdf(self.files[1])
+        with self.assertRaises(VirtualDatasetError):
+            open_virtual_dataset(self.files, self.index_path)
+
+    def test_unsupported_kwargs(self):
+        with self.assertRaises(VirtualDatasetError):
+            open_virtual_dataset(self.files, self.index_path, autoclose=False)
+
+    def test_open_xarray_dataset(self):
+        ds = open_xarray_dataset(self.files, index_path=self.index_path)
+        self.assertTrue(os.path.isfile(self.index_path))
+        self.assertEqual(ds.dims['time'], 8)
+        ds.close()
+
+        # Falls back to xarray.open_mfdataset()
+        os.remove(self.index_path)
+        xr.Dataset({'sm': (['time'], np.ones(2)),
+                    'time': pd.date_range('2000-01-03', periods=2)}).to_netcdf(self.files[1])
+        ds = open_xarray_dataset(self.files, index_path=self.index_path)
+        self.assertFalse(os.path.isfile(self.index_path))
+        self.assertEqual(ds.dims['time'], 8)
+        ds.close()
@@ -4,14 +4,27 @@ import os
 import os.path
 import shutil
 import tempfile
+import threading
+import time
+import types
 import unittest
 import unittest.mock
+import urllib.parse
 import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
 
-from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, format_variables_info_string
+import numpy as np
+import xarray as xr
+
+from cate.core.ds import DATA_STORE_REGISTRY, DataAccessError, format_variables_info_string, open_xarray_dataset
+from cate.core.opimpl import normalize_impl, subset_spatial_impl
 from cate.core.types import PolygonLike, TimeRangeLike, VarNamesLike
-from cate.ds.esa_cci_odp import EsaCciOdpDataStore, find_datetime_format, _DownloadStatistics
-from cate.ds.local import LocalDataStore
+from cate.ds.esa_cci_odp import EsaCciOdpDataStore, EsaCciCatalogueService, find_datetime_format, \
+    _DownloadStatistics, _fetch_file_list_json, _fetch_solr_json, _update_solr_json, _load_or_fetch_json, \
+    _run_ordered, _DatasetConstraint, _fetch_dap_dim_sizes
+from cate.ds.local import LocalDataSource, LocalDataStore
 
 
 @unittest.skip(reason='Because it writes a lot of files')
@@ -243,6 +256,145 @@ class EsaCciOdpDataSourceTest(unittest.TestCase):
                 self.assertIsNotNone(new_ds)
                 self.assertEqual(new_ds.meta_info['title'], title)
 
+    def test_make_local_subset_commits_in_time_order(self):
+        soilmoisture_data_source = self.data_store.query(
+            query_expr='esacci.SOILMOISTURE.day.L3S.SSMV.multi-sensor.multi-platform.COMBINED.02-1.r1')[0]
+
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_names = sorted(os.listdir(reference_path))
+
+        # noinspection PyUnusedLocal
+        def find_files_mock(_, time_range):
+            file_list = []
+            for day, file_name in enumerate(file_names):
+                date_from = datetime.datetime(1978, 11, 14 + day)
+                file_list.append([file_name, date_from, date_from + datetime.timedelta(hours=23, minutes=59), 0,
+                                  {'OPENDAP': os.path.join(reference_path, file_name)}])
+            return file_list
+
+        add_dataset = LocalDataSource.add_dataset
+        added_files = []
+
+        def add_dataset_mock(local_ds, file, *args, **kwargs):
+            added_files.append(os.path.basename(file))
+            return add_dataset(local_ds, file, *args, **kwargs)
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock), \
+                unittest.mock.patch.object(LocalDataSource, 'add_dataset', add_dataset_mock):
+            new_ds = soilmoisture_data_source.make_local('local_ds_pipeline_test', var_names=['sm'],
+                                                         region='10,20,30,40')
+
+        self.assertEqual(added_files, file_names)
+        self.assertEqual(new_ds.temporal_coverage(),
+                         TimeRangeLike.convert((datetime.datetime(1978, 11, 14, 0, 0),
+                                                datetime.datetime(1978, 11, 16, 23, 59))))
+        self.assertEqual(new_ds.spatial_coverage(), PolygonLike.convert('10,20,30,40'))
+        self.assertEqual([var_info['name'] for var_info in new_ds.meta_info['variables']], ['sm'])
+
+    def test_make_local_extends_existing_copy(self):
+        soilmoisture_data_source = self.data_store.query(
+            query_expr='esacci.SOILMOISTURE.day.L3S.SSMV.multi-sensor.multi-platform.COMBINED.02-1.r1')[0]
+
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_names = sorted(os.listdir(reference_path))
+
+        def find_files_mock(_, time_range):
+            file_list = []
+            for day, file_name in enumerate(file_names):
+                date_from = datetime.datetime(1978, 11, 14 + day)
+                date_to = date_from + datetime.timedelta(hours=23, minutes=59)
+                if not time_range or time_range[0] <= date_from and date_to <= time_range[1]:
+                    file_path = os.path.join(reference_path, file_name)
+                    file_list.append([file_name, date_from, date_to, os.path.getsize(file_path),
+                                      {'OPENDAP': file_path,
+                                       'HTTPServer': 'file:' + urllib.request.pathname2url(file_path)}])
+            return file_list
+
+        add_dataset = LocalDataSource.add_dataset
+        added_files = []
+
+        def add_dataset_mock(local_ds, file, *args, **kwargs):
+            added_files.append(os.path.basename(file))
+            return add_dataset(local_ds, file, *args, **kwargs)
+
+        def day_range(first_day, last_day):
+            return TimeRangeLike.convert((datetime.datetime(1978, 11, first_day),
+                                          datetime.datetime(1978, 11, last_day, 23, 59)))
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock), \
+                unittest.mock.patch.object(LocalDataSource, 'add_dataset', add_dataset_mock):
+            local_ds = soilmoisture_data_source.make_local('local_ds_extend_test', time_range=day_range(15, 15),
+                                                           var_names=['sm'])
+            self.assertEqual(added_files, file_names[1:2])
+
+            # Only missing files are copied
+            added_files.clear()
+            extended_ds = soilmoisture_data_source.make_local('local_ds_extend_test', time_range=day_range(14, 16),
+                                                              var_names=['sm'])
+            self.assertIs(extended_ds, local_ds)
+            self.assertEqual(added_files, [file_names[0], file_names[2]])
+            self.assertEqual(extended_ds.temporal_coverage(), day_range(14, 16))
+            self.assertEqual(extended_ds.meta_info['temporal_coverage_start'], '1978-11-14')
+            self.assertEqual(extended_ds.meta_info['temporal_coverage_end'], '1978-11-16T23:59:00')
+            self.assertEqual(extended_ds.open_dataset().dims['time'], 3)
+
+            # Nothing to copy
+            added_files.clear()
+            self.assertIs(soilmoisture_data_source.make_local('local_ds_extend_test', time_range=day_range(14, 16),
+                                                              var_names=['sm']), local_ds)
+            self.assertIs(soilmoisture_data_source.make_local('local_ds_extend_test', time_range=day_range(15, 16),
+                                                              var_names=['sm']), local_ds)
+            self.assertEqual(added_files, [])
+
+            # Other variables require a new copy
+            with self.assertRaises(ValueError):
+                soilmoisture_data_source.make_local('local_ds_extend_test', time_range=day_range(14, 16))
+
+            # Copies with generated identifiers are extended as well
+            added_files.clear()
+            local_ds = soilmoisture_data_source.make_local(None, time_range=day_range(14, 14))
+            extended_ds = soilmoisture_data_source.make_local(None, time_range=day_range(14, 15))
+            self.assertIs(extended_ds, local_ds)
+            self.assertEqual(added_files, file_names[0:2])
+            self.assertEqual(extended_ds.temporal_coverage(), day_range(14, 15))
+
+            # Gaps between the time ranges a copy has been extended with are filled
+            added_files.clear()
+            local_ds = soilmoisture_data_source.make_local('local_ds_gap_test', time_range=day_range(14, 14),
+                                                           var_names=['sm'])
+            soilmoisture_data_source.make_local('local_ds_gap_test', time_range=day_range(16, 16), var_names=['sm'])
+            self.assertEqual(local_ds.temporal_coverage(), day_range(14, 16))
+            self.assertEqual(added_files, [file_names[0], file_names[2]])
+            added_files.clear()
+            self.assertIs(soilmoisture_data_source.make_local('local_ds_gap_test', time_range=day_range(14, 16),
+                                                              var_names=['sm']), local_ds)
+            self.assertEqual(added_files, [file_names[1]])
+            self.assertEqual(local_ds.open_dataset().dims['time'], 3)
+
+    def test_open_dataset_with_constraints(self):
+        soilmoisture_data_source = self.data_store.query(
+            query_expr='esacci.SOILMOISTURE.day.L3S.SSMV.multi-sensor.multi-platform.COMBINED.02-1.r1')[0]
+
+        reference_path = os.path.join(os.path.dirname(__file__),
+                                      os.path.normpath('resources/datasources/local/files/'))
+        file_paths = [os.path.join(reference_path, file_name) for file_name in sorted(os.listdir(reference_path))]
+
+        # noinspection PyUnusedLocal
+        def find_files_mock(_, time_range):
+            return [[os.path.basename(file_path), None, None, 0, {'OPENDAP': file_path}] for file_path in file_paths]
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.EsaCciOdpDataSource._find_files', find_files_mock):
+            ds = soilmoisture_data_source.open_dataset(region='10,20,30,40', var_names=['sm'])
+
+        # Same result as subsetting the full dataset
+        expected_ds = subset_spatial_impl(normalize_impl(open_xarray_dataset(file_paths)), '10,20,30,40')
+        self.assertEqual(set(ds.data_vars), {'sm'})
+        np.testing.assert_array_equal(ds.lat.values, expected_ds.lat.values)
+        np.testing.assert_array_equal(ds.lon.values, expected_ds.lon.values)
+        np.testing.assert_array_equal(ds.sm.values, expected_ds.sm.values)
+
     def test_data_store(self):
         self.assertIs(self.first_oc_data_source.data_store,
                       self.data_store)
@@ -267,6 +419,20 @@ class EsaCciOdpDataSourceTest(unittest.TestCase):
         self.assertIn('Long name:        Downwelling attenuation coefficient at 490nm',
                       format_variables_info_string(self.first_oc_data_source.variables_info))
 
+    def test_cache_info(self):
+        data_source = self.first_oc_data_source
+        file_recs = [['a.nc', datetime.datetime(2000, 1, 1), datetime.datetime(2000, 1, 2), 10, {}, None, None],
+                     ['b.nc', datetime.datetime(2000, 1, 2), datetime.datetime(2000, 1, 3), 10, {}, 'ab', 'MD5'],
+                     ['c.nc', datetime.datetime(2000, 1, 4), datetime.datetime(2000, 1, 5), 10, {}, None, None]]
+        dataset_dir = os.path.join(self.tmp_dir, 'dataset')
+        os.makedirs(dataset_dir)
+        for file_rec in file_recs[:2]:
+            open(os.path.join(dataset_dir, file_rec[0]), 'w').close()
+        with unittest.mock.patch.object(data_source, '_find_files', return_value=file_recs), \
+                unittest.mock.patch.object(data_source, 'local_dataset_dir', return_value=dataset_dir):
+            self.assertEqual(data_source.cache_info,
+                             OrderedDict([(datetime.datetime(2000, 1, 1), datetime.datetime(2000, 1, 3))]))
+
     @unittest.skip(reason='ssl error on windows')
     def test_temporal_coverage(self):
         self.assertEqual(self.first_oc_data_source.temporal_coverage(),
@@ -340,6 +506,303 @@ class EsaCciOdpDataSourceTest(unittest.TestCase):
         self.assert_tf('20060107-ESACCI-L4_FIRE-BA-MERIS-fv4.1.nc', '%Y%m%d')
 
 
+class FetchFileListJsonTest(unittest.TestCase):
+
+    def test_checksum(self):
+        json_dict = {'response': {'numFound': 1, 'docs': [
+            {'title': 'ESACCI-OC-L3S-RRS-MERGED-1D_DAILY_4km_GEO_PML_RRS-19980418-fv1.0.nc',
+             'size': 1234,
+             'checksum': ['0a1b2c'],
+             'checksum_type': ['SHA256'],
+             'url': ['http://data.ceda.ac.uk/x.nc|application/netcdf|HTTPServer']}]}}
+        with unittest.mock.patch('cate.ds.esa_cci_odp._fetch_solr_json', return_value=json_dict):
+            file_list = _fetch_file_list_json('ds', 'ds_query')
+        self.assertEqual(file_list, [['ESACCI-OC-L3S-RRS-MERGED-1D_DAILY_4km_GEO_PML_RRS-19980418-fv1.0.nc',
+                                      '1998-04-18 00:00:00', None, 1234,
+                                      {'HTTPServer': 'http://data.ceda.ac.uk/x.nc'},
+                                      '0a1b2c', 'SHA256']])
+
+
+class _SolrRequestHandler(BaseHTTPRequestHandler):
+    """
+    A minimal stand-in for the ESGF Solr search service.
+    """
+
+    def do_GET(self):
+        query_args = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(self.path).query))
+        with self.server.lock:
+            self.server.requests.append(query_args)
+        docs = self.server.docs
+        if 'from' in query_args:
+            docs = [doc for doc in docs if doc['_timestamp'] >= query_args['from']]
+        offset = int(query_args.get('offset', 0))
+        limit = int(query_args.get('limit', 10))
+        json_text = json.dumps({'responseHeader': {'status': 0},
+                                'response': {'numFound': len(docs), 'docs': docs[offset:offset + limit]}})
+        data = json_text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class SolrIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _ThreadingHTTPServer(('127.0.0.1', 0), _SolrRequestHandler)
+        cls.server.lock = threading.Lock()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = 'http://127.0.0.1:%d/esg-search/search/' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.docs = [dict(id='ds-%02d.v1' % i, master_id='ds-%02d' % i, instance_id='ds-%02d.v1' % i,
+                                 _timestamp='2018-01-01T00:00:00Z')
+                            for i in range(10)]
+        self.server.requests = []
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _get_master_ids(self, json_dict):
+        return [doc.get('master_id') for doc in json_dict['response']['docs']]
+
+    def test_fetch_solr_json(self):
+        json_dict = _fetch_solr_json(self.base_url, dict(type='Dataset'), limit=3)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(10)])
+        self.assertEqual(sorted(int(args['offset']) for args in self.server.requests), [0, 3, 6, 9])
+
+        self.server.requests = []
+        json_dict = _fetch_solr_json(self.base_url, dict(type='Dataset'), limit=10)
+        self.assertEqual(len(json_dict['response']['docs']), 10)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_update_solr_json(self):
+        json_dict = _fetch_solr_json(self.base_url, dict(type='Dataset'), limit=3)
+
+        # A new dataset and a new version of an existing one
+        self.server.docs[4] = dict(id='ds-04.v2', master_id='ds-04', instance_id='ds-04.v2',
+                                   _timestamp='2018-02-01T00:00:00Z')
+        self.server.docs.append(dict(id='ds-10.v1', master_id='ds-10', instance_id='ds-10.v1',
+                                     _timestamp='2018-02-01T00:00:00Z'))
+        self.server.requests = []
+        json_dict = _update_solr_json(json_dict, datetime.datetime(2018, 1, 15), self.base_url,
+                                      dict(type='Dataset'), limit=3)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(11)])
+        self.assertEqual(json_dict['response']['docs'][4]['id'], 'ds-04.v2')
+        self.assertEqual(json_dict['response']['numFound'], 11)
+        # Only changed documents are fetched, plus the number of all documents
+        self.assertEqual([(args.get('from'), args['limit']) for args in self.server.requests],
+                         [('2018-01-14T23:00:00Z', '3'), (None, '0')])
+
+        # A retracted dataset requires fetching all documents
+        del self.server.docs[0]
+        self.server.requests = []
+        json_dict = _update_solr_json(json_dict, datetime.datetime(2018, 3, 1), self.base_url,
+                                      dict(type='Dataset'), limit=3)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(1, 11)])
+        self.assertEqual(len(self.server.requests), 6)
+
+    def test_load_or_fetch_json(self):
+        def load_or_fetch_json(expiration_days):
+            return _load_or_fetch_json(_fetch_solr_json,
+                                       fetch_json_args=[self.base_url, dict(type='Dataset')],
+                                       fetch_json_kwargs=dict(limit=4),
+                                       cache_used=True,
+                                       cache_dir=self.tmp_dir,
+                                       cache_json_filename='dataset-list.records',
+                                       cache_timestamp_filename='dataset-list-timestamp.json',
+                                       cache_expiration_days=expiration_days,
+                                       cache_records_path=('response', 'docs'),
+                                       cache_key_names=('master_id',),
+                                       update_json_function=_update_solr_json)
+
+        json_dict = load_or_fetch_json(1.0)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(10)])
+        self.assertEqual(len(self.server.requests), 3)
+
+        # Cached index is used
+        self.server.requests = []
+        json_dict = load_or_fetch_json(1.0)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(10)])
+        self.assertEqual(self.server.requests, [])
+        self.assertFalse(any(doc.is_decoded for doc in json_dict['response']['docs']))
+
+        # Expired index is updated
+        json_dict = load_or_fetch_json(0.0)
+        self.assertEqual(self._get_master_ids(json_dict), ['ds-%02d' % i for i in range(10)])
+        self.assertEqual([args.get('from') is not None for args in self.server.requests], [True, False])
+
+        # Server not reachable, expired index is used
+        with unittest.mock.patch('cate.ds.esa_cci_odp._fetch_solr_page', side_effect=DataAccessError('offline')):
+            json_dict = load_or_fetch_json(0.0)
+        self.assertEqual(len(json_dict['response']['docs']), 10)
+
+    def test_load_or_fetch_json_removes_stale_json_cache(self):
+        # Written by older Cate versions
+        stale_json_file = os.path.join(self.tmp_dir, 'file-list.json')
+        with open(stale_json_file, 'w') as fp:
+            json.dump([['file-1.nc', '2000-01-01T00:00:00']], fp)
+
+        file_list = _load_or_fetch_json(lambda: [['file-2.nc', '2000-01-02T00:00:00']],
+                                        cache_used=True,
+                                        cache_dir=self.tmp_dir,
+                                        cache_json_filename='file-list.records',
+                                        cache_timestamp_filename='file-list-timestamp.txt')
+        self.assertEqual(file_list, [['file-2.nc', '2000-01-02T00:00:00']])
+        self.assertFalse(os.path.exists(stale_json_file))
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, 'file-list.records')))
+
+
+class BuildCatalogueTest(unittest.TestCase):
+
+    def test_build_catalogue(self):
+        requests = []
+
+        def new_record(uri):
+            identification = types.SimpleNamespace(abstract='', bbox=None, date=[], title=uri,
+                                                   uricode=[uri, uri + '.ds'], uselimitation=[],
+                                                   temporalextent_start=None, temporalextent_end=None)
+            return types.SimpleNamespace(identification=identification)
+
+        class CatalogueServiceWebMock:
+            def __init__(self, *args, **kwargs):
+                self.results = None
+                self.records = None
+
+            def getrecords2(self, startposition=0, maxrecords=10, **kwargs):
+                requests.append(startposition)
+                self.results = dict(matches=25)
+                self.records = OrderedDict(('r%02d' % i, new_record('uri-%02d' % i))
+                                           for i in range(startposition, min(startposition + maxrecords, 25)))
+
+        with unittest.mock.patch('cate.ds.esa_cci_odp.CatalogueServiceWeb', CatalogueServiceWebMock), \
+                unittest.mock.patch('cate.ds.esa_cci_odp._CSW_MAX_RESULTS', 10):
+            catalogue = EsaCciCatalogueService('http://csw').getrecords()
+        self.assertEqual(sorted(requests), [0, 10, 20])
+        self.assertEqual(sorted(catalogue.keys()), ['uri-%02d' % i for i in range(25)])
+        self.assertEqual(catalogue['uri-07']['data_sources'], ['uri-07.ds'])
+
+
+def _slow_identity(value, delay):
+    time.sleep(delay)
+    if value < 0:
+        raise OSError('server not reachable')
+    return value
+
+
+class RunOrderedTest(unittest.TestCase):
+
+    def test_commit_order(self):
+        # Later calls complete first
+        args_list = [(value, 0.1 * (4 - value)) for value in range(5)]
+        committed = []
+        _run_ordered(_slow_identity, args_list, lambda index, result: committed.append((index, result)),
+                     max_workers=3)
+        self.assertEqual(committed, [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4)])
+
+    def test_failure(self):
+        args_list = [(0, 0.2), (1, 0.2), (-1, 0.), (3, 0.)]
+        committed = []
+        with self.assertRaises(OSError):
+            _run_ordered(_slow_identity, args_list, lambda index, result: committed.append(result),
+                         max_workers=2)
+        self.assertEqual(committed, [0, 1])
+
+    def test_single_worker(self):
+        committed = []
+        _run_ordered(_slow_identity, [(1, 0.), (2, 0.)], lambda index, result: committed.append(result),
+                     max_workers=1)
+        self.assertEqual(committed, [1, 2])
+
+
+class DatasetConstraintTest(unittest.TestCase):
+
+    @staticmethod
+    def _create_dataset():
+        return xr.Dataset({'sm': (['time', 'lat', 'lon'], np.zeros((1, 18, 36))),
+                           'sm_noise': (['time', 'lat', 'lon'], np.zeros((1, 18, 36))),
+                           'time_bnds': (['time', 'bnds'], np.zeros((1, 2))),
+                           'lat': np.linspace(85., -85., 18),
+                           'lon': np.linspace(-175., 175., 36),
+                           'time': [np.datetime64('2000-01-01')]})
+
+    def test_to_dap_url(self):
+        constraint = _DatasetConstraint.resolve(self._create_dataset(), region='-20,-10,20,30', var_names=['sm'])
+        self.assertEqual(list(constraint.var_dims), ['sm', 'time_bnds', 'lat', 'lon', 'time'])
+        self.assertEqual(constraint.index_slices, dict(lat=slice(5, 11), lon=slice(15, 21)))
+        self.assertEqual(constraint.to_dap_url('http://data.ceda.ac.uk/sm.nc', dict(time=1, lat=18, lon=36, bnds=2)),
+                         'http://data.ceda.ac.uk/sm.nc?'
+                         'sm[0:1:0][5:1:10][15:1:20],time_bnds,lat[5:1:10],lon[15:1:20],time')
+        # Unconstrained dimensions are read entirely, even if their sizes differ from those of the first file
+        self.assertEqual(constraint.to_dap_url('http://data.ceda.ac.uk/sm.nc', dict(time=3, lat=18, lon=36, bnds=2)),
+                         'http://data.ceda.ac.uk/sm.nc?'
+                         'sm[0:1:2][5:1:10][15:1:20],time_bnds,lat[5:1:10],lon[15:1:20],time')
+
+    def test_to_dap_url_quotes_names(self):
+        constraint = _DatasetConstraint(OrderedDict([('sm noise', ('lat',)), ('lat', ('lat',))]),
+                                        dict(lat=slice(2, 4)))
+        self.assertEqual(constraint.to_dap_url('http://data.ceda.ac.uk/sm.nc', dict(lat=18)),
+                         'http://data.ceda.ac.uk/sm.nc?sm%20noise[2:1:3],lat[2:1:3]')
+
+    def test_fetch_dap_dim_sizes(self):
+        dds = b"Dataset {\n" \
+              b"    Float32 sm[time = 3][lat = 18][lon = 36];\n" \
+              b"    Float64 time_bnds[time = 3][bnds = 2];\n" \
+              b"    Float64 lat[lat = 18];\n" \
+              b"} sm.nc;\n"
+        response = unittest.mock.MagicMock()
+        response.__enter__.return_value.read.return_value = dds
+        with unittest.mock.patch('urllib.request.urlopen', return_value=response) as urlopen:
+            dim_sizes = _fetch_dap_dim_sizes('http://data.ceda.ac.uk/sm.nc')
+        self.assertEqual(urlopen.call_args[0][0], 'http://data.ceda.ac.uk/sm.nc.dds')
+        self.assertEqual(dim_sizes, dict(time=3, lat=18, lon=36, bnds=2))
+
+    def test_apply(self):
+        ds = self._create_dataset()
+        constraint = _DatasetConstraint.resolve(ds, region='-20,-10,20,30', var_names=['sm'])
+        subset = constraint.apply(ds)
+        self.assertEqual(set(subset.data_vars), {'sm', 'time_bnds'})
+        self.assertEqual(subset.lat.values[0], 35.)
+        self.assertEqual(subset.lat.values[-1], -15.)
+        self.assertEqual(subset.lon.values[0], -25.)
+        self.assertEqual(subset.lon.values[-1], 25.)
+
+    def test_region_crossing_antimeridian(self):
+        ds = self._create_dataset()
+        ds['sm'][:] = 1.
+        # As given by users, and as converted by make_local()
+        for region in ['170,-10,-170,10', 'POLYGON((170 -10, -170 -10, -170 10, 170 10, 170 -10))',
+                       PolygonLike.convert('170,-10,-170,10')]:
+            constraint = _DatasetConstraint.resolve(ds, region=region, var_names=['sm'])
+            # Longitudes are not constrained, both ends are required
+            self.assertEqual(list(constraint.index_slices), ['lat'])
+            expected = subset_spatial_impl(ds, region)
+            actual = subset_spatial_impl(constraint.apply(ds), region)
+            self.assertEqual(list(actual.lon.values), list(expected.lon.values))
+            self.assertEqual(int(actual.sm.count()), int(expected.sm.count()))
+            self.assertGreater(int(actual.sm.count()), 0)
+
+    def test_no_region(self):
+        constraint = _DatasetConstraint.resolve(self._create_dataset(), var_names=['sm_noise'])
+        self.assertEqual(constraint.index_slices, {})
+        self.assertEqual(constraint.to_dap_url('http://data.ceda.ac.uk/sm.nc'),
+                         'http://data.ceda.ac.uk/sm.nc?sm_noise,time_bnds,lat,lon,time')
+
+
 class DownloadStatisticsTest(unittest.TestCase):
 
     def test_make_local_and_update(self):
@@ -351,3 +814,8 @@ class DownloadStatisticsTest(unittest.TestCase):
         self.assertEqual(str(download_stats), '48 of 64 MB @ 0.000 MB/s, 75.0% complete')
         download_stats.handle_chunk(16000000)
         self.assertEqual(str(download_stats), '64 of 64 MB @ 0.000 MB/s, 100.0% complete')
+
+    def test_unknown_size(self):
+        download_stats = _DownloadStatistics(0)
+        download_stats.handle_chunk(16000000)
+        self.assertEqual(str(download_stats), '16 MB @ 0.000 MB/s')
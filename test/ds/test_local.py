@@ -1,3 +1,5 @@
+import glob
+import importlib.util
 import os
 import os.path
 import tempfile
@@ -22,7 +24,7 @@ class LocalDataStoreTest(unittest.TestCase):
         self.assertEqual(0, len(os.listdir(self.tmp_dir)))
         self.data_store.add_pattern("ozone", "/DATA/ozone/*/*.nc")
         self.data_store.add_pattern("aerosol", ["/DATA/aerosol/*/*/AERO_V1*.nc", "/DATA/aerosol/*/*/AERO_V2*.nc"])
-        self.assertEqual(2, len(os.listdir(self.tmp_dir)))
+        self.assertEqual(2, len(glob.glob(os.path.join(self.tmp_dir, '*.json'))))
 
         self._existing_local_data_store = DATA_STORE_REGISTRY.get_data_store('local')
         DATA_STORE_REGISTRY.add_data_store(LocalDataStore('local', self.tmp_dir))
@@ -81,6 +83,7 @@ class LocalDataStoreTest(unittest.TestCase):
     def test_query(self):
         local_data_store = LocalDataStore('test', os.path.join(os.path.dirname(__file__),
                                                                'resources/datasources/local/'))
+        self.addCleanup(os.remove, os.path.join(local_data_store.data_store_path, '.catalogue'))
         data_sources = local_data_store.query()
         self.assertEqual(len(data_sources), 2)
 
@@ -92,6 +95,42 @@ class LocalDataStoreTest(unittest.TestCase):
         self.assertEqual(len(data_sources), 1)
         self.assertIsNotNone(data_sources[0].temporal_coverage())
 
+    def test_catalogue(self):
+        data_sources = self.data_store.query()
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp_dir, '.catalogue')))
+        ozone_files = self.data_store.query('test.ozone')[0]._files
+
+        # Data source configurations are not loaded if the catalogue is up to date
+        data_store2 = LocalDataStore('test', self.tmp_dir)
+        with unittest.mock.patch.object(LocalDataStore, '_load_data_source') as load_data_source:
+            data_sources2 = data_store2.query()
+            load_data_source.assert_not_called()
+        data_sources = {ds.id: ds for ds in data_sources}
+        data_sources2 = {ds.id: ds for ds in data_sources2}
+        self.assertEqual(data_sources2.keys(), data_sources.keys())
+        for ds_id, data_source in data_sources.items():
+            self.assertEqual(data_sources2[ds_id].meta_info, data_source.meta_info)
+        ozone = data_store2.query('test.ozone')[0]
+        self.assertEqual(ozone._files, ozone_files)
+
+        # Data source configurations modified out-of-band are reloaded
+        json_file = os.path.join(self.tmp_dir, 'test.ozone.json')
+        with open(json_file) as fp:
+            json_dict = json.load(fp)
+        json_dict['meta_info']['title'] = 'Ozone'
+        with open(json_file, 'w') as fp:
+            json.dump(json_dict, fp)
+        data_store2.invalidate()
+        self.assertEqual(data_store2.query('test.ozone')[0].title, 'Ozone')
+        # Unchanged data sources are reused
+        self.assertIs(data_store2.query('test.aerosol')[0], data_sources2['test.aerosol'])
+
+        data_store2.remove_data_source('test.aerosol')
+        data_store3 = LocalDataStore('test', self.tmp_dir)
+        with unittest.mock.patch.object(LocalDataStore, '_load_data_source') as load_data_source:
+            self.assertEqual([ds.title for ds in data_store3.query()], ['Ozone'])
+            load_data_source.assert_not_called()
+
     def test_load_old_datasource_from_json_dict(self):
         test_data = {
             'name': 'local.test_name',
@@ -220,8 +259,10 @@ class LocalDataSourceTest(unittest.TestCase):
         self.tmp_dir = tempfile.mkdtemp()
         self._dummy_store = LocalDataStore('dummy', 'dummy')
 
-        self._local_data_store = LocalDataStore('test', os.path.join(os.path.dirname(__file__),
-                                                                     'resources/datasources/local/'))
+        # Work on a copy so that indexes and catalogues are not written into the test resources
+        local_store_dir = os.path.join(self.tmp_dir, 'test')
+        shutil.copytree(os.path.join(os.path.dirname(__file__), 'resources/datasources/local/'), local_store_dir)
+        self._local_data_store = LocalDataStore('test', local_store_dir)
 
         self.ds1 = LocalDataSource("ozone",
                                    ["/DATA/ozone/*/*.nc"],
@@ -345,6 +386,40 @@ class LocalDataSourceTest(unittest.TestCase):
         self.assertEqual(self.ds3.temporal_coverage(), (datetime.datetime(2017, 2, 26, 0, 0),
                                                         datetime.datetime(2017, 2, 28, 0, 0)))
 
+    def test_select_files(self):
+        files = OrderedDict()
+        files['unknown.nc'] = None
+        files['instant.nc'] = datetime.datetime(2000, 1, 10, 12)
+        for day in range(100):
+            start = datetime.datetime(2000, 1, 1) + datetime.timedelta(days=day)
+            files['file%02d.nc' % day] = (start, start + datetime.timedelta(hours=23, minutes=59))
+        data_source = LocalDataSource('many_files', files, self._dummy_store)
+
+        def expected_files(time_range):
+            return [file for file, coverage in files.items()
+                    if isinstance(coverage, tuple) and time_range[0] <= coverage[0] and coverage[1] <= time_range[1]
+                    or isinstance(coverage, datetime.datetime) and time_range[0] <= coverage < time_range[1]]
+
+        for time_range in [(datetime.datetime(2000, 1, 10), datetime.datetime(2000, 1, 12, 23, 59)),
+                           (datetime.datetime(2000, 1, 10, 12), datetime.datetime(2000, 1, 12, 12)),
+                           (datetime.datetime(1999, 1, 1), datetime.datetime(2001, 1, 1)),
+                           (datetime.datetime(2001, 1, 1), datetime.datetime(2002, 1, 1))]:
+            self.assertEqual(sorted(data_source._select_files(time_range)), sorted(expected_files(time_range)))
+
+        self.assertEqual(data_source._select_files(None), list(files.keys()))
+
+        # The index is updated when files are added
+        data_source = LocalDataSource('many_files',
+                                      OrderedDict((file, coverage) for file, coverage in files.items()
+                                                  if isinstance(coverage, tuple)),
+                                      self._dummy_store)
+        self.assertEqual(data_source._select_files((datetime.datetime(2001, 1, 1), datetime.datetime(2002, 1, 1))),
+                         [])
+        with unittest.mock.patch.object(LocalDataSource, 'save'):
+            data_source.add_dataset('late.nc', (datetime.datetime(2001, 6, 1), datetime.datetime(2001, 6, 2)))
+        self.assertEqual(data_source._select_files((datetime.datetime(2001, 1, 1), datetime.datetime(2002, 1, 1))),
+                         ['late.nc'])
+
     def test_open_dataset(self):
         ds = self._local_data_store.query('local')[0]
 
@@ -420,6 +495,93 @@ class LocalDataSourceTest(unittest.TestCase):
                                                          datetime.datetime(2020, 11, 15, 23, 59)))
             self.assertIsNone(no_data)
 
+    def test_make_local_updates_catalogue_once(self):
+        data_source = self._local_data_store.query('local_w_temporal')[0]
+
+        def count_catalogue_saves(local_name, time_range):
+            with unittest.mock.patch.object(LocalDataStore, '_save_catalogue', autospec=True,
+                                            side_effect=LocalDataStore._save_catalogue) as save_catalogue:
+                local_ds = data_source.make_local(local_name, time_range=time_range)
+            return len(local_ds._files), save_catalogue.call_count
+
+        with unittest.mock.patch.object(EsaCciOdpDataStore, 'query', return_value=[]):
+            num_files_1, num_saves_1 = count_catalogue_saves('from_local_to_local_1',
+                                                             (datetime.datetime(1978, 11, 14, 0, 0),
+                                                              datetime.datetime(1978, 11, 14, 23, 59)))
+            num_files_3, num_saves_3 = count_catalogue_saves('from_local_to_local_3',
+                                                             (datetime.datetime(1978, 11, 14, 0, 0),
+                                                              datetime.datetime(1978, 11, 16, 23, 59)))
+        self.assertEqual((num_files_1, num_files_3), (1, 3))
+        # The number of catalogue updates doesn't depend on the number of files
+        self.assertEqual(num_saves_1, num_saves_3)
+
+    def test_make_local_extends_existing_copy(self):
+        data_source = self._local_data_store.query('local_w_temporal')[0]
+
+        with unittest.mock.patch.object(EsaCciOdpDataStore, 'query', return_value=[]):
+            local_ds = data_source.make_local('from_local_to_local_extend',
+                                              time_range=(datetime.datetime(1978, 11, 14, 0, 0),
+                                                          datetime.datetime(1978, 11, 14, 23, 59)))
+            self.assertEqual(local_ds.files_temporal_coverage(),
+                             (datetime.datetime(1978, 11, 14, 0, 0), datetime.datetime(1978, 11, 14, 23, 59)))
+
+            with unittest.mock.patch('shutil.copy', wraps=shutil.copy) as copy:
+                extended_ds = data_source.make_local('from_local_to_local_extend',
+                                                     time_range=(datetime.datetime(1978, 11, 14, 0, 0),
+                                                                 datetime.datetime(1978, 11, 15, 23, 59)))
+            self.assertIs(extended_ds, local_ds)
+            self.assertEqual(copy.call_count, 1)
+            self.assertEqual(extended_ds.temporal_coverage(),
+                             (datetime.datetime(1978, 11, 14, 0, 0), datetime.datetime(1978, 11, 15, 23, 59)))
+            self.assertEqual(extended_ds.files_temporal_coverage(),
+                             (datetime.datetime(1978, 11, 14, 0, 0), datetime.datetime(1978, 11, 15, 23, 59)))
+            self.assertEqual(extended_ds.open_dataset().dims['time'], 2)
+
+            self.assertEqual(extended_ds.get_missing_files([os.path.join(extended_ds.id, 'a.nc')]),
+                             [os.path.join(extended_ds.id, 'a.nc')])
+
+    @unittest.skipUnless(importlib.util.find_spec('zarr'), 'zarr not installed')
+    def test_make_local_zarr(self):
+        data_source = self._local_data_store.query('local_w_temporal')[0]
+        config = dict(local_data_store_format='zarr', local_data_store_zarr_chunking='both')
+
+        with unittest.mock.patch.object(EsaCciOdpDataStore, 'query', return_value=[]), \
+                unittest.mock.patch('cate.ds.local.get_config_value',
+                                    side_effect=lambda name, default=None: config.get(name, default)):
+            local_ds = data_source.make_local('from_local_to_zarr',
+                                              time_range=(datetime.datetime(1978, 11, 15, 0, 0),
+                                                          datetime.datetime(1978, 11, 15, 23, 59)))
+            self.assertEqual(local_ds.storage_format, 'zarr')
+            self.assertEqual(local_ds.zarr_layouts, ['map', 'time_series'])
+            self.assertEqual(sorted(os.listdir(local_ds.local_copy_dir)), ['map.zarr', 'time_series.zarr'])
+
+            # Extend into the past, which rewrites the stores, and into the future, which appends to them
+            for time_range in [(datetime.datetime(1978, 11, 14, 0, 0), datetime.datetime(1978, 11, 15, 23, 59)),
+                               (datetime.datetime(1978, 11, 14, 0, 0), datetime.datetime(1978, 11, 16, 23, 59))]:
+                local_ds = data_source.make_local('from_local_to_zarr', time_range=time_range)
+                self.assertEqual(sorted(os.listdir(local_ds.local_copy_dir)), ['map.zarr', 'time_series.zarr'])
+
+        dataset = local_ds.open_dataset()
+        self.assertEqual(dataset.dims['time'], 3)
+        self.assertEqual(list(dataset.time.values), sorted(dataset.time.values))
+        self.assertEqual(dataset.sm.data.chunks[0], (1, 1, 1))
+        self.assertIn('sm', dataset)
+
+        dataset = local_ds.open_dataset(time_range=(datetime.datetime(1978, 11, 14, 0, 0),
+                                                    datetime.datetime(1978, 11, 16, 0, 0)),
+                                        region='10,10,20,20')
+        self.assertEqual(dataset.dims['time'], 2)
+        self.assertEqual(dataset.sm.data.chunks[0], (2,))
+
+        with self.assertRaises(ValidationError):
+            local_ds.open_dataset(time_range=(datetime.datetime(1978, 11, 20), datetime.datetime(1978, 11, 21)))
+
+        # Local copies of Zarr-backed local copies
+        with unittest.mock.patch.object(EsaCciOdpDataStore, 'query', return_value=[]):
+            copy_ds = local_ds.make_local('from_zarr_to_local', var_names=['sm'])
+        self.assertEqual(copy_ds.storage_format, 'netcdf')
+        self.assertEqual(list(copy_ds.open_dataset().time.values), list(local_ds.open_dataset().time.values))
+
     def test_remove_data_source_by_id(self):
         data_sources = self._local_data_store.query('local_w_temporal')
         data_sources_len_before_remove = len(data_sources)
@@ -449,3 +611,118 @@ class LocalDataSourceTest(unittest.TestCase):
                                         datetime.datetime(1975, 1, 1)),
                             region=(1, -1, 3, 6),
                             var_names=('pippo', ))
+
+
+class LocalDataStoreQuotaTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_store = LocalDataStore('local', self.tmp_dir)
+        refs_dir = os.path.join(self.tmp_dir, 'workspace-refs')
+        self._refs_dir_patch = unittest.mock.patch.dict(os.environ, CATE_WORKSPACE_REFS_PATH=refs_dir)
+        self._refs_dir_patch.start()
+
+    def tearDown(self):
+        self._refs_dir_patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _new_local_copy(self, name: str, size: int, last_access: datetime.datetime = None):
+        data_source = self.data_store.create_data_source(name)
+        os.makedirs(data_source.local_copy_dir)
+        file = os.path.join(data_source.id, 'data.nc')
+        with open(os.path.join(self.tmp_dir, file), 'wb') as fp:
+            fp.write(b'x' * size)
+        data_source.add_dataset(file, (datetime.datetime(2000, 1, 1), datetime.datetime(2000, 1, 2)))
+        self.data_store.register_ds(data_source)
+        if last_access:
+            data_source._last_access = last_access
+            data_source.save()
+        return data_source
+
+    def test_usage_is_recorded(self):
+        data_source = self._new_local_copy('copy', 1000)
+        self.assertTrue(data_source.is_local_copy)
+        self.assertEqual(data_source.size, 1000)
+        self.assertIsNotNone(data_source.last_access)
+
+        with open(os.path.join(self.tmp_dir, 'local.copy.json')) as fp:
+            json_dict = json.load(fp)
+        self.assertEqual(json_dict['usage']['size'], 1000)
+
+        # Usage is restored from the data source configuration and the catalogue
+        for data_store in [LocalDataStore('local', self.tmp_dir), LocalDataStore('local', self.tmp_dir)]:
+            data_source_2 = data_store.query('local.copy')[0]
+            self.assertEqual(data_source_2.size, 1000)
+            self.assertEqual(data_source_2.last_access, data_source.last_access)
+
+        pattern_data_source = self.data_store.add_pattern('pattern', os.path.join(self.tmp_dir, '*.json'))
+        self.assertFalse(pattern_data_source.is_local_copy)
+        self.assertIsNone(pattern_data_source.size)
+        self.assertEqual([ds.id for ds in self.data_store.get_local_copies()], ['local.copy'])
+
+    def test_evict(self):
+        self._new_local_copy('copy_1', 1000, datetime.datetime(2018, 1, 3))
+        self._new_local_copy('copy_2', 1000, datetime.datetime(2018, 1, 1))
+        self._new_local_copy('copy_3', 1000, datetime.datetime(2018, 1, 2))
+        self.assertEqual([ds.id for ds in self.data_store.get_local_copies()],
+                         ['local.copy_2', 'local.copy_3', 'local.copy_1'])
+
+        self.assertEqual(self.data_store.evict(quota=3000), [])
+        self.assertEqual(self.data_store.evict(quota=1500), ['local.copy_2', 'local.copy_3'])
+        self.assertEqual([ds.id for ds in self.data_store.query()], ['local.copy_1'])
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'local.copy_2')))
+
+    def test_evict_keeps_copies_referenced_by_workspaces(self):
+        from cate.core.workspace import Workspace, mk_op_kwargs
+        from cate.ops.io import open_dataset
+
+        op_name = open_dataset.op_meta_info.qualified_name
+        self._new_local_copy('copy_1', 1000, datetime.datetime(2018, 1, 1))
+        self._new_local_copy('esacci.OC.day.1a2b', 1000, datetime.datetime(2018, 1, 2))
+        self._new_local_copy('copy_3', 1000, datetime.datetime(2018, 1, 3))
+
+        workspace = Workspace.create(os.path.join(self.tmp_dir, 'workspace'))
+        workspace.set_resource(op_name, mk_op_kwargs(ds_id='local.copy_1'), res_name='ds1', validate_args=False)
+        workspace.set_resource(op_name, mk_op_kwargs(ds_id='esacci.OC.day'), res_name='ds2', validate_args=False)
+        self.assertEqual(self.data_store.evict(quota=0), ['local.copy_3'])
+
+        workspace.close()
+        self.assertEqual(self.data_store.evict(quota=0), ['local.copy_1', 'local.esacci.OC.day.1a2b'])
+
+    def test_evict_keeps_copies_referenced_by_workspaces_of_other_processes(self):
+        from cate.core.workspace import Workspace, _get_process_create_time
+
+        self._new_local_copy('copy_1', 1000, datetime.datetime(2018, 1, 1))
+        self._new_local_copy('copy_2', 1000, datetime.datetime(2018, 1, 2))
+
+        refs_dir = os.path.join(self.tmp_dir, 'workspace-refs')
+        os.makedirs(refs_dir)
+        # The parent process is alive, a process with another creation time is not
+        parent_pid = os.getppid()
+        live_refs_file = os.path.join(refs_dir, '1-1.json')
+        with open(live_refs_file, 'w') as fp:
+            json.dump(dict(pid=parent_pid, create_time=_get_process_create_time(parent_pid),
+                           ds_ids=['local.copy_1']), fp)
+        stale_refs_file = os.path.join(refs_dir, '2-2.json')
+        with open(stale_refs_file, 'w') as fp:
+            json.dump(dict(pid=parent_pid, create_time=1, ds_ids=['local.copy_2']), fp)
+
+        self.assertEqual(self.data_store.evict(quota=0), ['local.copy_2'])
+        self.assertTrue(os.path.isfile(live_refs_file))
+        self.assertFalse(os.path.isfile(stale_refs_file))
+
+        # Workspaces of this process are recorded as well, until they are closed
+        workspace = Workspace.create(os.path.join(self.tmp_dir, 'workspace'))
+        self.assertEqual(len(os.listdir(refs_dir)), 2)
+        workspace.close()
+        self.assertEqual(os.listdir(refs_dir), ['1-1.json'])
+
+    def test_quota_is_enforced(self):
+        self._new_local_copy('copy_1', 1000, datetime.datetime(2018, 1, 1))
+        self._new_local_copy('copy_2', 1000, datetime.datetime(2018, 1, 2))
+        with unittest.mock.patch('cate.ds.local.get_config_value',
+                                 side_effect=lambda name, default=None:
+                                 2500 / (1024 ** 3) if name == 'local_data_store_quota' else default):
+            self._new_local_copy('copy_3', 1000)
+            self.assertEqual([ds.id for ds in self.data_store.query()], ['local.copy_2', 'local.copy_3'])
+            self._new_local_copy('copy_4', 3000)
+            self.assertEqual([ds.id for ds in self.data_store.query()], ['local.copy_4'])
@@ -0,0 +1,141 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from cate.core.types import ValidationError
+from cate.ds.local_zarr import check_zarr_available, get_zarr_chunk_sizes, get_zarr_layouts, open_zarr, write_zarr, \
+    _get_aligned_chunks, _recover_replaced_store, _replace_store
+
+
+def _new_dataset(start_date: str, num_times: int, num_lats: int = 180, num_lons: int = 360) -> xr.Dataset:
+    time = pd.date_range(start_date, periods=num_times, freq='D')
+    data = np.arange(num_times * num_lats * num_lons, dtype=np.float32).reshape((num_times, num_lats, num_lons))
+    return xr.Dataset({'sst': (('time', 'lat', 'lon'), data)},
+                      coords={'time': time,
+                              'lat': np.linspace(-89.5, 89.5, num_lats),
+                              'lon': np.linspace(-179.5, 179.5, num_lons)})
+
+
+class ChunkingTest(TestCase):
+    def test_get_zarr_layouts(self):
+        self.assertEqual(get_zarr_layouts('map'), ['map'])
+        self.assertEqual(get_zarr_layouts('time_series'), ['time_series'])
+        self.assertEqual(get_zarr_layouts('both'), ['map', 'time_series'])
+        with self.assertRaises(ValidationError):
+            get_zarr_layouts('maps')
+
+    def test_get_zarr_chunk_sizes(self):
+        dataset = _new_dataset('2000-01-01', 3, num_lats=3600, num_lons=7200)
+        self.assertEqual(get_zarr_chunk_sizes(dataset, 'map'), dict(time=1, lat=145, lon=7200))
+        self.assertEqual(get_zarr_chunk_sizes(dataset, 'time_series'), dict(time=256, lat=64, lon=64))
+
+        dataset = _new_dataset('2000-01-01', 3, num_lats=18, num_lons=36)
+        self.assertEqual(get_zarr_chunk_sizes(dataset, 'map'), dict(time=1, lat=18, lon=36))
+        self.assertEqual(get_zarr_chunk_sizes(dataset, 'time_series'), dict(time=256, lat=18, lon=36))
+
+    def test_get_aligned_chunks(self):
+        self.assertEqual(_get_aligned_chunks(0, 10, 4), (4, 4, 2))
+        self.assertEqual(_get_aligned_chunks(3, 10, 4), (1, 4, 4, 1))
+        self.assertEqual(_get_aligned_chunks(5, 2, 4), (2,))
+        self.assertEqual(_get_aligned_chunks(8, 4, 4), (4,))
+
+
+class CheckZarrAvailableTest(TestCase):
+    def test_check_zarr_available(self):
+        with patch('importlib.util.find_spec', return_value=None):
+            with self.assertRaises(ValidationError):
+                check_zarr_available()
+        with patch('importlib.util.find_spec', return_value=object()):
+            check_zarr_available()
+
+
+class ReplaceStoreTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = self._new_store('store.zarr', 'old')
+        self.temp_store_path = self._new_store('store.zarr.tmp', 'new')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _new_store(self, name: str, content: str) -> str:
+        store_path = os.path.join(self.tmp_dir, name)
+        os.mkdir(store_path)
+        with open(os.path.join(store_path, '.zattrs'), 'w') as fp:
+            fp.write(content)
+        return store_path
+
+    def _read_store(self) -> str:
+        with open(os.path.join(self.store_path, '.zattrs')) as fp:
+            return fp.read()
+
+    def test_replace_store(self):
+        _replace_store(self.temp_store_path, self.store_path)
+        self.assertEqual(self._read_store(), 'new')
+        self.assertEqual(os.listdir(self.tmp_dir), ['store.zarr'])
+
+    def test_old_store_is_kept_if_replacement_fails(self):
+        rename = os.rename
+
+        def failing_rename(src, dst):
+            if src == self.temp_store_path:
+                raise OSError('disk full')
+            rename(src, dst)
+
+        with patch('os.rename', failing_rename):
+            with self.assertRaises(OSError):
+                _replace_store(self.temp_store_path, self.store_path)
+        self.assertEqual(self._read_store(), 'old')
+
+    def test_recover_replaced_store(self):
+        # Interrupted after the old store has been moved aside
+        os.rename(self.store_path, self.store_path + '.old')
+        _recover_replaced_store(self.store_path)
+        self.assertEqual(self._read_store(), 'old')
+
+        # Interrupted before the old store has been deleted
+        _replace_store(self.temp_store_path, self.store_path)
+        self._new_store('store.zarr.old', 'old')
+        _recover_replaced_store(self.store_path)
+        self.assertEqual(self._read_store(), 'new')
+        self.assertEqual(os.listdir(self.tmp_dir), ['store.zarr'])
+
+
+@skipUnless(importlib.util.find_spec('zarr'), 'zarr not installed')
+class WriteZarrTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'time_series.zarr')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_append_and_rewrite(self):
+        dataset_1 = _new_dataset('2000-01-11', 300, num_lats=18, num_lons=36)
+        dataset_2 = _new_dataset('2000-01-01', 10, num_lats=18, num_lons=36)
+        dataset_3 = _new_dataset('2000-11-06', 300, num_lats=18, num_lons=36)
+
+        write_zarr(dataset_1, self.store_path, 'time_series')
+        # Appends
+        write_zarr(dataset_3, self.store_path, 'time_series')
+        # Rewrites
+        write_zarr(dataset_2, self.store_path, 'time_series')
+
+        actual = open_zarr(self.store_path)
+        expected = xr.concat([dataset_2, dataset_1, dataset_3], dim='time')
+        self.assertEqual(actual.sst.encoding['chunks'], (256, 18, 36))
+        np.testing.assert_equal(actual.time.values, expected.time.values)
+        np.testing.assert_equal(actual.sst.values, expected.sst.values)
+        self.assertFalse(os.path.exists(self.store_path + '.tmp'))
+        self.assertFalse(os.path.exists(self.store_path + '.old'))
+
+    def test_requires_time(self):
+        with self.assertRaises(ValidationError):
+            write_zarr(_new_dataset('2000-01-01', 1).isel(time=0), self.store_path, 'map')
@@ -2,7 +2,7 @@
 Tests for aggregation operations
 """
 
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import xarray as xr
 import pandas as pd
@@ -14,6 +14,7 @@ from cate.util.monitor import ConsoleMonitor
 
 from cate.ops import long_term_average, temporal_aggregation, reduce
 from cate.ops import adjust_temporal_attrs
+from cate.ops.aggregate import _chunk_group_sums_and_counts
 
 
 class TestLTA(TestCase):
@@ -122,6 +123,76 @@ class TestLTA(TestCase):
             long_term_average(ds)
         self.assertIn('inconsistent seasons', str(err.exception))
 
+    def test_values(self):
+        """
+        Test the averaged values, including missing values and chunked input
+        """
+        data = np.arange(24 * 2 * 3, dtype=np.float64).reshape([24, 2, 3])
+        data[0, 0, 0] = np.nan
+        data[[1, 13], 1, 2] = np.nan
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], data),
+            'second': (['lat', 'time', 'lon'], data.transpose([1, 0, 2]).astype(np.int32)),
+            'lat': np.linspace(-45, 45, 2),
+            'lon': np.linspace(-120, 120, 3),
+            'time': pd.date_range('2000-01-01', freq='MS', periods=24)})
+        ds = adjust_temporal_attrs(ds)
+
+        expected = (data[:12] + data[12:]) / 2
+        expected[0, 0, 0] = data[12, 0, 0]
+        expected[1, 1, 2] = np.nan
+
+        actual = long_term_average(ds)
+        self.assertEqual(actual['first'].dims, ('time', 'lat', 'lon'))
+        self.assertEqual(actual['second'].dims, ('lat', 'time', 'lon'))
+        self.assertEqual(actual['second'].dtype, np.float64)
+        np.testing.assert_equal(actual['first'].values, expected)
+
+        actual = long_term_average(ds.chunk({'time': 5}))
+        np.testing.assert_equal(actual['first'].values, expected)
+
+        # Daily, February 29th is left out
+        data = np.arange(731, dtype=np.float64)
+        ds = xr.Dataset({
+            'first': (['time'], data),
+            'time': pd.date_range('2000-01-01', freq='D', periods=731)})
+        ds = adjust_temporal_attrs(ds)
+        actual = long_term_average(ds.chunk({'time': 100}))
+        self.assertEqual(actual.time.values[59], np.datetime64('2000-03-01'))
+        np.testing.assert_equal(actual['first'].values[:59], (data[:59] + data[366:425]) / 2)
+        np.testing.assert_equal(actual['first'].values[59:], (data[60:366] + data[425:]) / 2)
+
+    def test_chunk_partials_bounded(self):
+        """
+        Test that every chunk is reduced only into the groups of its own time steps
+        """
+        data = np.arange(731 * 2 * 3, dtype=np.float64).reshape([731, 2, 3])
+        ds = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], data),
+            'lat': np.linspace(-45, 45, 2),
+            'lon': np.linspace(-120, 120, 3),
+            'time': pd.date_range('2000-01-01', freq='D', periods=731)})
+        ds = adjust_temporal_attrs(ds)
+
+        partial_shapes = []
+
+        def chunk_group_sums_and_counts(chunk, chunk_group_indexes):
+            result = _chunk_group_sums_and_counts(chunk, chunk_group_indexes)
+            partial_shapes.append((chunk.shape, result[1].shape, result[2].shape))
+            return result
+
+        with mock.patch('cate.ops.aggregate._chunk_group_sums_and_counts', chunk_group_sums_and_counts):
+            actual = long_term_average(ds.chunk({'time': 1, 'lat': 1}))
+
+        # One partial per chunk, except for the chunks of February 29th which belong to no group
+        self.assertEqual(len(partial_shapes), 730 * 2)
+        for chunk_shape, sums_shape, counts_shape in partial_shapes:
+            self.assertLessEqual(sums_shape[0], chunk_shape[0])
+            self.assertEqual(sums_shape[1:], chunk_shape[1:])
+            self.assertEqual(counts_shape, sums_shape)
+        np.testing.assert_equal(actual['first'].values[:59], (data[:59] + data[366:425]) / 2)
+        np.testing.assert_equal(actual['first'].values[59:], (data[60:366] + data[425:]) / 2)
+
     def test_registered(self):
         """
         Test registered operation execution
@@ -417,3 +488,37 @@ class TestReduce(TestCase):
             'time': pd.date_range('2000-01-01', '2000-12-31')})
 
         self.assertTrue(actual.broadcast_equals(ex))
+
+    def test_methods(self):
+        """
+        Test the reduction methods with missing values, area weighting and chunked input
+        """
+        data = np.arange(4 * 6 * 5, dtype=np.float64).reshape([4, 6, 5])
+        data[0, 0, 0] = np.nan
+        ds = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], data, {'units': 'K'}),
+            'lat': np.linspace(-60, 60, 4),
+            'lon': np.linspace(-150, 150, 6),
+            'time': pd.date_range('2000-01-01', periods=5)})
+
+        for chunks in (None, {'lat': 3, 'time': 2}):
+            actual_ds = ds.chunk(chunks) if chunks else ds
+            for method in ['mean', 'min', 'max', 'sum', 'median', 'std', 'var', 'count']:
+                actual = reduce(actual_ds, var='first', dim=['lat', 'lon'], method=method)
+                expected = getattr(ds['first'], method)(dim=['lat', 'lon'])
+                np.testing.assert_allclose(actual['first'].values, expected.values)
+                self.assertEqual(actual['first'].dims, ('time',))
+                self.assertEqual(actual['first'].attrs, {'units': 'K'})
+
+            actual = reduce(actual_ds, var='first', dim=['lat', 'lon'], area_weighted=True)
+            expected = ds['first'].weighted(np.cos(np.deg2rad(ds.lat))).mean(dim=['lat', 'lon'])
+            np.testing.assert_allclose(actual['first'].values, expected.values)
+
+        # Integer variables keep their minima and maxima, and sums are integers as in NumPy
+        int_ds = xr.Dataset({'second': (['lat', 'lon'], np.arange(4 * 6, dtype=np.int16).reshape([4, 6]))},
+                            coords={'lat': np.linspace(-60, 60, 4), 'lon': np.linspace(-150, 150, 6)})
+        for method in ['min', 'max', 'sum']:
+            actual = reduce(int_ds, var='second', dim='lon', method=method)
+            expected = getattr(int_ds['second'].values, method)(axis=1)
+            self.assertEqual(actual['second'].dtype, expected.dtype)
+            np.testing.assert_array_equal(actual['second'].values, expected)
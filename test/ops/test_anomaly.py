@@ -2,7 +2,7 @@
 Tests for anomaly operations
 """
 
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import os
 import sys
@@ -300,6 +300,50 @@ class TestExternal(TestCase):
                 anomaly.anomaly_external(ds, tmp_file)
             self.assertIn('time coordinate.', str(err.exception))
 
+        # Test reference data that is not monthly
+        ref = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], np.ones([45, 90, 4])),
+            'lat': np.linspace(-88, 88, 45),
+            'lon': np.linspace(-178, 178, 90)})
+        ds = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], np.ones([45, 90, 24])),
+            'lat': np.linspace(-88, 88, 45),
+            'lon': np.linspace(-178, 178, 90),
+            'time': [datetime(2000, x, 1) for x in range(1, 13)] +
+                    [datetime(2001, x, 1) for x in range(1, 13)]})
+        with create_tmp_file() as tmp_file:
+            ref.to_netcdf(tmp_file, 'w')
+            with self.assertRaises(ValueError) as err:
+                anomaly.anomaly_external(ds, tmp_file)
+            self.assertIn('12 time slices', str(err.exception))
+
+    def test_cached(self):
+        """
+        Test that the reference data is read only once for repeated calculations
+        """
+        ref = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], np.arange(12.0).reshape([1, 1, 12]) * np.ones([45, 90, 12])),
+            'lat': np.linspace(-88, 88, 45),
+            'lon': np.linspace(-178, 178, 90)})
+
+        ds = xr.Dataset({
+            'first': (['lat', 'lon', 'time'], np.ones([45, 90, 14])),
+            'lat': np.linspace(-88, 88, 45),
+            'lon': np.linspace(-178, 178, 90),
+            'time': [datetime(2000, x, 1) for x in range(1, 13)] +
+                    [datetime(2001, x, 1) for x in range(1, 3)]})
+
+        expected = 1.0 - np.array(list(range(12)) + [0, 1], dtype=np.float64)
+        with create_tmp_file() as tmp_file:
+            ref.to_netcdf(tmp_file, 'w')
+            with mock.patch('xarray.open_dataset', wraps=xr.open_dataset) as open_dataset:
+                for _ in range(3):
+                    actual = anomaly.anomaly_external(ds, tmp_file)
+                    np.testing.assert_equal(actual['first'].values[10, 20], expected)
+                actual = anomaly.anomaly_external(subset_spatial(ds, '-50, -50, 50, 50'), tmp_file)
+                np.testing.assert_equal(actual['first'].values[10, 20], expected)
+                self.assertEqual(open_dataset.call_count, 1)
+
 
 class TestInternal(TestCase):
     """
@@ -52,6 +52,33 @@ class TestDsArithmetics(TestCase):
             arithmetics.ds_arithmetics(dataset, 'not')
         self.assertTrue('not implemented' in str(err.exception))
 
+    def test_fused(self):
+        dataset = xr.Dataset({
+            'first': (['lat', 'lon'], np.linspace(1, 2, 12, dtype=np.float32).reshape(3, 4), {'units': 'K'}),
+            'second': (['lat', 'lon'], np.arange(12).reshape(3, 4), {'units': 'm'}),
+            'lat': np.linspace(-80, 80, 3),
+            'lon': np.linspace(-170, 170, 4)},
+            attrs={'title': 'test'})
+
+        actual = arithmetics.ds_arithmetics(dataset, 'log, +5, *2')
+        self.assertEqual(actual.first.dtype, np.float32)
+        self.assertEqual(actual.second.dtype, np.float64)
+        np.testing.assert_allclose(actual.first.values, (np.log(dataset.first.values) + 5) * 2, rtol=1e-6)
+        np.testing.assert_allclose(actual.second.values, (np.log(dataset.second.values) + 5) * 2)
+        self.assertEqual(actual.first.attrs, {})
+        self.assertEqual(actual.attrs['title'], 'test')
+        self.assertNotIn('history', dataset.attrs)
+
+        actual = arithmetics.ds_arithmetics(dataset, 'exp, log')
+        self.assertEqual(actual.first.attrs, {'units': 'K'})
+
+        kernels_before = arithmetics._get_kernel.cache_info().currsize
+        actual = arithmetics.ds_arithmetics(dataset.chunk({'lat': 1}), 'log, +5, *2')
+        self.assertEqual(arithmetics._get_kernel.cache_info().currsize, kernels_before)
+        self.assertIsNotNone(actual.first.chunks)
+        self.assertEqual(actual.first.dtype, np.float32)
+        np.testing.assert_allclose(actual.first.values, (np.log(dataset.first.values) + 5) * 2, rtol=1e-6)
+
     def test_registered(self):
         """
         Test the operation when invoked through the OP_REGISTRY
@@ -324,3 +351,37 @@ class ComputeTest(TestCase):
             'lat': lat,
             'lon': lon})
         assert_dataset_equal(expected, actual)
+
+    def test_fused_compute(self):
+        first = np.linspace(1, 2, 12, dtype=np.float32).reshape(3, 4)
+        second = np.linspace(2, 3, 12).reshape(3, 4)
+        dataset = xr.Dataset({
+            'first': (['lat', 'lon'], first, {'units': 'K'}),
+            'second': (['lat', 'lon'], second),
+            'third': (['lat', 'lon'], np.arange(12).reshape(3, 4)),
+            'lat': np.linspace(-80, 80, 3),
+            'lon': np.linspace(-170, 170, 4)})
+
+        script = "a = np.sqrt(first) * 2 + second\n" \
+                 "b = xu.log(xu.exp(first))\n" \
+                 "c = 2 * third + 1\n" \
+                 "d = a.mean()"
+        actual = arithmetics.compute(ds=dataset.chunk({'lat': 1}), script=script)
+        self.assertEqual(set(actual.data_vars), {'a', 'b', 'c', 'd'})
+        self.assertIsNotNone(actual.a.chunks)
+        self.assertEqual(actual.a.dtype, np.float64)
+        np.testing.assert_allclose(actual.a.values, np.sqrt(first) * 2 + second)
+        self.assertEqual(actual.b.dtype, np.float32)
+        self.assertEqual(actual.b.attrs, {'units': 'K'})
+        np.testing.assert_allclose(actual.b.values, first, rtol=1e-6)
+        self.assertEqual(actual.c.dtype, dataset.third.dtype)
+        np.testing.assert_array_equal(actual.c.values, 2 * dataset.third.values + 1)
+        np.testing.assert_allclose(actual.d.values, (np.sqrt(first) * 2 + second).mean())
+
+    def test_fused_compute_aligns_like_arithmetics(self):
+        dataset = xr.Dataset({'a': (['x'], np.array([1., 2., 3.]))}, coords={'x': [0, 1, 2]})
+
+        actual = arithmetics.compute(ds=dataset, script="s = a[1:]\nc = s * 2 + a\nd = s + a")
+        np.testing.assert_array_equal(actual.c.values, [6., 9.])
+        np.testing.assert_array_equal(actual.c.x.values, [1, 2])
+        np.testing.assert_array_equal(actual.d.values, [4., 6.])
@@ -8,6 +8,7 @@ when using default upsampling/downsampling methods.
 
 from unittest import TestCase
 
+import dask.array as da
 import numpy as np
 import xarray as xr
 from numpy.testing import assert_almost_equal, assert_array_equal
@@ -48,32 +49,10 @@ class TestCoregistration(TestCase):
         ds_coarse_resampled = coregister(ds_fine, ds_coarse, monitor=rm)
         self.assertEqual([('start', 'coregister dataset', 2),
                           ('progress', 0.0, 'coregister dataarray', 0),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 0),
-                          ('progress', 0.125, None, 6),
-                          ('progress', 0.125, None, 13),
-                          ('progress', 0.125, None, 19),
-                          ('progress', 0.125, None, 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.125, None, 31),
-                          ('progress', 0.125, None, 38),
-                          ('progress', 0.125, None, 44),
-                          ('progress', 0.125, None, 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
+                          ('progress', 1.0, None, 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
-                          ('progress', 0.125, None, 56),
-                          ('progress', 0.125, None, 63),
-                          ('progress', 0.125, None, 69),
-                          ('progress', 0.125, None, 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.125, None, 81),
-                          ('progress', 0.125, None, 88),
-                          ('progress', 0.125, None, 94),
-                          ('progress', 0.125, None, 100),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 100),
+                          ('progress', 1.0, None, 100),
                           ('progress', 0.0, 'coregister dataarray', 100),
                           ('done',)], rm.records)
 
@@ -447,104 +426,10 @@ class TestCoregistration(TestCase):
 
         self.assertEqual([('start', 'coregister dataset', 2),
                           ('progress', 0.0, 'coregister dataarray', 0),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 0),
-                          ('progress', 0.03125, None, 2),
-                          ('progress', 0.03125, None, 3),
-                          ('progress', 0.03125, None, 5),
-                          ('progress', 0.03125, None, 6),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 6),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 6),
-                          ('progress', 0.03125, None, 8),
-                          ('progress', 0.03125, None, 9),
-                          ('progress', 0.03125, None, 11),
-                          ('progress', 0.03125, None, 13),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 13),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 13),
-                          ('progress', 0.03125, None, 14),
-                          ('progress', 0.03125, None, 16),
-                          ('progress', 0.03125, None, 17),
-                          ('progress', 0.03125, None, 19),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 19),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 19),
-                          ('progress', 0.03125, None, 20),
-                          ('progress', 0.03125, None, 22),
-                          ('progress', 0.03125, None, 23),
-                          ('progress', 0.03125, None, 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 25),
-                          ('progress', 0.03125, None, 27),
-                          ('progress', 0.03125, None, 28),
-                          ('progress', 0.03125, None, 30),
-                          ('progress', 0.03125, None, 31),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 31),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 31),
-                          ('progress', 0.03125, None, 33),
-                          ('progress', 0.03125, None, 34),
-                          ('progress', 0.03125, None, 36),
-                          ('progress', 0.03125, None, 38),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 38),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 38),
-                          ('progress', 0.03125, None, 39),
-                          ('progress', 0.03125, None, 41),
-                          ('progress', 0.03125, None, 42),
-                          ('progress', 0.03125, None, 44),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 44),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 44),
-                          ('progress', 0.03125, None, 45),
-                          ('progress', 0.03125, None, 47),
-                          ('progress', 0.03125, None, 48),
-                          ('progress', 0.03125, None, 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
+                          ('progress', 1.0, None, 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
                           ('progress', 0.0, 'coregister dataarray', 50),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 50),
-                          ('progress', 0.03125, None, 52),
-                          ('progress', 0.03125, None, 53),
-                          ('progress', 0.03125, None, 55),
-                          ('progress', 0.03125, None, 56),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 56),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 56),
-                          ('progress', 0.03125, None, 58),
-                          ('progress', 0.03125, None, 59),
-                          ('progress', 0.03125, None, 61),
-                          ('progress', 0.03125, None, 63),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 63),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 63),
-                          ('progress', 0.03125, None, 64),
-                          ('progress', 0.03125, None, 66),
-                          ('progress', 0.03125, None, 67),
-                          ('progress', 0.03125, None, 69),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 69),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 69),
-                          ('progress', 0.03125, None, 70),
-                          ('progress', 0.03125, None, 72),
-                          ('progress', 0.03125, None, 73),
-                          ('progress', 0.03125, None, 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 75),
-                          ('progress', 0.03125, None, 77),
-                          ('progress', 0.03125, None, 78),
-                          ('progress', 0.03125, None, 80),
-                          ('progress', 0.03125, None, 81),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 81),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 81),
-                          ('progress', 0.03125, None, 83),
-                          ('progress', 0.03125, None, 84),
-                          ('progress', 0.03125, None, 86),
-                          ('progress', 0.03125, None, 88),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 88),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 88),
-                          ('progress', 0.03125, None, 89),
-                          ('progress', 0.03125, None, 91),
-                          ('progress', 0.03125, None, 92),
-                          ('progress', 0.03125, None, 94),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 94),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 94),
-                          ('progress', 0.03125, None, 95),
-                          ('progress', 0.03125, None, 97),
-                          ('progress', 0.03125, None, 98),
-                          ('progress', 0.03125, None, 100),
-                          ('progress', 0.0, 'coregister dataarray: resample slice', 100),
+                          ('progress', 1.0, None, 100),
                           ('progress', 0.0, 'coregister dataarray', 100),
                           ('done',)], rm.records)
 
@@ -584,6 +469,43 @@ class TestCoregistration(TestCase):
 
         assert_almost_equal(ds_fine_resampled['first'].values, expected['first'].values)
 
+    def test_lazy(self):
+        """
+        Test that coregistration is performed lazily per dask block
+        """
+        ds_fine = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], np.array([np.eye(4, 8)] * 4)),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': np.array([1, 2, 3, 4])})
+
+        arr_coarse = np.array([np.eye(3, 6)] * 4)
+        arr_coarse[1, 0, 0] = np.nan
+        ds_coarse = xr.Dataset({
+            'first': (['lat', 'time', 'lon'], arr_coarse.transpose(1, 0, 2)),
+            'lat': np.linspace(-60, 60, 3),
+            'lon': np.linspace(-150, 150, 6),
+            'time': np.array([1, 2, 3, 4])}).chunk(chunks={'time': 2, 'lat': 2, 'lon': 3})
+
+        ds_coarse_resampled = coregister(ds_fine, ds_coarse)
+
+        first = ds_coarse_resampled['first']
+        self.assertEqual(('lat', 'time', 'lon'), first.dims)
+        self.assertIsInstance(first.data, da.Array)
+        self.assertEqual(((4,), (2, 2), (8,)), first.chunks)
+        assert_array_equal([1, 2, 3, 4], first.time.values)
+
+        slice_exp = np.array([[1., 0.28571429, 0., 0., 0., 0., 0., 0.],
+                              [0.33333333, 0.57142857, 0.38095238, 0., 0., 0., 0., 0.],
+                              [0., 0.47619048, 0.52380952, 0.28571429, 0.04761905, 0., 0., 0.],
+                              [0., 0., 0.42857143, 0.85714286, 0.14285714, 0., 0., 0.]])
+        values = first.transpose('time', 'lat', 'lon').values
+        assert_almost_equal(values[0], slice_exp)
+        assert_almost_equal(values[2], slice_exp)
+        # Invalid source pixels are ignored
+        self.assertTrue(np.isnan(values[1, 0, 0]))
+        assert_almost_equal(values[1, 2:], slice_exp[2:])
+
     def test_2D(self):
         """
         Test a case where a 2D lat/lon dataset is resampled or used for
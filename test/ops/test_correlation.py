@@ -140,6 +140,37 @@ class TestPearson(TestCase):
         self.assertTrue(np.all(np.isclose(correlation['p_value'].values,
                                           pv_sp)))
 
+    def test_chunked(self):
+        """
+        Test time chunked input with missing values against the scipy implementation
+        """
+        random = np.random.RandomState(0)
+        x_3d = random.rand(50, 3, 4)
+        y_3d = x_3d + random.rand(50, 3, 4)
+        x_3d[3, 0, 0] = np.nan
+        y_3d[[7, 40], 1, 2] = np.nan
+
+        ds1 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], x_3d),
+            'lat': np.linspace(-45, 45, 3),
+            'lon': np.linspace(-135, 135, 4),
+            'time': np.arange(50)}).chunk(chunks={'time': 7, 'lon': 2})
+        ds2 = xr.Dataset({
+            'first': (['time', 'lat', 'lon'], y_3d),
+            'lat': np.linspace(-45, 45, 3),
+            'lon': np.linspace(-135, 135, 4),
+            'time': np.arange(100, 150)}).chunk(chunks={'time': 9})
+
+        correlation = pearson_correlation(ds1, ds2, 'first', 'first')
+        for lat in range(3):
+            for lon in range(4):
+                x = x_3d[:, lat, lon]
+                y = y_3d[:, lat, lon]
+                valid = np.isfinite(x) & np.isfinite(y)
+                cc_sp, pv_sp = pearsonr(x[valid], y[valid])
+                self.assertAlmostEqual(correlation['corr_coef'].values[lat, lon], cc_sp)
+                self.assertAlmostEqual(correlation['p_value'].values[lat, lon], pv_sp)
+
     def test_broadcasting(self):
         """
         Test a (3d, 1d) input pair
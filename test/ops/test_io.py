@@ -5,7 +5,7 @@ Test the IO operations
 import os
 import unittest
 from io import StringIO
-from unittest import TestCase
+from unittest import TestCase, mock
 
 import geopandas as gpd
 
@@ -156,6 +156,38 @@ class TestIO(TestCase):
                                           '1;2;1.5\n'
                                           '2;3;2.0\n')
 
+    def test_write_csv_with_chunked_dataset(self):
+        import io
+        import xarray as xr
+        import numpy as np
+
+        ds = xr.Dataset(
+            data_vars=dict(sst=xr.DataArray(np.arange(4 * 3 * 5, dtype=np.float32).reshape((4, 3, 5)) / 4,
+                                            dims=['time', 'lat', 'lon'])),
+            coords=dict(time=np.array(['2000-01-01', '2000-02-01', '2000-03-01', '2000-04-01'],
+                                      dtype='datetime64[ns]'),
+                        lat=[-1.5, 0.0, 1.5],
+                        lon=[10.0, 10.5, 11.0, 11.5, 12.0]))
+        ds.sst[0, 0, 0] = np.nan
+
+        file = io.StringIO()
+        write_csv(ds, file=file)
+        expected = file.getvalue()
+        lines = expected.split('\n')
+        self.assertEqual(len(lines), 1 + 4 * 3 * 5 + 1)
+        self.assertEqual(lines[0], 'index,time,lat,lon,sst')
+        self.assertEqual(lines[1], '0,2000-01-01T00:00:00.000000000,-1.5,10.0,nan')
+        self.assertEqual(lines[23], '22,2000-02-01T00:00:00.000000000,0.0,11.0,5.5')
+        self.assertEqual(lines[60], '59,2000-04-01T00:00:00.000000000,1.5,12.0,14.75')
+        self.assertEqual(lines[61], '')
+
+        # Blocks of rows must neither depend on the block size nor on the chunking
+        for block_size in [1, 4, 7, 15, 16]:
+            with mock.patch('cate.ops.io._CSV_BLOCK_SIZE', block_size):
+                file = io.StringIO()
+                write_csv(ds.chunk(dict(lat=2)), file=file)
+                self.assertEqual(file.getvalue(), expected)
+
     def test_write_csv_with_data_frame(self):
         import io
         import pandas as pd
@@ -82,3 +82,33 @@ class TestOutliers(TestCase):
                          ret_first.attrs['ancillary_variables']))
         self.assertTrue(('second ' in
                          ret_first.attrs['ancillary_variables']))
+
+    def test_outliers_chunked(self):
+        random = np.random.RandomState(0)
+        first = random.standard_normal((20, 30, 40))
+        first[0, 0, :5] = np.nan
+        ds = xr.Dataset({
+            'first': xr.DataArray(first, dims=('time', 'lat', 'lon')),
+            'second': xr.DataArray(random.randint(0, 1000, (20, 30, 40)).astype(np.int16), dims=('time', 'lat', 'lon'))
+        }).chunk({'time': 3, 'lat': 10})
+
+        ret_ds = outliers.detect_outliers(ds, '*', threshold_low=0.01, threshold_high=0.99)
+        self.assertIsNotNone(ret_ds['first'].chunks)
+        self.assertEqual(ret_ds['first'].dtype, np.float64)
+        self.assertEqual(ret_ds['second'].dtype, np.float32)
+        for var_name in ('first', 'second'):
+            values = ds[var_name].values.astype(np.float64)
+            # The estimated quantiles differ slightly from the exact ones
+            low, high = np.nanquantile(values, [0.01, 0.99])
+            actual = np.isnan(ret_ds[var_name].values)
+            inner = (values > low + 0.01 * (high - low)) & (values < high - 0.01 * (high - low))
+            outer = np.isnan(values) | (values <= low - 0.01 * (high - low)) | (values >= high + 0.01 * (high - low))
+            self.assertFalse(np.any(actual[inner]))
+            self.assertTrue(np.all(actual[outer]))
+            self.assertAlmostEqual(np.count_nonzero(actual & ~np.isnan(values)) / values.size, 0.02, delta=0.002)
+
+        ret_ds = outliers.detect_outliers(ds, 'first', threshold_low=0.01, threshold_high=0.99, mask=True)
+        self.assertEqual(ret_ds['first_outlier_mask'].dtype, np.int8)
+        np.testing.assert_equal(ret_ds['first_outlier_mask'].values,
+                                np.isnan(outliers.detect_outliers(ds, 'first', threshold_low=0.01,
+                                                                  threshold_high=0.99)['first'].values))
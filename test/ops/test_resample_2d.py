@@ -82,3 +82,67 @@ class Resample2dTest(unittest.TestCase):
                           8, 2, rs.DS_MEAN, rs.US_NEAREST,
                           [[1., 1., 1., 1., 2., 2., 3., 3.],
                            [3.5, 3.5, 3.5, 3.5, 3., 3., 3., 3.]])
+
+
+class ResampleStackTest(unittest.TestCase):
+    def test_matches_resample_2d(self):
+        src = np.array([SRC, np.array(SRC) * 2., np.array(SRC) + 1.]).reshape((3, 1, 4, 4))
+        for w, h in ((2, 2), (8, 8), (8, 2), (2, 8)):
+            actual = rs.resample_stack(src, w, h, ds_method=rs.DS_MEAN, us_method=rs.US_LINEAR)
+            self.assertEqual((3, 1, h, w), actual.shape)
+            for i in range(3):
+                assert_almost_equal(actual[i, 0], rs.resample_2d(src[i, 0], w, h,
+                                                                 ds_method=rs.DS_MEAN,
+                                                                 us_method=rs.US_LINEAR))
+
+    def test_invalid_values(self):
+        src = np.array([[[np.nan, np.nan, 3.0, 4.0],
+                         [np.nan, np.nan, 1.0, 2.0]]])
+        actual = rs.resample_stack(src, 2, 1, ds_method=rs.DS_MEAN)
+        assert_almost_equal(actual, [[[np.nan, 2.5]]])
+
+    def test_int_to_float(self):
+        actual = rs.resample_stack(np.array([[[1, 2], [3, 5]]]), 1, 1, ds_method=rs.DS_MEAN)
+        self.assertEqual(np.float64, actual.dtype)
+        assert_almost_equal(actual, [[[2.75]]])
+
+
+class ResamplingPlanTest(unittest.TestCase):
+    def test_cached(self):
+        plan = rs.get_resampling_plan(4, 4, 2, 2, ds_method=rs.DS_MEAN, us_method=rs.US_NEAREST)
+        self.assertIs(plan, rs.get_resampling_plan(4, 4, 2, 2, ds_method=rs.DS_MEAN, us_method=rs.US_NEAREST))
+        self.assertIsNot(plan, rs.get_resampling_plan(4, 4, 2, 2, ds_method=rs.DS_STD, us_method=rs.US_NEAREST))
+
+    def test_matches_resample_2d(self):
+        src = np.random.RandomState(0).rand(2, 12, 15)
+        for ds_method in (rs.DS_MEAN, rs.DS_VAR, rs.DS_STD, rs.DS_FIRST, rs.DS_LAST):
+            for us_method in (rs.US_NEAREST, rs.US_LINEAR):
+                for w, h in ((5, 4), (31, 25), (5, 25), (31, 4), (15, 4), (31, 12)):
+                    plan = rs.ResamplingPlan(15, 12, w, h, ds_method=ds_method, us_method=us_method)
+                    actual = plan.apply(src)
+                    self.assertEqual((2, h, w), actual.shape)
+                    for i in range(2):
+                        assert_almost_equal(actual[i], rs.resample_2d(src[i], w, h,
+                                                                      ds_method=ds_method,
+                                                                      us_method=us_method))
+
+    def test_invalid_values(self):
+        src = np.array([[[np.nan, 1.0, 2.0, np.inf],
+                         [np.nan, 3.0, 4.0, 5.0]]])
+        plan = rs.ResamplingPlan(4, 2, 2, 1, ds_method=rs.DS_MEAN)
+        assert_almost_equal(plan.apply(src), [[[2.0, 11.0 / 3.0]]])
+        plan = rs.ResamplingPlan(4, 2, 8, 2, us_method=rs.US_NEAREST)
+        assert_almost_equal(plan.apply(src)[0, 0], [np.nan, np.nan, 1.0, 1.0, 2.0, 2.0, np.nan, np.nan])
+
+    def test_parallel(self):
+        src = np.random.RandomState(0).rand(3, 12, 15)
+        src[src < 0.2] = np.nan
+        for ds_method in (rs.DS_MEAN, rs.DS_MODE):
+            for w, h in ((5, 4), (31, 25), (5, 25)):
+                plan = rs.ResamplingPlan(15, 12, w, h, ds_method=ds_method)
+                assert_almost_equal(plan.apply(src, parallel=True), plan.apply(src, parallel=False))
+
+    def test_incompatible_shape(self):
+        plan = rs.ResamplingPlan(4, 2, 2, 1)
+        with self.assertRaises(ValueError):
+            plan.apply(np.zeros((2, 2)))
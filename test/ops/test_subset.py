@@ -213,9 +213,15 @@ class TestSubsetSpatial(TestCase):
             'lat': np.linspace(-89.5, 89.5, 180),
             'lon': np.linspace(-179.5, 179.5, 360)})
 
-        with self.assertRaises(Exception) as cm:
-            subset.subset_spatial(dataset, antimeridian_pol)
-        self.assertIn('anti-meridian', str(cm.exception))
+        actual = subset.subset_spatial(dataset, antimeridian_pol)
+        self.assertEqual(len(actual.lon), 360)
+        # Inside, west and east of the antimeridian
+        self.assertTrue(1 == actual.first.sel(method='nearest', lon=170.5, lat=30.5).all())
+        self.assertTrue(1 == actual.first.sel(method='nearest', lon=-170.5, lat=30.5).all())
+        # Outside, but within the bounding box
+        self.assertTrue(np.isnan(actual.first.sel(method='nearest', lon=159.5, lat=20.5)).all())
+        # Outside of the bounding box
+        self.assertTrue(np.isnan(actual.first.sel(method='nearest', lon=0.5, lat=30.5)).all())
 
     def test_antimeridian_arbitrary_inverted(self):
         antimeridian_pol = str('POLYGON(('
@@ -233,9 +239,15 @@ class TestSubsetSpatial(TestCase):
             'lat': np.linspace(89.5, -89.5, 180),
             'lon': np.linspace(-179.5, 179.5, 360)})
 
-        with self.assertRaises(Exception) as cm:
-            subset.subset_spatial(dataset, antimeridian_pol)
-        self.assertIn('anti-meridian', str(cm.exception))
+        actual = subset.subset_spatial(dataset, antimeridian_pol)
+        self.assertEqual(len(actual.lon), 360)
+        # Inside, west and east of the antimeridian
+        self.assertTrue(1 == actual.first.sel(method='nearest', lon=170.5, lat=30.5).all())
+        self.assertTrue(1 == actual.first.sel(method='nearest', lon=-170.5, lat=30.5).all())
+        # Outside, but within the bounding box
+        self.assertTrue(np.isnan(actual.first.sel(method='nearest', lon=159.5, lat=20.5)).all())
+        # Outside of the bounding box
+        self.assertTrue(np.isnan(actual.first.sel(method='nearest', lon=0.5, lat=30.5)).all())
 
     def test_select_single_center(self):
         """
@@ -118,3 +118,27 @@ class TimeSeriesMean(TestCase):
             'time': ['2000-01-01', '2000-02-01', '2000-03-01', '2000-04-01',
                      '2000-05-01', '2000-06-01']})
         assertDatasetEqual(expected, actual)
+
+    def test_tseries_mean_options(self):
+        data = np.arange(4 * 8 * 6, dtype=np.float32).reshape([4, 8, 6])
+        data[1, 2, 3] = np.nan
+        dataset = xr.Dataset({
+            'abs': (['lat', 'lon', 'time'], data, {'units': 'K'}),
+            'lat': np.linspace(-67.5, 67.5, 4),
+            'lon': np.linspace(-157.5, 157.5, 8),
+            'time': ['2000-01-01', '2000-02-01', '2000-03-01', '2000-04-01',
+                     '2000-05-01', '2000-06-01']}).chunk({'lat': 2, 'time': 4})
+
+        actual = tseries_mean(dataset, var='abs', calculate_std=False)
+        self.assertNotIn('abs_std', actual)
+        self.assertEqual(actual['abs'].dtype, np.float32)
+        self.assertEqual(actual['abs'].attrs['units'], 'K')
+        self.assertNotIn('Cate_Description', dataset['abs'].attrs)
+        np.testing.assert_allclose(actual['abs'].values, np.nanmean(data, axis=(0, 1)))
+
+        actual = tseries_mean(dataset, var='abs', area_weighted=True)
+        weights = np.cos(np.deg2rad(dataset.lat))
+        expected = dataset['abs'].weighted(weights).mean(dim=['lat', 'lon'])
+        np.testing.assert_allclose(actual['abs'].values, expected.values, rtol=1e-6)
+        expected_std = np.sqrt(((dataset['abs'] - expected) ** 2).weighted(weights).mean(dim=['lat', 'lon']))
+        np.testing.assert_allclose(actual['abs_std'].values, expected_std.values, rtol=1e-5)
@@ -0,0 +1,120 @@
+"""
+Tests for zonal statistics operations
+"""
+
+from unittest import TestCase
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import xarray as xr
+from shapely.geometry import box, Point
+
+from cate.core.op import OP_REGISTRY
+from cate.core.opimpl import rasterize_rings_impl, get_polygon_rings
+from cate.core.types import GeoDataFrame, ValidationError
+from cate.ops.zonal import zonal_statistics
+from cate.util.misc import object_to_qualified_name
+
+
+def _create_dataset():
+    lat = np.linspace(-4.5, 4.5, 10)
+    lon = np.linspace(-4.5, 4.5, 10)
+    data = np.arange(3 * 10 * 10, dtype=np.float64).reshape((3, 10, 10))
+    data[1, 0, 0] = np.nan
+    return xr.Dataset({
+        'first': (['time', 'lat', 'lon'], data),
+        'second': (['lat', 'lon'], np.ones((10, 10))),
+        'lat': lat,
+        'lon': lon,
+        'time': pd.date_range('2000-01-01', periods=3)})
+
+
+def _create_features():
+    return [
+        dict(type='Feature', id='0', properties=dict(name='west', code=1),
+             geometry=box(-5, -5, 0, 0).__geo_interface__),
+        dict(type='Feature', id='1', properties=dict(name='east', code=2),
+             geometry=box(0, -5, 5, 0).__geo_interface__),
+        dict(type='Feature', id='2', properties=dict(name='nowhere', code=3),
+             geometry=box(20, 20, 30, 30).__geo_interface__),
+    ]
+
+
+class RasterizeRingsTest(TestCase):
+    def test_box(self):
+        x = np.linspace(0.5, 9.5, 10)
+        y = np.linspace(0.5, 4.5, 5)
+        mask = rasterize_rings_impl(x, y, get_polygon_rings(box(2, 1, 5, 3)))
+        self.assertEqual(mask.shape, (5, 10))
+        expected = np.zeros((5, 10), dtype=bool)
+        expected[1:3, 2:5] = True
+        np.testing.assert_array_equal(mask, expected)
+
+    def test_hole_and_unsorted_coords(self):
+        polygon = box(-10, -10, 10, 10).difference(box(-2, -2, 2, 2))
+        x = np.linspace(9.5, -9.5, 20)
+        y = np.array([0.5, -9.5, 5.5, -0.5])
+        mask = rasterize_rings_impl(x, y, get_polygon_rings(polygon))
+        xx, yy = np.meshgrid(x, y)
+        expected = np.array([polygon.contains(Point(px, py)) for px, py in zip(xx.ravel(), yy.ravel())])
+        np.testing.assert_array_equal(mask, expected.reshape(mask.shape))
+
+    def test_empty(self):
+        mask = rasterize_rings_impl(np.arange(3.), np.arange(2.), [])
+        self.assertEqual(mask.shape, (2, 3))
+        self.assertFalse(mask.any())
+
+
+class ZonalStatisticsTest(TestCase):
+    def test_nominal(self):
+        ds = _create_dataset()
+        gdf = GeoDataFrame.from_features(_create_features())
+        actual = zonal_statistics(ds, gdf, var='first')
+
+        self.assertEqual(set(actual.data_vars),
+                         {'first_mean', 'first_min', 'first_max', 'first_std', 'first_count'})
+        self.assertEqual(actual.first_mean.dims, ('time', 'zone'))
+        self.assertEqual(list(actual.name.values), ['west', 'east', 'nowhere'])
+        self.assertEqual(list(actual.code.values), [1, 2, 3])
+
+        for zone, lon_slice in enumerate([slice(-5, 0), slice(0, 5)]):
+            expected = ds.first.sel(lat=slice(-5, 0), lon=lon_slice)
+            np.testing.assert_allclose(actual.first_mean[:, zone], expected.mean(dim=['lat', 'lon']))
+            np.testing.assert_allclose(actual.first_min[:, zone], expected.min(dim=['lat', 'lon']))
+            np.testing.assert_allclose(actual.first_max[:, zone], expected.max(dim=['lat', 'lon']))
+            np.testing.assert_allclose(actual.first_std[:, zone], expected.std(dim=['lat', 'lon']))
+            np.testing.assert_array_equal(actual.first_count[:, zone], expected.count(dim=['lat', 'lon']))
+
+        # Zone without any pixels
+        self.assertTrue(np.isnan(actual.first_mean[:, 2]).all())
+        np.testing.assert_array_equal(actual.first_count[:, 2], [0, 0, 0])
+
+    def test_geopandas_and_no_time(self):
+        ds = _create_dataset()
+        gdf = gpd.GeoDataFrame.from_features(_create_features())
+        actual = zonal_statistics(ds, gdf, var='second')
+        self.assertEqual(actual.second_mean.dims, ('zone',))
+        np.testing.assert_allclose(actual.second_mean.values, [1., 1., np.nan])
+        np.testing.assert_array_equal(actual.second_count.values, [25, 25, 0])
+
+    def test_cached_labels(self):
+        ds = _create_dataset()
+        actual_1 = zonal_statistics(ds, GeoDataFrame.from_features(_create_features()))
+        actual_2 = zonal_statistics(ds, GeoDataFrame.from_features(_create_features()))
+        self.assertTrue(actual_1.equals(actual_2))
+
+    def test_invalid_input(self):
+        ds = _create_dataset()
+        gdf = GeoDataFrame.from_features(_create_features())
+        with self.assertRaises(ValidationError):
+            zonal_statistics(ds.drop('lat'), gdf)
+        with self.assertRaises(ValidationError):
+            zonal_statistics(ds, gdf, var='lat')
+
+    def test_registered(self):
+        reg_op = OP_REGISTRY.get_op(object_to_qualified_name(zonal_statistics))
+        ds = _create_dataset()
+        gdf = GeoDataFrame.from_features(_create_features())
+        actual = reg_op(ds=ds, gdf=gdf, var='second')
+        np.testing.assert_array_equal(actual.second_count.values, [25, 25, 0])
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import TestCase, mock
+
+from cate.util.download import Downloader, DownloadError, DownloadTask
+from cate.util.monitor import Cancellation, Monitor
+
+_FILES = {
+    '/a.nc': bytes(range(256)) * 400,
+    '/b.nc': b'b' * 50000,
+    '/c.nc': b'c' * 70000,
+}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """
+    A minimal HTTP/1.1 file server that supports keep-alive and byte range requests.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get('Range')))
+            server.connections.add(self.client_address)
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header and server.ranges_supported:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (start, len(data) - 1, len(data)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = _ThreadingHTTPServer(('127.0.0.1', 0), _RequestHandler)
+        cls.server.files = _FILES
+        cls.server.lock = threading.Lock()
+        cls.server_thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.server_thread.start()
+        cls.base_url = 'http://127.0.0.1:%d' % cls.server.server_address[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.requests = []
+        self.server.connections = set()
+        self.server.ranges_supported = True
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _new_task(self, name, **kwargs):
+        return DownloadTask(self.base_url + name, os.path.join(self.tmp_dir, name[1:]), **kwargs)
+
+    def _read(self, task):
+        with open(task.file_path, 'rb') as fp:
+            return fp.read()
+
+    def test_download(self):
+        tasks = [self._new_task(name, size=len(data)) for name, data in sorted(_FILES.items())]
+        num_bytes = []
+        done = []
+        Downloader(max_connections=2, chunk_size=4096).download(tasks,
+                                                                on_chunk=lambda task, n: num_bytes.append(n),
+                                                                on_done=done.append)
+        for task, (name, data) in zip(tasks, sorted(_FILES.items())):
+            self.assertEqual(self._read(task), data)
+        self.assertEqual(done, tasks)
+        self.assertEqual(sum(num_bytes), sum(len(data) for data in _FILES.values()))
+        # Connections are kept alive and reused
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertLessEqual(len(self.server.connections), 2)
+
+    def test_resume(self):
+        data = _FILES['/a.nc']
+        task = self._new_task('/a.nc', size=len(data),
+                              checksum=hashlib.sha256(data).hexdigest(), checksum_type='SHA256')
+        with open(task.file_path, 'wb') as fp:
+            fp.write(data[:1000])
+        num_bytes = []
+        Downloader().download([task], on_chunk=lambda t, n: num_bytes.append(n))
+        self.assertEqual(self._read(task), data)
+        self.assertEqual(self.server.requests, [('/a.nc', 'bytes=1000-')])
+        self.assertEqual(sum(num_bytes), len(data))
+
+    def test_resume_not_supported(self):
+        self.server.ranges_supported = False
+        data = _FILES['/b.nc']
+        task = self._new_task('/b.nc', size=len(data))
+        with open(task.file_path, 'wb') as fp:
+            fp.write(data[:1000])
+        Downloader().download([task])
+        self.assertEqual(self._read(task), data)
+
+    def test_resume_corrupted_partial_file(self):
+        data = _FILES['/a.nc']
+        task = self._new_task('/a.nc', size=len(data),
+                              checksum=hashlib.md5(data).hexdigest(), checksum_type='MD5')
+        with open(task.file_path, 'wb') as fp:
+            fp.write(b'x' * 1000)
+        Downloader().download([task])
+        self.assertEqual(self._read(task), data)
+        self.assertEqual(self.server.requests, [('/a.nc', 'bytes=1000-'), ('/a.nc', None)])
+
+    def test_checksum_mismatch(self):
+        data = _FILES['/c.nc']
+        task = self._new_task('/c.nc', size=len(data), checksum='0' * 64, checksum_type='SHA256')
+        with self.assertRaises(DownloadError):
+            Downloader().download([task])
+        self.assertFalse(os.path.exists(task.file_path))
+
+    def test_failure_keeps_order(self):
+        tasks = [self._new_task('/a.nc'), self._new_task('/missing.nc'), self._new_task('/c.nc')]
+        done = []
+        with self.assertRaises(DownloadError):
+            Downloader(max_connections=1).download(tasks, on_done=done.append)
+        self.assertEqual(done, tasks[:1])
+        self.assertFalse(os.path.exists(tasks[2].file_path))
+
+    def test_retry_backoff(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        task = DownloadTask('http://127.0.0.1:%d/a.nc' % port, os.path.join(self.tmp_dir, 'a.nc'))
+        with mock.patch('cate.util.download.time.sleep') as sleep:
+            with self.assertRaises(DownloadError):
+                Downloader(max_retries=3).download([task])
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [0.5, 1.0, 2.0])
+
+    def test_shared_session(self):
+        downloader = Downloader()
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(downloader._get_session())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, sessions))), 1)
+        downloader.close()
+
+    def test_cancellation(self):
+        class CancelledMonitor(Monitor):
+            def start(self, label, total_work=None):
+                pass
+
+            def progress(self, work=None, msg=None):
+                pass
+
+            def done(self):
+                pass
+
+            def is_cancelled(self):
+                return True
+
+        with self.assertRaises(Cancellation):
+            Downloader().download([self._new_task('/a.nc')], monitor=CancelledMonitor())
+
+    def test_file_url(self):
+        data = _FILES['/b.nc']
+        source_file = os.path.join(self.tmp_dir, 'source.nc')
+        with open(source_file, 'wb') as fp:
+            fp.write(data)
+        task = DownloadTask('file:' + urllib.request.pathname2url(source_file),
+                            os.path.join(self.tmp_dir, 'target', 'b.nc'),
+                            checksum=hashlib.sha1(data).hexdigest(), checksum_type='SHA1')
+        Downloader().download([task])
+        self.assertEqual(self._read(task), data)
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from cate.util.recordfile import LazyRecord, read_record_file, write_record_file
+
+
+def _new_solr_json_dict(num_docs=5):
+    return {'responseHeader': {'status': 0},
+            'response': {'numFound': num_docs,
+                         'docs': [{'id': 'ds-%d' % i, 'title': 'Dataset %d' % i, 'variable': ['a', 'b']}
+                                  for i in range(num_docs)]}}
+
+
+class RecordFileTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'records')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_list_records(self):
+        json_dict = _new_solr_json_dict()
+        write_record_file(self.file_path, json_dict, records_path=('response', 'docs'), key_names=('id',))
+        actual = read_record_file(self.file_path)
+
+        self.assertEqual(actual['responseHeader'], {'status': 0})
+        self.assertEqual(actual['response']['numFound'], 5)
+        docs = actual['response']['docs']
+        self.assertEqual(len(docs), 5)
+        self.assertIsInstance(docs[0], LazyRecord)
+
+        # Key fields are available without decoding
+        self.assertEqual([doc.get('id') for doc in docs], ['ds-0', 'ds-1', 'ds-2', 'ds-3', 'ds-4'])
+        self.assertFalse(any(doc.is_decoded for doc in docs))
+
+        self.assertEqual(docs[1]['title'], 'Dataset 1')
+        self.assertTrue(docs[1].is_decoded)
+        self.assertEqual(json.loads(json.dumps(actual, default=dict)), json_dict)
+
+    def test_dict_records(self):
+        json_dict = {'uri-1': {'title': 'One', 'data_sources': ['a']},
+                     'uri-2': {'title': 'Two', 'data_sources': []}}
+        write_record_file(self.file_path, json_dict)
+        actual = read_record_file(self.file_path)
+        self.assertEqual(list(actual.keys()), ['uri-1', 'uri-2'])
+        item = actual['uri-1'].copy()
+        self.assertEqual(item.pop('data_sources'), ['a'])
+        self.assertEqual(item, {'title': 'One'})
+
+    def test_array_records(self):
+        file_list = [['file-1.nc', '2000-01-01T00:00:00', None, 'url-1', 1024, 'MD5', 'abc'],
+                     ['file-2.nc', '2000-01-02T00:00:00', None, 'url-2', 2048, 'MD5', 'def']]
+        write_record_file(self.file_path, file_list)
+        actual = read_record_file(self.file_path)
+        self.assertEqual(actual[0][0], 'file-1.nc')
+        self.assertEqual(actual[1][:3], ['file-2.nc', '2000-01-02T00:00:00', None])
+        filename, date_from, date_to = actual[1][:3]
+        self.assertEqual(filename, 'file-2.nc')
+        actual[1][2] = '2000-01-03T00:00:00'
+        self.assertEqual(actual[1][2], '2000-01-03T00:00:00')
+
+    def test_rewrite(self):
+        write_record_file(self.file_path, _new_solr_json_dict(), records_path=('response', 'docs'))
+        json_dict = read_record_file(self.file_path)
+        json_dict['response']['docs'][2]['title'] = 'Modified'
+        json_dict['response']['docs'].append({'id': 'ds-5'})
+
+        # Records that have not been decoded are copied as-is
+        write_record_file(self.file_path, json_dict, records_path=('response', 'docs'))
+        actual = read_record_file(self.file_path)
+        self.assertEqual([doc.get('title') for doc in actual['response']['docs']],
+                         ['Dataset 0', 'Dataset 1', 'Modified', 'Dataset 3', 'Dataset 4', None])
+
+    def test_invalid_file(self):
+        with open(self.file_path, 'w') as fp:
+            json.dump(_new_solr_json_dict(), fp)
+        with self.assertRaises(ValueError):
+            read_record_file(self.file_path)
+
+        with self.assertRaises(ValueError):
+            write_record_file(self.file_path, _new_solr_json_dict(), records_path=('response', 'nope'))
@@ -2,7 +2,7 @@ import cmath
 import math
 from unittest import TestCase
 
-from cate.util.safe import get_safe_globals, safe_eval
+from cate.util.safe import compile_source, get_safe_globals, safe_eval, safe_exec
 
 
 class SafeTest(TestCase):
@@ -25,6 +25,13 @@ class SafeTest(TestCase):
         self.assertEqual(safe_eval('x + 1', dict(x=2)), 3)
         self.assertEqual(safe_eval('"Ha%s" % "Ha"'), "HaHa")
 
+    def test_compiled_code_is_cached(self):
+        self.assertIs(compile_source('x * 2 + 1'), compile_source('x * 2 + 1'))
+        self.assertEqual(safe_eval(compile_source('x * 2 + 1'), dict(x=2)), 5)
+        namespace = dict(x=2)
+        safe_exec('y = x * 2 + 1', namespace)
+        self.assertEqual(namespace['y'], 5)
+
     def test_safe_eval_forbidden(self):
         with self.assertRaises(TypeError):
             safe_eval('eval("3+1")')
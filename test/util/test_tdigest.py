@@ -0,0 +1,33 @@
+from unittest import TestCase
+
+import numpy as np
+
+from cate.util.tdigest import TDigest
+
+
+class TDigestTest(TestCase):
+    def test_exact(self):
+        values = np.arange(16, dtype=np.float64)[::-1]
+        digest = TDigest.from_values(values)
+        self.assertEqual(digest.count, 16)
+        self.assertEqual(digest.num_centroids, 16)
+        np.testing.assert_almost_equal(digest.quantile([0.0, 0.05, 0.5, 0.95, 1.0]),
+                                       np.quantile(values, [0.0, 0.05, 0.5, 0.95, 1.0]))
+        self.assertAlmostEqual(digest.quantile(0.3), np.quantile(values, 0.3))
+
+    def test_empty(self):
+        self.assertTrue(np.isnan(TDigest().quantile(0.5)))
+        self.assertTrue(np.isnan(TDigest.from_values([np.nan, np.nan]).quantile(0.5)))
+        self.assertEqual(TDigest.merge([TDigest(), TDigest.from_values([1.0, np.nan, 2.0])]).quantile(0.5), 1.5)
+
+    def test_merge(self):
+        values = np.random.RandomState(0).standard_normal(100000)
+        digests = [TDigest.from_values(part, compression=100) for part in np.array_split(values, 10)]
+        digest = TDigest.merge(digests)
+        self.assertEqual(digest.count, 100000)
+        self.assertLess(digest.num_centroids, 100)
+        self.assertEqual(digest.quantile(0.0), values.min())
+        self.assertEqual(digest.quantile(1.0), values.max())
+        for q in (0.001, 0.01, 0.1, 0.5, 0.9, 0.99, 0.999):
+            # The rank of the estimated quantile is accurate
+            self.assertAlmostEqual(np.mean(values < digest.quantile(q)), q, delta=0.002)
@@ -2,9 +2,11 @@ import unittest
 import os
 import shutil
 
+from cate.core.ds import DATA_STORE_REGISTRY
 from cate.core.wsmanag import FSWorkspaceManager
 from cate.util.monitor import Monitor
 from cate.webapi.websocket import WebSocketService
+from test.core.test_ds import SimpleDataStore, SimpleDataSource
 
 
 class WebSocketServiceTest(unittest.TestCase):
@@ -33,6 +35,27 @@ class WebSocketServiceTest(unittest.TestCase):
             data_sources = self.service.get_data_sources(ds['id'], monitor=Monitor.NONE)
             self.assertIsInstance(data_sources, list)
 
+    def test_get_data_sources_search(self):
+        data_store = SimpleDataStore('test_search', [
+            SimpleDataSource('sst.day', meta_info=dict(title='Sea Surface Temperature',
+                                                       variables=[dict(name='analysed_sst')])),
+            SimpleDataSource('sst.mon', meta_info=dict(title='Monthly Sea Surface Temperature',
+                                                       variables=[dict(name='sst')])),
+            SimpleDataSource('oc.mon', meta_info=dict(title='Ocean Colour', variables=[dict(name='chlor_a')])),
+        ])
+        DATA_STORE_REGISTRY.add_data_store(data_store)
+        try:
+            data_sources = self.service.get_data_sources('test_search', monitor=Monitor.NONE)
+            self.assertEqual([ds['id'] for ds in data_sources], ['sst.mon', 'oc.mon', 'sst.day'])
+            data_sources = self.service.get_data_sources('test_search', monitor=Monitor.NONE, query_expr='sst')
+            self.assertEqual([ds['id'] for ds in data_sources], ['sst.mon', 'sst.day'])
+            data_sources = self.service.get_data_sources('test_search', monitor=Monitor.NONE, query_expr='mon')
+            self.assertEqual([ds['id'] for ds in data_sources], ['sst.mon', 'oc.mon'])
+            data_sources = self.service.get_data_sources('test_search', monitor=Monitor.NONE, var_names='sst')
+            self.assertEqual([ds['id'] for ds in data_sources], ['sst.mon'])
+        finally:
+            DATA_STORE_REGISTRY.remove_data_store('test_search')
+
     def test_get_operations(self):
         ops = self.service.get_operations()
         self.assertIsInstance(ops, list)